@@ -5,6 +5,7 @@ from at_ontology.apps.ontology.models import Ontology
 from at_ontology.apps.ontology.models import Relationship
 from at_ontology.apps.ontology.models import Vertex
 from at_ontology.apps.ontology.models import VertexPropertyAssignment
+from at_ontology.apps.ontology.search import SearchService
 
 
 class VertexInline(admin.TabularInline):
@@ -57,6 +58,12 @@ class VertexAdmin(admin.ModelAdmin):
     search_fields = "name", "description", "type__name", "type__description"
     list_filter = "ontology",
 
+    def get_search_results(self, request, queryset, search_term):
+        result, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            result |= queryset.filter(id__in=SearchService.search_ids(search_term))
+        return result, may_have_duplicates
+
 
 @admin.register(Relationship)
 class RelationshipAdmin(admin.ModelAdmin):
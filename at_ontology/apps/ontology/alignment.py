@@ -0,0 +1,243 @@
+import hashlib
+import json
+import time
+from typing import Callable
+from typing import Iterable
+from uuid import UUID
+
+from django.db import OperationalError
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import QuerySet
+from django.db.transaction import atomic
+
+from at_ontology.apps.ontology import models
+
+# Размер пачки при массовой записи пар сопоставления
+ALIGNMENT_BATCH_SIZE = 2000
+
+# Попытки записи сопоставления, пока SQLite занята другим процессом, и пауза перед первым повтором (с)
+SAVE_ATTEMPTS = 5
+SAVE_RETRY_DELAY = 0.2
+
+# Пара в виде (имя вершины A, имя вершины B, σ, σ⁰)
+type AlignmentRow = tuple[str, str, float, float]
+
+
+class AlignmentException(Exception):
+    pass
+
+
+def config_hash(config: dict) -> str:
+    """sha256 канонического JSON настроек сопоставителя; значения не из JSON приводятся к строке."""
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def alignment_row(result: object) -> AlignmentRow:
+    """Строка пары из ``MatchResult``/``SimilarPair`` (вершины — объекты с ``name``) или готового кортежа."""
+    if isinstance(result, tuple):
+        name_a, name_b, score, initial_score = result
+        return name_a, name_b, float(score), float(initial_score)
+    return result.vertex_a.name, result.vertex_b.name, float(result.score), float(result.initial_score)
+
+
+def _ontology_id(ontology: models.Ontology | UUID) -> UUID:
+    return ontology.id if isinstance(ontology, models.Ontology) else ontology
+
+
+class _PendingTouch(object):
+    """Онтологии и вершины, изменённые в текущей транзакции; ревизии растут один раз при её фиксации."""
+
+    def __init__(self, hooks: list):
+        # Список on_commit соединения: Django заменяет его после фиксации или отката
+        self.hooks = hooks
+        self.ontology_ids: set[UUID] = set()
+        self.vertex_ids: set[UUID] = set()
+        self.done = False
+
+    def __call__(self) -> None:
+        self.done = True
+        AlignmentService.touch_many(self.ontology_ids, self.vertex_ids)
+
+
+class AlignmentService(object):
+    """Хранилище результатов сопоставления онтологий.
+
+    Сопоставление определяется парой онтологий и хэшем настроек сопоставителя и хранит ревизии
+    обеих онтологий на момент запуска. Ревизия онтологии растёт при фиксации любого изменения её
+    вершин, связей и свойств вершин, поэтому сохранённое сопоставление действительно, пока обе
+    ревизии совпадают с текущими.
+    """
+
+    @staticmethod
+    def touch(ontology: models.Ontology | UUID) -> None:
+        models.Ontology.objects.filter(id=_ontology_id(ontology)).update(revision=F("revision") + 1)
+
+    @staticmethod
+    def touch_many(ontology_ids: Iterable[UUID], vertex_ids: Iterable[UUID] = ()) -> None:
+        """Увеличивает на 1 ревизии онтологий ``ontology_ids`` и онтологий вершин ``vertex_ids``."""
+        ontology_ids = set(ontology_ids)
+        vertex_ids = list(vertex_ids)
+        for start in range(0, len(vertex_ids), ALIGNMENT_BATCH_SIZE):
+            stop = start + ALIGNMENT_BATCH_SIZE
+            vertices = models.Vertex.objects.filter(id__in=vertex_ids[start:stop])
+            ontology_ids.update(vertices.values_list("ontology_id", flat=True))
+        ontology_ids = list(ontology_ids)
+        for start in range(0, len(ontology_ids), ALIGNMENT_BATCH_SIZE):
+            stop = start + ALIGNMENT_BATCH_SIZE
+            models.Ontology.objects.filter(id__in=ontology_ids[start:stop]).update(revision=F("revision") + 1)
+
+    @staticmethod
+    def touch_on_commit(ontology_id: UUID | None = None, vertex_id: UUID | None = None) -> None:
+        """Откладывает ``touch`` онтологии (или онтологии вершины) до фиксации транзакции.
+
+        Все изменения одной транзакции — например, каскадное удаление онтологии — увеличивают
+        ревизию каждой затронутой онтологии одним запросом; вне транзакции ревизия растёт сразу.
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            AlignmentService.touch_many([ontology_id] if ontology_id else [], [vertex_id] if vertex_id else [])
+            return
+        pending = getattr(connection, "ontology_pending_touch", None)
+        if pending is None or pending.done or pending.hooks is not connection.run_on_commit:
+            pending = _PendingTouch(connection.run_on_commit)
+            connection.ontology_pending_touch = pending
+            transaction.on_commit(pending)
+        if ontology_id is not None:
+            pending.ontology_ids.add(ontology_id)
+        if vertex_id is not None:
+            pending.vertex_ids.add(vertex_id)
+
+    @staticmethod
+    def revisions(ontology_a: models.Ontology | UUID, ontology_b: models.Ontology | UUID) -> tuple[int, int]:
+        id_a, id_b = _ontology_id(ontology_a), _ontology_id(ontology_b)
+        revisions = dict(models.Ontology.objects.filter(id__in=[id_a, id_b]).values_list("id", "revision"))
+        try:
+            return revisions[id_a], revisions[id_b]
+        except KeyError as e:
+            raise AlignmentException(f"ontology {e.args[0]} does not exist")
+
+    @staticmethod
+    def get(
+        ontology_a: models.Ontology | UUID,
+        ontology_b: models.Ontology | UUID,
+        config: dict,
+    ) -> models.Alignment | None:
+        """Сохранённое сопоставление, если ни одна из онтологий не менялась с момента его запуска."""
+        return models.Alignment.objects.filter(
+            ontology_a_id=_ontology_id(ontology_a),
+            ontology_b_id=_ontology_id(ontology_b),
+            config_hash=config_hash(config),
+            revision_a=F("ontology_a__revision"),
+            revision_b=F("ontology_b__revision"),
+        ).first()
+
+    @staticmethod
+    def save(
+        ontology_a: models.Ontology | UUID,
+        ontology_b: models.Ontology | UUID,
+        config: dict,
+        results: Iterable[object],
+        revisions: tuple[int, int] | None = None,
+    ) -> models.Alignment:
+        """Записывает результаты сопоставителя, заменяя прежнее сопоставление с теми же настройками.
+
+        ``results`` — ``MatchResult``/``SimilarPair`` или кортежи ``(имя_a, имя_b, σ, σ⁰)``; вершины
+        ищутся по имени в своей онтологии. ``revisions`` — ревизии онтологий на момент запуска
+        сопоставителя (по умолчанию текущие).
+
+        SQLite не даёт читающей транзакции стать пишущей, пока пишет другое соединение (например,
+        задача сопоставления в соседнем процессе), и сразу отвечает «database is locked». Транзакция
+        записи тогда откатывается целиком и повторяется до ``SAVE_ATTEMPTS`` раз — если она не вложена
+        в чужую транзакцию, которую повторить нельзя.
+        """
+        rows = [alignment_row(result) for result in results]
+        for attempt in range(1, SAVE_ATTEMPTS + 1):
+            try:
+                return AlignmentService._save(ontology_a, ontology_b, config, rows, revisions)
+            except OperationalError as e:
+                nested = transaction.get_connection().in_atomic_block
+                if "database is locked" not in str(e) or nested or attempt == SAVE_ATTEMPTS:
+                    raise
+            time.sleep(SAVE_RETRY_DELAY * attempt)
+
+    @staticmethod
+    @atomic
+    def _save(
+        ontology_a: models.Ontology | UUID,
+        ontology_b: models.Ontology | UUID,
+        config: dict,
+        rows: list[AlignmentRow],
+        revisions: tuple[int, int] | None,
+    ) -> models.Alignment:
+        id_a, id_b = _ontology_id(ontology_a), _ontology_id(ontology_b)
+        if revisions is None:
+            revisions = AlignmentService.revisions(id_a, id_b)
+
+        alignment, created = models.Alignment.objects.update_or_create(
+            ontology_a_id=id_a,
+            ontology_b_id=id_b,
+            config_hash=config_hash(config),
+            defaults={"revision_a": revisions[0], "revision_b": revisions[1], "config": config},
+        )
+        if not created:
+            alignment.pairs.all().delete()
+
+        vertices_a = dict(models.Vertex.objects.filter(ontology_id=id_a).values_list("name", "id"))
+        vertices_b = dict(models.Vertex.objects.filter(ontology_id=id_b).values_list("name", "id"))
+        pairs = []
+        for name_a, name_b, score, initial_score in rows:
+            if name_a not in vertices_a or name_b not in vertices_b:
+                raise AlignmentException(f"unknown vertex pair ({name_a!r}, {name_b!r})")
+            pairs.append(
+                models.AlignmentPair(
+                    alignment=alignment,
+                    vertex_a_id=vertices_a[name_a],
+                    vertex_b_id=vertices_b[name_b],
+                    score=score,
+                    initial_score=initial_score,
+                )
+            )
+        models.AlignmentPair.objects.bulk_create(pairs, batch_size=ALIGNMENT_BATCH_SIZE)
+        return alignment
+
+    @staticmethod
+    def get_or_compute(
+        ontology_a: models.Ontology | UUID,
+        ontology_b: models.Ontology | UUID,
+        config: dict,
+        compute: Callable[[], Iterable[object]],
+    ) -> models.Alignment:
+        """Сохранённое сопоставление или результат ``compute()``, записанный в хранилище."""
+        alignment = AlignmentService.get(ontology_a, ontology_b, config)
+        if alignment is not None:
+            return alignment
+        # Ревизии читаются до запуска: правки во время сопоставления сделают результат устаревшим
+        revisions = AlignmentService.revisions(ontology_a, ontology_b)
+        return AlignmentService.save(ontology_a, ontology_b, config, compute(), revisions)
+
+    @staticmethod
+    def rows(alignment: models.Alignment) -> list[AlignmentRow]:
+        """Пары сопоставления по убыванию σ в виде ``(имя_a, имя_b, σ, σ⁰)``."""
+        return list(alignment.pairs.values_list("vertex_a__name", "vertex_b__name", "score", "initial_score"))
+
+    @staticmethod
+    def pairs_for_vertex(
+        vertex: models.Vertex | UUID,
+        current: bool = True,
+    ) -> QuerySet[models.AlignmentPair]:
+        """Пары с участием вершины с любой стороны, по убыванию σ.
+
+        Запрос идёт по индексам ``(vertex_a, -score)`` и ``(vertex_b, -score)``; с ``current`` остаются
+        только пары действительных сопоставлений.
+        """
+        vertex_id = vertex.id if isinstance(vertex, models.Vertex) else vertex
+        pairs = models.AlignmentPair.objects.filter(Q(vertex_a_id=vertex_id) | Q(vertex_b_id=vertex_id))
+        if current:
+            pairs = pairs.filter(
+                alignment__revision_a=F("alignment__ontology_a__revision"),
+                alignment__revision_b=F("alignment__ontology_b__revision"),
+            )
+        return pairs.select_related("alignment", "vertex_a", "vertex_b")
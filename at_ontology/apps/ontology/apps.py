@@ -7,3 +7,8 @@ class OntologyConfig(AppConfig):
     name = "at_ontology.apps.ontology"
     label = "ontology"
     verbose_name = _("ontology")
+
+    def ready(self):
+        from at_ontology.apps.ontology.signals import connect_signals
+
+        connect_signals()
@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from typing import Any
+from typing import Iterable
+
+from django.db.models import Exists
+from django.db.models import OuterRef
+from django.db.models import Q
+
+from at_ontology.apps.ontology import models
+from at_ontology.apps.ontology_model import models as model_models
+from at_ontology.apps.ontology_model.closure import TypeClosureService
+
+LOOKUPS = {
+    "exact",
+    "iexact",
+    "contains",
+    "icontains",
+    "startswith",
+    "istartswith",
+    "endswith",
+    "iendswith",
+    "gt",
+    "gte",
+    "lt",
+    "lte",
+    "in",
+    "isnull",
+    "regex",
+    "iregex",
+    "has_key",
+    "has_keys",
+    "has_any_keys",
+}
+
+
+class PropertyFilterException(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PropertyFilter:
+    """Условие на значение свойства, вычисляемое в БД подзапросом ``EXISTS``.
+
+    ``definition`` — имя определения свойства, ``path`` — путь внутри JSON-значения через точку
+    (пустой путь — само значение), ``lookup`` — стандартный lookup Django (``exact``, ``gt``, ``icontains``...).
+    Для свойств с несколькими значениями условие выполняется, если ему удовлетворяет хотя бы одно из них.
+    """
+
+    definition: str
+    path: str = ""
+    lookup: str = "exact"
+    value: Any = None
+
+    def __post_init__(self):
+        if self.lookup not in LOOKUPS:
+            raise PropertyFilterException(f"unsupported lookup {self.lookup!r}")
+        if self.path and (not all(self.path.split(".")) or "__" in self.path):
+            raise PropertyFilterException(f"invalid path {self.path!r}")
+
+    @classmethod
+    def parse(cls, expression: str, value: Any) -> "PropertyFilter":
+        """Разбирает выражение вида ``questions.difficulty__gt``."""
+        head, _, lookup = expression.rpartition("__")
+        if not head or lookup not in LOOKUPS:
+            head, lookup = expression, "exact"
+        definition, _, path = head.partition(".")
+        return cls(definition=definition, path=path, lookup=lookup, value=value)
+
+    @property
+    def value_lookup(self) -> str:
+        parts = ["value", *self.path.split(".")] if self.path else ["value"]
+        return "__".join([*parts, self.lookup])
+
+    def subquery(self, assignment_model: type, owner_field: str) -> Exists:
+        return Exists(
+            assignment_model.objects.filter(
+                **{
+                    owner_field: OuterRef("pk"),
+                    "definition__name": self.definition,
+                    self.value_lookup: self.value,
+                }
+            )
+        )
+
+    def for_vertices(self) -> Q:
+        return Q(self.subquery(models.VertexPropertyAssignment, "vertex"))
+
+    def for_relationships(self) -> Q:
+        return Q(self.subquery(models.RelationshipPropertyAssignment, "relationship"))
+
+
+def vertex_filters_q(filters: Iterable[PropertyFilter]) -> Q:
+    result = Q()
+    for property_filter in filters:
+        result &= property_filter.for_vertices()
+    return result
+
+
+def relationship_filters_q(filters: Iterable[PropertyFilter]) -> Q:
+    result = Q()
+    for property_filter in filters:
+        result &= property_filter.for_relationships()
+    return result
+
+
+def vertex_type_q(vertex_type: model_models.VertexType, include_subtypes: bool = True) -> Q:
+    if not include_subtypes:
+        return Q(type_id=vertex_type.id)
+    closure = TypeClosureService.get(vertex_type.ontology_model_id)
+    return Q(type_id__in=closure.vertex_types.subtypes(vertex_type.id))
+
+
+def relationship_type_q(relationship_type: model_models.RelationshipType, include_subtypes: bool = True) -> Q:
+    if not include_subtypes:
+        return Q(type_id=relationship_type.id)
+    closure = TypeClosureService.get(relationship_type.ontology_model_id)
+    return Q(type_id__in=closure.relationship_types.subtypes(relationship_type.id))
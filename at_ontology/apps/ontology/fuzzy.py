@@ -0,0 +1,115 @@
+import threading
+from dataclasses import dataclass
+from typing import Iterable
+
+from django.db import connection
+from django.db.transaction import atomic
+
+from at_ontology.apps.ontology import models
+from at_ontology.apps.ontology.ngram import NGramIndex
+
+DEFAULT_THRESHOLD = 0.3
+
+
+class FuzzyLookupException(Exception):
+    pass
+
+
+@dataclass
+class FuzzyHit:
+    vertex: models.Vertex
+    similarity: float
+
+
+class FuzzyLookupService(object):
+    _indexes: dict = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def similar_vertices(
+        text: str,
+        ontologies: models.Ontology | Iterable[models.Ontology] | None = None,
+        k: int = 10,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> list[FuzzyHit]:
+        ranked = FuzzyLookupService.similar_vertex_ids(text, ontologies, k=k, threshold=threshold)
+        vertices = models.Vertex.objects.in_bulk([vertex_id for vertex_id, _ in ranked])
+        return [
+            FuzzyHit(vertex=vertices[vertex_id], similarity=score)
+            for vertex_id, score in ranked
+            if vertex_id in vertices
+        ]
+
+    @staticmethod
+    def similar_vertex_ids(
+        text: str,
+        ontologies: models.Ontology | Iterable[models.Ontology] | None = None,
+        k: int = 10,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> list[tuple[object, float]]:
+        if not 0 <= threshold <= 1:
+            raise FuzzyLookupException("threshold must be in [0, 1]")
+        if not text or k <= 0:
+            return []
+
+        if isinstance(ontologies, models.Ontology):
+            ontologies = [ontologies]
+        if ontologies is None:
+            ontology_ids = list(models.Ontology.objects.values_list("id", flat=True))
+        else:
+            ontology_ids = [ontology.id for ontology in ontologies]
+        if not ontology_ids:
+            return []
+
+        if connection.vendor == "postgresql":
+            return FuzzyLookupService._postgres_lookup(text, ontology_ids, k, threshold)
+
+        ranked = []
+        for ontology_id in ontology_ids:
+            ranked.extend(FuzzyLookupService.get_index(ontology_id).query(text, k=k, threshold=threshold))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    @staticmethod
+    def get_index(ontology_id) -> NGramIndex:
+        with FuzzyLookupService._lock:
+            index = FuzzyLookupService._indexes.get(ontology_id)
+            if index is None:
+                index = NGramIndex()
+                for vertex_id, name, label in models.Vertex.objects.filter(ontology_id=ontology_id).values_list(
+                    "id", "name", "label"
+                ):
+                    index.add(vertex_id, label)
+                    index.add(vertex_id, name)
+                FuzzyLookupService._indexes[ontology_id] = index
+            return index
+
+    @staticmethod
+    def invalidate(ontology_id=None) -> None:
+        with FuzzyLookupService._lock:
+            if ontology_id is None:
+                FuzzyLookupService._indexes.clear()
+            else:
+                FuzzyLookupService._indexes.pop(ontology_id, None)
+
+    @staticmethod
+    @atomic
+    def _postgres_lookup(text: str, ontology_ids: list, k: int, threshold: float) -> list[tuple[object, float]]:
+        pk = models.Ontology._meta.pk
+        params = [pk.get_db_prep_value(ontology_id, connection) for ontology_id in ontology_ids]
+        placeholders = ", ".join(["%s"] * len(params))
+
+        with connection.cursor() as cursor:
+            # Оператор % использует GIN-индексы gin_trgm_ops; порог задаётся на время транзакции
+            cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", [str(threshold)])
+            cursor.execute(
+                "SELECT v.id, GREATEST(similarity(v.label, %s), similarity(v.name, %s)) AS score "
+                "FROM ontology_vertex v "
+                f"WHERE (v.label %% %s OR v.name %% %s) AND v.ontology_id IN ({placeholders}) "
+                "ORDER BY score DESC, v.id LIMIT %s",
+                [text, text, text, text, *params, k],
+            )
+            rows = cursor.fetchall()
+
+        to_python = models.Vertex._meta.pk.to_python
+        return [(to_python(vertex_id), float(score)) for vertex_id, score in rows]
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.search import SearchService
+
+
+class Command(BaseCommand):
+    help = "Пересоздание документов полнотекстового поиска вершин"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ontology", action="append", help="id онтологии (можно указать несколько раз)")
+
+    def handle(self, *args, **options):
+        ontologies = None
+        if options["ontology"]:
+            ontologies = Ontology.objects.filter(id__in=options["ontology"])
+        count = SearchService.rebuild(ontologies)
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано вершин: {count}"))
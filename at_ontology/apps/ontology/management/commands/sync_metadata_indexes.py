@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from at_ontology.apps.ontology.metadata import get_indexed_metadata_keys
+from at_ontology.apps.ontology.metadata import MetadataIndexService
+
+
+class Command(BaseCommand):
+    help = "Синхронизация индексов Vertex.metadata с настройкой ONTOLOGY_INDEXED_METADATA_KEYS"
+
+    def handle(self, *args, **options):
+        created, dropped = MetadataIndexService.sync_indexes()
+
+        self.stdout.write(f"Индексируемые ключи: {', '.join(get_indexed_metadata_keys()) or '-'}")
+        for name in created:
+            self.stdout.write(self.style.SUCCESS(f"Создан индекс {name}"))
+        for name in dropped:
+            self.stdout.write(self.style.WARNING(f"Удалён индекс {name}"))
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from at_ontology.apps.ontology.matching.embeddings import text_key
+
+# Число строк в блоке при назначении векторов центроидам
+ASSIGN_BLOCK = 4096
+
+
+class IVFIndexException(Exception):
+    pass
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-нормированные строки во float32; нулевые строки остаются нулевыми."""
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Номер ближайшего по косинусу центроида для каждого вектора (блоками по ASSIGN_BLOCK строк)."""
+    result = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        stop = start + ASSIGN_BLOCK
+        result[start:stop] = np.argmax(vectors[start:stop] @ centroids.T, axis=1)
+    return result
+
+
+def spherical_kmeans(vectors: np.ndarray, n_lists: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Центроиды k-средних по косинусу; опустевший кластер заново засевается случайным вектором."""
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroids(vectors, centroids)
+        one_hot = sparse.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (assignment, np.arange(len(vectors)))),
+            shape=(n_lists, len(vectors)),
+        )
+        sums = np.asarray(one_hot @ vectors, dtype=np.float32)
+        empty = np.bincount(assignment, minlength=n_lists) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex(object):
+    """Инвертированный индекс (IVF) для поиска ближайших соседей по косинусу.
+
+    Векторы разбиваются k-средними на ``n_lists`` списков; поиск просматривает только
+    ``n_probe`` списков с ближайшими к запросу центроидами. Векторы хранятся переупорядоченными
+    по спискам: список ``l`` — строки ``offsets[l]:offsets[l + 1]``, ``ids`` — исходные номера строк.
+    Чем больше ``n_probe``, тем выше полнота и медленнее поиск; ``n_probe = n_lists`` — точный поиск.
+    """
+
+    def __init__(self, centroids: np.ndarray, vectors: np.ndarray, ids: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        n_lists: int | None = None,
+        iterations: int = 10,
+        sample_size: int = 256,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Индекс по строкам ``vectors``. По умолчанию ``n_lists ≈ √n``; центроиды обучаются
+        на выборке не более ``sample_size`` векторов на список."""
+        vectors = normalize_rows(vectors)
+        if not len(vectors):
+            raise IVFIndexException("cannot build an index over no vectors")
+        n_lists = min(n_lists or max(int(np.sqrt(len(vectors))), 1), len(vectors))
+        rng = np.random.default_rng(seed)
+
+        sample = vectors
+        if len(vectors) > n_lists * sample_size:
+            sample = vectors[np.sort(rng.choice(len(vectors), n_lists * sample_size, replace=False))]
+        centroids = spherical_kmeans(sample, n_lists, iterations, rng)
+
+        assignment = nearest_centroids(vectors, centroids)
+        ids = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, vectors[ids], ids, offsets)
+
+    def search(self, queries: np.ndarray, k: int, n_probe: int = 8) -> tuple[np.ndarray, np.ndarray]:
+        """``k`` ближайших векторов для каждого запроса: номера строк (−1 — соседей меньше ``k``)
+        и косинусы, по убыванию.
+
+        Запросы группируются по просматриваемому списку, так что каждый список обходится один раз
+        одним произведением матриц «запросы × векторы списка».
+        """
+        queries = normalize_rows(queries)
+        n_probe = min(n_probe, self.n_lists)
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+
+        found_ids = np.full((len(queries), n_probe * k), -1, dtype=np.int64)
+        found_scores = np.full((len(queries), n_probe * k), -np.inf, dtype=np.float32)
+        for lst in range(self.n_lists):
+            query_rows, slots = np.nonzero(probes == lst)
+            start, stop = self.offsets[lst], self.offsets[lst + 1]
+            if not len(query_rows) or start == stop:
+                continue
+            scores = queries[query_rows] @ np.asarray(self.vectors[start:stop]).T
+            top = min(k, stop - start)
+            best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            columns = slots[:, None] * k + np.arange(top)
+            found_ids[query_rows[:, None], columns] = self.ids[start + best]
+            found_scores[query_rows[:, None], columns] = np.take_along_axis(scores, best, axis=1)
+
+        top = min(k, found_ids.shape[1])
+        best = np.argsort(-found_scores, axis=1, kind="stable")[:, :top]
+        ids = np.take_along_axis(found_ids, best, axis=1)
+        scores = np.take_along_axis(found_scores, best, axis=1)
+        scores[ids < 0] = 0.0
+        return ids, scores
+
+    def save(self, path: Path | str) -> None:
+        """Сохраняет индекс в каталог ``path``: сначала во временный каталог рядом, затем переименованием."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}."))
+        try:
+            for name in ("centroids", "vectors", "ids", "offsets"):
+                np.save(staging / f"{name}.npy", np.asarray(getattr(self, name)))
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path | str) -> "IVFIndex":
+        """Загружает индекс; векторы отображаются в память только для чтения."""
+        path = Path(path)
+        return cls(
+            centroids=np.load(path / "centroids.npy"),
+            vectors=np.load(path / "vectors.npy", mmap_mode="r"),
+            ids=np.load(path / "ids.npy"),
+            offsets=np.load(path / "offsets.npy"),
+        )
+
+
+def index_key(texts: list[str], n_lists: int | None = None, seed: int = 0) -> str:
+    """Имя каталога индекса: хэш текстов вершин в порядке строк и параметров построения."""
+    digest = hashlib.sha1(f"{n_lists}:{seed}:".encode())
+    for text in texts:
+        digest.update(text_key(text))
+    return digest.hexdigest()
+
+
+def cached_index(
+    root: Path | str,
+    texts: list[str],
+    vectors: np.ndarray,
+    n_lists: int | None = None,
+    seed: int = 0,
+) -> IVFIndex:
+    """Индекс по векторам текстов онтологии из каталога ``root``; строится и сохраняется,
+    если для этого набора текстов его ещё нет."""
+    path = Path(root) / index_key(texts, n_lists, seed)
+    if (path / "offsets.npy").exists():
+        return IVFIndex.load(path)
+    index = IVFIndex.build(vectors, n_lists=n_lists, seed=seed)
+    index.save(path)
+    return index
@@ -0,0 +1,184 @@
+from typing import Callable
+from typing import Container
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+type PairKey = tuple[str, str]
+
+ASSIGNMENT_METHODS = ("greedy", "optimal")
+
+# Минимальный размер порции лучших пар, просматриваемой жадным паросочетанием
+MIN_CHUNK = 1024
+
+
+class AssignmentException(Exception):
+    pass
+
+
+def greedy_assignment(
+    rows: np.ndarray,
+    cols: np.ndarray,
+    scores: np.ndarray,
+    min_score: float = 0.0,
+    chunk_size: int | None = None,
+    callback: Callable[[np.ndarray], None] | None = None,
+    callback_size: int = MIN_CHUNK,
+) -> np.ndarray:
+    """Жадное паросочетание «один к одному»: номера выбранных пар в порядке убывания оценки.
+
+    Совпадает с ``_filter_one_to_one``: пары просматриваются по убыванию оценки (при равенстве —
+    в порядке входных массивов), пара берётся, если обе её вершины ещё свободны. Пары не
+    сортируются целиком: из оставшихся выбирается порция лучших (``np.partition``), пары с уже
+    занятыми вершинами отбрасываются из неё векторно, и по одной просматривается только остаток.
+    Просмотр заканчивается, как только заняты все вершины меньшей стороны.
+
+    Выбранная пара окончательна, поэтому ``callback`` получает номера пар по мере выбора —
+    порциями не больше ``callback_size`` пар, в том же порядке.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    remaining = np.flatnonzero(scores >= min_score)
+    if not len(remaining):
+        return np.empty(0, dtype=np.int64)
+
+    used_a = np.zeros(int(rows[remaining].max()) + 1, dtype=bool)
+    used_b = np.zeros(int(cols[remaining].max()) + 1, dtype=bool)
+    limit = min(len(np.unique(rows[remaining])), len(np.unique(cols[remaining])))
+    chunk_size = chunk_size or max(4 * limit, MIN_CHUNK)
+
+    chosen: list[int] = []
+    reported = 0
+    while len(remaining) and len(chosen) < limit:
+        values = scores[remaining]
+        if len(remaining) > chunk_size:
+            # Все пары не хуже k-й лучшей, вместе с равными ей, чтобы порядок при равенстве сохранился
+            kth = np.partition(values, len(values) - chunk_size)[len(values) - chunk_size]
+            head = values >= kth
+            batch, remaining = remaining[head], remaining[~head]
+        else:
+            batch, remaining = remaining, remaining[:0]
+
+        batch = batch[~used_a[rows[batch]] & ~used_b[cols[batch]]]
+        batch = batch[np.lexsort((batch, -scores[batch]))]
+        for pair, row, col in zip(batch.tolist(), rows[batch].tolist(), cols[batch].tolist()):
+            if used_a[row] or used_b[col]:
+                continue
+            used_a[row] = used_b[col] = True
+            chosen.append(pair)
+            if callback is not None and len(chosen) - reported == callback_size:
+                callback(np.array(chosen[reported:], dtype=np.int64))
+                reported = len(chosen)
+            if len(chosen) == limit:
+                break
+    if callback is not None and len(chosen) > reported:
+        callback(np.array(chosen[reported:], dtype=np.int64))
+    return np.array(chosen, dtype=np.int64)
+
+
+def optimal_assignment(
+    rows: np.ndarray,
+    cols: np.ndarray,
+    scores: np.ndarray,
+    min_score: float = 0.0,
+) -> np.ndarray:
+    """Паросочетание «один к одному» с наибольшей суммой оценок; номера пар в порядке убывания оценки.
+
+    Пары (без повторов) с оценкой не ниже ``min_score`` — рёбра разреженного двудольного графа.
+    Задача сводится к полному паросочетанию в графе (A ∪ B′) × (B ∪ A′), которое решает
+    ``min_weight_full_bipartite_matching`` (LAPJVsp): у вершины A есть ребро в свою копию в A′,
+    у вершины B — из своей копии в B′, а копии связаны рёбрами, транспонированными к исходным.
+    Так любое паросочетание дополняется до полного, а все веса сдвинуты на 1, чтобы
+    не было нулевых рёбер; число рёбер в полном паросочетании постоянно, и сдвиг не меняет ответ.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    edges = np.flatnonzero(scores >= min_score)
+    if not len(edges):
+        return np.empty(0, dtype=np.int64)
+
+    vertices_a, edge_rows = np.unique(rows[edges], return_inverse=True)
+    vertices_b, edge_cols = np.unique(cols[edges], return_inverse=True)
+    n_a, n_b = len(vertices_a), len(vertices_b)
+    if len(np.unique(edge_rows * n_b + edge_cols)) != len(edges):
+        raise AssignmentException("pairs must be unique")
+
+    own_a, own_b = np.arange(n_a), np.arange(n_b)
+    graph = sparse.csr_matrix(
+        (
+            np.concatenate([scores[edges] + 1.0, np.ones(n_a + n_b + len(edges))]),
+            (
+                np.concatenate([edge_rows, own_a, n_a + own_b, n_a + edge_cols]),
+                np.concatenate([edge_cols, n_b + own_a, own_b, n_b + edge_rows]),
+            ),
+        ),
+        shape=(n_a + n_b, n_b + n_a),
+    )
+    left, right = min_weight_full_bipartite_matching(graph, maximize=True)
+
+    real = (left < n_a) & (right < n_b)
+    position = np.full(n_a, -1, dtype=np.int64)
+    position[left[real]] = right[real]
+    chosen = edges[position[edge_rows] == edge_cols]
+    return chosen[np.lexsort((chosen, -scores[chosen]))]
+
+
+def assign(
+    rows: np.ndarray,
+    cols: np.ndarray,
+    scores: np.ndarray,
+    min_score: float = 0.0,
+    method: str = "greedy",
+    callback: Callable[[np.ndarray], None] | None = None,
+    callback_size: int = MIN_CHUNK,
+) -> np.ndarray:
+    """Паросочетание методом ``method``; ``callback`` — как в ``greedy_assignment``.
+
+    Оптимальное паросочетание известно только целиком, поэтому ``callback`` получает его пары в конце.
+    """
+    if method == "greedy":
+        return greedy_assignment(rows, cols, scores, min_score, callback=callback, callback_size=callback_size)
+    if method == "optimal":
+        chosen = optimal_assignment(rows, cols, scores, min_score)
+        if callback is not None:
+            for start in range(0, len(chosen), callback_size):
+                stop = start + callback_size
+                callback(chosen[start:stop])
+        return chosen
+    raise AssignmentException(f"unknown assignment method {method!r}")
+
+
+def assign_pairs(
+    sigma: dict[PairKey, float],
+    min_score: float = 0.0,
+    method: str = "greedy",
+    vertices_a: Container[str] | None = None,
+    vertices_b: Container[str] | None = None,
+) -> list[tuple[PairKey, float]]:
+    """Паросочетание для σ в виде словаря ``{(имя_a, имя_b): оценка}`` — список ``((имя_a, имя_b), оценка)``.
+
+    Пары с вершинами не из ``vertices_a``/``vertices_b`` (если заданы) пропускаются. Имена переводятся
+    в номера без промежуточных кортежей и списков размером с σ.
+    """
+    index_a: dict[str, int] = {}
+    index_b: dict[str, int] = {}
+    rows = np.fromiter((index_a.setdefault(a, len(index_a)) for a, _ in sigma), dtype=np.int64, count=len(sigma))
+    cols = np.fromiter((index_b.setdefault(b, len(index_b)) for _, b in sigma), dtype=np.int64, count=len(sigma))
+    scores = np.fromiter(sigma.values(), dtype=np.float64, count=len(sigma))
+    if vertices_a is not None or vertices_b is not None:
+        known = np.fromiter(
+            ((vertices_a is None or a in vertices_a) and (vertices_b is None or b in vertices_b) for a, b in sigma),
+            dtype=bool,
+            count=len(sigma),
+        )
+        scores[~known] = -np.inf
+
+    chosen = assign(rows, cols, scores, min_score, method)
+    names_a, names_b = list(index_a), list(index_b)
+    return [
+        ((names_a[row], names_b[col]), score)
+        for row, col, score in zip(rows[chosen].tolist(), cols[chosen].tolist(), scores[chosen].tolist())
+    ]
@@ -0,0 +1,236 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+from scipy import sparse
+
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.propagation import PairKey
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.similarity import SimilarityMatrix
+from at_ontology.apps.ontology.matching.text import char_ngrams
+from at_ontology.apps.ontology.matching.text import is_abbreviation
+from at_ontology.apps.ontology.matching.text import tokenize
+from at_ontology.apps.ontology.matching.text import vertex_label
+
+# Строк матрицы A за один шаг разреженного произведения — ограничивает пиковую память
+CHUNK_SIZE = 1024
+
+
+@dataclass
+class CandidatePairs:
+    """Пары-кандидаты ``(rows[i], cols[i])`` с оценкой блокировки ``scores[i]``."""
+
+    n_a: int
+    n_b: int
+    rows: np.ndarray
+    cols: np.ndarray
+    scores: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def reduction(self) -> float:
+        """Доля пар полного произведения, отброшенных блокировкой."""
+        total = self.n_a * self.n_b
+        return 1.0 - len(self) / total if total else 0.0
+
+    def pair_space(self) -> PairSpace:
+        return PairSpace(self.n_a, self.n_b, PairSpace.pack(self.rows, self.cols, self.n_b))
+
+    def names(self, graph_a: MatchGraph, graph_b: MatchGraph) -> list[PairKey]:
+        """Пары ``(имя_a, имя_b)`` в порядке вершин A, затем B."""
+        return [(graph_a.names[row], graph_b.names[col]) for row, col in zip(self.rows.tolist(), self.cols.tolist())]
+
+    def recall(self, reference: Iterable[PairKey], graph_a: MatchGraph, graph_b: MatchGraph) -> float:
+        """Доля эталонных пар ``(имя_a, имя_b)``, попавших в кандидаты."""
+        reference = set(reference)
+        if not reference:
+            return 1.0
+        return len(reference.intersection(self.names(graph_a, graph_b))) / len(reference)
+
+
+class CandidateBlocker(object):
+    """Отбор пар-кандидатов для σ⁰ без перебора всего произведения |A|·|B|.
+
+    Каждая вершина описывается двумя разреженными векторами признаков с весами IDF:
+    словами названия (плюс аббревиатуры и инициалы соседних слов, чтобы «НФ» находило
+    «неформализованных ...») и символьными n-граммами слов. Оценка пары — максимум косинусов
+    по двум видам признаков; с учётом контекста родителей она смешивается с оценкой пары
+    родителей так же, как в σ⁰: ``(1 − parent_weight)·s + parent_weight·s_parent``.
+
+    Пара становится кандидатом, если оценка (своя или контекстная) не ниже ``threshold``
+    либо она входит в ``top_k`` лучших пар своей вершины A или B. Понижение ``threshold``
+    и повышение ``top_k`` увеличивают полноту ценой числа кандидатов.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.15,
+        top_k: int = 3,
+        ngram_size: int = 3,
+        parent_weight: float = 0.3,
+        max_feature_share: float = 0.35,
+    ):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.ngram_size = ngram_size
+        self.parent_weight = parent_weight
+        # n-граммы/слова, встречающиеся больше чем у этой доли вершин, не различают вершины и отбрасываются
+        self.max_feature_share = max_feature_share
+
+    def token_features(self, label: str) -> list[str]:
+        tokens = tokenize(label)
+        features = list(tokens)
+        for token in tokens:
+            if is_abbreviation(token):
+                features.append("^" + token.replace("-", ""))
+        initials = "".join(token[0] for token in tokens if not is_abbreviation(token))
+        for size in range(2, 6):
+            for start, stop in enumerate(range(size, len(initials) + 1)):
+                features.append("^" + initials[start:stop])
+        return features
+
+    def ngram_features(self, label: str) -> list[str]:
+        features = set()
+        for token in tokenize(label):
+            features.update(char_ngrams(token, self.ngram_size))
+        return list(features)
+
+    def _matrices(self, *documents: list[list[str]]) -> tuple[sparse.csr_matrix, ...]:
+        """L2-нормированные TF-IDF матрицы каждого списка документов над общим словарём признаков."""
+        vocabulary: dict[str, int] = {}
+        coordinates = []
+        for documents_list in documents:
+            rows, cols = [], []
+            for row, features in enumerate(documents_list):
+                for feature in set(features):
+                    rows.append(row)
+                    cols.append(vocabulary.setdefault(feature, len(vocabulary)))
+            coordinates.append((np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)))
+
+        size = len(vocabulary)
+        total = sum(len(documents_list) for documents_list in documents)
+        frequency = np.zeros(size, dtype=np.float64)
+        for _, cols in coordinates:
+            frequency += np.bincount(cols, minlength=size)
+        idf = np.log((1 + total) / (1 + frequency)) + 1.0
+        idf[frequency > max(self.max_feature_share * total, 2)] = 0.0
+
+        result = []
+        for (rows, cols), documents_list in zip(coordinates, documents):
+            matrix = sparse.csr_matrix((idf[cols], (rows, cols)), shape=(len(documents_list), size), dtype=np.float64)
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            result.append(sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix))
+        return tuple(result)
+
+    def text_scores(self, graph_a: MatchGraph, graph_b: MatchGraph) -> sparse.csr_matrix:
+        """Разреженная матрица собственных оценок пар (нули не хранятся)."""
+        labels_a = [vertex_label(vertex) for vertex in graph_a.vertices]
+        labels_b = [vertex_label(vertex) for vertex in graph_b.vertices]
+        tokens_a, tokens_b = self._matrices(
+            [self.token_features(label) for label in labels_a],
+            [self.token_features(label) for label in labels_b],
+        )
+        ngrams_a, ngrams_b = self._matrices(
+            [self.ngram_features(label) for label in labels_a],
+            [self.ngram_features(label) for label in labels_b],
+        )
+
+        chunks = []
+        for start in range(0, len(graph_a), CHUNK_SIZE):
+            stop = start + CHUNK_SIZE
+            token_scores = tokens_a[start:stop] @ tokens_b.T
+            ngram_scores = ngrams_a[start:stop] @ ngrams_b.T
+            chunks.append(token_scores.maximum(ngram_scores).tocsr())
+        if not chunks:
+            return sparse.csr_matrix((len(graph_a), len(graph_b)))
+        return sparse.vstack(chunks).tocsr()
+
+    def candidates(self, graph_a: MatchGraph, graph_b: MatchGraph) -> CandidatePairs:
+        return self.select(self.text_scores(graph_a, graph_b), graph_a, graph_b)
+
+    def candidates_many(self, graphs: list[MatchGraph]) -> dict[tuple[int, int], CandidatePairs]:
+        """Кандидаты для всех пар графов ``(i, j)``, ``i < j``, по общему индексу признаков.
+
+        Признаки каждой вершины извлекаются один раз, IDF считается по вершинам всех графов,
+        а строки графа i умножаются сразу на признаки всех графов после него, поэтому работа
+        пропорциональна числу ненулевых оценок, а не числу пар графов. В словарь попадают только
+        пары графов, у которых нашёлся хотя бы один кандидат.
+        """
+        labels = [[vertex_label(vertex) for vertex in graph.vertices] for graph in graphs]
+        tokens = self._matrices(*[[self.token_features(label) for label in graph_labels] for graph_labels in labels])
+        ngrams = self._matrices(*[[self.ngram_features(label) for label in graph_labels] for graph_labels in labels])
+        tokens, ngrams = sparse.vstack(tokens).tocsr(), sparse.vstack(ngrams).tocsr()
+        sizes = np.array([len(graph) for graph in graphs], dtype=np.int64)
+        offsets = np.r_[0, np.cumsum(sizes)]
+        owners = np.repeat(np.arange(len(graphs)), sizes)
+
+        result = {}
+        for i in range(len(graphs) - 1):
+            rest = offsets[i + 1]
+            tokens_rest = tokens[rest:].T.tocsr()
+            ngrams_rest = ngrams[rest:].T.tocsr()
+            chunks = []
+            for start in range(offsets[i], offsets[i + 1], CHUNK_SIZE):
+                stop = min(start + CHUNK_SIZE, offsets[i + 1])
+                chunks.append((tokens[start:stop] @ tokens_rest).maximum(ngrams[start:stop] @ ngrams_rest).tocoo())
+            if not chunks:
+                continue
+            rows = np.concatenate([chunk.row + k * CHUNK_SIZE for k, chunk in enumerate(chunks)])
+            cols = np.concatenate([chunk.col for chunk in chunks]) + offsets[i + 1]
+            values = np.concatenate([chunk.data for chunk in chunks])
+            col_owners = owners[cols]
+            for j in np.unique(col_owners).tolist():
+                mask = col_owners == j
+                scores = sparse.csr_matrix(
+                    (values[mask], (rows[mask], cols[mask] - offsets[j])),
+                    shape=(sizes[i], sizes[j]),
+                )
+                pairs = self.select(scores, graphs[i], graphs[j])
+                if len(pairs):
+                    result[i, j] = pairs
+        return result
+
+    def select(self, scores: sparse.csr_matrix, graph_a: MatchGraph, graph_b: MatchGraph) -> CandidatePairs:
+        """Кандидаты по матрице собственных оценок пар: контекст родителей, порог и ``top_k``."""
+        scores.sort_indices()
+        scores = scores.tocoo()
+        rows = scores.row.astype(np.int32)
+        cols = scores.col.astype(np.int32)
+        values = scores.data.astype(np.float64)
+
+        # Контекст родителей: оценка пары родителей берётся из той же матрицы
+        combined = values
+        if self.parent_weight and len(values):
+            parents_a = graph_a.parents()[rows]
+            parents_b = graph_b.parents()[cols]
+            both = (parents_a >= 0) & (parents_b >= 0)
+            parent_scores = np.zeros(len(values))
+            if both.any():
+                lookup = scores.tocsr()
+                parent_scores[both] = np.asarray(lookup[parents_a[both], parents_b[both]]).ravel()
+            contextual = (1.0 - self.parent_weight) * values + self.parent_weight * parent_scores
+            combined = np.where(both, np.maximum(values, contextual), values)
+
+        keep = combined >= self.threshold
+        if self.top_k:
+            # k лучших пар каждой вершины A и, по транспонированной матрице, каждой вершины B
+            matrix = SimilarityMatrix.from_pairs(
+                len(graph_a), len(graph_b), rows, cols, combined, dtype=np.float64, dense_max_pairs=0
+            )
+            pairs = PairSpace(len(graph_a), len(graph_b), PairSpace.pack(rows, cols, len(graph_b)))
+            best_rows, best_cols, _ = matrix.top_k(self.top_k)
+            keep[pairs.positions(PairSpace.pack(best_rows, best_cols, len(graph_b)))] = True
+            best_cols, best_rows, _ = matrix.transpose().top_k(self.top_k)
+            keep[pairs.positions(PairSpace.pack(best_rows, best_cols, len(graph_b)))] = True
+
+        return CandidatePairs(
+            n_a=len(graph_a),
+            n_b=len(graph_b),
+            rows=rows[keep],
+            cols=cols[keep],
+            scores=combined[keep].astype(np.float32),
+        )
@@ -0,0 +1,263 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from django.conf import settings
+
+# Пар в памяти по умолчанию (около 24 байт на пару) — больше матрицы названий типичной пары онтологий
+DEFAULT_MAX_ENTRIES = 4_000_000
+
+# Пар в одном запросе к постоянному хранилищу (по два параметра на пару)
+DISK_BATCH_SIZE = 400
+
+# Номер строки занимает младшие 32 бита ключа пары
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+type SimilarityFunction = Callable[[list[str], list[str]], np.ndarray]
+
+
+class SimilarityCacheException(Exception):
+    pass
+
+
+class SimilarityCache(object):
+    """Кэш схожести пар строк, общий для всех оценок σ⁰ и всех запусков в процессе.
+
+    Каждая строка получает номер в паре с видом схожести и версией формулы (например, ``char:1``),
+    а запись — ключ из двух номеров в порядке возрастания: схожесть симметрична, поэтому пары ``(a, b)``
+    и ``(b, a)`` — одна запись. Ключи лежат в отсортированном массиве, и вся матрица ищется в нём
+    одним ``searchsorted``, без кортежа на каждую пару. В памяти хранится не больше ``max_entries`` пар,
+    при переполнении вытесняются давно не использованные. Матрица больше ``max_entries`` пар считается
+    напрямую, мимо кэша: она всё равно вытеснила бы сама себя. С ``path`` промахи памяти ищутся
+    в постоянном хранилище SQLite, туда же дописываются новые значения, так что схожесть названий,
+    повторяющихся во всех онтологиях курсов, считается один раз на все процессы.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: str | Path | None = None):
+        if max_entries < 0:
+            raise SimilarityCacheException("max_entries must not be negative")
+        self.max_entries = max_entries
+        self.path = Path(path) if path is not None else None
+        self._ids: dict[tuple[str, str], int] = {}
+        self._strings: list[tuple[str, str]] = []
+        self._keys = np.empty(0, dtype=np.int64)
+        self._values = np.empty(0, dtype=np.float64)
+        self._used = np.empty(0, dtype=np.int64)
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def hit_rate(self) -> float:
+        """Доля пар, найденных в памяти или в постоянном хранилище, среди искавшихся в кэше."""
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._keys),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self) -> None:
+        """Очищает память и счётчики; постоянное хранилище не трогается."""
+        with self._lock:
+            self._ids.clear()
+            self._strings.clear()
+            self._keys = np.empty(0, dtype=np.int64)
+            self._values = np.empty(0, dtype=np.float64)
+            self._used = np.empty(0, dtype=np.int64)
+            self.hits = self.disk_hits = self.misses = self.bypassed = 0
+
+    def close(self) -> None:
+        """Закрывает соединение с постоянным хранилищем; при следующем промахе оно откроется снова."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _database(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS similarity ("
+                "kind TEXT NOT NULL, a TEXT NOT NULL, b TEXT NOT NULL, value REAL NOT NULL, "
+                "PRIMARY KEY (kind, a, b)) WITHOUT ROWID"
+            )
+        return self._connection
+
+    def _load(self, keys: list[tuple[str, str, str]]) -> dict[tuple[str, str, str], float]:
+        found = {}
+        database = self._database()
+        for start in range(0, len(keys), DISK_BATCH_SIZE):
+            stop = start + DISK_BATCH_SIZE
+            batch = keys[start:stop]
+            # Все ключи порции одного вида: одна матрица запрашивается с одним kind
+            placeholders = ", ".join(["(?, ?)"] * len(batch))
+            query = f"SELECT a, b, value FROM similarity WHERE kind = ? AND (a, b) IN (VALUES {placeholders})"
+            parameters = [batch[0][0], *(word for _, a, b in batch for word in (a, b))]
+            for a, b, value in database.execute(query, parameters):
+                found[(batch[0][0], a, b)] = value
+        return found
+
+    def _save(self, items: dict[tuple[str, str, str], float]) -> None:
+        database = self._database()
+        with database:
+            database.executemany(
+                "INSERT OR IGNORE INTO similarity (kind, a, b, value) VALUES (?, ?, ?, ?)",
+                [(*key, value) for key, value in items.items()],
+            )
+
+    def _string_ids(self, kind: str, words: list[str]) -> np.ndarray:
+        """Номера строк вида ``kind``; новым строкам выдаются новые номера."""
+        ids = self._ids
+        for key in dict.fromkeys((kind, word) for word in words):
+            if key not in ids:
+                ids[key] = len(self._strings)
+                self._strings.append(key)
+        return np.fromiter((ids[(kind, word)] for word in words), dtype=np.int64, count=len(words))
+
+    @staticmethod
+    def _pair_keys(ids_a: np.ndarray, ids_b: np.ndarray) -> np.ndarray:
+        """Ключи пар ``ids_a × ids_b``: меньший номер в старших битах, больший — в младших."""
+        return (np.minimum.outer(ids_a, ids_b) << ID_BITS) | np.maximum.outer(ids_a, ids_b)
+
+    def _key_words(self, key: int) -> tuple[str, str, str]:
+        """Ключ пары в постоянном хранилище: вид и строки в порядке возрастания."""
+        kind, a = self._strings[key >> ID_BITS]
+        _, b = self._strings[key & ID_MASK]
+        return (kind, a, b) if a <= b else (kind, b, a)
+
+    def _find(self, keys: np.ndarray) -> np.ndarray:
+        """Позиции ключей среди записей (−1 — записи нет)."""
+        if not len(self._keys):
+            return np.full(keys.shape, -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[positions] == keys, positions, -1)
+
+    def _remember(self, keys: np.ndarray, values: np.ndarray) -> None:
+        """Добавляет записи с ключами, которых ещё нет в памяти, и вытесняет давно не использованные."""
+        if not self.max_entries or not len(keys):
+            return
+        keys, first = np.unique(keys, return_index=True)
+        positions = np.searchsorted(self._keys, keys)
+        self._keys = np.insert(self._keys, positions, keys)
+        self._values = np.insert(self._values, positions, values[first])
+        self._used = np.insert(self._used, positions, self._clock)
+        if len(self._keys) <= self.max_entries:
+            return
+
+        kept = np.sort(np.argpartition(-self._used, self.max_entries - 1)[: self.max_entries])
+        self._keys, self._values, self._used = self._keys[kept], self._values[kept], self._used[kept]
+        # Номера строк, не входящих ни в одну запись, забываются; порядок номеров, а значит и ключей, сохраняется
+        live, inverse = np.unique(np.concatenate([self._keys >> ID_BITS, self._keys & ID_MASK]), return_inverse=True)
+        low, high = np.split(inverse.astype(np.int64), 2)
+        self._keys = (low << ID_BITS) | high
+        self._strings = [self._strings[i] for i in live.tolist()]
+        self._ids = {key: i for i, key in enumerate(self._strings)}
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Значения для ключей (NaN — нет ни в памяти, ни в постоянном хранилище)."""
+        positions = self._find(keys)
+        found = positions >= 0
+        self._used[positions[found]] = self._clock
+        values = np.full(keys.shape, np.nan)
+        values[found] = self._values[positions[found]]
+        self.hits += int(found.sum())
+
+        missing = ~found
+        if missing.any() and self.path is not None:
+            unique_keys, inverse = np.unique(keys[missing], return_inverse=True)
+            words = [self._key_words(key) for key in unique_keys.tolist()]
+            stored = self._load(words)
+            stored_values = np.fromiter((stored.get(key, np.nan) for key in words), dtype=np.float64, count=len(words))
+            values[missing] = stored_values[inverse]
+            self.disk_hits += int((~np.isnan(values[missing])).sum())
+            on_disk = ~np.isnan(stored_values)
+            self._remember(unique_keys[on_disk], stored_values[on_disk])
+        self.misses += int(np.isnan(values).sum())
+        return values
+
+    def matrix(self, kind: str, words_a: list[str], words_b: list[str], compute: SimilarityFunction) -> np.ndarray:
+        """Матрица схожести ``words_a × words_b`` вида ``kind``; ``compute`` считает её для строк без записей.
+
+        ``compute`` вызывается один раз — для строк A и столбцов B, в которых есть хотя бы один промах.
+        Матрица больше ``max_entries`` пар считается ``compute`` целиком, без поиска в кэше.
+        """
+        size = len(words_a) * len(words_b)
+        if not size or size > self.max_entries:
+            with self._lock:
+                self.bypassed += size
+            return compute(words_a, words_b)
+
+        with self._lock:
+            self._clock += 1
+            result = self._lookup(self._pair_keys(self._string_ids(kind, words_a), self._string_ids(kind, words_b)))
+        missing = np.isnan(result)
+        if not missing.any():
+            return result
+        rows = np.flatnonzero(missing.any(axis=1))
+        cols = np.flatnonzero(missing.any(axis=0))
+        words_rows = [words_a[i] for i in rows]
+        words_cols = [words_b[j] for j in cols]
+        block = compute(words_rows, words_cols)
+        part = result[np.ix_(rows, cols)]
+        gaps = np.isnan(part)
+        part[gaps] = block[gaps]
+        result[np.ix_(rows, cols)] = part
+
+        with self._lock:
+            # Номера строк берутся заново: пока считался блок, кэш мог вытеснить записи и перенумеровать строки
+            keys = self._pair_keys(self._string_ids(kind, words_rows), self._string_ids(kind, words_cols))[gaps]
+            keys, first = np.unique(keys, return_index=True)
+            values = part[gaps][first]
+            # Те же пары мог успеть записать другой поток
+            new = self._find(keys) < 0
+            self._remember(keys[new], values[new])
+            if self.path is not None:
+                self._save({self._key_words(key): value for key, value in zip(keys.tolist(), values.tolist())})
+        return result
+
+
+_default_cache: SimilarityCache | None = None
+_default_lock = threading.Lock()
+
+
+def similarity_cache() -> SimilarityCache | None:
+    """Общий кэш процесса по настройкам ``ONTOLOGY_SIMILARITY_CACHE_SIZE`` и ``ONTOLOGY_SIMILARITY_CACHE_PATH``.
+
+    По умолчанию и при нулевом размере кэш выключен (``None``): матрицы больше размера кэша
+    считаются мимо него, поэтому постоянное хранилище без размера тоже ничего не дало бы.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            size = getattr(settings, "ONTOLOGY_SIMILARITY_CACHE_SIZE", 0)
+            path = getattr(settings, "ONTOLOGY_SIMILARITY_CACHE_PATH", None)
+            if not size:
+                return None
+            _default_cache = SimilarityCache(size, path)
+        return _default_cache
+
+
+def set_similarity_cache(cache: SimilarityCache | None) -> None:
+    """Заменяет общий кэш процесса; ``None`` — снова взять его из настроек при следующем обращении."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
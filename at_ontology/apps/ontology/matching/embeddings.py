@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+# Длина ключа — дайджест SHA-1 текста вершины
+KEY_SIZE = 20
+
+type Encoder = Callable[[list[str]], np.ndarray]
+
+
+class EmbeddingStoreException(Exception):
+    pass
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore(object):
+    """Постоянное хранилище эмбеддингов одной модели, ключ — хэш текста вершины.
+
+    Векторы float32 дописываются построчно в ``vectors.f32`` и читаются через ``np.memmap``
+    без копирования; ``keys.bin`` хранит ключи строк в том же порядке, ``meta.json`` — модель
+    и размерность. Повторное сопоставление мало изменившихся онтологий кодирует моделью только
+    новые и изменённые тексты. Запись рассчитана на один процесс: потоки синхронизируются блокировкой.
+    """
+
+    def __init__(self, root: Path | str, model_name: str):
+        self.model_name = model_name
+        self.path = Path(root) / re.sub(r"[^\w.-]+", "_", model_name)
+        self._lock = threading.Lock()
+        self._rows: dict[bytes, int] = {}
+        self._vectors: np.ndarray | None = None
+        self.dim: int | None = None
+        self._load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.path / "meta.json"
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.path / "keys.bin"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / "vectors.f32"
+
+    def _load(self) -> None:
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text())
+        if meta["model"] != self.model_name:
+            raise EmbeddingStoreException(f"store {self.path} belongs to model {meta['model']}")
+        self.dim = meta["dim"]
+
+        keys = np.fromfile(self._keys_path, dtype=np.uint8) if self._keys_path.exists() else np.empty(0, np.uint8)
+        keys = keys[: len(keys) // KEY_SIZE * KEY_SIZE].reshape(-1, KEY_SIZE)
+        row_size = self.dim * np.dtype(np.float32).itemsize
+        stored_rows = self._vectors_path.stat().st_size // row_size if self._vectors_path.exists() else 0
+        # Прерванная запись оставляет векторы без ключей или наоборот — учитываются только полные строки
+        count = min(len(keys), stored_rows)
+        self._rows = {key.tobytes(): row for row, key in enumerate(keys[:count])}
+        self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        self._vectors = None
+        if self._rows:
+            shape = (len(self._rows), self.dim)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=shape)
+
+    def _trim(self) -> None:
+        """Отрезает от файлов хвост неполной записи, чтобы новые строки легли сразу за известными."""
+        if self._vectors_path.exists():
+            os.truncate(self._vectors_path, len(self._rows) * self.dim * np.dtype(np.float32).itemsize)
+        if self._keys_path.exists():
+            os.truncate(self._keys_path, len(self._rows) * KEY_SIZE)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, text: str) -> bool:
+        return text_key(text) in self._rows
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Все сохранённые векторы (отображение файла в память, только чтение)."""
+        if self._vectors is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._vectors
+
+    def rows(self, texts: list[str]) -> np.ndarray:
+        """Номера строк ``vectors`` для текстов (−1 — текста нет в хранилище)."""
+        return np.array([self._rows.get(text_key(text), -1) for text in texts], dtype=np.int64)
+
+    def get(self, texts: list[str]) -> np.ndarray:
+        rows = self.rows(texts)
+        if (rows < 0).any():
+            raise EmbeddingStoreException(f"{int((rows < 0).sum())} texts are not in the store")
+        return self.vectors[rows]
+
+    def add(self, texts: list[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise EmbeddingStoreException("expected one vector per text")
+
+        with self._lock:
+            if self.dim is None:
+                self.path.mkdir(parents=True, exist_ok=True)
+                self._meta_path.write_text(json.dumps({"model": self.model_name, "dim": vectors.shape[1]}))
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise EmbeddingStoreException(f"expected vectors of size {self.dim}, got {vectors.shape[1]}")
+
+            self._trim()
+            keys: dict[bytes, int] = {}
+            for i, text in enumerate(texts):
+                key = text_key(text)
+                if key not in self._rows:
+                    keys.setdefault(key, i)
+            if not keys:
+                return
+
+            with open(self._vectors_path, "ab") as file:
+                file.write(vectors[list(keys.values())].tobytes())
+            with open(self._keys_path, "ab") as file:
+                file.write(b"".join(keys))
+            for key in keys:
+                self._rows[key] = len(self._rows)
+            self._map_vectors()
+
+    def encode(self, texts: list[str], encoder: Encoder, batch_size: int = 256) -> np.ndarray:
+        """Векторы текстов; модель вызывается только для текстов, которых нет в хранилище."""
+        missing = list(dict.fromkeys(text for text in texts if text not in self))
+        for start in range(0, len(missing), batch_size):
+            stop = start + batch_size
+            batch = missing[start:stop]
+            self.add(batch, encoder(batch))
+        return self.get(texts) if texts else np.empty((0, self.dim or 0), dtype=np.float32)
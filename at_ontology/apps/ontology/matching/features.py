@@ -0,0 +1,123 @@
+import threading
+from typing import Callable
+from uuid import UUID
+
+import numpy as np
+from django.db.models import Q
+from scipy import sparse
+
+from at_ontology.apps.ontology import models
+from at_ontology.apps.ontology.matching.graph import HIERARCHY_LABEL
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.text import tokenize
+from at_ontology.apps.ontology.matching.text import vertex_label
+
+
+def vertex_property_names(vertex: object) -> frozenset[str]:
+    """Имена свойств вершины: ключи словаря парсера или ``definition.name`` назначений из БД."""
+    properties = getattr(vertex, "properties", None)
+    if properties is None:
+        return frozenset()
+    if isinstance(properties, dict):
+        return frozenset(properties)
+    if hasattr(properties, "select_related"):
+        return frozenset(assignment.definition.name for assignment in properties.select_related("definition").all())
+    try:
+        return frozenset(assignment.definition.name for assignment in properties)
+    except (AttributeError, TypeError):
+        return frozenset()
+
+
+def db_property_names(graph: MatchGraph) -> list[frozenset[str]]:
+    """Имена свойств вершин графа из БД (``MatchGraph.from_db``) одним запросом."""
+    index = {vertex.id: i for i, vertex in enumerate(graph.vertices)}
+    property_names: list[set[str]] = [set() for _ in graph.vertices]
+    assignments = models.VertexPropertyAssignment.objects.filter(vertex_id__in=list(index))
+    for vertex_id, name in assignments.values_list("vertex_id", "definition__name"):
+        property_names[index[vertex_id]].add(name)
+    return [frozenset(names) for names in property_names]
+
+
+class FeatureTable(object):
+    """Признаки вершин графа сопоставления, вычисленные один раз.
+
+    Хранит то, что функции σ⁰ раньше пересчитывали для каждой пары: название (``label`` или ``name``)
+    и его токены, родителя по иерархии, детей в CSR-виде (дети вершины i —
+    ``children[children_indptr[i] : children_indptr[i + 1]]`` в порядке рёбер) и имена свойств.
+    Родители и дети — номера вершин того же графа, поэтому схожесть их названий берётся
+    из матрицы схожести самих вершин без повторного сравнения строк.
+    """
+
+    def __init__(self, graph: MatchGraph, property_names: list[frozenset[str]] | None = None):
+        self.graph = graph
+        self.names = graph.names
+        self.labels = [vertex_label(vertex) for vertex in graph.vertices]
+        self.stripped_labels = [label.strip() for label in self.labels]
+        self.tokens = [tokenize(label) for label in self.labels]
+        self.parents = graph.parents(HIERARCHY_LABEL)
+        self.children_indptr, self.children = graph.label_adjacency(HIERARCHY_LABEL)
+        self.child_counts = np.diff(self.children_indptr)
+        if property_names is None:
+            property_names = [vertex_property_names(vertex) for vertex in graph.vertices]
+        self.property_names = property_names
+        self.property_counts = np.array([len(names) for names in property_names], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def children_of(self, i: int) -> np.ndarray:
+        start, stop = self.children_indptr[i], self.children_indptr[i + 1]
+        return self.children[start:stop]
+
+    def parent_label(self, i: int) -> str | None:
+        parent = self.parents[i]
+        return self.labels[parent] if parent >= 0 else None
+
+    def property_matrix(self, vocabulary: dict[str, int]) -> sparse.csr_matrix:
+        """Бинарная матрица «вершина × свойство»; новые имена дописываются в ``vocabulary``."""
+        rows, cols = [], []
+        for row, names in enumerate(self.property_names):
+            for name in names:
+                rows.append(row)
+                cols.append(vocabulary.setdefault(name, len(vocabulary)))
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(self), len(vocabulary)),
+        )
+
+    @classmethod
+    def from_ontology(cls, ontology: object, vertex_filter: Callable[[object], bool] | None = None) -> "FeatureTable":
+        return cls(MatchGraph.from_ontology(ontology, vertex_filter))
+
+    @classmethod
+    def from_db(cls, ontology: models.Ontology | UUID, vertex_query: Q | None = None) -> "FeatureTable":
+        """Граф и имена свойств всех вершин загружаются фиксированным числом запросов."""
+        graph = MatchGraph.from_db(ontology, vertex_query)
+        return cls(graph, db_property_names(graph))
+
+
+class FeatureTableService(object):
+    """Кэш таблиц признаков онтологий из БД; сбрасывается сигналами при изменении вершин, связей и свойств."""
+
+    _tables: dict = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(ontology: models.Ontology | UUID, vertex_query: Q | None = None) -> FeatureTable:
+        ontology_id = ontology.id if isinstance(ontology, models.Ontology) else ontology
+        key = (ontology_id, None if vertex_query is None else str(vertex_query))
+        with FeatureTableService._lock:
+            table = FeatureTableService._tables.get(key)
+            if table is None:
+                table = FeatureTable.from_db(ontology_id, vertex_query)
+                FeatureTableService._tables[key] = table
+            return table
+
+    @staticmethod
+    def invalidate(ontology_id: UUID | None = None) -> None:
+        with FeatureTableService._lock:
+            if ontology_id is None:
+                FeatureTableService._tables.clear()
+                return
+            for key in [key for key in FeatureTableService._tables if key[0] == ontology_id]:
+                del FeatureTableService._tables[key]
@@ -0,0 +1,155 @@
+from typing import Callable
+from uuid import UUID
+
+import numpy as np
+from django.db.models import Q
+
+from at_ontology.apps.ontology import models
+
+HIERARCHY_LABEL = "Hierarchy"
+
+
+def default_vertex_filter(vertex: object) -> bool:
+    return True
+
+
+def topic_vertex_filter(vertex: object) -> bool:
+    return vertex.name.startswith("Topic_")
+
+
+def relationship_label(relationship: object) -> str:
+    """Метка ребра — короткое имя типа связи (``...relationship_types.Hierarchy`` → ``Hierarchy``)."""
+    rel_type = getattr(relationship, "type", None)
+    if rel_type is None:
+        return "unknown"
+    if hasattr(rel_type, "alias"):
+        return rel_type.alias.rsplit(".", 1)[-1]
+    if hasattr(rel_type, "name"):
+        return rel_type.name
+    return "unknown"
+
+
+def relationship_end(rel_end: object) -> object | None:
+    if hasattr(rel_end, "value"):
+        return rel_end.value
+    return rel_end
+
+
+class MatchGraph(object):
+    """Граф онтологии для сопоставления: вершины пронумерованы, рёбра хранятся массивами int32.
+
+    Порядок вершин совпадает с порядком ``ontology.vertices``, порядок рёбер — с порядком
+    ``ontology.relationships``; ``labels[edge_label[i]]`` — метка i-го ребра.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        vertices: list[object],
+        edge_source: np.ndarray,
+        edge_target: np.ndarray,
+        edge_label: np.ndarray,
+        labels: list[str],
+    ):
+        self.names = names
+        self.vertices = vertices
+        self.index = {name: i for i, name in enumerate(names)}
+        self.edge_source = np.asarray(edge_source, dtype=np.int32)
+        self.edge_target = np.asarray(edge_target, dtype=np.int32)
+        self.edge_label = np.asarray(edge_label, dtype=np.int32)
+        self.labels = labels
+        self.label_index = {label: i for i, label in enumerate(labels)}
+        self.out_degree = np.bincount(self.edge_source, minlength=len(names)).astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_source)
+
+    def vertex(self, name: str) -> object:
+        return self.vertices[self.index[name]]
+
+    def label_edges(self, label: str) -> tuple[np.ndarray, np.ndarray]:
+        """Источники и цели рёбер с данной меткой (в исходном порядке рёбер)."""
+        label_id = self.label_index.get(label)
+        if label_id is None:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty
+        mask = self.edge_label == label_id
+        return self.edge_source[mask], self.edge_target[mask]
+
+    def label_adjacency(self, label: str) -> tuple[np.ndarray, np.ndarray]:
+        """Рёбра с меткой в CSR-виде: цели рёбер из вершины i — ``indices[indptr[i] : indptr[i + 1]]``."""
+        sources, targets = self.label_edges(label)
+        indptr = np.zeros(len(self.names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.names)), out=indptr[1:])
+        return indptr, targets[np.argsort(sources, kind="stable")]
+
+    def parents(self, label: str = HIERARCHY_LABEL) -> np.ndarray:
+        """Родитель каждой вершины — источник первого входящего ребра с меткой ``label`` (−1, если нет)."""
+        result = np.full(len(self.names), -1, dtype=np.int32)
+        sources, targets = self.label_edges(label)
+        # При повторах цели побеждает первое ребро: записываем в обратном порядке
+        result[targets[::-1]] = sources[::-1]
+        return result
+
+    @classmethod
+    def from_ontology(cls, ontology: object, vertex_filter: Callable[[object], bool] | None = None) -> "MatchGraph":
+        """Строит граф из онтологии ``at_ontology_parser``; рёбра с отфильтрованными концами отбрасываются."""
+        if vertex_filter is None:
+            vertex_filter = default_vertex_filter
+
+        names = []
+        vertices = []
+        for name, vertex in ontology.vertices.items():
+            if vertex_filter(vertex):
+                names.append(name)
+                vertices.append(vertex)
+        index = {name: i for i, name in enumerate(names)}
+
+        labels: dict[str, int] = {}
+        sources, targets, edge_labels = [], [], []
+        for relationship in ontology.relationships.values():
+            try:
+                source = relationship_end(relationship.source)
+                target = relationship_end(relationship.target)
+            except AttributeError:
+                continue
+            if source is None or target is None:
+                continue
+            if not vertex_filter(source) or not vertex_filter(target):
+                continue
+            if source.name not in index or target.name not in index:
+                continue
+            label = relationship_label(relationship)
+            sources.append(index[source.name])
+            targets.append(index[target.name])
+            edge_labels.append(labels.setdefault(label, len(labels)))
+
+        return cls(names, vertices, sources, targets, edge_labels, list(labels))
+
+    @classmethod
+    def from_db(cls, ontology: models.Ontology | UUID, vertex_query: Q | None = None) -> "MatchGraph":
+        """Строит граф из онтологии в БД двумя запросами; вершины упорядочены по имени."""
+        ontology_id = ontology.id if isinstance(ontology, models.Ontology) else ontology
+        vertices = models.Vertex.objects.filter(ontology_id=ontology_id)
+        if vertex_query is not None:
+            vertices = vertices.filter(vertex_query)
+        vertices = list(vertices.order_by("name"))
+        index = {vertex.id: i for i, vertex in enumerate(vertices)}
+
+        labels: dict[str, int] = {}
+        sources, targets, edge_labels = [], [], []
+        relationships = models.Relationship.objects.filter(ontology_id=ontology_id).order_by("name")
+        for source_id, target_id, type_name in relationships.values_list("source_id", "target_id", "type__name"):
+            if source_id not in index or target_id not in index:
+                continue
+            label = type_name.rsplit(".", 1)[-1]
+            sources.append(index[source_id])
+            targets.append(index[target_id])
+            edge_labels.append(labels.setdefault(label, len(labels)))
+
+        names = [vertex.name for vertex in vertices]
+        return cls(names, vertices, sources, targets, edge_labels, list(labels))
@@ -0,0 +1,258 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from at_ontology.apps.ontology.alignment import config_hash
+from at_ontology.apps.ontology.matching.blocking import CandidatePairs
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.propagation import FloodResult
+from at_ontology.apps.ontology.matching.propagation import PairKey
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.matching.scoring import neighbourhood
+from at_ontology.apps.ontology.matching.similarity import SimilarityMatrix
+
+STATE_FILE = "state.npz"
+
+
+class IncrementalMatchingException(Exception):
+    pass
+
+
+def vertex_signatures(features: FeatureTable) -> np.ndarray:
+    """Отпечаток каждой вершины: название, имя родителя и имена детей.
+
+    Отпечаток меняется при переименовании вершины и при правке её иерархических связей; правки
+    остальных связей σ⁰ не затрагивают и учитываются одним перестроением PCG.
+    """
+    names = features.names
+    signatures = []
+    for i, label in enumerate(features.stripped_labels):
+        parent = features.parents[i]
+        children = [names[child] for child in features.children_of(i).tolist()]
+        text = "\x00".join([label, names[parent] if parent >= 0 else "", *children])
+        signatures.append(hashlib.sha1(text.encode("utf-8")).hexdigest())
+    return np.array(signatures, dtype="<U40")
+
+
+# ─── Состояние ───
+
+
+@dataclass
+class MatchState:
+    """Сохраняемое состояние сопоставления: σ⁰ (матрица A × B) и неподвижная точка σ.
+
+    Вершины задаются именами и отпечатками, σ — тремя массивами (номер в A, номер в B, значение)
+    в нумерации ``names_a``/``names_b``. ``config_hash`` — хэш настроек σ⁰ и SF, с которыми
+    состояние получено (см. ``IncrementalMatcher.config``).
+    """
+
+    names_a: list[str]
+    names_b: list[str]
+    signatures_a: np.ndarray
+    signatures_b: np.ndarray
+    scores: np.ndarray
+    sigma_rows: np.ndarray
+    sigma_cols: np.ndarray
+    sigma_values: np.ndarray
+    config_hash: str = ""
+
+    def save(self, path: str | Path) -> None:
+        """Атомарная запись в каталог ``path``: файл пишется во временный и переименовывается."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path, suffix=".npz")
+        with os.fdopen(fd, "wb") as file:
+            np.savez(
+                file,
+                names_a=np.array(self.names_a, dtype=str),
+                names_b=np.array(self.names_b, dtype=str),
+                signatures_a=self.signatures_a,
+                signatures_b=self.signatures_b,
+                scores=self.scores,
+                sigma_rows=self.sigma_rows,
+                sigma_cols=self.sigma_cols,
+                sigma_values=self.sigma_values,
+                config_hash=np.array(self.config_hash),
+            )
+        os.replace(temporary, path / STATE_FILE)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "MatchState | None":
+        """Состояние из каталога ``path`` или ``None``, если его там нет."""
+        path = Path(path) / STATE_FILE
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                names_a=data["names_a"].tolist(),
+                names_b=data["names_b"].tolist(),
+                signatures_a=data["signatures_a"],
+                signatures_b=data["signatures_b"],
+                scores=data["scores"],
+                sigma_rows=data["sigma_rows"],
+                sigma_cols=data["sigma_cols"],
+                sigma_values=data["sigma_values"],
+                # Состояния без хэша настроек не совпадут ни с какими настройками
+                config_hash=str(data["config_hash"]) if "config_hash" in data.files else "",
+            )
+
+
+def _reindex(old_names: list[str], new_names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Для новых номеров — прежний номер той же вершины или −1; и обратное отображение."""
+    old_index = {name: i for i, name in enumerate(old_names)}
+    new_to_old = np.array([old_index.get(name, -1) for name in new_names], dtype=np.int64)
+    old_to_new = np.full(len(old_names), -1, dtype=np.int64)
+    known = new_to_old >= 0
+    old_to_new[new_to_old[known]] = np.flatnonzero(known)
+    return new_to_old, old_to_new
+
+
+def _changed(features: FeatureTable, signatures: np.ndarray, old_signatures: np.ndarray, new_to_old: np.ndarray):
+    """Номера вершин, чьи оценки σ⁰ нужно пересчитать: новые и изменённые вместе с соседями по иерархии."""
+    known = new_to_old >= 0
+    changed = ~known
+    changed[known] = signatures[known] != old_signatures[new_to_old[known]]
+    return neighbourhood(features, np.flatnonzero(changed))
+
+
+# ─── Сопоставление ───
+
+
+@dataclass
+class IncrementalResult:
+    features_a: FeatureTable
+    features_b: FeatureTable
+    flood: FloodResult
+    state: MatchState
+    # Число пересчитанных строк и столбцов σ⁰ (при холодном запуске — все)
+    rows: int
+    cols: int
+    # L1-норма разности σ с прежней неподвижной точкой (при холодном запуске — None)
+    delta: float | None = None
+
+    def sigma0(self) -> dict[PairKey, float]:
+        return self.flood.to_dict(self.features_a.graph, self.features_b.graph, initial=True)
+
+    def sigma(self) -> dict[PairKey, float]:
+        return self.flood.to_dict(self.features_a.graph, self.features_b.graph)
+
+
+class IncrementalMatcher(object):
+    """σ⁰ (``ContextScorer``) и Similarity Flooding с дозапуском от сохранённого состояния.
+
+    Без состояния считает всё заново. С состоянием прежнего запуска σ⁰ переносится по именам
+    вершин и пересчитывается только в строках и столбцах новых и изменённых вершин (с их родителями
+    и детьми), а итерации SF начинаются с прежней неподвижной точки σ, поэтому после небольшой
+    правки сходятся за одну-две итерации. PCG строится заново: это дёшево и учитывает любые
+    добавленные или удалённые связи. Состояние, полученное с другими настройками σ⁰ или SF,
+    не используется: запуск идёт как холодный.
+
+    С ``candidates`` (результат блокировки) SF идёт только по парам-кандидатам; σ⁰ в состоянии
+    хранится полностью, чтобы дозапуск не зависел от блокировки.
+    """
+
+    def __init__(self, scorer: ContextScorer | None = None, flooding: SimilarityFlooding | None = None):
+        self.scorer = scorer if scorer is not None else ContextScorer()
+        self.flooding = flooding if flooding is not None else SimilarityFlooding(formula="weighted")
+
+    @property
+    def config(self) -> dict:
+        """Настройки, от которых зависит состояние (число процессов ``workers`` на результат не влияет)."""
+        scorer = self.scorer
+        flooding = self.flooding
+        return {
+            "scorer": {
+                "label_weight": scorer.label_weight,
+                "parent_weight": scorer.parent_weight,
+                "children_weight": scorer.children_weight,
+                "one_root": scorer.one_root,
+                "both_roots": scorer.both_roots,
+            },
+            "flooding": {
+                "iterations": flooding.iterations,
+                "convergence_threshold": flooding.convergence_threshold,
+                "formula": flooding.formula,
+                "sf_weight": flooding.sf_weight,
+                "freeze_threshold": flooding.freeze_threshold,
+                "freeze_after": flooding.freeze_after,
+                "acceleration": flooding.acceleration,
+                "accelerate_every": flooding.accelerate_every,
+            },
+        }
+
+    def run(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        state: MatchState | None = None,
+        candidates: CandidatePairs | None = None,
+    ) -> IncrementalResult:
+        signatures_a = vertex_signatures(features_a)
+        signatures_b = vertex_signatures(features_b)
+        current_hash = config_hash(self.config)
+        if state is not None and state.config_hash != current_hash:
+            state = None
+
+        initial = None
+        if state is None:
+            scores = self.scorer.matrix(features_a, features_b)
+            rows, cols = len(features_a), len(features_b)
+        else:
+            if state.scores.shape != (len(state.names_a), len(state.names_b)):
+                raise IncrementalMatchingException("state scores do not match its vertices")
+            new_to_old_a, old_to_new_a = _reindex(state.names_a, features_a.names)
+            new_to_old_b, old_to_new_b = _reindex(state.names_b, features_b.names)
+            changed_a = _changed(features_a, signatures_a, state.signatures_a, new_to_old_a)
+            changed_b = _changed(features_b, signatures_b, state.signatures_b, new_to_old_b)
+
+            # Прежние оценки на новых местах; строки и столбцы новых вершин пересчитываются
+            previous = state.scores[np.ix_(np.maximum(new_to_old_a, 0), np.maximum(new_to_old_b, 0))]
+            scores = self.scorer.update(previous, features_a, features_b, changed_a, changed_b)
+            rows, cols = len(changed_a), len(changed_b)
+
+            sigma_rows = old_to_new_a[state.sigma_rows]
+            sigma_cols = old_to_new_b[state.sigma_cols]
+            kept = (sigma_rows >= 0) & (sigma_cols >= 0)
+            initial = (sigma_rows[kept], sigma_cols[kept], state.sigma_values[kept])
+
+        if candidates is None:
+            sigma0_rows, sigma0_cols = np.nonzero(scores > 0)
+        else:
+            sigma0_rows, sigma0_cols = candidates.rows, candidates.cols
+        flood = self.flooding.run(
+            features_a.graph,
+            features_b.graph,
+            sigma0_rows,
+            sigma0_cols,
+            scores[sigma0_rows, sigma0_cols],
+            candidates=candidates.pair_space() if candidates is not None else None,
+            initial=initial,
+        )
+
+        nonzero = np.flatnonzero(flood.sigma)
+        new_state = MatchState(
+            names_a=list(features_a.names),
+            names_b=list(features_b.names),
+            signatures_a=signatures_a,
+            signatures_b=signatures_b,
+            scores=scores,
+            sigma_rows=flood.pairs.rows[nonzero],
+            sigma_cols=flood.pairs.cols[nonzero],
+            sigma_values=flood.sigma[nonzero],
+            config_hash=current_hash,
+        )
+
+        delta = None
+        if initial is not None:
+            shape = len(features_a), len(features_b)
+            previous = SimilarityMatrix.from_pairs(*shape, *initial, dtype=np.float64)
+            current = SimilarityMatrix.from_pairs(
+                *shape, new_state.sigma_rows, new_state.sigma_cols, new_state.sigma_values, dtype=np.float64
+            )
+            delta = current.delta(previous)
+        return IncrementalResult(features_a, features_b, flood, new_state, rows, cols, delta)
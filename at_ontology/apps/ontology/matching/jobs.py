@@ -0,0 +1,295 @@
+import multiprocessing
+import queue
+import threading
+import uuid
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from multiprocessing.managers import SyncManager
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connections
+
+from at_ontology.apps.ontology.alignment import AlignmentService
+from at_ontology.apps.ontology.matching.pipeline import MatchingPipeline
+from at_ontology.apps.ontology.matching.pipeline import PipelineException
+from at_ontology.apps.ontology.matching.pipeline import PipelineRow
+from at_ontology.apps.ontology.matching.pipeline import RESULT_BATCH_SIZE
+from at_ontology.apps.ontology.matching.semantic import EmbeddingScorer
+from at_ontology.apps.ontology.matching.worker import init_job_worker
+
+DEFAULT_WORKERS = 2
+
+JOB_STATUSES = ("pending", "running", "done", "failed", "cancelled")
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class MatchingJobException(Exception):
+    pass
+
+
+class MatchingCancelled(Exception):
+    pass
+
+
+@dataclass
+class MatchingJob:
+    id: str
+    ontology_a: UUID
+    ontology_b: UUID
+    config: dict
+    status: str = "pending"
+    # События хода задачи по порядку (пары из событий ``results`` хранятся в ``results``)
+    events: list[dict] = field(default_factory=list)
+    # Найденные пары по убыванию σ в виде (имя_a, имя_b, σ, σ⁰)
+    results: list[PipelineRow] = field(default_factory=list)
+    error: str | None = None
+    alignment: int | None = None
+
+    def to_dict(self, events_offset: int = 0) -> dict:
+        return {
+            "id": self.id,
+            "ontology_a": str(self.ontology_a),
+            "ontology_b": str(self.ontology_b),
+            "config": self.config,
+            "status": self.status,
+            "events": self.events[events_offset:],
+            "results": len(self.results),
+            "error": self.error,
+            "alignment": self.alignment,
+        }
+
+
+# ─── Задача в процессе пула ───
+
+
+def run_matching_job(
+    job_id: str,
+    ontology_a: UUID,
+    ontology_b: UUID,
+    config: dict,
+    events: queue.Queue,
+    cancelled: threading.Event,
+) -> None:
+    """Сопоставляет две онтологии из БД по настройкам ``config`` и сообщает о ходе в ``events``.
+
+    В очередь кладутся пары ``(job_id, событие)``: ``started``, события этапов и итераций конвейера,
+    ``results`` с очередной порцией пар по убыванию σ и в конце одно из ``done``, ``failed``, ``cancelled``.
+    Пары отправляются по мере выбора паросочетанием, до конца сопоставления. Действительное сохранённое
+    сопоставление с теми же настройками отдаётся без пересчёта, новое записывается в ``AlignmentService``.
+    Флаг ``cancelled`` проверяется перед каждым событием и внутри долгих этапов конвейера.
+    """
+
+    def check() -> None:
+        if cancelled.is_set():
+            raise MatchingCancelled()
+
+    def emit(event: dict) -> None:
+        check()
+        events.put((job_id, event))
+
+    def emit_rows(rows: list[PipelineRow]) -> None:
+        emit({"event": "results", "rows": rows})
+
+    try:
+        emit({"event": "started"})
+        alignment = AlignmentService.get(ontology_a, ontology_b, config)
+        cached = alignment is not None
+        if cached:
+            rows = AlignmentService.rows(alignment)
+            for start in range(0, len(rows), RESULT_BATCH_SIZE):
+                stop = start + RESULT_BATCH_SIZE
+                emit_rows(rows[start:stop])
+        else:
+            # Ревизии читаются до запуска: правки во время сопоставления сделают результат устаревшим
+            revisions = AlignmentService.revisions(ontology_a, ontology_b)
+            pipeline = MatchingPipeline.from_config(config)
+            result = pipeline.run(ontology_a, ontology_b, progress=emit, results=emit_rows, check=check)
+            rows = result.pairs()
+            alignment = AlignmentService.save(ontology_a, ontology_b, config, rows, revisions)
+        events.put((job_id, {"event": "done", "alignment": alignment.id, "pairs": len(rows), "cached": cached}))
+    except MatchingCancelled:
+        events.put((job_id, {"event": "cancelled"}))
+    except Exception as e:
+        events.put((job_id, {"event": "failed", "error": f"{type(e).__name__}: {e}"}))
+    finally:
+        connections.close_all()
+
+
+# ─── Менеджер задач ───
+
+
+class MatchingJobManager(object):
+    """Очередь задач сопоставления онтологий из БД.
+
+    Задачи выполняются в пуле из ``workers`` процессов (число одновременных задач, по умолчанию
+    ``ONTOLOGY_MATCHING_WORKERS``), остальные ждут в очереди пула. События задач передаются через
+    общую очередь и разбираются фоновым потоком; состояние задач хранится в процессе менеджера.
+    С ``processes=False`` задачи выполняются в пуле потоков того же процесса. Процессы пула работают
+    с той же БД, что и менеджер, поэтому SQLite в памяти годится только для пула потоков.
+    """
+
+    def __init__(self, workers: int | None = None, processes: bool = True):
+        if workers is None:
+            workers = getattr(settings, "ONTOLOGY_MATCHING_WORKERS", DEFAULT_WORKERS)
+        if workers < 1:
+            raise MatchingJobException("workers must be positive")
+        self.workers = workers
+        self.processes = processes
+        self._jobs: dict[str, MatchingJob] = {}
+        self._futures: dict[str, Future] = {}
+        self._flags: dict[str, threading.Event] = {}
+        self._changed = threading.Condition()
+        self._pool: Executor | None = None
+        self._sync: SyncManager | None = None
+        self._events: queue.Queue | None = None
+        self._drain: threading.Thread | None = None
+
+    def _start_pool(self) -> None:
+        if self._pool is not None:
+            return
+        if self.processes:
+            if any(
+                connections[alias].vendor == "sqlite" and connections[alias].is_in_memory_db() for alias in connections
+            ):
+                raise MatchingJobException("worker processes cannot share an in-memory SQLite database")
+            databases = {alias: connections[alias].settings_dict["NAME"] for alias in connections}
+            context = multiprocessing.get_context("spawn")
+            self._sync = context.Manager()
+            self._events = self._sync.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=init_job_worker,
+                initargs=(databases,),
+            )
+        else:
+            self._events = queue.Queue()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._drain = threading.Thread(target=self._drain_events, name="matching-jobs", daemon=True)
+        self._drain.start()
+
+    def _drain_events(self) -> None:
+        while (item := self._events.get()) is not None:
+            self._apply(*item)
+
+    def _apply(self, job_id: str, event: dict) -> None:
+        with self._changed:
+            job = self._jobs[job_id]
+            if job.status in FINAL_STATUSES:
+                return
+            kind = event["event"]
+            if kind == "results":
+                job.results.extend(tuple(row) for row in event["rows"])
+                event = {"event": "results", "count": len(event["rows"])}
+            elif kind == "started":
+                job.status = "running"
+            elif kind in FINAL_STATUSES:
+                job.status = kind
+                job.error = event.get("error")
+                job.alignment = event.get("alignment")
+            job.events.append(event)
+            self._changed.notify_all()
+
+    def _finished(self, job_id: str, future: Future) -> None:
+        # Итог задачи приходит событием; здесь — только отмена до запуска и падение процесса пула
+        if future.cancelled():
+            self._apply(job_id, {"event": "cancelled"})
+        elif future.exception() is not None:
+            error = future.exception()
+            self._apply(job_id, {"event": "failed", "error": f"{type(error).__name__}: {error}"})
+
+    def _job(self, job_id: str) -> MatchingJob:
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise MatchingJobException(f"unknown matching job {job_id!r}")
+
+    def start(
+        self,
+        ontology_a: UUID | str,
+        ontology_b: UUID | str,
+        preset: str = "similarity_flooding",
+        params: dict | None = None,
+    ) -> str:
+        """Ставит в очередь сопоставление онтологий с настройками ``PRESETS[preset]``; возвращает id задачи.
+
+        ``params`` заменяют ключи верхнего уровня настроек предустановки (как в ``MatchingPipeline.preset``).
+        """
+        try:
+            pipeline = MatchingPipeline.preset(preset, **(params or {}))
+        except (PipelineException, TypeError) as e:
+            raise MatchingJobException(str(e))
+        if any(isinstance(scorer, EmbeddingScorer) for scorer, _ in pipeline.scorers):
+            raise MatchingJobException("embedding scorers need precomputed embeddings and cannot run as a job")
+        ontology_a, ontology_b = UUID(str(ontology_a)), UUID(str(ontology_b))
+        AlignmentService.revisions(ontology_a, ontology_b)
+
+        self._start_pool()
+        job = MatchingJob(uuid.uuid4().hex, ontology_a, ontology_b, pipeline.config)
+        flag = self._sync.Event() if self.processes else threading.Event()
+        with self._changed:
+            self._jobs[job.id] = job
+            self._flags[job.id] = flag
+            future = self._pool.submit(run_matching_job, job.id, ontology_a, ontology_b, job.config, self._events, flag)
+            self._futures[job.id] = future
+        future.add_done_callback(lambda future: self._finished(job.id, future))
+        return job.id
+
+    def status(self, job_id: str, events_offset: int = 0) -> dict:
+        """Состояние задачи; ``events_offset`` пропускает уже полученные события."""
+        with self._changed:
+            return self._job(job_id).to_dict(events_offset)
+
+    def results(self, job_id: str, offset: int = 0, limit: int | None = None) -> list[PipelineRow]:
+        """Уже полученные пары задачи по убыванию σ, начиная с ``offset``."""
+        with self._changed:
+            results = self._job(job_id).results
+            stop = offset + limit if limit is not None else None
+            return results[offset:stop]
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет задачу; ``False``, если она уже завершилась."""
+        with self._changed:
+            job = self._job(job_id)
+            if job.status in FINAL_STATUSES:
+                return False
+            self._flags[job_id].set()
+        self._futures[job_id].cancel()
+        return True
+
+    def wait(self, job_id: str, timeout: float | None = None) -> MatchingJob:
+        """Ждёт завершения задачи не дольше ``timeout`` секунд."""
+        with self._changed:
+            job = self._job(job_id)
+            if not self._changed.wait_for(lambda: job.status in FINAL_STATUSES, timeout):
+                raise MatchingJobException(f"matching job {job_id!r} is still {job.status}")
+            return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Отменяет задачи в очереди и останавливает пул; запущенные задачи с ``wait`` доводятся до конца."""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._events.put(None)
+        self._drain.join()
+        if self._sync is not None:
+            self._sync.shutdown()
+        self._pool = self._sync = self._events = self._drain = None
+
+
+_default_manager: MatchingJobManager | None = None
+_default_lock = threading.Lock()
+
+
+def matching_jobs() -> MatchingJobManager:
+    """Общий менеджер задач сопоставления процесса."""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = MatchingJobManager()
+        return _default_manager
@@ -0,0 +1,239 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+from typing import Mapping
+
+import numpy as np
+
+from at_ontology.apps.ontology.matching.assignment import assign
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.blocking import CandidatePairs
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.propagation import FloodResult
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.matching.semantic import EmbeddingScorer
+
+# Вершина сопоставления нескольких онтологий: (ключ онтологии, имя вершины)
+type VertexKey = tuple[str, str]
+
+
+class MultiMatchingException(Exception):
+    pass
+
+
+def feature_tables(
+    ontologies: Mapping[str, object],
+    vertex_filter: Callable[[object], bool] | None = None,
+) -> dict[str, FeatureTable]:
+    """Признаки каждой онтологии парсера, извлечённые один раз для всех её пар."""
+    return {key: FeatureTable.from_ontology(ontology, vertex_filter) for key, ontology in ontologies.items()}
+
+
+def consolidate(
+    owners: np.ndarray,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    scores: np.ndarray,
+    exclusive: bool = True,
+) -> list[np.ndarray]:
+    """Кластеры эквивалентных вершин по найденным парам ``(rows[i], cols[i])`` в общей нумерации.
+
+    Пары объединяются системой непересекающихся множеств по убыванию оценки. С ``exclusive``
+    кластеры не сливаются, если в них уже есть вершины одной онтологии (``owners`` — номер
+    онтологии каждой вершины): цепочка «A₁ ~ B ~ A₂» не склеивает две вершины одной онтологии.
+    Возвращает кластеры из двух и более вершин, номера в каждом по возрастанию.
+    """
+    parent = np.arange(len(owners))
+    members: dict[int, set[int]] = {}
+
+    def find(vertex: int) -> int:
+        root = vertex
+        while parent[root] != root:
+            root = parent[root]
+        while parent[vertex] != root:
+            parent[vertex], vertex = root, parent[vertex]
+        return root
+
+    order = np.lexsort((np.arange(len(scores)), -np.asarray(scores)))
+    for row, col in zip(np.asarray(rows)[order].tolist(), np.asarray(cols)[order].tolist()):
+        root_a, root_b = find(row), find(col)
+        if root_a == root_b:
+            continue
+        ontologies_a = members.get(root_a, {int(owners[root_a])})
+        ontologies_b = members.get(root_b, {int(owners[root_b])})
+        if exclusive and not ontologies_a.isdisjoint(ontologies_b):
+            continue
+        parent[root_b] = root_a
+        members[root_a] = ontologies_a | ontologies_b
+        members.pop(root_b, None)
+
+    roots = np.array([find(vertex) for vertex in range(len(owners))], dtype=np.int64)
+    order = np.argsort(roots, kind="stable")
+    sorted_roots = roots[order]
+    starts = np.flatnonzero(np.r_[True, sorted_roots[1:] != sorted_roots[:-1]])
+    return [cluster for cluster in np.split(order, starts[1:]) if len(cluster) > 1]
+
+
+# ─── Сопоставление ───
+
+
+@dataclass
+class PairAlignment:
+    """Сопоставление онтологий ``index_a`` и ``index_b``: кандидаты, SF и найденные пары (локальные номера)."""
+
+    index_a: int
+    index_b: int
+    candidates: CandidatePairs
+    flood: FloodResult
+    rows: np.ndarray
+    cols: np.ndarray
+    scores: np.ndarray
+
+
+@dataclass
+class MultiMatchResult:
+    keys: list[str]
+    features: list[FeatureTable]
+    # Вершины онтологии i в общей нумерации — offsets[i] … offsets[i + 1] − 1
+    offsets: np.ndarray
+    alignments: dict[tuple[int, int], PairAlignment]
+    clusters: list[np.ndarray]
+
+    def vertex(self, vertex: int) -> VertexKey:
+        """Ключ онтологии и имя вершины по её номеру в общей нумерации."""
+        index = int(np.searchsorted(self.offsets, vertex, side="right")) - 1
+        return self.keys[index], self.features[index].names[vertex - self.offsets[index]]
+
+    def cluster_names(self) -> list[list[VertexKey]]:
+        return [[self.vertex(vertex) for vertex in cluster.tolist()] for cluster in self.clusters]
+
+    def pairs(self, key_a: str, key_b: str) -> list[tuple[str, str, float]]:
+        """Найденные пары онтологий ``key_a`` и ``key_b`` в виде ``(имя_a, имя_b, σ)``."""
+        index_a, index_b = self.keys.index(key_a), self.keys.index(key_b)
+        alignment = self.alignments.get((min(index_a, index_b), max(index_a, index_b)))
+        if alignment is None:
+            return []
+        names_a = self.features[alignment.index_a].names
+        names_b = self.features[alignment.index_b].names
+        pairs = [
+            (names_a[row], names_b[col], score)
+            for row, col, score in zip(alignment.rows.tolist(), alignment.cols.tolist(), alignment.scores.tolist())
+        ]
+        if index_a > index_b:
+            pairs = [(name_b, name_a, score) for name_a, name_b, score in pairs]
+        return pairs
+
+
+class MultiOntologyMatcher(object):
+    """Сопоставление N онтологий с общим извлечением признаков и общей блокировкой.
+
+    Признаки (и, если заданы, эмбеддинги) каждой онтологии берутся один раз. Кандидаты для всех
+    пар онтологий находит один индекс признаков блокировки (``CandidateBlocker.candidates_many``),
+    σ⁰ считается только для кандидатов: оценка блокировки или, с эмбеддингами, ``EmbeddingScorer``.
+    SF для каждой пары онтологий идёт по PCG, ограниченному кандидатами, в пуле из ``workers``
+    потоков: итерации — операции numpy и scipy, отпускающие GIL, и графы не нужно передавать
+    в другие процессы. Пары «один к одному» с σ не ниже ``min_score`` сводятся в кластеры
+    эквивалентных вершин (``consolidate``).
+    """
+
+    def __init__(
+        self,
+        blocker: CandidateBlocker | None = None,
+        flooding: SimilarityFlooding | None = None,
+        embedding_scorer: EmbeddingScorer | None = None,
+        min_score: float = 0.3,
+        assignment: str = "greedy",
+        exclusive: bool = True,
+        workers: int = 1,
+    ):
+        self.blocker = blocker if blocker is not None else CandidateBlocker()
+        self.flooding = flooding if flooding is not None else SimilarityFlooding(formula="weighted")
+        self.embedding_scorer = embedding_scorer if embedding_scorer is not None else EmbeddingScorer()
+        self.min_score = min_score
+        self.assignment = assignment
+        self.exclusive = exclusive
+        self.workers = workers
+
+    def _align(
+        self,
+        index_a: int,
+        index_b: int,
+        features: list[FeatureTable],
+        candidates: CandidatePairs,
+        embeddings: list[np.ndarray] | None,
+    ) -> PairAlignment:
+        features_a, features_b = features[index_a], features[index_b]
+        if embeddings is None:
+            sigma0 = candidates.scores.astype(np.float64)
+        else:
+            sigma0 = self.embedding_scorer.pair_scores(
+                features_a,
+                features_b,
+                embeddings[index_a],
+                embeddings[index_b],
+                candidates.rows,
+                candidates.cols,
+            )
+        flood = self.flooding.run(
+            features_a.graph,
+            features_b.graph,
+            candidates.rows,
+            candidates.cols,
+            sigma0,
+            candidates=candidates.pair_space(),
+        )
+        chosen = assign(flood.pairs.rows, flood.pairs.cols, flood.sigma, self.min_score, self.assignment)
+        return PairAlignment(
+            index_a,
+            index_b,
+            candidates,
+            flood,
+            flood.pairs.rows[chosen],
+            flood.pairs.cols[chosen],
+            flood.sigma[chosen],
+        )
+
+    def run(
+        self,
+        features: Mapping[str, FeatureTable],
+        embeddings: Mapping[str, np.ndarray] | None = None,
+    ) -> MultiMatchResult:
+        """``features`` — признаки онтологий по ключам; ``embeddings`` — L2-нормированные векторы их вершин."""
+        keys = list(features)
+        tables = [features[key] for key in keys]
+        vectors = None
+        if embeddings is not None:
+            missing = [key for key in keys if key not in embeddings]
+            if missing:
+                raise MultiMatchingException(f"no embeddings for ontologies {missing}")
+            vectors = [np.asarray(embeddings[key], dtype=np.float32) for key in keys]
+            if any(len(vectors[i]) != len(tables[i]) for i in range(len(keys))):
+                raise MultiMatchingException("embeddings do not match ontology vertices")
+
+        offsets = np.r_[0, np.cumsum([len(table) for table in tables])].astype(np.int64)
+        candidates = self.blocker.candidates_many([table.graph for table in tables])
+        tasks = [(index_a, index_b, tables, pairs, vectors) for (index_a, index_b), pairs in candidates.items()]
+        if self.workers <= 1:
+            alignments = [self._align(*task) for task in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                alignments = list(pool.map(lambda task: self._align(*task), tasks))
+
+        owners = np.repeat(np.arange(len(tables)), np.diff(offsets))
+        rows = [alignment.rows + offsets[alignment.index_a] for alignment in alignments]
+        cols = [alignment.cols + offsets[alignment.index_b] for alignment in alignments]
+        scores = [alignment.scores for alignment in alignments]
+        clusters = consolidate(
+            owners,
+            np.concatenate([np.empty(0, dtype=np.int64), *rows]),
+            np.concatenate([np.empty(0, dtype=np.int64), *cols]),
+            np.concatenate([np.empty(0), *scores]),
+            self.exclusive,
+        )
+        return MultiMatchResult(
+            keys,
+            tables,
+            offsets,
+            {(alignment.index_a, alignment.index_b): alignment for alignment in alignments},
+            clusters,
+        )
@@ -0,0 +1,409 @@
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Iterator
+from uuid import UUID
+
+import numpy as np
+from django.db.models import Q
+
+from at_ontology.apps.ontology import models
+from at_ontology.apps.ontology.matching.assignment import assign
+from at_ontology.apps.ontology.matching.assignment import ASSIGNMENT_METHODS
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.blocking import CandidatePairs
+from at_ontology.apps.ontology.matching.features import db_property_names
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.graph import default_vertex_filter
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.graph import topic_vertex_filter
+from at_ontology.apps.ontology.matching.propagation import FloodResult
+from at_ontology.apps.ontology.matching.propagation import IterationStats
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.matching.scoring import StringScorer
+from at_ontology.apps.ontology.matching.scoring import TokenScorer
+from at_ontology.apps.ontology.matching.semantic import EmbeddingScorer
+from at_ontology.apps.ontology.matching.similarity import SimilarityMatrix
+
+STAGES = ("load", "features", "blocking", "sigma0", "propagation", "assignment")
+
+# Пар в одной порции найденных пар, передаваемой ``results`` по ходу паросочетания
+RESULT_BATCH_SIZE = 500
+
+# Оценки σ⁰ по имени в настройках; оценка — объект с ``matrix(features_a, features_b)`` для всех пар
+# и ``pair_scores(features_a, features_b, rows, cols)`` для кандидатов. ``EmbeddingScorer`` вместо них
+# получает ещё и эмбеддинги: ``candidates(...)`` и ``pair_scores(...)``
+SCORERS: dict[str, type] = {
+    "context": ContextScorer,
+    "string": StringScorer,
+    "token": TokenScorer,
+    "embedding": EmbeddingScorer,
+}
+
+# Фильтры вершин по имени: для онтологий парсера и для онтологий в БД
+VERTEX_FILTERS: dict[str, tuple[Callable[[object], bool], Q | None]] = {
+    "all": (default_vertex_filter, None),
+    "topic": (topic_vertex_filter, Q(name__startswith="Topic_")),
+}
+
+# Настройки сопоставителей из ``tests/``: с ними конвейер воспроизводит их σ⁰, σ и найденные пары
+PRESETS: dict[str, dict] = {
+    "similarity_flooding": {
+        "vertex_filter": "topic",
+        "scorers": [{"scorer": "context", "weight": 1.0}],
+        "blocking": None,
+        "flooding": {"iterations": 10, "formula": "weighted", "sf_weight": 0.3},
+        "min_score": 0.10,
+        "assignment": "greedy",
+    },
+    "ontology_intersection": {
+        "vertex_filter": "topic",
+        "scorers": [{"scorer": "context", "weight": 1.0}],
+        "blocking": None,
+        "flooding": {"iterations": 10, "formula": "weighted", "sf_weight": 0.3},
+        "min_score": 0.10,
+        "assignment": "greedy",
+    },
+    "similarity_flooding_copy": {
+        "vertex_filter": "all",
+        "scorers": [{"scorer": "string", "weight": 1.0}],
+        "blocking": None,
+        "flooding": {"iterations": 20, "formula": "basic"},
+        "min_score": 0.05,
+        "assignment": "greedy",
+    },
+    "similarity_flooding_cool_run": {
+        "vertex_filter": "all",
+        "scorers": [{"scorer": "string", "weight": 1.0, "name_weight": 0.2, "property_weight": 0.15}],
+        "blocking": None,
+        "flooding": {"iterations": 20, "formula": "C"},
+        "min_score": 0.05,
+        "assignment": "greedy",
+    },
+    "similarity_flooding_copy_cool_run2": {
+        "vertex_filter": "all",
+        "scorers": [
+            {"scorer": "string", "weight": 1.0, "name_weight": 0.2, "property_weight": 0.15, "parent_weight": 0.3},
+        ],
+        "blocking": None,
+        "flooding": {"iterations": 20, "formula": "C"},
+        "min_score": 0.05,
+        "assignment": "greedy",
+    },
+    "similarity_flooding_copy_final": {
+        "vertex_filter": "all",
+        "scorers": [{"scorer": "token", "weight": 1.0}],
+        "blocking": None,
+        "flooding": {"iterations": 20, "formula": "C"},
+        "min_score": 0.05,
+        "assignment": "greedy",
+    },
+    "embeddings_matcher": {
+        "vertex_filter": "all",
+        "scorers": [{"scorer": "embedding", "weight": 1.0}],
+        "blocking": None,
+        # Сопоставитель вызывает _sparse_flood из similarity_flooding.py, а там формула взвешенная
+        "flooding": {"iterations": 20, "formula": "weighted", "sf_weight": 0.3},
+        "min_score": 0.3,
+        "assignment": "greedy",
+    },
+}
+
+# Пара в виде (имя вершины A, имя вершины B, σ, σ⁰) — как ``AlignmentRow``
+type PipelineRow = tuple[str, str, float, float]
+
+
+class PipelineException(Exception):
+    pass
+
+
+def _pair_rows(
+    features_a: FeatureTable,
+    features_b: FeatureTable,
+    flood: FloodResult,
+    chosen: np.ndarray,
+) -> list[PipelineRow]:
+    """Пары ``flood`` с номерами ``chosen`` в виде ``(имя_a, имя_b, σ, σ⁰)``."""
+    names_a, names_b = features_a.names, features_b.names
+    return [
+        (names_a[row], names_b[col], score, initial)
+        for row, col, score, initial in zip(
+            flood.pairs.rows[chosen].tolist(),
+            flood.pairs.cols[chosen].tolist(),
+            flood.sigma[chosen].tolist(),
+            flood.sigma0[chosen].tolist(),
+        )
+    ]
+
+
+@contextmanager
+def _timed(timings: dict[str, float], stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+@dataclass
+class PipelineResult:
+    features_a: FeatureTable
+    features_b: FeatureTable
+    candidates: CandidatePairs | None
+    flood: FloodResult
+    # Найденные пары: номера вершин A и B и их σ
+    rows: np.ndarray
+    cols: np.ndarray
+    scores: np.ndarray
+    # Время каждого этапа из STAGES в секундах
+    timings: dict[str, float] = field(default_factory=dict)
+    # Память под массивы, построенные на этапах блокировки, σ⁰, распространения и паросочетания, в байтах
+    memory: dict[str, int] = field(default_factory=dict)
+
+    def similarity(self, initial: bool = False) -> SimilarityMatrix:
+        """σ (или σ⁰) всех пар в виде ``SimilarityMatrix`` во float32 — для хранения и запросов лучших пар."""
+        return SimilarityMatrix.from_flood(self.flood, initial)
+
+    def pairs(self) -> list[PipelineRow]:
+        """Найденные пары по убыванию σ в виде ``(имя_a, имя_b, σ, σ⁰)`` — готовы для ``AlignmentService.save``."""
+        positions = self.flood.pairs.positions(PairSpace.pack(self.rows, self.cols, len(self.features_b)))
+        pairs = _pair_rows(self.features_a, self.features_b, self.flood, positions)
+        pairs.sort(key=lambda pair: -pair[2])
+        return pairs
+
+
+class MatchingPipeline(object):
+    """Сопоставление двух онтологий по этапам: загрузка, признаки, блокировка, σ⁰, распространение, паросочетание.
+
+    σ⁰ — взвешенная сумма оценок ``scorers`` (пары ``(оценка, вес)``); с блокировщиком оценки считаются
+    только для пар-кандидатов, и PCG строится только между ними. Без ``flooding`` σ — нормированная σ⁰.
+    Онтология задаётся объектом парсера, моделью или id онтологии в БД либо готовой ``FeatureTable``
+    (тогда загрузка и признаки пропускаются). Время каждого этапа сохраняется в ``PipelineResult.timings``.
+
+    ``from_config`` собирает конвейер из настроек в виде JSON-словаря (см. ``PRESETS``); такие настройки
+    годятся и как ключ сохранённого сопоставления в ``AlignmentService``.
+    """
+
+    def __init__(
+        self,
+        scorers: list[tuple[object, float]],
+        blocker: CandidateBlocker | None = None,
+        flooding: SimilarityFlooding | None = None,
+        min_score: float = 0.10,
+        assignment: str = "greedy",
+        vertex_filter: str = "topic",
+    ):
+        if not scorers:
+            raise PipelineException("at least one scorer is required")
+        if assignment not in ASSIGNMENT_METHODS:
+            raise PipelineException(f"unknown assignment method {assignment!r}")
+        if vertex_filter not in VERTEX_FILTERS:
+            raise PipelineException(f"unknown vertex filter {vertex_filter!r}")
+        self.scorers = scorers
+        self.blocker = blocker
+        self.flooding = flooding
+        self.min_score = min_score
+        self.assignment = assignment
+        self.vertex_filter = vertex_filter
+        self.config: dict | None = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> "MatchingPipeline":
+        scorers = []
+        for entry in config.get("scorers", []):
+            params = dict(entry)
+            name = params.pop("scorer")
+            weight = params.pop("weight", 1.0)
+            if name not in SCORERS:
+                raise PipelineException(f"unknown scorer {name!r}")
+            scorers.append((SCORERS[name](**params), weight))
+
+        blocking = config.get("blocking")
+        flooding = config.get("flooding")
+        pipeline = cls(
+            scorers,
+            blocker=CandidateBlocker(**blocking) if blocking is not None else None,
+            flooding=SimilarityFlooding(**flooding) if flooding is not None else None,
+            min_score=config.get("min_score", 0.10),
+            assignment=config.get("assignment", "greedy"),
+            vertex_filter=config.get("vertex_filter", "topic"),
+        )
+        pipeline.config = config
+        return pipeline
+
+    @classmethod
+    def preset(cls, name: str, **overrides) -> "MatchingPipeline":
+        """Конвейер с настройками ``PRESETS[name]``; ``overrides`` заменяют ключи верхнего уровня."""
+        if name not in PRESETS:
+            raise PipelineException(f"unknown preset {name!r}")
+        return cls.from_config({**PRESETS[name], **overrides})
+
+    def _load(self, ontology: object) -> MatchGraph | FeatureTable:
+        if isinstance(ontology, FeatureTable):
+            return ontology
+        vertex_filter, vertex_query = VERTEX_FILTERS[self.vertex_filter]
+        if isinstance(ontology, (models.Ontology, UUID)):
+            return MatchGraph.from_db(ontology, vertex_query)
+        return MatchGraph.from_ontology(ontology, vertex_filter)
+
+    @staticmethod
+    def _features(graph: MatchGraph | FeatureTable) -> FeatureTable:
+        if isinstance(graph, FeatureTable):
+            return graph
+        if graph.vertices and isinstance(graph.vertices[0], models.Vertex):
+            return FeatureTable(graph, db_property_names(graph))
+        return FeatureTable(graph)
+
+    def _sigma0(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        candidates: CandidatePairs | None,
+        embeddings: tuple[np.ndarray, np.ndarray] | None,
+        check: Callable[[], None] | None = None,
+    ) -> SimilarityMatrix:
+        n_a, n_b = len(features_a), len(features_b)
+        if candidates is None:
+            # Все пары — матрицей A × B
+            values = np.zeros((n_a, n_b), dtype=np.float64)
+        else:
+            rows, cols = candidates.rows.astype(np.int64), candidates.cols.astype(np.int64)
+            values = np.zeros(len(rows), dtype=np.float64)
+
+        for scorer, weight in self.scorers:
+            if isinstance(scorer, EmbeddingScorer):
+                if embeddings is None:
+                    raise PipelineException(f"{type(scorer).__name__} requires embeddings of both ontologies")
+                if candidates is None:
+                    # Все пары — блоками матричных произведений, а не по одной паре
+                    found = scorer.candidates(features_a, features_b, embeddings[0], embeddings[1], check)
+                    scores = np.zeros((n_a, n_b), dtype=np.float64)
+                    scores[found.rows, found.cols] = found.scores
+                else:
+                    scores = scorer.pair_scores(
+                        features_a, features_b, embeddings[0], embeddings[1], rows, cols, check=check
+                    )
+            elif candidates is None:
+                scores = scorer.matrix(features_a, features_b, check)
+            else:
+                # Только пары-кандидаты, подматрицами «вершины A × их кандидаты»
+                scores = scorer.pair_scores(features_a, features_b, rows, cols, check=check)
+            values += weight * scores
+
+        # σ⁰ остаётся во float64: от неё зависят σ и порядок выбора пар. Без блокировщика матрица плотная
+        # до DENSE_MAX_PAIRS пар, дальше — CSR из положительных оценок; с блокировщиком — всегда CSR
+        if candidates is None:
+            return SimilarityMatrix.from_dense(np.maximum(values, 0.0), dtype=np.float64)
+        positive = values > 0
+        return SimilarityMatrix.from_pairs(
+            n_a, n_b, rows[positive], cols[positive], values[positive], dtype=np.float64, dense_max_pairs=0
+        )
+
+    def run(
+        self,
+        ontology_a: object,
+        ontology_b: object,
+        embeddings: tuple[np.ndarray, np.ndarray] | None = None,
+        progress: Callable[[dict], None] | None = None,
+        results: Callable[[list[PipelineRow]], None] | None = None,
+        check: Callable[[], None] | None = None,
+    ) -> PipelineResult:
+        """``embeddings`` — L2-нормированные векторы вершин обеих онтологий (для ``EmbeddingScorer``).
+
+        ``progress`` получает события хода сопоставления: ``{"event": "stage", "stage": этап, "seconds": время, ...}``
+        после каждого этапа и ``{"event": "iteration", "iteration": k, "delta": Δ, ...}`` с метриками
+        ``IterationStats`` после каждой итерации SF.
+        Исключение из ``progress`` прерывает сопоставление. В событиях этапов с новыми массивами есть
+        ``bytes`` — их размер, как в ``PipelineResult.memory``.
+
+        ``results`` получает найденные пары по убыванию σ порциями до ``RESULT_BATCH_SIZE`` пар
+        по мере выбора — ещё во время паросочетания, в том же виде, что и ``PipelineResult.pairs``.
+        ``check`` вызывается между этапами, частями расчёта σ⁰ и итерациями SF; исключение из него
+        прерывает сопоставление, не дожидаясь конца этапа.
+        """
+        timings: dict[str, float] = {}
+        memory: dict[str, int] = {}
+
+        def report(stage: str, **details) -> None:
+            if check is not None:
+                check()
+            if stage in memory:
+                details["bytes"] = memory[stage]
+            if progress is not None:
+                progress({"event": "stage", "stage": stage, "seconds": timings[stage], **details})
+
+        def iteration(stats: IterationStats) -> None:
+            if check is not None:
+                check()
+            if progress is not None:
+                progress({"event": "iteration", **asdict(stats)})
+
+        with _timed(timings, "load"):
+            graph_a = self._load(ontology_a)
+            graph_b = self._load(ontology_b)
+        report("load")
+        with _timed(timings, "features"):
+            features_a = self._features(graph_a)
+            features_b = self._features(graph_b)
+        report("features", vertices_a=len(features_a), vertices_b=len(features_b))
+        if embeddings is not None and (len(embeddings[0]) != len(features_a) or len(embeddings[1]) != len(features_b)):
+            raise PipelineException("embeddings do not match ontology vertices")
+
+        with _timed(timings, "blocking"):
+            candidates = None
+            if self.blocker is not None:
+                candidates = self.blocker.candidates(features_a.graph, features_b.graph)
+                memory["blocking"] = candidates.rows.nbytes + candidates.cols.nbytes + candidates.scores.nbytes
+        report("blocking", candidates=len(candidates) if candidates is not None else None)
+        with _timed(timings, "sigma0"):
+            sigma0 = self._sigma0(features_a, features_b, candidates, embeddings, check)
+            memory["sigma0"] = sigma0.nbytes
+        report("sigma0", pairs=sigma0.nnz)
+        with _timed(timings, "propagation"):
+            rows, cols, values = sigma0.pairs()
+            if self.flooding is not None:
+                flood = self.flooding.run(
+                    features_a.graph,
+                    features_b.graph,
+                    rows,
+                    cols,
+                    values,
+                    candidates=candidates.pair_space() if candidates is not None else None,
+                    callback=iteration,
+                )
+            else:
+                pairs = PairSpace(len(features_a), len(features_b), PairSpace.pack(rows, cols, len(features_b)))
+                sigma = sigma0.normalized().get(pairs.rows, pairs.cols)
+                flood = FloodResult(pairs, pairs.scatter(rows, cols, values), sigma, converged=True)
+            memory["propagation"] = flood.nbytes
+        report("propagation", iterations=flood.iterations, converged=flood.converged)
+        with _timed(timings, "assignment"):
+            chosen = assign(
+                flood.pairs.rows,
+                flood.pairs.cols,
+                flood.sigma,
+                self.min_score,
+                self.assignment,
+                callback=(lambda part: results(_pair_rows(features_a, features_b, flood, part))) if results else None,
+                callback_size=RESULT_BATCH_SIZE,
+            )
+            chosen_rows, chosen_cols, scores = flood.pairs.rows[chosen], flood.pairs.cols[chosen], flood.sigma[chosen]
+            memory["assignment"] = chosen_rows.nbytes + chosen_cols.nbytes + scores.nbytes
+        report("assignment", pairs=len(chosen))
+
+        return PipelineResult(
+            features_a,
+            features_b,
+            candidates,
+            flood,
+            chosen_rows,
+            chosen_cols,
+            scores,
+            timings,
+            memory,
+        )
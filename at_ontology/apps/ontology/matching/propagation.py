@@ -0,0 +1,529 @@
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+
+import numpy as np
+from scipy import sparse
+
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+
+type PairKey = tuple[str, str]
+
+# C — σⁱ⁺¹ = normalize(σ⁰ + σⁱ + φ(σⁱ)) (Melnik et al. 2002);
+# weighted — σⁱ⁺¹ = normalize(σ⁰ + w·φ(σⁱ));
+# basic — σⁱ⁺¹ = σⁱ + φ(σⁱ) для пар со входящими рёбрами, нормализация один раз в конце
+FORMULAS = ("C", "weighted", "basic")
+
+# Ускорение сходимости: экстраполяция Эйткена по трём последним приближениям σ
+ACCELERATIONS = ("aitken",)
+
+# Заморозка пар применяется, когда сошлась хотя бы 1/FREEZE_FRACTION пересчитываемых пар
+FREEZE_FRACTION = 4
+
+
+class PropagationException(Exception):
+    pass
+
+
+# ─── Пространство пар ───
+
+
+class PairSpace(object):
+    """Отсортированное множество пар вершин ``(i_a, i_b)``, упакованных в ключи ``i_a * n_b + i_b``.
+
+    Номер пары — позиция ключа в ``keys``; поиск номеров выполняется бинарным поиском.
+    """
+
+    def __init__(self, n_a: int, n_b: int, keys: np.ndarray):
+        self.n_a = n_a
+        self.n_b = n_b
+        self.keys = np.unique(np.asarray(keys, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def pack(rows: np.ndarray, cols: np.ndarray, n_b: int) -> np.ndarray:
+        return np.asarray(rows, dtype=np.int64) * n_b + np.asarray(cols, dtype=np.int64)
+
+    @property
+    def rows(self) -> np.ndarray:
+        return (self.keys // max(self.n_b, 1)).astype(np.int32)
+
+    @property
+    def cols(self) -> np.ndarray:
+        return (self.keys % max(self.n_b, 1)).astype(np.int32)
+
+    def positions(self, keys: np.ndarray) -> np.ndarray:
+        """Номера пар для ключей; ключа нет в пространстве — ``-1``."""
+        keys = np.asarray(keys, dtype=np.int64)
+        positions = np.searchsorted(self.keys, keys)
+        positions[positions >= len(self.keys)] = 0
+        found = self.keys[positions] == keys if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        return np.where(found, positions, -1)
+
+    def scatter(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Вектор значений над пространством пар; отсутствующие пары — 0."""
+        result = np.zeros(len(self.keys), dtype=np.float64)
+        positions = self.positions(self.pack(rows, cols, self.n_b))
+        mask = positions >= 0
+        result[positions[mask]] = np.asarray(values, dtype=np.float64)[mask]
+        return result
+
+
+# ─── Граф попарной связности (PCG) ───
+
+# Наибольшее число рёбер PCG в одном блоке: временные массивы блока занимают O(PCG_BLOCK_EDGES)
+PCG_BLOCK_EDGES = 1 << 20
+
+
+@dataclass
+class PCGBlock:
+    """Рёбра PCG с одной меткой: номера пар ``from_pairs → to_pairs`` (int32) и веса 1/(outdeg_a · outdeg_b)."""
+
+    label: str
+    from_pairs: np.ndarray
+    to_pairs: np.ndarray
+    weights: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.from_pairs)
+
+
+def pcg_pair_space(graph_a: MatchGraph, graph_b: MatchGraph, keys: np.ndarray | None = None) -> PairSpace:
+    """Пары, между которыми есть рёбра полного PCG, и пары ``keys`` — без построения самих рёбер.
+
+    Ребро PCG идёт из пары источников в пару целей рёбер A и B с одной меткой, поэтому множество
+    пар — объединение по меткам произведений уникальных источников и уникальных целей.
+    """
+    n_b = len(graph_b)
+    parts = [np.asarray(keys, dtype=np.int64)] if keys is not None else []
+    for label in graph_a.labels:
+        sources_a, targets_a = graph_a.label_edges(label)
+        sources_b, targets_b = graph_b.label_edges(label)
+        if not len(sources_a) or not len(sources_b):
+            continue
+        for ends_a, ends_b in ((sources_a, sources_b), (targets_a, targets_b)):
+            ends_a = np.unique(ends_a)
+            ends_b = np.unique(ends_b)
+            parts.append(PairSpace.pack(np.repeat(ends_a, len(ends_b)), np.tile(ends_b, len(ends_a)), n_b))
+    return PairSpace(len(graph_a), n_b, np.concatenate(parts) if parts else np.empty(0, dtype=np.int64))
+
+
+def pcg_blocks(
+    graph_a: MatchGraph,
+    graph_b: MatchGraph,
+    pairs: PairSpace,
+    restrict: bool = False,
+    block_edges: int = PCG_BLOCK_EDGES,
+) -> Iterator[PCGBlock]:
+    """Рёбра PCG над номерами пар ``pairs``, лениво, блоками не больше ``block_edges`` рёбер.
+
+    Без ``restrict`` для каждой общей метки перебирается декартово произведение рёбер A и B с этой
+    меткой (``pairs`` должно содержать ``pcg_pair_space``). С ``restrict`` строятся только рёбра между
+    парами из ``pairs``: исходящие рёбра перебираются от самих пар, и полное произведение не строится.
+    """
+    out_degree_a = np.maximum(graph_a.out_degree, 1).astype(np.float64)
+    out_degree_b = np.maximum(graph_b.out_degree, 1).astype(np.float64)
+    for label in graph_a.labels:
+        if label not in graph_b.label_index:
+            continue
+        if restrict:
+            blocks = _pair_blocks(graph_a, graph_b, pairs, label, block_edges)
+        else:
+            blocks = _label_blocks(graph_a, graph_b, pairs, label, block_edges)
+        for from_a, from_b, from_pairs, to_pairs in blocks:
+            yield PCGBlock(
+                label,
+                from_pairs.astype(np.int32),
+                to_pairs.astype(np.int32),
+                1.0 / (out_degree_a[from_a] * out_degree_b[from_b]),
+            )
+
+
+def _label_blocks(graph_a: MatchGraph, graph_b: MatchGraph, pairs: PairSpace, label: str, block_edges: int):
+    n_b = len(graph_b)
+    sources_a, targets_a = graph_a.label_edges(label)
+    sources_b, targets_b = graph_b.label_edges(label)
+    count_b = len(sources_b)
+    if not len(sources_a) or not count_b:
+        return
+    step = max(block_edges // count_b, 1)
+    for start in range(0, len(sources_a), step):
+        stop = start + step
+        block_sources = sources_a[start:stop]
+        block_targets = targets_a[start:stop]
+        from_a = np.repeat(block_sources, count_b)
+        from_b = np.tile(sources_b, len(block_sources))
+        from_pairs = pairs.positions(PairSpace.pack(from_a, from_b, n_b))
+        to_pairs = pairs.positions(
+            PairSpace.pack(np.repeat(block_targets, count_b), np.tile(targets_b, len(block_targets)), n_b)
+        )
+        yield from_a, from_b, from_pairs, to_pairs
+
+
+def _pair_blocks(graph_a: MatchGraph, graph_b: MatchGraph, pairs: PairSpace, label: str, block_edges: int):
+    n_b = len(graph_b)
+    rows = pairs.rows.astype(np.int64)
+    cols = pairs.cols.astype(np.int64)
+    indptr_a, indices_a = graph_a.label_adjacency(label)
+    indptr_b, indices_b = graph_b.label_adjacency(label)
+    count_a = indptr_a[rows + 1] - indptr_a[rows]
+    count_b = indptr_b[cols + 1] - indptr_b[cols]
+    counts = count_a * count_b
+    active = np.flatnonzero(counts)
+    if not len(active):
+        return
+
+    # Пары делятся на группы так, чтобы в группе было не больше block_edges рёбер (кроме одной большой пары)
+    group = (np.cumsum(counts[active]) - counts[active]) // block_edges
+    for chunk in np.split(active, np.flatnonzero(np.diff(group)) + 1):
+        # Для пары p с count_a·count_b исходящими комбинациями: смещение k → (k // count_b, k % count_b)
+        chunk_counts = counts[chunk]
+        owner = np.repeat(chunk, chunk_counts)
+        offsets = np.arange(chunk_counts.sum()) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        target_a = indices_a[indptr_a[rows[owner]] + offsets // count_b[owner]]
+        target_b = indices_b[indptr_b[cols[owner]] + offsets % count_b[owner]]
+
+        to_pairs = pairs.positions(PairSpace.pack(target_a, target_b, n_b))
+        known = to_pairs >= 0
+        owner = owner[known]
+        yield rows[owner], cols[owner], owner, to_pairs[known]
+
+
+def propagation_matrix(pairs: PairSpace, blocks: Iterable[PCGBlock]) -> sparse.csr_matrix:
+    """Матрица W (строка — пара-получатель, столбец — пара-источник), повторные рёбра суммируются.
+
+    Блоки потребляются по одному; в памяти остаются только их массивы номеров int32 и веса.
+    """
+    size = len(pairs)
+    from_parts, to_parts, weight_parts = [], [], []
+    for block in blocks:
+        from_parts.append(block.from_pairs)
+        to_parts.append(block.to_pairs)
+        weight_parts.append(block.weights)
+    if not from_parts:
+        return sparse.csr_matrix((size, size), dtype=np.float64)
+    return sparse.csr_matrix(
+        (np.concatenate(weight_parts), (np.concatenate(to_parts), np.concatenate(from_parts))),
+        shape=(size, size),
+    )
+
+
+# ─── Итерации ───
+
+
+@dataclass
+class IterationStats:
+    """Метрики одной итерации SF."""
+
+    iteration: int
+    # L1- и L∞-нормы изменения σ на итерации (до экстраполяции)
+    delta: float
+    residual: float
+    # Число пар, σ которых пересчитывалась (без замороженных)
+    active: int
+    seconds: float
+    extrapolated: bool = False
+
+
+@dataclass
+class FloodResult:
+    pairs: PairSpace
+    sigma0: np.ndarray
+    sigma: np.ndarray
+    iterations: int = 0
+    deltas: list[float] = field(default_factory=list)
+    converged: bool = False
+    # Число ненулевых весов матрицы распространения (повторные рёбра PCG сложены) и её размер в байтах
+    edges: int = 0
+    matrix_bytes: int = 0
+    # Метрики по итерациям: Δ, наибольшее изменение пары, число пересчитанных пар, время
+    stats: list[IterationStats] = field(default_factory=list)
+
+    @property
+    def nbytes(self) -> int:
+        """Память под пространство пар, σ⁰, σ и матрицу распространения в байтах."""
+        return self.pairs.keys.nbytes + self.sigma0.nbytes + self.sigma.nbytes + self.matrix_bytes
+
+    def to_dict(self, graph_a: MatchGraph, graph_b: MatchGraph, initial: bool = False) -> dict[PairKey, float]:
+        """Ненулевые значения σ (или σ⁰) в виде ``{(имя_a, имя_b): значение}``."""
+        values = self.sigma0 if initial else self.sigma
+        nonzero = np.flatnonzero(values)
+        rows = self.pairs.rows[nonzero]
+        cols = self.pairs.cols[nonzero]
+        return {
+            (graph_a.names[row], graph_b.names[col]): float(value)
+            for row, col, value in zip(rows.tolist(), cols.tolist(), values[nonzero].tolist())
+        }
+
+
+def normalize(values: np.ndarray) -> np.ndarray:
+    if not len(values):
+        return values
+    max_value = values.max()
+    if max_value == 0:
+        return values
+    return values / max_value
+
+
+def _aitken(previous: np.ndarray, last: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """Экстраполяция Эйткена по трём приближениям: там, где изменение пары убывает с отношением
+    ``r ∈ (0, 1)``, σ заменяется пределом геометрической прогрессии ``σ + Δ·r / (1 − r)``.
+    """
+    first = last - previous
+    second = current - last
+    ratio = np.divide(second, first, out=np.zeros_like(second), where=first != 0)
+    monotone = (ratio > 0) & (ratio < 1)
+    result = current.copy()
+    result[monotone] += second[monotone] * ratio[monotone] / (1.0 - ratio[monotone])
+    return np.maximum(result, 0.0)
+
+
+def _moving_pairs(rows: sparse.csr_matrix, indices: np.ndarray, size: int, settled: np.ndarray) -> np.ndarray:
+    """Какие из пересчитываемых пар ``indices`` (строки ``rows``) нельзя заморозить.
+
+    Сошедшаяся пара замерзает, только если замерзают и все пары, от которых она получает σ: иначе
+    к ней ещё может прийти изменение, например волна от далёких пар с ненулевой σ⁰ к нулевой паре.
+    Запрет распространяется по рёбрам PCG от несошедшихся пар до неподвижной точки.
+    """
+    moving = ~settled
+    while True:
+        sources = np.zeros(size, dtype=np.float64)
+        sources[indices[moving]] = 1.0
+        grown = moving | ((rows @ sources) > 0)
+        if np.array_equal(grown, moving):
+            return moving
+        moving = grown
+
+
+def flood(
+    sigma0: np.ndarray,
+    matrix: sparse.csr_matrix,
+    iterations: int = 20,
+    convergence_threshold: float = 1e-4,
+    formula: str = "C",
+    sf_weight: float = 0.3,
+    initial: np.ndarray | None = None,
+    callback: Callable[[IterationStats], None] | None = None,
+    freeze_threshold: float | None = None,
+    freeze_after: int = 2,
+    acceleration: str | None = None,
+    accelerate_every: int = 3,
+) -> tuple[np.ndarray, list[IterationStats], bool]:
+    """Итерации Similarity Flooding над векторами пар.
+
+    Возвращает ``(σ, метрики итераций, сошлось ли)``; Δ — L1-норма изменения σ.
+    ``initial`` — начальное приближение вместо σ⁰, например неподвижная точка прошлого запуска.
+    ``callback(stats)`` вызывается после каждой итерации; исключение из него прерывает итерации.
+
+    С ``freeze_threshold`` пара, σ которой ``freeze_after`` итераций подряд менялась меньше порога,
+    замораживается вместе со всеми парами, от которых получает σ (``_moving_pairs``): её σ больше
+    не пересчитывается, а умножение идёт только по строкам матрицы остальных пар, так что итерации
+    дешевеют по мере сходимости. Это приближение: при C и weighted вклад замороженных пар
+    в нормирующий максимум оценивается по их σ и прежнему максимуму.
+    ``acceleration="aitken"`` раз в ``accelerate_every`` итераций заменяет σ экстраполяцией Эйткена.
+    Без этих параметров итерации совпадают со словарными реализациями.
+    """
+    if formula not in FORMULAS:
+        raise PropagationException(f"unknown formula {formula!r}")
+    if acceleration is not None and acceleration not in ACCELERATIONS:
+        raise PropagationException(f"unknown acceleration {acceleration!r}")
+
+    start = sigma0 if initial is None else initial
+    if formula == "basic":
+        has_incoming = np.diff(matrix.indptr) > 0
+        current = start.copy()
+    else:
+        if matrix.nnz == 0:
+            return sigma0.copy(), [], True
+        current = normalize(start)
+
+    # Номера пересчитываемых пар (None — все), строки матрицы и σ⁰ для них и маска замороженных пар;
+    # stable — число итераций подряд, за которые σ пересчитываемой пары менялась меньше порога
+    active = None
+    rows, base, incoming = matrix, sigma0, has_incoming if formula == "basic" else None
+    frozen = None
+    stable = np.zeros(len(current), dtype=np.int32) if freeze_threshold is not None else None
+    last_max = 1.0
+    history: list[np.ndarray] = []
+    stats: list[IterationStats] = []
+    converged = False
+    for iteration in range(1, iterations + 1):
+        started = time.perf_counter()
+        increments = rows @ current
+        values = current if active is None else current[active]
+        if formula == "C":
+            raw = base + values + increments
+        elif formula == "weighted":
+            raw = base + sf_weight * increments
+        else:
+            raw = np.where(incoming, values + increments, values)
+
+        if formula != "basic" and len(raw):
+            max_value = raw.max()
+            if frozen is not None:
+                max_value = max(max_value, current[frozen].max() * last_max)
+            if max_value != 0:
+                raw = raw / max_value
+                last_max = max_value
+        if active is None:
+            new = raw
+        else:
+            new = current.copy()
+            new[active] = raw
+
+        change = np.abs(raw - values)
+        delta = float(change.sum())
+        residual = float(change.max()) if len(change) else 0.0
+        step = IterationStats(iteration, delta, residual, active=len(raw), seconds=0.0)
+        current = new
+
+        if delta < convergence_threshold:
+            converged = True
+        elif stable is not None:
+            stable = np.where(change < freeze_threshold, stable + 1, 0)
+            # Пары с наибольшей σ задают нормирующий максимум и не замораживаются
+            settled = (stable >= freeze_after) & (raw < raw.max())
+            # Строки матрицы выбираются заново, только когда замерзает хотя бы четверть пересчитываемых пар
+            minimum = max(len(raw) // FREEZE_FRACTION, 1)
+            if np.count_nonzero(settled) >= minimum and iteration % freeze_after == 0:
+                indices = np.arange(len(current)) if active is None else active
+                moving = _moving_pairs(rows, indices, len(current), settled)
+                if len(raw) - np.count_nonzero(moving) >= minimum:
+                    active, stable = indices[moving], stable[moving]
+                    rows, base = matrix[active], sigma0[active]
+                    if formula == "basic":
+                        incoming = has_incoming[active]
+                    frozen = np.ones(len(current), dtype=bool)
+                    frozen[active] = False
+                    converged = not len(active)
+        if acceleration is not None and not converged:
+            history = [*history[-2:], current]
+            if len(history) == 3 and iteration % accelerate_every == 0:
+                # Нормировка — на следующей итерации: иначе сдвинулись бы и замороженные пары
+                current = _aitken(*history)
+                history = []
+                step.extrapolated = True
+
+        step.seconds = time.perf_counter() - started
+        stats.append(step)
+        if callback is not None:
+            callback(step)
+        if converged:
+            break
+
+    if formula == "basic":
+        current = normalize(current)
+    return current, stats, converged
+
+
+class SimilarityFlooding(object):
+    """Similarity Flooding на разреженной матрице распространения.
+
+    Пары вершин нумеруются целыми числами (``PairSpace``), PCG собирается в CSR-матрицу
+    с весами 1/(outdeg_a · outdeg_b), итерация — одно умножение матрицы на вектор.
+    Семантика σ⁰, нормализации и критерия остановки совпадает со словарными реализациями
+    из ``tests/similarity_flooding*.py``. Заморозка сошедшихся пар (``freeze_threshold``) и экстраполяция
+    (``acceleration``) сокращают работу ценой небольшого отклонения от них — см. ``flood``.
+    """
+
+    def __init__(
+        self,
+        iterations: int = 20,
+        convergence_threshold: float = 1e-4,
+        formula: str = "C",
+        sf_weight: float = 0.3,
+        freeze_threshold: float | None = None,
+        freeze_after: int = 2,
+        acceleration: str | None = None,
+        accelerate_every: int = 3,
+    ):
+        if formula not in FORMULAS:
+            raise PropagationException(f"unknown formula {formula!r}")
+        if acceleration is not None and acceleration not in ACCELERATIONS:
+            raise PropagationException(f"unknown acceleration {acceleration!r}")
+        if freeze_after < 1 or accelerate_every < 1:
+            raise PropagationException("freeze_after and accelerate_every must be positive")
+        self.iterations = iterations
+        self.convergence_threshold = convergence_threshold
+        self.formula = formula
+        self.sf_weight = sf_weight
+        self.freeze_threshold = freeze_threshold
+        self.freeze_after = freeze_after
+        self.acceleration = acceleration
+        self.accelerate_every = accelerate_every
+
+    def run(
+        self,
+        graph_a: MatchGraph,
+        graph_b: MatchGraph,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        values: np.ndarray,
+        candidates: PairSpace | None = None,
+        initial: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None,
+        callback: Callable[[IterationStats], None] | None = None,
+    ) -> FloodResult:
+        """σ⁰ задаётся тремя массивами: номер вершины A, номер вершины B, значение.
+
+        С ``candidates`` (результат блокировки) PCG строится только между парами-кандидатами
+        и парами с ненулевым σ⁰; остальные пары в итерациях не участвуют. ``initial`` — начальное σ
+        теми же тремя массивами (тёплый старт); пары вне пространства пар отбрасываются.
+        ``callback(stats)`` — метрики каждой итерации, как в ``flood``; они же сохраняются в ``FloodResult.stats``.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        nonzero = values != 0
+        rows, cols, values = rows[nonzero], cols[nonzero], values[nonzero]
+
+        n_b = len(graph_b)
+        sigma0_keys = PairSpace.pack(rows, cols, n_b)
+        if candidates is not None:
+            pairs = PairSpace(len(graph_a), n_b, np.concatenate([sigma0_keys, candidates.keys]))
+        else:
+            pairs = pcg_pair_space(graph_a, graph_b, sigma0_keys)
+        sigma0 = pairs.scatter(rows, cols, values)
+        start = None if initial is None else pairs.scatter(*initial)
+        matrix = propagation_matrix(pairs, pcg_blocks(graph_a, graph_b, pairs, restrict=candidates is not None))
+
+        sigma, stats, converged = flood(
+            sigma0,
+            matrix,
+            iterations=self.iterations,
+            convergence_threshold=self.convergence_threshold,
+            formula=self.formula,
+            sf_weight=self.sf_weight,
+            initial=start,
+            callback=callback,
+            freeze_threshold=self.freeze_threshold,
+            freeze_after=self.freeze_after,
+            acceleration=self.acceleration,
+            accelerate_every=self.accelerate_every,
+        )
+        deltas = [step.delta for step in stats]
+        matrix_bytes = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return FloodResult(pairs, sigma0, sigma, len(stats), deltas, converged, matrix.nnz, matrix_bytes, stats)
+
+    def run_dict(
+        self,
+        graph_a: MatchGraph,
+        graph_b: MatchGraph,
+        sigma0: dict[PairKey, float],
+        candidates: PairSpace | None = None,
+    ) -> FloodResult:
+        """То же для σ⁰ в виде словаря ``{(имя_a, имя_b): значение}``; пары с неизвестными вершинами пропускаются."""
+        rows, cols, values = [], [], []
+        for (name_a, name_b), value in sigma0.items():
+            row = graph_a.index.get(name_a)
+            col = graph_b.index.get(name_b)
+            if row is None or col is None:
+                continue
+            rows.append(row)
+            cols.append(col)
+            values.append(value)
+        return self.run(graph_a, graph_b, rows, cols, values, candidates)
@@ -0,0 +1,515 @@
+from typing import Callable
+from typing import Iterator
+
+import numpy as np
+
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.strings import char_similarity_matrix
+from at_ontology.apps.ontology.matching.strings import TokenSimilarityKernel
+
+# ─── Составляющие σ⁰ ───
+
+
+def string_similarity_matrix(
+    strings_a: list[str],
+    strings_b: list[str],
+    workers: int = 1,
+    check: Callable[[], None] | None = None,
+) -> np.ndarray:
+    """``_string_sim`` для всех пар: посимвольная схожесть без учёта регистра.
+
+    Повторяющиеся строки сравниваются один раз; ``workers`` — число процессов для расстояний.
+    ``check`` вызывается между частями расчёта; исключение из него прерывает расчёт.
+    """
+    if not strings_a or not strings_b:
+        return np.zeros((len(strings_a), len(strings_b)), dtype=np.float64)
+    unique_a, inverse_a = np.unique([string.lower() for string in strings_a], return_inverse=True)
+    unique_b, inverse_b = np.unique([string.lower() for string in strings_b], return_inverse=True)
+    similarity = char_similarity_matrix(unique_a.tolist(), unique_b.tolist(), workers, check)
+    return similarity[np.ix_(inverse_a, inverse_b)]
+
+
+def property_similarity_matrix(
+    features_a: FeatureTable,
+    features_b: FeatureTable,
+    rows: np.ndarray | None = None,
+    cols: np.ndarray | None = None,
+) -> np.ndarray:
+    """Коэффициент Жаккара наборов свойств для вершин ``rows`` × ``cols`` (по умолчанию всех); без свойств — 0."""
+    vocabulary: dict[str, int] = {}
+    matrix_a = features_a.property_matrix(vocabulary)
+    matrix_b = features_b.property_matrix(vocabulary)
+    matrix_a.resize((len(features_a), len(vocabulary)))
+    counts_a, counts_b = features_a.property_counts, features_b.property_counts
+    if rows is not None:
+        matrix_a, counts_a = matrix_a[rows], counts_a[rows]
+    if cols is not None:
+        matrix_b, counts_b = matrix_b[cols], counts_b[cols]
+    common = (matrix_a @ matrix_b.T).toarray()
+    union = counts_a[:, None] + counts_b[None, :] - common
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(union > 0, common / union, 0.0)
+    result[(counts_a == 0)[:, None] | (counts_b == 0)[None, :]] = 0.0
+    return result
+
+
+def _vertices(features: FeatureTable, vertices: np.ndarray | None) -> np.ndarray:
+    return np.arange(len(features)) if vertices is None else vertices
+
+
+def _children(features: FeatureTable, vertices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Дети вершин ``vertices`` подряд и начала их групп."""
+    starts = features.children_indptr[vertices]
+    counts = features.child_counts[vertices]
+    offsets = np.r_[0, np.cumsum(counts)[:-1]].astype(np.int64)
+    flat = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+    return features.children[flat], offsets
+
+
+def children_similarity_matrix(
+    features_a: FeatureTable,
+    features_b: FeatureTable,
+    similarity: np.ndarray,
+    rows: np.ndarray | None = None,
+    cols: np.ndarray | None = None,
+    positions: tuple[np.ndarray, np.ndarray] | None = None,
+) -> np.ndarray:
+    """Симметричное среднее лучших совпадений детей по матрице ``similarity`` вершин A × B.
+
+    Считается для вершин ``rows`` × ``cols`` (по умолчанию всех). Если ``similarity`` построена
+    только для части вершин, ``positions`` — номера вершин A и B в ней (−1 — нет).
+    Два листа получают 0.5, лист и не лист — 0.
+    """
+    rows, cols = _vertices(features_a, rows), _vertices(features_b, cols)
+    counts_a = features_a.child_counts[rows]
+    counts_b = features_b.child_counts[cols]
+    result = np.zeros((len(rows), len(cols)), dtype=np.float64)
+    result[np.ix_(counts_a == 0, counts_b == 0)] = 0.5
+
+    inner_rows = np.flatnonzero(counts_a)
+    inner_cols = np.flatnonzero(counts_b)
+    if not len(inner_rows) or not len(inner_cols):
+        return result
+
+    children_a, offsets_a = _children(features_a, rows[inner_rows])
+    children_b, offsets_b = _children(features_b, cols[inner_cols])
+    if positions is not None:
+        children_a, children_b = positions[0][children_a], positions[1][children_b]
+
+    best_in_b = np.maximum.reduceat(similarity[:, children_b], offsets_b, axis=1)
+    score_ab = np.add.reduceat(best_in_b[children_a], offsets_a, axis=0) / counts_a[inner_rows, None]
+    best_in_a = np.maximum.reduceat(similarity[children_a], offsets_a, axis=0)
+    score_ba = np.add.reduceat(best_in_a[:, children_b], offsets_b, axis=1) / counts_b[None, inner_cols]
+
+    result[np.ix_(inner_rows, inner_cols)] = (score_ab + score_ba) / 2.0
+    return result
+
+
+def mix_parents(
+    scores: np.ndarray,
+    features_a: FeatureTable,
+    features_b: FeatureTable,
+    similarity: np.ndarray,
+    weight: float,
+    rows: np.ndarray | None = None,
+    cols: np.ndarray | None = None,
+    positions: tuple[np.ndarray, np.ndarray] | None = None,
+) -> np.ndarray:
+    """Для пар, у обеих вершин которых есть родитель: ``(1 − weight)·score + weight·similarity[родители]``.
+
+    ``rows``, ``cols`` и ``positions`` — как в ``children_similarity_matrix``.
+    """
+    if not weight:
+        return scores
+    parents_a = features_a.parents[_vertices(features_a, rows)]
+    parents_b = features_b.parents[_vertices(features_b, cols)]
+    both = (parents_a >= 0)[:, None] & (parents_b >= 0)[None, :]
+    index_a, index_b = np.maximum(parents_a, 0), np.maximum(parents_b, 0)
+    if positions is not None:
+        index_a, index_b = np.maximum(positions[0][index_a], 0), np.maximum(positions[1][index_b], 0)
+    parent_scores = similarity[np.ix_(index_a, index_b)]
+    return np.where(both, (1.0 - weight) * scores + weight * parent_scores, scores)
+
+
+def positive_pairs(
+    scores: np.ndarray,
+    features_a: FeatureTable,
+    features_b: FeatureTable,
+) -> dict[tuple[str, str], float]:
+    """Пары имён вершин с оценкой больше нуля — σ⁰ в виде словаря, как у попарных функций."""
+    rows, cols = np.nonzero(scores > 0)
+    names_a, names_b = features_a.names, features_b.names
+    return {
+        (names_a[i], names_b[j]): score
+        for i, j, score in zip(rows.tolist(), cols.tolist(), scores[rows, cols].tolist())
+    }
+
+
+def neighbourhood(features: FeatureTable, vertices: np.ndarray) -> np.ndarray:
+    """Вершины ``vertices`` вместе с их родителями и детьми, без повторов."""
+    vertices = np.asarray(vertices, dtype=np.int64)
+    parents = features.parents[vertices]
+    children = [features.children_of(i) for i in vertices.tolist()]
+    return np.unique(np.concatenate([vertices, parents[parents >= 0], *children]).astype(np.int64))
+
+
+def with_parents(features: FeatureTable, vertices: np.ndarray) -> np.ndarray:
+    """Вершины ``vertices`` вместе с их родителями, без повторов."""
+    vertices = np.asarray(vertices, dtype=np.int64)
+    parents = features.parents[vertices]
+    return np.unique(np.concatenate([vertices, parents[parents >= 0]]).astype(np.int64))
+
+
+def vertex_positions(size: int, vertices: np.ndarray) -> np.ndarray:
+    """Номера вершин ``vertices`` в подматрице, построенной только для них (−1 — вершины там нет)."""
+    positions = np.full(size, -1, dtype=np.int64)
+    positions[vertices] = np.arange(len(vertices))
+    return positions
+
+
+def pair_blocks(rows: np.ndarray, block_size: int) -> Iterator[np.ndarray]:
+    """Номера пар, сгруппированные по ``block_size`` различных вершин A."""
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+    bounds = np.r_[starts[::block_size], len(rows)]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        yield order[lo:hi]
+
+
+def block_pair_scores(
+    submatrix: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    rows: np.ndarray,
+    cols: np.ndarray,
+    block_size: int,
+    check: Callable[[], None] | None = None,
+) -> np.ndarray:
+    """Оценки пар ``(rows[i], cols[i])`` из подматриц ``submatrix(вершины группы, их кандидаты)``.
+
+    ``check`` вызывается перед каждой группой; исключение из него прерывает расчёт.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    result = np.zeros(len(rows), dtype=np.float64)
+    if not len(rows):
+        return result
+    for pairs in pair_blocks(rows, block_size):
+        if check is not None:
+            check()
+        unique_rows, at_rows = np.unique(rows[pairs], return_inverse=True)
+        unique_cols, at_cols = np.unique(cols[pairs], return_inverse=True)
+        result[pairs] = submatrix(unique_rows, unique_cols)[at_rows, at_cols]
+    return result
+
+
+def _select(
+    similarity: np.ndarray,
+    features_a: FeatureTable,
+    features_b: FeatureTable,
+    rows: np.ndarray | None,
+    cols: np.ndarray | None,
+    positions: tuple[np.ndarray, np.ndarray] | None,
+) -> np.ndarray:
+    """Строки ``rows`` и столбцы ``cols`` матрицы ``similarity`` с учётом ``positions``."""
+    if rows is None and cols is None and positions is None:
+        return similarity
+    rows, cols = _vertices(features_a, rows), _vertices(features_b, cols)
+    if positions is not None:
+        rows, cols = positions[0][rows], positions[1][cols]
+    return similarity[np.ix_(rows, cols)]
+
+
+# ─── Оценки σ⁰ ───
+
+
+class ContextScorer(object):
+    """σ⁰ по названию, родителю и детям (``similarity_flooding.py``, ``ontology_intersection.py``).
+
+    ``label_weight·sim(label) + parent_weight·sim(parent) + children_weight·children_sim``; если родитель
+    есть только у одной вершины, вместо схожести родителей берётся ``one_root``, если ни у одной — ``both_roots``.
+
+    Почти всё время уходит на посимвольную схожесть названий; ``workers`` — число процессов для неё.
+    """
+
+    def __init__(
+        self,
+        label_weight: float = 0.5,
+        parent_weight: float = 0.3,
+        children_weight: float = 0.2,
+        one_root: float = 0.2,
+        both_roots: float = 0.5,
+        workers: int = 1,
+    ):
+        self.label_weight = label_weight
+        self.parent_weight = parent_weight
+        self.children_weight = children_weight
+        self.one_root = one_root
+        self.both_roots = both_roots
+        self.workers = workers
+
+    def matrix(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ всех пар; ``check`` вызывается между частями расчёта, исключение из него прерывает расчёт."""
+        labels_a, labels_b = features_a.stripped_labels, features_b.stripped_labels
+        similarity = string_similarity_matrix(labels_a, labels_b, self.workers, check)
+        return self.combine(features_a, features_b, similarity)
+
+    def update(
+        self,
+        scores: np.ndarray,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+    ) -> np.ndarray:
+        """Копия σ⁰ ``scores`` с пересчитанными строками ``rows`` и столбцами ``cols`` — после правки вершин.
+
+        Оценка пары зависит от названий её вершин, их родителей и детей, поэтому названия сравниваются
+        только для строк ``rows`` с их родителями и детьми (со всеми вершинами B) и так же для столбцов.
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        cols = np.unique(np.asarray(cols, dtype=np.int64))
+        result = scores.copy()
+        if not len(rows) and not len(cols):
+            return result
+
+        labels_a, labels_b = features_a.stripped_labels, features_b.stripped_labels
+        similarity = np.zeros((len(features_a), len(features_b)), dtype=np.float64)
+        needed_a = neighbourhood(features_a, rows)
+        needed_b = neighbourhood(features_b, cols)
+        if len(needed_a):
+            similarity[needed_a] = string_similarity_matrix([labels_a[i] for i in needed_a], labels_b, self.workers)
+        if len(needed_b):
+            similarity[:, needed_b] = string_similarity_matrix(labels_a, [labels_b[j] for j in needed_b], self.workers)
+
+        # Вне нужных строк и столбцов similarity не заполнена, но в строки rows и столбцы cols она не попадает
+        combined = self.combine(features_a, features_b, similarity)
+        result[rows] = combined[rows]
+        result[:, cols] = combined[:, cols]
+        return result
+
+    def submatrix(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ для вершин ``rows`` × ``cols``: названия сравниваются только у них, их родителей и детей."""
+        labels_a, labels_b = features_a.stripped_labels, features_b.stripped_labels
+        needed_a = neighbourhood(features_a, rows)
+        needed_b = neighbourhood(features_b, cols)
+        similarity = string_similarity_matrix(
+            [labels_a[i] for i in needed_a], [labels_b[j] for j in needed_b], self.workers, check
+        )
+        positions = (vertex_positions(len(features_a), needed_a), vertex_positions(len(features_b), needed_b))
+        return self.combine(features_a, features_b, similarity, rows, cols, positions)
+
+    def pair_scores(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        block_size: int = 32,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ только для пар ``(rows[i], cols[i])`` — например, кандидатов блокировщика.
+
+        Пары группируются по ``block_size`` вершин A, и каждая группа считается подматрицей
+        «вершины группы × их кандидаты»; матрица A × B не строится. ``check`` — как в ``matrix``.
+        """
+        return block_pair_scores(
+            lambda r, c: self.submatrix(features_a, features_b, r, c, check), rows, cols, block_size, check
+        )
+
+    def combine(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        similarity: np.ndarray,
+        rows: np.ndarray | None = None,
+        cols: np.ndarray | None = None,
+        positions: tuple[np.ndarray, np.ndarray] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ по готовой матрице схожести названий вершин A × B.
+
+        ``rows``, ``cols`` и ``positions`` — как в ``children_similarity_matrix``.
+        """
+        has_parent_a = (features_a.parents[_vertices(features_a, rows)] >= 0)[:, None]
+        has_parent_b = (features_b.parents[_vertices(features_b, cols)] >= 0)[None, :]
+        parent_scores = np.where(has_parent_a | has_parent_b, self.one_root, self.both_roots)
+        parent_scores = mix_parents(parent_scores, features_a, features_b, similarity, 1.0, rows, cols, positions)
+        children_scores = children_similarity_matrix(features_a, features_b, similarity, rows, cols, positions)
+
+        return (
+            self.label_weight * _select(similarity, features_a, features_b, rows, cols, positions)
+            + self.parent_weight * parent_scores
+            + self.children_weight * children_scores
+        )
+
+
+class StringScorer(object):
+    """σ⁰ по посимвольной схожести имени и названия и по свойствам.
+
+    ``(1 − property_weight)·(name_weight·sim(name) + (1 − name_weight)·sim(label)) + property_weight·jaccard``,
+    затем смешивание со схожестью названий родителей с весом ``parent_weight``. Веса по умолчанию —
+    ``similarity_flooding_copy.py``; ``name_weight=0.2, property_weight=0.15`` — ``similarity_flooding_cool_run.py``,
+    с ``parent_weight=0.3`` — ``similarity_flooding_copy_cool_run2.py``.
+    """
+
+    def __init__(
+        self,
+        name_weight: float = 0.35,
+        property_weight: float = 0.2,
+        parent_weight: float = 0.0,
+        workers: int = 1,
+    ):
+        self.name_weight = name_weight
+        self.property_weight = property_weight
+        self.parent_weight = parent_weight
+        self.workers = workers
+
+    def matrix(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ всех пар; ``check`` — как в ``ContextScorer.matrix``."""
+        names = string_similarity_matrix(features_a.names, features_b.names, self.workers, check)
+        labels = string_similarity_matrix(features_a.labels, features_b.labels, self.workers, check)
+        text = self.name_weight * names + (1.0 - self.name_weight) * labels
+        scores = (1.0 - self.property_weight) * text + self.property_weight * property_similarity_matrix(
+            features_a, features_b
+        )
+        return mix_parents(scores, features_a, features_b, labels, self.parent_weight)
+
+    def submatrix(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ для вершин ``rows`` × ``cols``: строки сравниваются только у них и их родителей."""
+        needed_a = with_parents(features_a, rows) if self.parent_weight else rows
+        needed_b = with_parents(features_b, cols) if self.parent_weight else cols
+        names = string_similarity_matrix(
+            [features_a.names[i] for i in rows], [features_b.names[j] for j in cols], self.workers, check
+        )
+        labels = string_similarity_matrix(
+            [features_a.labels[i] for i in needed_a], [features_b.labels[j] for j in needed_b], self.workers, check
+        )
+        positions = (vertex_positions(len(features_a), needed_a), vertex_positions(len(features_b), needed_b))
+        text = self.name_weight * names + (1.0 - self.name_weight) * _select(
+            labels, features_a, features_b, rows, cols, positions
+        )
+        scores = (1.0 - self.property_weight) * text + self.property_weight * property_similarity_matrix(
+            features_a, features_b, rows, cols
+        )
+        return mix_parents(scores, features_a, features_b, labels, self.parent_weight, rows, cols, positions)
+
+    def pair_scores(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        block_size: int = 32,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ только для пар ``(rows[i], cols[i])`` подматрицами по ``block_size`` вершин A, как у ``ContextScorer``."""
+        return block_pair_scores(
+            lambda r, c: self.submatrix(features_a, features_b, r, c, check), rows, cols, block_size, check
+        )
+
+
+class TokenScorer(object):
+    """σ⁰ ``similarity_flooding_copy_final.py``: токенная схожесть названий с раскрытием аббревиатур.
+
+    ``(1 − property_weight)·(name_weight·char(name) + (1 − name_weight)·token(label)) + property_weight·jaccard``,
+    смешанная с токенной схожестью названий родителей с весом ``parent_weight``.
+    """
+
+    def __init__(
+        self,
+        name_weight: float = 0.15,
+        property_weight: float = 0.15,
+        parent_weight: float = 0.3,
+        workers: int = 1,
+    ):
+        self.name_weight = name_weight
+        self.property_weight = property_weight
+        self.parent_weight = parent_weight
+        self.workers = workers
+
+    def matrix(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ всех пар; ``check`` — как в ``ContextScorer.matrix``."""
+        names = char_similarity_matrix(features_a.names, features_b.names, self.workers, check)
+        kernel = TokenSimilarityKernel(features_a.labels, features_b.labels, features_a.tokens, features_b.tokens)
+        labels = kernel.matrix(check=check)
+        text = self.name_weight * names + (1.0 - self.name_weight) * labels
+        scores = (1.0 - self.property_weight) * text + self.property_weight * property_similarity_matrix(
+            features_a, features_b
+        )
+        return mix_parents(scores, features_a, features_b, labels, self.parent_weight)
+
+    def submatrix(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        kernel: TokenSimilarityKernel | None = None,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ для вершин ``rows`` × ``cols``: названия сравниваются только у них и их родителей.
+
+        Готовое ядро ``kernel`` избавляет от повторной посимвольной схожести токенов.
+        """
+        if kernel is None:
+            kernel = TokenSimilarityKernel(features_a.labels, features_b.labels, features_a.tokens, features_b.tokens)
+        needed_a = with_parents(features_a, rows) if self.parent_weight else rows
+        needed_b = with_parents(features_b, cols) if self.parent_weight else cols
+        names = char_similarity_matrix(
+            [features_a.names[i] for i in rows], [features_b.names[j] for j in cols], self.workers, check
+        )
+        labels = kernel.matrix(needed_a, needed_b, check)
+        positions = (vertex_positions(len(features_a), needed_a), vertex_positions(len(features_b), needed_b))
+        text = self.name_weight * names + (1.0 - self.name_weight) * _select(
+            labels, features_a, features_b, rows, cols, positions
+        )
+        scores = (1.0 - self.property_weight) * text + self.property_weight * property_similarity_matrix(
+            features_a, features_b, rows, cols
+        )
+        return mix_parents(scores, features_a, features_b, labels, self.parent_weight, rows, cols, positions)
+
+    def pair_scores(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        block_size: int = 32,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ только для пар ``(rows[i], cols[i])`` подматрицами по ``block_size`` вершин A, как у ``ContextScorer``.
+
+        Посимвольная схожесть токенов считается один раз для всех групп.
+        """
+        kernel = TokenSimilarityKernel(features_a.labels, features_b.labels, features_a.tokens, features_b.tokens)
+        return block_pair_scores(
+            lambda r, c: self.submatrix(features_a, features_b, r, c, kernel, check), rows, cols, block_size, check
+        )
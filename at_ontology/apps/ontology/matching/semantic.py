@@ -0,0 +1,198 @@
+from typing import Callable
+from typing import Iterator
+
+import numpy as np
+
+from at_ontology.apps.ontology.matching.blocking import CandidatePairs
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.scoring import pair_blocks
+from at_ontology.apps.ontology.matching.strings import TokenSimilarityKernel
+
+# Предел памяти плотного блока оценок по умолчанию (байт)
+DEFAULT_MEMORY_LIMIT = 256 * 2**20
+
+
+def block_rows(n_b: int, bytes_per_cell: int, memory_limit: int) -> int:
+    """Сколько строк A помещается в блок ``строки × n_b`` при заданном пределе памяти."""
+    return max(memory_limit // max(n_b * bytes_per_cell, 1), 1)
+
+
+def cosine_blocks(embeddings_a: np.ndarray, embeddings_b: np.ndarray, step: int) -> Iterator[tuple[int, np.ndarray]]:
+    """Блоки ``(E_a[блок] · E_bᵀ + 1) / 2`` по ``step`` строк во float32 — косинус L2-нормированных векторов в [0, 1].
+
+    Возвращает пары (номер первой строки блока, блок).
+    """
+    embeddings_a = np.asarray(embeddings_a, dtype=np.float32)
+    embeddings_b = np.asarray(embeddings_b, dtype=np.float32)
+    for start in range(0, len(embeddings_a), step):
+        stop = start + step
+        block = embeddings_a[start:stop] @ embeddings_b.T
+        block += 1.0
+        block *= 0.5
+        yield start, block
+
+
+def top_k_columns(scores: np.ndarray, k: int) -> np.ndarray:
+    """Маска k лучших столбцов в каждой строке плотного блока."""
+    mask = np.zeros(scores.shape, dtype=bool)
+    if k >= scores.shape[1]:
+        mask[:] = True
+        return mask
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    np.put_along_axis(mask, best, True, axis=1)
+    return mask
+
+
+class EmbeddingScorer(object):
+    """σ⁰ по эмбеддингам с токенным и родительским контекстом (``tests/embeddings_matcher.py``).
+
+    ``(1 − token_weight − parent_weight)·cos + token_weight·token(label) + parent_weight·token(parent)``;
+    если родителя нет хотя бы у одной вершины, вместо схожести родителей берётся ``no_parent``.
+
+    Матрица A × B не строится целиком: строки A обрабатываются блоками, размер которых
+    ограничен ``memory_limit``. Косинусы блока — одно произведение матриц во float32, токенная
+    схожесть названий берётся из ядра с общей для всех блоков таблицей схожести токенов,
+    а схожесть родителей — из маленькой матрицы «родители A × родители B». Из блока сохраняются
+    только пары с оценкой не ниже ``threshold`` (и строго больше нуля), не более ``top_k`` на вершину A.
+    """
+
+    def __init__(
+        self,
+        token_weight: float = 0.1,
+        parent_weight: float = 0.2,
+        no_parent: float = 0.5,
+        threshold: float = 0.0,
+        top_k: int | None = None,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    ):
+        self.token_weight = token_weight
+        self.parent_weight = parent_weight
+        self.no_parent = no_parent
+        self.threshold = threshold
+        self.top_k = top_k
+        self.memory_limit = memory_limit
+
+    def parent_scores(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Токенная схожесть названий родителей и номера строк/столбцов в ней для каждой вершины (−1 — нет)."""
+        parents_a, positions_a = np.unique(features_a.parents[features_a.parents >= 0], return_inverse=True)
+        parents_b, positions_b = np.unique(features_b.parents[features_b.parents >= 0], return_inverse=True)
+        rows = np.full(len(features_a), -1, dtype=np.int64)
+        cols = np.full(len(features_b), -1, dtype=np.int64)
+        rows[features_a.parents >= 0] = positions_a
+        cols[features_b.parents >= 0] = positions_b
+        kernel = TokenSimilarityKernel(
+            [features_a.stripped_labels[i] for i in parents_a],
+            [features_b.stripped_labels[j] for j in parents_b],
+        )
+        return kernel.matrix(), rows, cols
+
+    def _kernel(self, features_a: FeatureTable, features_b: FeatureTable) -> TokenSimilarityKernel | None:
+        if not self.token_weight:
+            return None
+        return TokenSimilarityKernel(features_a.labels, features_b.labels, features_a.tokens, features_b.tokens)
+
+    def candidates(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        embeddings_a: np.ndarray,
+        embeddings_b: np.ndarray,
+        check: Callable[[], None] | None = None,
+    ) -> CandidatePairs:
+        """Пары с оценкой выше ``threshold`` (и среди ``top_k`` лучших в строке) блоками строк A.
+
+        ``check`` вызывается перед каждым блоком; исключение из него прерывает расчёт.
+        """
+        n_a, n_b = len(features_a), len(features_b)
+        embedding_weight = 1.0 - self.token_weight - self.parent_weight
+        kernel = self._kernel(features_a, features_b)
+        if self.parent_weight:
+            parents, parent_rows, parent_cols = self.parent_scores(features_a, features_b)
+
+        # На ячейку блока: косинус float32, токенная и итоговая оценки float64 и промежуточные
+        # матрицы ядра — по числу токенов названия A на каждый токен B
+        tokens_b = sum(len(tokens) for tokens in features_b.tokens)
+        tokens_per_label = max(sum(len(tokens) for tokens in features_a.tokens) / max(n_a, 1), 1.0)
+        bytes_per_cell = 4 + 16 + (int(8 * tokens_per_label * tokens_b / max(n_b, 1)) if kernel else 0)
+        step = block_rows(n_b, bytes_per_cell, self.memory_limit)
+
+        rows, cols, scores = [], [], []
+        for start, block in cosine_blocks(embeddings_a, embeddings_b, step):
+            if check is not None:
+                check()
+            block_range = np.arange(start, start + len(block))
+            block = embedding_weight * block.astype(np.float64)
+            if kernel is not None:
+                block += self.token_weight * kernel.matrix(block_range, check=check)
+            if self.parent_weight:
+                has_a = parent_rows[block_range] >= 0
+                has_b = parent_cols >= 0
+                parent = np.full(block.shape, self.no_parent)
+                parent[np.ix_(has_a, has_b)] = parents[np.ix_(parent_rows[block_range][has_a], parent_cols[has_b])]
+                block += self.parent_weight * parent
+
+            keep = (block > 0) & (block >= self.threshold)
+            if self.top_k is not None:
+                keep &= top_k_columns(block, self.top_k)
+            pair_rows, pair_cols = np.nonzero(keep)
+            rows.append(pair_rows + start)
+            cols.append(pair_cols)
+            scores.append(block[pair_rows, pair_cols])
+
+        return CandidatePairs(
+            n_a=n_a,
+            n_b=n_b,
+            rows=np.concatenate([np.empty(0, dtype=np.int64), *rows]).astype(np.int32),
+            cols=np.concatenate([np.empty(0, dtype=np.int64), *cols]).astype(np.int32),
+            scores=np.concatenate([np.empty(0), *scores]),
+        )
+
+    def pair_scores(
+        self,
+        features_a: FeatureTable,
+        features_b: FeatureTable,
+        embeddings_a: np.ndarray,
+        embeddings_b: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        block_size: int = 32,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """σ⁰ только для пар ``(rows[i], cols[i])`` — например, кандидатов из ANN-индекса.
+
+        Пары группируются по ``block_size`` вершин A; токенная схожесть группы считается
+        подматрицей «вершины группы × их кандидаты», а не всей строкой B. ``check`` вызывается
+        перед каждой группой.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        embeddings_a = np.asarray(embeddings_a, dtype=np.float32)
+        embeddings_b = np.asarray(embeddings_b, dtype=np.float32)
+        embedding_weight = 1.0 - self.token_weight - self.parent_weight
+        kernel = self._kernel(features_a, features_b)
+        if self.parent_weight:
+            parents, parent_rows, parent_cols = self.parent_scores(features_a, features_b)
+
+        result = np.empty(len(rows), dtype=np.float64)
+        for pairs in pair_blocks(rows, block_size):
+            if check is not None:
+                check()
+            pair_rows, pair_cols = rows[pairs], cols[pairs]
+            cosine = (np.einsum("ij,ij->i", embeddings_a[pair_rows], embeddings_b[pair_cols]) + 1.0) / 2.0
+            scores = embedding_weight * cosine.astype(np.float64)
+            if kernel is not None:
+                unique_rows, at_rows = np.unique(pair_rows, return_inverse=True)
+                unique_cols, at_cols = np.unique(pair_cols, return_inverse=True)
+                scores += self.token_weight * kernel.matrix(unique_rows, unique_cols, check)[at_rows, at_cols]
+            if self.parent_weight:
+                parent_a, parent_b = parent_rows[pair_rows], parent_cols[pair_cols]
+                both = (parent_a >= 0) & (parent_b >= 0)
+                parent = np.full(len(pairs), self.no_parent)
+                parent[both] = parents[parent_a[both], parent_b[both]]
+                scores += self.parent_weight * parent
+            result[pairs] = scores
+        return result
@@ -0,0 +1,183 @@
+import numpy as np
+from scipy import sparse
+
+from at_ontology.apps.ontology.matching.propagation import FloodResult
+from at_ontology.apps.ontology.matching.propagation import PairKey
+
+# Наибольшее число пар A × B, при котором матрица хранится плотной (4M пар — 16 МБ во float32)
+DENSE_MAX_PAIRS = 1 << 22
+
+
+class SimilarityMatrixException(Exception):
+    pass
+
+
+class SimilarityMatrix(object):
+    """Оценки пар вершин A × B по их номерам: плотный массив для небольших онтологий, CSR — для больших.
+
+    По умолчанию хранится во float32 (``dtype``): для сохранения и выдачи результатов точности хватает,
+    а память вдвое меньше, чем у float64, и на порядки меньше, чем у словаря ``{(имя_a, имя_b): оценка}``.
+    Если пар больше ``DENSE_MAX_PAIRS``, хранятся только ненулевые оценки. σ⁰ конвейера хранится
+    такой матрицей во float64 (от неё зависит ход SF), ``top_k`` отбирает пары-кандидаты блокировщика.
+    Итерации SF идут во float64 над ``PairSpace``; σ строится из их результата (``from_flood``).
+    """
+
+    def __init__(self, n_a: int, n_b: int, data: np.ndarray | sparse.csr_matrix):
+        if data.shape != (n_a, n_b):
+            raise SimilarityMatrixException(f"matrix shape {data.shape} does not match ({n_a}, {n_b})")
+        self.n_a = n_a
+        self.n_b = n_b
+        self.data = data
+
+    # ─── Построение ───
+
+    @classmethod
+    def from_dense(
+        cls,
+        matrix: np.ndarray,
+        dtype: np.dtype = np.float32,
+        dense_max_pairs: int = DENSE_MAX_PAIRS,
+    ) -> "SimilarityMatrix":
+        n_a, n_b = matrix.shape
+        if n_a * n_b <= dense_max_pairs:
+            return cls(n_a, n_b, np.asarray(matrix, dtype=dtype))
+        return cls(n_a, n_b, sparse.csr_matrix(np.asarray(matrix, dtype=dtype)))
+
+    @classmethod
+    def from_pairs(
+        cls,
+        n_a: int,
+        n_b: int,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        values: np.ndarray,
+        dtype: np.dtype = np.float32,
+        dense_max_pairs: int = DENSE_MAX_PAIRS,
+    ) -> "SimilarityMatrix":
+        """Матрица из трёх массивов: номер вершины A, номер вершины B, оценка; повторные пары суммируются."""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=dtype)
+        if n_a * n_b <= dense_max_pairs:
+            data = np.zeros((n_a, n_b), dtype=dtype)
+            np.add.at(data, (rows, cols), values)
+            return cls(n_a, n_b, data)
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(n_a, n_b), dtype=dtype)
+        matrix.eliminate_zeros()
+        return cls(n_a, n_b, matrix)
+
+    @classmethod
+    def from_flood(
+        cls,
+        flood: FloodResult,
+        initial: bool = False,
+        dtype: np.dtype = np.float32,
+        dense_max_pairs: int = DENSE_MAX_PAIRS,
+    ) -> "SimilarityMatrix":
+        """σ (или σ⁰) результата Similarity Flooding."""
+        values = flood.sigma0 if initial else flood.sigma
+        nonzero = np.flatnonzero(values)
+        return cls.from_pairs(
+            flood.pairs.n_a,
+            flood.pairs.n_b,
+            flood.pairs.rows[nonzero],
+            flood.pairs.cols[nonzero],
+            values[nonzero],
+            dtype,
+            dense_max_pairs,
+        )
+
+    # ─── Свойства ───
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_a, self.n_b
+
+    @property
+    def is_sparse(self) -> bool:
+        return sparse.issparse(self.data)
+
+    @property
+    def nnz(self) -> int:
+        return self.data.nnz if self.is_sparse else int(np.count_nonzero(self.data))
+
+    @property
+    def nbytes(self) -> int:
+        """Память под значения (и для CSR — под номера столбцов и указатели строк) в байтах."""
+        if self.is_sparse:
+            return self.data.data.nbytes + self.data.indices.nbytes + self.data.indptr.nbytes
+        return self.data.nbytes
+
+    def max(self) -> float:
+        if not self.n_a or not self.n_b:
+            return 0.0
+        return float(self.data.max())
+
+    # ─── Доступ ───
+
+    def pairs(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ненулевые оценки тремя массивами ``(номер A, номер B, оценка)`` в порядке строк, затем столбцов."""
+        if self.is_sparse:
+            matrix = self.data.tocoo()
+            order = np.lexsort((matrix.col, matrix.row))
+            return matrix.row[order].astype(np.int32), matrix.col[order].astype(np.int32), matrix.data[order]
+        rows, cols = np.nonzero(self.data)
+        return rows.astype(np.int32), cols.astype(np.int32), self.data[rows, cols]
+
+    def get(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Оценки пар ``(rows[i], cols[i])``; пары без оценки — 0."""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if self.is_sparse:
+            return np.asarray(self.data[rows, cols]).ravel()
+        return self.data[rows, cols]
+
+    def to_dense(self) -> np.ndarray:
+        return self.data.toarray() if self.is_sparse else self.data.copy()
+
+    def to_dict(self, names_a: list[str], names_b: list[str]) -> dict[PairKey, float]:
+        """Ненулевые оценки в виде ``{(имя_a, имя_b): оценка}``, как у словарных сопоставителей."""
+        rows, cols, values = self.pairs()
+        return {
+            (names_a[row], names_b[col]): value
+            for row, col, value in zip(rows.tolist(), cols.tolist(), values.tolist())
+        }
+
+    # ─── Операции ───
+
+    def transpose(self) -> "SimilarityMatrix":
+        data = self.data.T.tocsr() if self.is_sparse else self.data.T
+        return SimilarityMatrix(self.n_b, self.n_a, data)
+
+    def normalized(self) -> "SimilarityMatrix":
+        """Матрица, делённая на наибольшую оценку (нулевая остаётся нулевой), как ``normalize`` в SF."""
+        max_value = self.max()
+        data = self.data.copy()
+        if max_value != 0:
+            data /= data.dtype.type(max_value)
+        return SimilarityMatrix(self.n_a, self.n_b, data)
+
+    def delta(self, other: "SimilarityMatrix") -> float:
+        """L1-норма разности матриц — Δ критерия остановки SF; суммирование во float64."""
+        if other.shape != self.shape:
+            raise SimilarityMatrixException(f"cannot compare matrices {self.shape} and {other.shape}")
+        if not self.is_sparse and not other.is_sparse:
+            return float(np.abs(self.data.astype(np.float64) - other.data).sum())
+        difference = sparse.csr_matrix(self.data, dtype=np.float64) - sparse.csr_matrix(other.data, dtype=np.float64)
+        return float(np.abs(difference.data).sum())
+
+    def top_k(self, k: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """До ``k`` лучших вершин B для каждой вершины A тремя массивами ``(номер A, номер B, оценка)``.
+
+        Пары упорядочены по номеру A, затем по убыванию оценки (при равенстве — по номеру B);
+        нулевые оценки не попадают. Лучшие вершины A для вершин B — ``transpose().top_k(k)``.
+        """
+        if k < 1:
+            raise SimilarityMatrixException("k must be positive")
+        rows, cols, values = self.pairs()
+        order = np.lexsort((cols, -values, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        starts = np.searchsorted(rows, np.arange(self.n_a))
+        ranks = np.arange(len(rows)) - starts[rows]
+        best = ranks < k
+        return rows[best], cols[best], values[best]
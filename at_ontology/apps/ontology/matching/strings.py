@@ -0,0 +1,384 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import numpy as np
+
+from at_ontology.apps.ontology.matching.cache import similarity_cache
+from at_ontology.apps.ontology.matching.text import is_abbreviation
+from at_ontology.apps.ontology.matching.text import tokenize
+from at_ontology.apps.ontology.matching.text import vertex_label
+
+# Ограничение на число ячеек состояния ДП (строки A × строки B × длина B) за один шаг
+MAX_DP_CELLS = 8_000_000
+
+# Слов в части при расчёте расстояний по частям и наибольшее число частей одной стороны
+SHARD_WORDS = 64
+MAX_SHARDS = 8
+
+# Вид и версия посимвольной схожести в ключах кэша: при изменении формулы версия увеличивается
+CHAR_SIMILARITY_KIND = "char:1"
+
+
+# ─── Редакционное расстояние ───
+
+
+def _encode(words: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Слова как матрица кодов символов (дополнение −1) и вектор длин."""
+    lengths = np.array([len(word) for word in words], dtype=np.int32)
+    codes = np.full((len(words), int(lengths.max(initial=0))), -1, dtype=np.int32)
+    for i, word in enumerate(words):
+        codes[i, : len(word)] = [ord(ch) for ch in word]
+    return codes, lengths
+
+
+def levenshtein_matrix(words_a: list[str], words_b: list[str]) -> np.ndarray:
+    """Расстояния Левенштейна между всеми словами A и B.
+
+    Динамическое программирование идёт по символам, а не по парам слов: строка ДП хранится
+    сразу для блока слов A и всех слов B, поэтому число операций NumPy — O(max|a| · max|b|)
+    на блок вместо O(|a| · |b|) на каждую пару.
+    """
+    result = np.zeros((len(words_a), len(words_b)), dtype=np.int32)
+    if not words_a or not words_b:
+        return result
+
+    codes_a, lengths_a = _encode(words_a)
+    codes_b, lengths_b = _encode(words_b)
+    width_b = codes_b.shape[1]
+    chunk = max(MAX_DP_CELLS // (len(words_b) * (width_b + 1)), 1)
+
+    columns_b = codes_b.T[:, None, :]
+    for start in range(0, len(words_a), chunk):
+        stop = start + chunk
+        block = codes_a[start:stop]
+        block_lengths = lengths_a[start:stop]
+        rows = len(block)
+        # prev[j, r, k] — расстояние между префиксом длины i слова r из A и префиксом длины j слова k из B;
+        # первая ось — позиция в B, чтобы срезы prev[j] были непрерывными
+        prev = np.broadcast_to(np.arange(width_b + 1, dtype=np.int32)[:, None, None], (width_b + 1, rows, len(words_b)))
+        prev = prev.copy()
+        out = result[start:stop]
+        out[block_lengths == 0] = lengths_b
+
+        for i in range(1, block.shape[1] + 1):
+            differs = block[None, :, i - 1, None] != columns_b
+            best = np.minimum(prev[:-1] + differs, prev[1:] + 1)
+            curr = np.empty_like(prev)
+            curr[0] = i
+            for j in range(1, width_b + 1):
+                np.minimum(best[j - 1], curr[j - 1] + 1, out=curr[j])
+            prev = curr
+
+            finished = block_lengths == i
+            if finished.any():
+                out[finished] = np.take_along_axis(prev[:, finished], lengths_b[None, None, :], axis=0)[0]
+
+    return result
+
+
+def length_shards(words: list[str], count: int) -> list[np.ndarray]:
+    """Номера слов, отсортированные по длине и разбитые на ``count`` частей."""
+    order = np.argsort([len(word) for word in words], kind="stable")
+    return [shard for shard in np.array_split(order, count) if len(shard)]
+
+
+_shard_words: tuple[list[str], list[str]] = ([], [])
+
+
+def _init_shard_worker(words_a: list[str], words_b: list[str]) -> None:
+    global _shard_words
+    _shard_words = (words_a, words_b)
+
+
+def _levenshtein_shard(task: tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    rows, cols = task
+    words_a, words_b = _shard_words
+    return levenshtein_matrix([words_a[i] for i in rows], [words_b[j] for j in cols])
+
+
+def sharded_levenshtein_matrix(
+    words_a: list[str],
+    words_b: list[str],
+    workers: int = 1,
+    check: Callable[[], None] | None = None,
+) -> np.ndarray:
+    """``levenshtein_matrix`` по частям «слова A × слова B» близкой длины.
+
+    ДП в ``levenshtein_matrix`` идёт до длины самого длинного слова блока, поэтому одно длинное
+    название заставляет считать все короткие на всю его длину; в частях из слов близкой длины
+    этой лишней работы почти нет. При ``workers > 1`` части считаются в пуле процессов: слова
+    передаются каждому процессу один раз при запуске, задачи — только номера слов, а строк A
+    в несколько раз больше, чем процессов, чтобы выровнять их загрузку.
+
+    ``check`` вызывается перед каждой частью; исключение из него прерывает расчёт (и отменяет части в пуле).
+    """
+    result = np.zeros((len(words_a), len(words_b)), dtype=np.int32)
+    if not words_a or not words_b:
+        return result
+
+    shards_a = length_shards(words_a, max(min(-(-len(words_a) // SHARD_WORDS), MAX_SHARDS), workers * 4))
+    shards_b = length_shards(words_b, min(-(-len(words_b) // SHARD_WORDS), MAX_SHARDS))
+    tasks = [(rows, cols) for rows in shards_a for cols in shards_b]
+    if workers <= 1:
+        for rows, cols in tasks:
+            if check is not None:
+                check()
+            result[np.ix_(rows, cols)] = levenshtein_matrix([words_a[i] for i in rows], [words_b[j] for j in cols])
+        return result
+
+    # spawn: дочерние процессы не наследуют потоки и соединения с БД родителя
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_shard_worker,
+        initargs=(words_a, words_b),
+    ) as pool:
+        try:
+            for (rows, cols), block in zip(tasks, pool.map(_levenshtein_shard, tasks)):
+                if check is not None:
+                    check()
+                result[np.ix_(rows, cols)] = block
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return result
+
+
+def char_similarity_matrix(
+    words_a: list[str],
+    words_b: list[str],
+    workers: int = 1,
+    check: Callable[[], None] | None = None,
+) -> np.ndarray:
+    """``1 − lev(a, b) / max(|a|, |b|)``; пустое слово — 0, совпадающие слова — 1.
+
+    Расстояния считаются по частям близкой длины (``sharded_levenshtein_matrix``), при ``workers > 1`` —
+    в пуле процессов. Пары, уже посчитанные в этом процессе (или в постоянном хранилище), берутся
+    из общего кэша ``similarity_cache()``, если он включён. ``check`` — как в ``sharded_levenshtein_matrix``.
+    """
+    cache = similarity_cache()
+    if cache is None:
+        return _char_similarity(words_a, words_b, workers, check)
+    return cache.matrix(
+        CHAR_SIMILARITY_KIND,
+        words_a,
+        words_b,
+        lambda block_a, block_b: _char_similarity(block_a, block_b, workers, check),
+    )
+
+
+def _char_similarity(
+    words_a: list[str],
+    words_b: list[str],
+    workers: int,
+    check: Callable[[], None] | None = None,
+) -> np.ndarray:
+    distances = sharded_levenshtein_matrix(words_a, words_b, workers, check)
+    lengths_a = np.array([len(word) for word in words_a], dtype=np.float64)
+    lengths_b = np.array([len(word) for word in words_b], dtype=np.float64)
+    longest = np.maximum(lengths_a[:, None], lengths_b[None, :])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 1.0 - distances / longest
+    result[(lengths_a[:, None] == 0) | (lengths_b[None, :] == 0)] = 0.0
+    return result
+
+
+# ─── Аббревиатуры ───
+
+
+def abbreviation_score(abbreviation: str, words: list[str]) -> float:
+    """Доля букв аббревиатуры, найденных по порядку среди первых букв слов (НФ → неформализованных)."""
+    letters = abbreviation.lower().replace("-", "")
+    if len(letters) < 2:
+        return 0.0
+    initials = "".join(word[0] for word in words if word)
+    position = 0
+    matched = 0
+    for ch in letters:
+        while position < len(initials):
+            position += 1
+            if initials[position - 1] == ch:
+                matched += 1
+                break
+    return matched / len(letters)
+
+
+# ─── Токенная схожесть названий ───
+
+
+class TokenSimilarityKernel(object):
+    """Пакетная токенная схожесть всех пар названий A × B.
+
+    Названия токенизируются один раз, строится общий словарь токенов, и матрица схожести
+    «токен × токен» считается один раз векторизованным Левенштейном. Оценка пары названий —
+    симметричное среднее лучших совпадений токенов — получается из неё редукциями
+    ``maximum.reduceat`` (лучший токен в названии) и ``add.reduceat`` (среднее по токенам).
+    Раскрытие аббревиатур по первым буквам слов другого названия добавляется матрицей
+    «аббревиатура × название». Результат совпадает с ``_token_sim`` из ``tests/similarity_flooding_copy_final.py``.
+    """
+
+    def __init__(
+        self,
+        labels_a: list[str],
+        labels_b: list[str],
+        tokens_a: list[list[str]] | None = None,
+        tokens_b: list[list[str]] | None = None,
+    ):
+        self.labels_a = labels_a
+        self.labels_b = labels_b
+        # Готовые токены (например, из FeatureTable) избавляют от повторной токенизации
+        self.tokens_a = tokens_a if tokens_a is not None else [tokenize(label) for label in labels_a]
+        self.tokens_b = tokens_b if tokens_b is not None else [tokenize(label) for label in labels_b]
+
+        vocabulary: dict[str, int] = {}
+        for tokens in (*self.tokens_a, *self.tokens_b):
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+        self.vocabulary = list(vocabulary)
+        self.token_ids_a = [self._ids(tokens, vocabulary) for tokens in self.tokens_a]
+        self.token_ids_b = [self._ids(tokens, vocabulary) for tokens in self.tokens_b]
+        self.abbreviations = np.array([is_abbreviation(token) for token in self.vocabulary], dtype=bool)
+        self._char: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    @staticmethod
+    def _ids(tokens: list[str], vocabulary: dict[str, int]) -> np.ndarray:
+        return np.array([vocabulary[token] for token in tokens], dtype=np.int64)
+
+    def token_matrix(self, ids_a: np.ndarray, ids_b: np.ndarray, char: np.ndarray | None = None) -> np.ndarray:
+        """Направленная схожесть токенов A → B, как в ``_best_token_match``.
+
+        Обычное слово сравнивается с аббревиатурой только по первой букве (``1 / len`` при совпадении),
+        во всех остальных случаях — посимвольно. Готовую посимвольную схожесть можно передать в ``char``.
+        """
+        words_a = [self.vocabulary[i] for i in ids_a]
+        words_b = [self.vocabulary[i] for i in ids_b]
+        result = char_similarity_matrix(words_a, words_b) if char is None else char.copy()
+
+        plain_a = ~self.abbreviations[ids_a]
+        abbreviations_b = np.flatnonzero(self.abbreviations[ids_b])
+        plain_words = [word for word, plain in zip(words_a, plain_a) if plain]
+        for column in abbreviations_b:
+            result[plain_a, column] = [abbreviation_score(words_b[column], [word]) for word in plain_words]
+        return result
+
+    def _expansion(self, flat_ids: np.ndarray, tokens_to: list[list[str]]) -> np.ndarray:
+        """Матрица «позиция токена × название другой стороны» для раскрытия аббревиатур."""
+        result = np.zeros((len(flat_ids), len(tokens_to)), dtype=np.float64)
+        abbreviation_positions = np.flatnonzero(self.abbreviations[flat_ids])
+        if not len(abbreviation_positions):
+            return result
+        initials: dict[str, list[int]] = {}
+        for label, tokens in enumerate(tokens_to):
+            initials.setdefault("".join(token[0] for token in tokens), []).append(label)
+        rows: dict[int, np.ndarray] = {}
+        for position in abbreviation_positions:
+            token_id = int(flat_ids[position])
+            if token_id not in rows:
+                row = np.zeros(len(tokens_to), dtype=np.float64)
+                for letters, labels in initials.items():
+                    row[labels] = abbreviation_score(self.vocabulary[token_id], list(letters))
+                rows[token_id] = row
+            result[position] = rows[token_id]
+        return result
+
+    def _directional(
+        self,
+        ids_from: list[np.ndarray],
+        ids_to: list[np.ndarray],
+        tokens_to: list[list[str]],
+        char: np.ndarray,
+        positions_from: np.ndarray,
+        positions_to: np.ndarray,
+    ) -> np.ndarray:
+        """Среднее по токенам названия «откуда» лучших совпадений в названии «куда».
+
+        ``char`` — посимвольная схожесть токенов («откуда» × «куда»), ``positions_*`` — номера токенов словаря в ней.
+        """
+        result = np.zeros((len(ids_from), len(ids_to)), dtype=np.float64)
+        rows = [i for i, ids in enumerate(ids_from) if len(ids)]
+        cols = [j for j, ids in enumerate(ids_to) if len(ids)]
+        if not rows or not cols:
+            return result
+
+        flat_from = np.concatenate([ids_from[i] for i in rows])
+        flat_to = np.concatenate([ids_to[j] for j in cols])
+        counts_from = np.array([len(ids_from[i]) for i in rows])
+        offsets_from = np.r_[0, np.cumsum(counts_from)[:-1]]
+        offsets_to = np.r_[0, np.cumsum([len(ids_to[j]) for j in cols])[:-1]]
+
+        unique_from, inverse_from = np.unique(flat_from, return_inverse=True)
+        unique_to, inverse_to = np.unique(flat_to, return_inverse=True)
+        char = char[np.ix_(positions_from[unique_from], positions_to[unique_to])]
+        tokens = self.token_matrix(unique_from, unique_to, char)
+
+        # Лучшее совпадение каждой позиции токена с каждым названием «куда»
+        best = np.maximum.reduceat(tokens[:, inverse_to], offsets_to, axis=1)[inverse_from]
+        expansion = self._expansion(flat_from, [tokens_to[j] for j in cols])
+        best = np.maximum(best, expansion)
+
+        result[np.ix_(rows, cols)] = np.add.reduceat(best, offsets_from, axis=0) / counts_from[:, None]
+        return result
+
+    def char_matrix(self, check: Callable[[], None] | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Посимвольная схожесть «токены A × токены B» и позиции токенов словаря в ней (−1 — нет).
+
+        Расстояние Левенштейна симметрично, поэтому один блок обслуживает оба направления.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        ids_a = np.unique(np.concatenate([empty, *self.token_ids_a]))
+        ids_b = np.unique(np.concatenate([empty, *self.token_ids_b]))
+        positions_a = np.full(len(self.vocabulary), -1, dtype=np.int64)
+        positions_b = np.full(len(self.vocabulary), -1, dtype=np.int64)
+        positions_a[ids_a] = np.arange(len(ids_a))
+        positions_b[ids_b] = np.arange(len(ids_b))
+        words_a = [self.vocabulary[i] for i in ids_a]
+        words_b = [self.vocabulary[i] for i in ids_b]
+        return char_similarity_matrix(words_a, words_b, check=check), positions_a, positions_b
+
+    def matrix(
+        self,
+        rows: np.ndarray | None = None,
+        cols: np.ndarray | None = None,
+        check: Callable[[], None] | None = None,
+    ) -> np.ndarray:
+        """Матрица ``_token_sim(label_a, label_b)`` для всех пар или для подматрицы ``rows × cols``.
+
+        Посимвольная схожесть токенов считается при первом вызове и переиспользуется, поэтому
+        большую матрицу можно получать по блокам без повторного Левенштейна. ``check`` — как
+        в ``sharded_levenshtein_matrix``.
+        """
+        if self._char is None:
+            self._char = self.char_matrix(check)
+        char, at_a, at_b = self._char
+        rows = np.arange(len(self.labels_a)) if rows is None else np.asarray(rows, dtype=np.int64)
+        cols = np.arange(len(self.labels_b)) if cols is None else np.asarray(cols, dtype=np.int64)
+        ids_a = [self.token_ids_a[i] for i in rows]
+        ids_b = [self.token_ids_b[j] for j in cols]
+        tokens_a = [self.tokens_a[i] for i in rows]
+        tokens_b = [self.tokens_b[j] for j in cols]
+        labels_a = [self.labels_a[i] for i in rows]
+        labels_b = [self.labels_b[j] for j in cols]
+
+        score_ab = self._directional(ids_a, ids_b, tokens_b, char, at_a, at_b)
+        score_ba = self._directional(ids_b, ids_a, tokens_a, char.T, at_b, at_a)
+        result = (score_ab + score_ba.T) / 2.0
+
+        # Название без значимых токенов сравнивается целиком
+        empty_a = [i for i, tokens in enumerate(tokens_a) if not tokens]
+        empty_b = [j for j, tokens in enumerate(tokens_b) if not tokens]
+        if empty_a:
+            result[empty_a, :] = char_similarity_matrix([labels_a[i] for i in empty_a], labels_b, check=check)
+        if empty_b:
+            result[:, empty_b] = char_similarity_matrix(labels_a, [labels_b[j] for j in empty_b], check=check)
+        return result
+
+
+def label_similarity_matrix(vertices_a: list[object], vertices_b: list[object]) -> np.ndarray:
+    """``0.15 · char(name) + 0.85 · token(label)`` для всех пар — пакетный аналог ``_label_sim``."""
+    names = char_similarity_matrix([vertex.name for vertex in vertices_a], [vertex.name for vertex in vertices_b])
+    labels = TokenSimilarityKernel(
+        [vertex_label(vertex) for vertex in vertices_a],
+        [vertex_label(vertex) for vertex in vertices_b],
+    ).matrix()
+    return 0.15 * names + 0.85 * labels
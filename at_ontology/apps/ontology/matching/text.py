@@ -0,0 +1,60 @@
+import re
+
+# Короткие служебные слова, не несущие смысла при сравнении названий тем
+STOP_WORDS = frozenset(
+    {
+        "в",
+        "и",
+        "на",
+        "с",
+        "к",
+        "о",
+        "по",
+        "из",
+        "за",
+        "для",
+        "от",
+        "до",
+        "со",
+        "во",
+        "об",
+        "при",
+        "или",
+        "не",
+        "а",
+        "но",
+    }
+)
+
+# Аббревиатуры предметной области, встречающиеся в нижнем регистре после токенизации
+KNOWN_ABBREVIATIONS = frozenset(
+    {"эс", "мас", "иэс", "дис", "нф", "соз", "бз", "пр", "ии", "аи", "рии", "стс", "имвиа", "рво", "иос", "зом"}
+)
+
+TOKEN_SPLIT_RE = re.compile(r"[\s,.()\[\]/\\]+")
+
+
+def vertex_label(vertex: object) -> str:
+    return getattr(vertex, "label", None) or vertex.name
+
+
+def tokenize(text: str) -> list[str]:
+    """Слова строки в нижнем регистре без знаков препинания, однобуквенных слов и стоп-слов.
+
+    ``'Перечень типовых НФ-задач (ЭС)'`` → ``['перечень', 'типовых', 'нф-задач', 'эс']``
+    """
+    return [token for token in TOKEN_SPLIT_RE.split(text.lower()) if len(token) > 1 and token not in STOP_WORDS]
+
+
+def is_abbreviation(word: str) -> bool:
+    if word.isupper() and 2 <= len(word) <= 5:
+        return True
+    return word.lower() in KNOWN_ABBREVIATIONS
+
+
+def char_ngrams(text: str, n: int = 3) -> set[str]:
+    """n-граммы слова, дополненного пробелами с обеих сторон (короткие слова дают хотя бы одну n-грамму)."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[start:stop] for start, stop in enumerate(range(n, len(padded) + 1))}
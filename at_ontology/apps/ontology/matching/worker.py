@@ -0,0 +1,14 @@
+import django
+from django.db import connections
+
+
+def init_job_worker(databases: dict[str, str]) -> None:
+    """Инициализатор процесса пула задач сопоставления.
+
+    spawn: процесс начинает с чистого интерпретатора, и инициализатор загружается до ``django.setup()``,
+    поэтому этот модуль не импортирует моделей. Процесс работает с той же БД, что и менеджер
+    (например, с тестовой): ``databases`` — имена БД менеджера по псевдонимам соединений.
+    """
+    django.setup()
+    for alias, name in databases.items():
+        connections[alias].settings_dict["NAME"] = name
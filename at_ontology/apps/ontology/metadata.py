@@ -0,0 +1,118 @@
+import hashlib
+import re
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection
+
+from at_ontology.apps.ontology import models
+
+VERTEX_TABLE = "ontology_vertex"
+INDEX_PREFIX = "ontology_vertex_meta_"
+
+DEFAULT_INDEXED_METADATA_KEYS = ["legacy_db_id", "parent_id"]
+
+# Ключ подставляется в текст SQL (выражение запроса должно буквально совпадать с выражением индекса),
+# поэтому допускаются только идентификаторы
+KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,40}$")
+
+
+class MetadataIndexException(Exception):
+    pass
+
+
+def get_indexed_metadata_keys() -> list[str]:
+    return list(getattr(settings, "ONTOLOGY_INDEXED_METADATA_KEYS", DEFAULT_INDEXED_METADATA_KEYS))
+
+
+def validate_key(key: str) -> str:
+    if not KEY_RE.match(key):
+        raise MetadataIndexException(f"metadata key {key!r} is not a valid identifier")
+    return key
+
+
+def metadata_expression(key: str, vendor: str, column: str = "metadata") -> str:
+    """Текстовое представление скалярного значения ключа: ``123`` и ``"123"`` совпадают."""
+    validate_key(key)
+    if vendor == "postgresql":
+        return f"({column} ->> '{key}')"
+    return f"CAST(json_extract({column}, '$.{key}') AS TEXT)"
+
+
+def index_name(key: str) -> str:
+    """Имя индекса ключа; хеш точного ключа различает ключи, отличающиеся только регистром."""
+    digest = hashlib.sha1(validate_key(key).encode()).hexdigest()[:8]
+    # Имя укладывается в 63 символа — предел длины идентификатора Postgres
+    return f"{INDEX_PREFIX}{key.lower()[:28]}_{digest}_idx"
+
+
+class MetadataIndexService(object):
+    @staticmethod
+    def sync_indexes(keys: Iterable[str] | None = None, schema_editor=None) -> tuple[list[str], list[str]]:
+        """Создаёт индексы для ключей из настроек и удаляет индексы ключей, исключённых из них."""
+        keys = [validate_key(key) for key in (get_indexed_metadata_keys() if keys is None else keys)]
+        conn = schema_editor.connection if schema_editor is not None else connection
+        expected = {index_name(key): key for key in keys}
+
+        with conn.cursor() as cursor:
+            existing = {
+                name
+                for name in conn.introspection.get_constraints(cursor, VERTEX_TABLE)
+                if name.startswith(INDEX_PREFIX)
+            }
+
+            created = []
+            for name, key in expected.items():
+                if name in existing:
+                    continue
+                expression = metadata_expression(key, conn.vendor)
+                cursor.execute(f"CREATE INDEX {name} ON {VERTEX_TABLE} ({expression})")
+                created.append(name)
+
+            dropped = sorted(existing - set(expected))
+            for name in dropped:
+                cursor.execute(f"DROP INDEX {name}")
+
+        return created, dropped
+
+    @staticmethod
+    def find_by_metadata(
+        ontology: models.Ontology | None,
+        key: str,
+        values: Iterable,
+    ) -> dict[str, list[models.Vertex]]:
+        """Возвращает вершины, у которых ``metadata[key]`` равно одному из значений.
+
+        Значения сравниваются в текстовом виде; результат сгруппирован по ``str(value)``.
+        """
+        values = list(dict.fromkeys(str(value) for value in values if value is not None))
+        expression = metadata_expression(key, connection.vendor, column="v.metadata")
+
+        where = ""
+        prefix_params = []
+        if ontology is not None:
+            where = "v.ontology_id = %s AND "
+            prefix_params = [models.Ontology._meta.pk.get_db_prep_value(ontology.id, connection)]
+
+        batch_size = max((connection.features.max_query_params or len(values) + 1) - len(prefix_params), 1)
+        result: dict[str, list[models.Vertex]] = {}
+        for start in range(0, len(values), batch_size):
+            stop = start + batch_size
+            batch = values[start:stop]
+            placeholders = ", ".join(["%s"] * len(batch))
+            query = models.Vertex.objects.raw(
+                f"SELECT v.*, {expression} AS metadata_value FROM {VERTEX_TABLE} v "
+                f"WHERE {where}{expression} IN ({placeholders})",
+                prefix_params + batch,
+            )
+            for vertex in query:
+                result.setdefault(vertex.metadata_value, []).append(vertex)
+
+        return result
+
+    @staticmethod
+    def find_one_by_metadata(ontology: models.Ontology | None, key: str, values: Iterable) -> dict[str, models.Vertex]:
+        return {
+            value: vertices[0]
+            for value, vertices in MetadataIndexService.find_by_metadata(ontology, key, values).items()
+        }
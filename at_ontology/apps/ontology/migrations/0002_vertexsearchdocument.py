@@ -0,0 +1,143 @@
+import django.db.models.deletion
+from django.db import migrations
+from django.db import models
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Свойства и пути в их значениях на момент миграции; документы по другим ONTOLOGY_SEARCH_PROPERTIES
+# пересоздаёт команда rebuild_search_index
+SEARCH_PROPERTIES = {
+    "questions": ["question"],
+    "code": [""],
+    "description": [""],
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS ontology_vertexsearch_tsv_idx ON ontology_vertexsearchdocument "
+            "USING gin ((to_tsvector('russian', content) || to_tsvector('english', content)))"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS ontology_vertexsearch_fts USING fts5("
+            "content, content='ontology_vertexsearchdocument', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS ontology_vertexsearch_fts_ai AFTER INSERT ON ontology_vertexsearchdocument "
+            "BEGIN INSERT INTO ontology_vertexsearch_fts(rowid, content) VALUES (new.id, new.content); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS ontology_vertexsearch_fts_ad AFTER DELETE ON ontology_vertexsearchdocument "
+            "BEGIN INSERT INTO ontology_vertexsearch_fts(ontology_vertexsearch_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS ontology_vertexsearch_fts_au AFTER UPDATE ON ontology_vertexsearchdocument "
+            "BEGIN INSERT INTO ontology_vertexsearch_fts(ontology_vertexsearch_fts, rowid, content) "
+            "VALUES ('delete', old.id, old.content); "
+            "INSERT INTO ontology_vertexsearch_fts(rowid, content) VALUES (new.id, new.content); END"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS ontology_vertexsearch_tsv_idx")
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS ontology_vertexsearch_fts_{suffix}")
+        schema_editor.execute("DROP TABLE IF EXISTS ontology_vertexsearch_fts")
+
+
+def extract_text(value, path):
+    if isinstance(value, list):
+        return [text for item in value for text in extract_text(item, path)]
+    if not path:
+        return [value] if isinstance(value, str) else []
+    key, _, rest = path.partition(".")
+    if isinstance(value, dict) and key in value:
+        return extract_text(value[key], rest)
+    return []
+
+
+def build_search_content(vertex, properties):
+    parts = [vertex.label, vertex.description]
+    for prop in properties:
+        for path in SEARCH_PROPERTIES.get(prop.definition.name, []):
+            parts.extend(extract_text(prop.value, path))
+    return "\n".join(part for part in parts if part)
+
+
+def backfill_search_documents(apps, schema_editor):
+    # Документы вершин, созданных до появления индекса; модели — исторические, а не из models.py
+    Vertex = apps.get_model("ontology", "Vertex")
+    VertexPropertyAssignment = apps.get_model("ontology", "VertexPropertyAssignment")
+    VertexSearchDocument = apps.get_model("ontology", "VertexSearchDocument")
+    db_alias = schema_editor.connection.alias
+
+    vertex_ids = list(Vertex.objects.using(db_alias).order_by("id").values_list("id", flat=True))
+    for start in range(0, len(vertex_ids), BACKFILL_BATCH_SIZE):
+        stop = start + BACKFILL_BATCH_SIZE
+        batch = vertex_ids[start:stop]
+        properties = {}
+        assignments = VertexPropertyAssignment.objects.using(db_alias).filter(
+            vertex_id__in=batch,
+            definition__name__in=list(SEARCH_PROPERTIES),
+        )
+        for prop in assignments.select_related("definition"):
+            properties.setdefault(prop.vertex_id, []).append(prop)
+        vertices = Vertex.objects.using(db_alias).filter(id__in=batch).only("id", "ontology_id", "label", "description")
+        VertexSearchDocument.objects.using(db_alias).bulk_create(
+            [
+                VertexSearchDocument(
+                    vertex_id=vertex.id,
+                    ontology_id=vertex.ontology_id,
+                    content=build_search_content(vertex, properties.get(vertex.id, [])),
+                )
+                for vertex in vertices
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ontology", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VertexSearchDocument",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("content", models.TextField(blank=True, default="", verbose_name="search_content")),
+                (
+                    "ontology",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_documents",
+                        to="ontology.ontology",
+                        verbose_name="ontology",
+                    ),
+                ),
+                (
+                    "vertex",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_document",
+                        to="ontology.vertex",
+                        verbose_name="vertex",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "vertex_search_document",
+                "verbose_name_plural": "vertex_search_documents",
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
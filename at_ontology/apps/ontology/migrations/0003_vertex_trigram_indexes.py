@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS ontology_vertex_label_trgm_idx ON ontology_vertex USING gin (label gin_trgm_ops)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS ontology_vertex_name_trgm_idx ON ontology_vertex USING gin (name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS ontology_vertex_label_trgm_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS ontology_vertex_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ontology", "0002_vertexsearchdocument"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# Ключи и имена на момент миграции; дальнейшие изменения ONTOLOGY_INDEXED_METADATA_KEYS
+# применяет команда sync_metadata_indexes
+METADATA_INDEXES = {
+    "legacy_db_id": "ontology_vertex_meta_legacy_db_id_6074e410_idx",
+    "parent_id": "ontology_vertex_meta_parent_id_bf93c41e_idx",
+}
+
+
+def create_metadata_indexes(apps, schema_editor):
+    for key, name in METADATA_INDEXES.items():
+        if schema_editor.connection.vendor == "postgresql":
+            expression = f"(metadata ->> '{key}')"
+        else:
+            expression = f"CAST(json_extract(metadata, '$.{key}') AS TEXT)"
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ontology_vertex ({expression})")
+
+
+def drop_metadata_indexes(apps, schema_editor):
+    for name in METADATA_INDEXES.values():
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ontology", "0003_vertex_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_metadata_indexes, drop_metadata_indexes),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 6.1.2 on 2026-10-19 18:40
+import django.db.models.deletion
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ontology", "0004_vertex_metadata_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ontology",
+            name="revision",
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name="revision"),
+        ),
+        migrations.CreateModel(
+            name="Alignment",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("revision_a", models.PositiveBigIntegerField(verbose_name="revision_a")),
+                ("revision_b", models.PositiveBigIntegerField(verbose_name="revision_b")),
+                ("config_hash", models.CharField(max_length=64, verbose_name="config_hash")),
+                ("config", models.JSONField(blank=True, default=dict, verbose_name="config")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="updated_at")),
+                (
+                    "ontology_a",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alignments_as_a",
+                        to="ontology.ontology",
+                        verbose_name="ontology_a",
+                    ),
+                ),
+                (
+                    "ontology_b",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alignments_as_b",
+                        to="ontology.ontology",
+                        verbose_name="ontology_b",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "alignment",
+                "verbose_name_plural": "alignments",
+            },
+        ),
+        migrations.CreateModel(
+            name="AlignmentPair",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("score", models.FloatField(verbose_name="score")),
+                ("initial_score", models.FloatField(default=0.0, verbose_name="initial_score")),
+                (
+                    "alignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pairs",
+                        to="ontology.alignment",
+                        verbose_name="alignment",
+                    ),
+                ),
+                (
+                    "vertex_a",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alignment_pairs_as_a",
+                        to="ontology.vertex",
+                        verbose_name="vertex_a",
+                    ),
+                ),
+                (
+                    "vertex_b",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alignment_pairs_as_b",
+                        to="ontology.vertex",
+                        verbose_name="vertex_b",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "alignment_pair",
+                "verbose_name_plural": "alignment_pairs",
+                "ordering": ["-score"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="alignment",
+            constraint=models.UniqueConstraint(
+                fields=("ontology_a", "ontology_b", "config_hash"), name="unique_alignment"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="alignmentpair",
+            index=models.Index(fields=["vertex_a", "-score"], name="alignment_pair_vertex_a_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="alignmentpair",
+            index=models.Index(fields=["vertex_b", "-score"], name="alignment_pair_vertex_b_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="alignmentpair",
+            constraint=models.UniqueConstraint(
+                fields=("alignment", "vertex_a", "vertex_b"), name="unique_alignment_pair"
+            ),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from typing import TYPE_CHECKING
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from at_ontology.apps.ontology_model.closure import TypeClosureService
 from at_ontology.apps.ontology_model.models import ArtifactAssignment
 from at_ontology.apps.ontology_model.models import Instance
 from at_ontology.apps.ontology_model.models import OntologyEntity
@@ -88,6 +90,20 @@ class VertexPropertyAssignment(PropertyAssignment):
         verbose_name = _("vertex_property_assignment")
         verbose_name_plural = _("vertex_property_assignments")
 
+    def clean(self):
+        # Незаполненные поля — ошибки полей, их сообщает full_clean
+        if self.vertex_id is None or self.definition_id is None:
+            return
+        closure = TypeClosureService.get(self.vertex.type.ontology_model_id)
+        inherited = closure.vertex_properties.get(self.vertex.type_id, {})
+        if inherited.get(self.definition.name) != self.definition:
+            raise ValidationError(
+                _("property_not_defined_for_type{name}{type}").format(
+                    name=self.definition.name,
+                    type=self.vertex.type.name,
+                )
+            )
+
 
 class Relationship(Instance):
     ontology: "Ontology" = models.ForeignKey(
@@ -133,6 +149,28 @@ class Relationship(Instance):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if None in (self.ontology_id, self.type_id, self.source_id, self.target_id):
+            return
+        if self.source.ontology_id != self.ontology_id or self.target.ontology_id != self.ontology_id:
+            raise ValidationError(_("relationship_ontology_mismatch{name}").format(name=self.name))
+
+        closure = TypeClosureService.get(self.type.ontology_model_id)
+        if not closure.relationship_endpoint_allowed(self.type_id, self.source.type_id, target=False):
+            raise ValidationError(
+                _("invalid_source_type{name}{type}").format(
+                    name=self.name,
+                    type=self.source.type.name,
+                )
+            )
+        if not closure.relationship_endpoint_allowed(self.type_id, self.target.type_id, target=True):
+            raise ValidationError(
+                _("invalid_target_type{name}{type}").format(
+                    name=self.name,
+                    type=self.target.type.name,
+                )
+            )
+
 
 class RelationshipArtifactAssignment(ArtifactAssignment):
     definition: "RelationshipTypeArtifactDefinition" = models.ForeignKey(
@@ -175,6 +213,19 @@ class RelationshipPropertyAssignment(PropertyAssignment):
         verbose_name = _("relationship_property_assignment")
         verbose_name_plural = _("relationship_property_assignments")
 
+    def clean(self):
+        if self.relationship_id is None or self.definition_id is None:
+            return
+        closure = TypeClosureService.get(self.relationship.type.ontology_model_id)
+        inherited = closure.relationship_properties.get(self.relationship.type_id, {})
+        if inherited.get(self.definition.name) != self.definition:
+            raise ValidationError(
+                _("property_not_defined_for_type{name}{type}").format(
+                    name=self.definition.name,
+                    type=self.relationship.type.name,
+                )
+            )
+
 
 class Ontology(OntologyEntity):
     imports = models.ManyToManyField(
@@ -184,6 +235,9 @@ class Ontology(OntologyEntity):
         verbose_name=_("imports"),
     )
 
+    # Растёт при каждом изменении вершин, связей и свойств вершин (см. AlignmentService.touch)
+    revision = models.PositiveBigIntegerField(default=0, editable=False, verbose_name=_("revision"))
+
     class Meta:
         verbose_name = _("ontology")
         verbose_name_plural = _("ontologies")
@@ -194,3 +248,100 @@ class Ontology(OntologyEntity):
                 name="unique_ontology",
             )
         ]
+
+
+class VertexSearchDocument(models.Model):
+    vertex: "Vertex" = models.OneToOneField(
+        "Vertex",
+        on_delete=models.CASCADE,
+        related_name="search_document",
+        verbose_name=_("vertex"),
+    )
+
+    ontology: "Ontology" = models.ForeignKey(
+        "Ontology",
+        on_delete=models.CASCADE,
+        related_name="search_documents",
+        verbose_name=_("ontology"),
+    )
+
+    content = models.TextField(blank=True, default="", verbose_name=_("search_content"))
+
+    class Meta:
+        verbose_name = _("vertex_search_document")
+        verbose_name_plural = _("vertex_search_documents")
+
+
+class Alignment(models.Model):
+    ontology_a: "Ontology" = models.ForeignKey(
+        "Ontology",
+        on_delete=models.CASCADE,
+        related_name="alignments_as_a",
+        verbose_name=_("ontology_a"),
+    )
+
+    ontology_b: "Ontology" = models.ForeignKey(
+        "Ontology",
+        on_delete=models.CASCADE,
+        related_name="alignments_as_b",
+        verbose_name=_("ontology_b"),
+    )
+
+    revision_a = models.PositiveBigIntegerField(verbose_name=_("revision_a"))
+    revision_b = models.PositiveBigIntegerField(verbose_name=_("revision_b"))
+    config_hash = models.CharField(max_length=64, verbose_name=_("config_hash"))
+    config = models.JSONField(default=dict, blank=True, verbose_name=_("config"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated_at"))
+
+    class Meta:
+        verbose_name = _("alignment")
+        verbose_name_plural = _("alignments")
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ontology_a", "ontology_b", "config_hash"],
+                name="unique_alignment",
+            )
+        ]
+
+
+class AlignmentPair(models.Model):
+    alignment: "Alignment" = models.ForeignKey(
+        "Alignment",
+        on_delete=models.CASCADE,
+        related_name="pairs",
+        verbose_name=_("alignment"),
+    )
+
+    vertex_a: "Vertex" = models.ForeignKey(
+        "Vertex",
+        on_delete=models.CASCADE,
+        related_name="alignment_pairs_as_a",
+        verbose_name=_("vertex_a"),
+    )
+
+    vertex_b: "Vertex" = models.ForeignKey(
+        "Vertex",
+        on_delete=models.CASCADE,
+        related_name="alignment_pairs_as_b",
+        verbose_name=_("vertex_b"),
+    )
+
+    score = models.FloatField(verbose_name=_("score"))
+    initial_score = models.FloatField(default=0.0, verbose_name=_("initial_score"))
+
+    class Meta:
+        verbose_name = _("alignment_pair")
+        verbose_name_plural = _("alignment_pairs")
+        ordering = ["-score"]
+
+        indexes = [
+            models.Index(fields=["vertex_a", "-score"], name="alignment_pair_vertex_a_idx"),
+            models.Index(fields=["vertex_b", "-score"], name="alignment_pair_vertex_b_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["alignment", "vertex_a", "vertex_b"],
+                name="unique_alignment_pair",
+            )
+        ]
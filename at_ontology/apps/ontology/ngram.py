@@ -0,0 +1,77 @@
+import heapq
+import re
+from collections import defaultdict
+from typing import Hashable
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def trigrams(text: str | None) -> frozenset[str]:
+    """Множество триграмм строки в той же нормализации, что и у pg_trgm.
+
+    Строка приводится к нижнему регистру и разбивается на слова; каждое слово дополняется двумя
+    пробелами слева и одним справа, так что ``similarity`` совпадает с одноимённой функцией Postgres.
+    """
+    result = set()
+    for word in WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        result.update(a + b + c for a, b, c in zip(padded, padded[1:], padded[2:]))
+    return frozenset(result)
+
+
+def similarity(a: str | None, b: str | None) -> float:
+    left, right = trigrams(a), trigrams(b)
+    if not left or not right:
+        return 0.0
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class NGramIndex(object):
+    """Инвертированный индекс триграмм: триграмма -> номера записей.
+
+    Запрос затрагивает только записи, имеющие хотя бы одну общую триграмму с образцом,
+    поэтому стоимость поиска зависит от длины списков совпадений, а не от размера индекса.
+    У одного ключа может быть несколько записей (например, ``label`` и ``name`` вершины);
+    сходство ключа равно максимуму по его записям.
+    """
+
+    def __init__(self):
+        self._keys: list[Hashable] = []
+        self._sizes: list[int] = []
+        self._postings: dict[str, list[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, text: str | None) -> None:
+        grams = trigrams(text)
+        if not grams:
+            return
+        entry = len(self._keys)
+        self._keys.append(key)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings[gram].append(entry)
+
+    def query(self, text: str | None, k: int = 10, threshold: float = 0.3) -> list[tuple[Hashable, float]]:
+        grams = trigrams(text)
+        if not grams or k <= 0:
+            return []
+
+        shared: dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for entry in self._postings.get(gram, ()):
+                shared[entry] += 1
+
+        best: dict[Hashable, float] = {}
+        size = len(grams)
+        for entry, count in shared.items():
+            score = count / (size + self._sizes[entry] - count)
+            if score < threshold:
+                continue
+            key = self._keys[entry]
+            if score > best.get(key, -1.0):
+                best[key] = score
+
+        return heapq.nlargest(k, best.items(), key=lambda item: item[1])
@@ -0,0 +1,249 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection
+from django.db.transaction import atomic
+
+from at_ontology.apps.ontology import models
+from at_ontology.apps.ontology.filters import PropertyFilter
+from at_ontology.apps.ontology.filters import vertex_filters_q
+
+SEARCH_TABLE = "ontology_vertexsearchdocument"
+SQLITE_FTS_TABLE = "ontology_vertexsearch_fts"
+
+# Выражение должно совпадать с выражением GIN-индекса из миграции 0002, иначе планировщик его не использует
+POSTGRES_VECTOR = "(to_tsvector('russian', content) || to_tsvector('english', content))"
+POSTGRES_QUERY = "(websearch_to_tsquery('russian', %s) || websearch_to_tsquery('english', %s))"
+
+DEFAULT_SEARCH_PROPERTIES = {
+    "questions": ["question"],
+    "code": [""],
+    "description": [""],
+}
+
+# Вершин в одной порции полной переиндексации
+REINDEX_BATCH_SIZE = 1000
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchException(Exception):
+    pass
+
+
+@dataclass
+class SearchHit:
+    vertex: models.Vertex
+    rank: float
+
+
+@dataclass
+class SearchPage:
+    hits: list[SearchHit]
+    total: int
+    page: int
+    page_size: int
+
+    @property
+    def num_pages(self) -> int:
+        return max((self.total + self.page_size - 1) // self.page_size, 1)
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.num_pages
+
+
+def get_search_properties() -> dict[str, list[str]]:
+    return getattr(settings, "ONTOLOGY_SEARCH_PROPERTIES", DEFAULT_SEARCH_PROPERTIES)
+
+
+def extract_text(value: object, path: str) -> list[str]:
+    """Достаёт строки из JSON-значения свойства по пути вида ``a.b`` (списки обходятся поэлементно)."""
+    if isinstance(value, list):
+        return [text for item in value for text in extract_text(item, path)]
+
+    if not path:
+        return [value] if isinstance(value, str) else []
+
+    key, _, rest = path.partition(".")
+    if isinstance(value, dict) and key in value:
+        return extract_text(value[key], rest)
+    return []
+
+
+def build_search_content(
+    vertex: models.Vertex,
+    properties: Iterable[models.VertexPropertyAssignment],
+    search_properties: dict[str, list[str]] | None = None,
+) -> str:
+    search_properties = search_properties if search_properties is not None else get_search_properties()
+    parts = [vertex.label, vertex.description]
+
+    for prop in properties:
+        for path in search_properties.get(prop.definition.name, []):
+            parts.extend(extract_text(prop.value, path))
+
+    return "\n".join(part for part in parts if part)
+
+
+class SearchService(object):
+    @staticmethod
+    @atomic
+    def index_vertices(vertex_ids: Iterable) -> list[models.VertexSearchDocument]:
+        vertex_ids = list(vertex_ids)
+        if not vertex_ids:
+            return []
+
+        search_properties = get_search_properties()
+        vertices = models.Vertex.objects.filter(id__in=vertex_ids).only("id", "ontology_id", "label", "description")
+
+        properties: dict = {}
+        assignments = models.VertexPropertyAssignment.objects.filter(
+            vertex_id__in=vertex_ids,
+            definition__name__in=list(search_properties),
+        ).select_related("definition")
+        for prop in assignments:
+            properties.setdefault(prop.vertex_id, []).append(prop)
+
+        # Пересоздание вместо update: триггеры FTS5 обрабатывают delete/insert одинаково для любых путей записи
+        models.VertexSearchDocument.objects.filter(vertex_id__in=vertex_ids).delete()
+        return models.VertexSearchDocument.objects.bulk_create(
+            [
+                models.VertexSearchDocument(
+                    vertex_id=vertex.id,
+                    ontology_id=vertex.ontology_id,
+                    content=build_search_content(vertex, properties.get(vertex.id, []), search_properties),
+                )
+                for vertex in vertices
+            ]
+        )
+
+    @staticmethod
+    def index_ontology(ontology: models.Ontology) -> list[models.VertexSearchDocument]:
+        return SearchService.index_vertices(ontology.vertices.values_list("id", flat=True))
+
+    @staticmethod
+    def rebuild(
+        ontologies: models.Ontology | Iterable[models.Ontology] | None = None,
+        batch_size: int = REINDEX_BATCH_SIZE,
+    ) -> int:
+        """Пересоздаёт документы всех вершин (или вершин ``ontologies``) порциями; возвращает число вершин.
+
+        Нужна после смены ``ONTOLOGY_SEARCH_PROPERTIES``: сигналы переиндексируют только изменённые вершины.
+        """
+        if isinstance(ontologies, models.Ontology):
+            ontologies = [ontologies]
+        vertices = models.Vertex.objects.order_by("id")
+        if ontologies is not None:
+            vertices = vertices.filter(ontology__in=list(ontologies))
+        vertex_ids = list(vertices.values_list("id", flat=True))
+        for start in range(0, len(vertex_ids), batch_size):
+            stop = start + batch_size
+            SearchService.index_vertices(vertex_ids[start:stop])
+        return len(vertex_ids)
+
+    @staticmethod
+    def search(
+        query: str,
+        ontologies: models.Ontology | Iterable[models.Ontology] | None = None,
+        page: int = 1,
+        page_size: int = 20,
+        filters: Iterable[PropertyFilter] = (),
+    ) -> SearchPage:
+        if page < 1 or page_size < 1:
+            raise SearchException("page and page_size must be positive")
+
+        ranked, total = SearchService._ranked_ids(
+            query, ontologies, filters, limit=page_size, offset=(page - 1) * page_size
+        )
+        vertices = models.Vertex.objects.in_bulk([vertex_id for vertex_id, _ in ranked])
+        hits = [SearchHit(vertex=vertices[vertex_id], rank=rank) for vertex_id, rank in ranked if vertex_id in vertices]
+
+        return SearchPage(hits=hits, total=total, page=page, page_size=page_size)
+
+    @staticmethod
+    def search_ids(
+        query: str,
+        ontologies: models.Ontology | Iterable[models.Ontology] | None = None,
+        filters: Iterable[PropertyFilter] = (),
+    ) -> list:
+        ranked, _ = SearchService._ranked_ids(query, ontologies, filters, limit=None, offset=0)
+        return [vertex_id for vertex_id, _ in ranked]
+
+    @staticmethod
+    def _ranked_ids(
+        query: str,
+        ontologies: models.Ontology | Iterable[models.Ontology] | None,
+        filters: Iterable[PropertyFilter],
+        limit: int | None,
+        offset: int,
+    ) -> tuple[list[tuple[object, float]], int]:
+        if not WORD_RE.search(query or ""):
+            return [], 0
+
+        if isinstance(ontologies, models.Ontology):
+            ontologies = [ontologies]
+        ontology_ids = None
+        if ontologies is not None:
+            pk = models.Ontology._meta.pk
+            ontology_ids = [pk.get_db_prep_value(ontology.id, connection) for ontology in ontologies]
+            if not ontology_ids:
+                return [], 0
+
+        if connection.vendor == "postgresql":
+            source, params = SearchService._postgres_source(query)
+        elif connection.vendor == "sqlite":
+            source, params = SearchService._sqlite_source(query)
+        else:
+            raise SearchException(f"full-text search is not supported for {connection.vendor}")
+
+        where = ""
+        if ontology_ids is not None:
+            where = f" AND d.ontology_id IN ({', '.join(['%s'] * len(ontology_ids))})"
+            params = params + ontology_ids
+
+        filters = list(filters)
+        if filters:
+            subquery, subquery_params = (
+                models.Vertex.objects.filter(vertex_filters_q(filters)).values("id").query.sql_with_params()
+            )
+            where += f" AND d.vertex_id IN ({subquery})"
+            params = params + list(subquery_params)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) {source}{where}", params)
+            total = cursor.fetchone()[0]
+
+            sql = f"SELECT d.vertex_id, rank {source}{where} ORDER BY rank DESC, d.id"
+            page_params = list(params)
+            if limit is not None:
+                sql += " LIMIT %s OFFSET %s"
+                page_params += [limit, offset]
+            cursor.execute(sql, page_params)
+            rows = cursor.fetchall()
+
+        to_python = models.Vertex._meta.pk.to_python
+        return [(to_python(vertex_id), float(rank)) for vertex_id, rank in rows], total
+
+    @staticmethod
+    def _postgres_source(query: str) -> tuple[str, list]:
+        source = (
+            f"FROM (SELECT d.id, d.vertex_id, d.ontology_id, ts_rank({POSTGRES_VECTOR}, q.query) AS rank "
+            f"FROM {SEARCH_TABLE} d, (SELECT {POSTGRES_QUERY} AS query) q "
+            f"WHERE {POSTGRES_VECTOR} @@ q.query) d WHERE TRUE"
+        )
+        return source, [query, query]
+
+    @staticmethod
+    def _sqlite_source(query: str) -> tuple[str, list]:
+        # Каждое слово — префиксный термин в кавычках: пользовательский ввод не ломает синтаксис MATCH,
+        # а префикс частично заменяет отсутствующий в FTS5 стемминг для русского языка
+        terms = " ".join('"{0}"*'.format(word.replace('"', '""')) for word in WORD_RE.findall(query.lower()))
+        source = (
+            f"FROM (SELECT d.id, d.vertex_id, d.ontology_id, -bm25({SQLITE_FTS_TABLE}) AS rank "
+            f"FROM {SQLITE_FTS_TABLE} JOIN {SEARCH_TABLE} d ON d.id = {SQLITE_FTS_TABLE}.rowid "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s) d WHERE 1"
+        )
+        return source, [terms]
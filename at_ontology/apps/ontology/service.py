@@ -1,3 +1,4 @@
+import uuid
 from io import BytesIO
 from io import IOBase
 from pathlib import Path
@@ -18,6 +19,13 @@ from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
 from at_ontology.apps.ontology import models
+from at_ontology.apps.ontology.alignment import AlignmentService
+from at_ontology.apps.ontology.filters import PropertyFilter
+from at_ontology.apps.ontology.filters import relationship_filters_q
+from at_ontology.apps.ontology.filters import vertex_filters_q
+from at_ontology.apps.ontology.fuzzy import FuzzyLookupService
+from at_ontology.apps.ontology.matching.features import FeatureTableService
+from at_ontology.apps.ontology.search import SearchService
 from at_ontology.apps.ontology_model.import_loader import DBLoader
 from at_ontology.apps.ontology_model.service import OntologyModelService
 
@@ -117,6 +125,8 @@ class OntologyService(object):
         vertex_query_exclude: Q = None,
         relationship_query: Q = None,
         relationship_query_exclude: Q = None,
+        vertex_filters: Iterable[PropertyFilter] = None,
+        relationship_filters: Iterable[PropertyFilter] = None,
 
     ) -> dict:
         
@@ -125,12 +135,16 @@ class OntologyService(object):
             vertices = vertices.filter(vertex_query)
         if vertex_query_exclude:
             vertices = vertices.exclude(vertex_query_exclude)
+        if vertex_filters:
+            vertices = vertices.filter(vertex_filters_q(vertex_filters))
         
         relationships = ontology.relationships.filter(source__in=vertices, target__in=vertices)
         if relationship_query:
             relationships = relationships.filter(relationship_query)
         if relationship_query_exclude:
             relationships = relationships.exclude(relationship_query_exclude)
+        if relationship_filters:
+            relationships = relationships.filter(relationship_filters_q(relationship_filters))
 
         return {
             "name": ontology.name,
@@ -182,6 +196,10 @@ class OntologyService(object):
 
         OntologyService.vertex_properties_to_db_bulk(properties)
         OntologyService.vertex_artifacts_to_db_bulk(artifacts, content_getter=content_getter)
+        SearchService.index_vertices([vertex.id for vertex in result])
+        FuzzyLookupService.invalidate(ontology.id)
+        FeatureTableService.invalidate(ontology.id)
+        AlignmentService.touch(ontology)
 
         try:
             connection.check_constraints()
@@ -327,6 +345,8 @@ class OntologyService(object):
 
         OntologyService.relationship_properties_to_db_bulk(properties)
         OntologyService.relationship_artifacts_to_db_bulk(artifacts, content_getter=content_getter)
+        FeatureTableService.invalidate(ontology.id)
+        AlignmentService.touch(ontology)
 
         try:
             connection.check_constraints()
@@ -442,6 +462,182 @@ class OntologyService(object):
 
         return result
 
+    @staticmethod
+    @atomic
+    def union_to_db(
+        union: object,
+        name: str,
+        label: str | None = None,
+        description: str | None = None,
+        content_getter_a: Callable[[str], bytes | None] | None = None,
+        content_getter_b: Callable[[str], bytes | None] | None = None,
+    ) -> models.Ontology:
+        """Записывает результат ``OntologyUnion`` (``UnionResult``) новой онтологией.
+
+        Строки вершин, связей и назначений строятся прямо из исходных объектов парсера, без сборки
+        YAML и повторного разбора, и вставляются ``bulk_create`` в одной транзакции. Идентификаторы
+        новые: исходные онтологии могут уже храниться в БД. У слитой вершины описание и метаданные
+        дополняются из O_j, а если типы вершин совпадают, к её назначениям добавляются назначения O_j
+        с определениями, которых нет у вершины O_i. Содержимое артефактов читается
+        ``content_getter_a``/``content_getter_b`` (по умолчанию — из модулей исходных онтологий).
+        """
+        result = models.Ontology.objects.create(name=name, label=label, description=description)
+
+        getters = {}
+        for side, getter, ontology in (
+            ("a", content_getter_a, getattr(union, "ontology_a", None)),
+            ("b", content_getter_b, getattr(union, "ontology_b", None)),
+        ):
+            if getter is None and ontology is not None:
+                getter = OntologyService.get_content_getter(ontology)
+            getters[side] = getter
+
+        def type_id(entity: Vertex | Relationship, name: str) -> object:
+            if not entity.type.fulfilled:
+                raise CreateOntologyException(_("type_not_fulfilled{alias}{entity}{name}").format(
+                    alias=entity.type.alias,
+                    entity=entity.__class__.__name__,
+                    name=name,
+                ))
+            return entity.type.value._uuid
+
+        def definition_id(assignment: PropertyAssignment | ArtifactAssignment, owner: object) -> object:
+            if not assignment.definition.fulfilled:
+                raise CreateOntologyException(_("definition_not_fulfilled{alias}{entity}{owner}{owner_entity}").format(
+                    alias=assignment.definition.alias,
+                    entity=assignment.__class__.__name__,
+                    owner=owner.name,
+                    owner_entity=owner.__class__.__name__,
+                ))
+            return assignment.definition.value._uuid
+
+        def assignment_rows(owner_field: str, owner_id: object, sources: list[tuple[Vertex | Relationship, str]]):
+            """Назначения свойств и артефактов по списку (исходная сущность, сторона); первая сущность главная."""
+            properties, artifacts = [], []
+            defined_properties, defined_artifacts = set(), set()
+            for source, side in sources:
+                source_properties = list(source.properties or [])
+                source_artifacts = list(source.artifacts or [])
+                for property in source_properties:
+                    if property.definition.alias in defined_properties:
+                        continue
+                    properties.append({
+                        owner_field: owner_id,
+                        "definition_id": definition_id(property, source),
+                        "value": property.value,
+                    })
+                for artifact in source_artifacts:
+                    if artifact.definition.alias in defined_artifacts:
+                        continue
+                    if artifact.path and getters[side] is None:
+                        raise CreateOntologyException(_("artifact_content_unavailable{path}").format(
+                            path=artifact.path,
+                        ))
+                    artifacts.append({
+                        owner_field: owner_id,
+                        "definition_id": definition_id(artifact, source),
+                        "content": getters[side](artifact.path) if artifact.path else None,
+                        "path": artifact.path,
+                    })
+                defined_properties.update(property.definition.alias for property in source_properties)
+                defined_artifacts.update(artifact.definition.alias for artifact in source_artifacts)
+            return properties, artifacts
+
+        def merge_metadata(primary: dict | None, secondary: dict | None) -> dict | None:
+            if isinstance(primary, dict) and isinstance(secondary, dict):
+                return {**secondary, **primary}
+            return primary if primary is not None else secondary
+
+        vertices, vertex_properties, vertex_artifacts = [], [], []
+        vertex_ids = {}
+        for merged in union.vertices:
+            sources = [(merged.original_a, "a"), (merged.original_b, "b")]
+            sources = [(source, side) for source, side in sources if source is not None]
+            primary = sources[0][0]
+            secondary = sources[1][0] if len(sources) > 1 else None
+            # Назначения O_j переносятся только на вершину того же типа: иначе их определения к ней не относятся
+            if secondary is not None and type_id(secondary, merged.name) != type_id(primary, merged.name):
+                sources = sources[:1]
+            vertex = models.Vertex(
+                id=uuid.uuid4(),
+                name=merged.name,
+                label=merged.label,
+                description=primary.description or (secondary.description if secondary is not None else None),
+                type_id=type_id(primary, merged.name),
+                metadata=merge_metadata(primary.metadata, secondary.metadata if secondary is not None else None),
+                ontology_id=result.id,
+            )
+            vertices.append(vertex)
+            vertex_ids[merged.name] = vertex.id
+            properties, artifacts = assignment_rows("vertex_id", vertex.id, sources)
+            vertex_properties.extend(properties)
+            vertex_artifacts.extend(artifacts)
+
+        relationships_a = {id(relationship) for relationship in getattr(union.ontology_a, "relationships", {}).values()}
+        relationships, relationship_properties, relationship_artifacts = [], [], []
+        names = set()
+        for edge in union.edges:
+            original = edge.original
+            if original is None:
+                raise CreateOntologyException(_("union_edge_without_relationship{source}{target}").format(
+                    source=edge.source_name,
+                    target=edge.target_name,
+                ))
+            relationship_name = original.name
+            suffix = 1
+            while relationship_name in names:
+                suffix += 1
+                relationship_name = f"{original.name}_{suffix}"
+            names.add(relationship_name)
+
+            relationship = models.Relationship(
+                id=uuid.uuid4(),
+                name=relationship_name,
+                label=original.label,
+                description=original.description,
+                type_id=type_id(original, original.name),
+                source_id=vertex_ids[edge.source_name],
+                target_id=vertex_ids[edge.target_name],
+                metadata=original.metadata,
+                ontology_id=result.id,
+            )
+            relationships.append(relationship)
+            side = "a" if id(original) in relationships_a else "b"
+            properties, artifacts = assignment_rows("relationship_id", relationship.id, [(original, side)])
+            relationship_properties.extend(properties)
+            relationship_artifacts.extend(artifacts)
+
+        type_ids = {vertex.type_id for vertex in vertices} | {relationship.type_id for relationship in relationships}
+        result.imports.set(models.OntologyModel.objects.filter(
+            Q(vertex_types__id__in=type_ids) | Q(relationship_types__id__in=type_ids)
+        ).distinct())
+
+        models.Vertex.objects.bulk_create(vertices)
+        models.VertexPropertyAssignment.objects.bulk_create(
+            [models.VertexPropertyAssignment(**property) for property in vertex_properties]
+        )
+        models.VertexArtifactAssignment.objects.bulk_create(
+            [models.VertexArtifactAssignment(**artifact) for artifact in vertex_artifacts]
+        )
+        models.Relationship.objects.bulk_create(relationships)
+        models.RelationshipPropertyAssignment.objects.bulk_create(
+            [models.RelationshipPropertyAssignment(**property) for property in relationship_properties]
+        )
+        models.RelationshipArtifactAssignment.objects.bulk_create(
+            [models.RelationshipArtifactAssignment(**artifact) for artifact in relationship_artifacts]
+        )
+
+        SearchService.index_vertices([vertex.id for vertex in vertices])
+        FuzzyLookupService.invalidate(result.id)
+        FeatureTableService.invalidate(result.id)
+
+        try:
+            connection.check_constraints()
+        except IntegrityError as e:
+            raise CreateOntologyException(str(e))
+
+        return result
+
     @staticmethod
     def get_content_getter(ontology: Ontology) -> Callable[[str], bytes | None]:
         def default_content_getter(path: str) -> bytes | None:
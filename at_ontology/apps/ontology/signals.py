@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+from at_ontology.apps.ontology import models
+
+
+def schedule_reindex(vertex_id) -> None:
+    from at_ontology.apps.ontology.search import SearchService
+
+    # Индексация откладывается до фиксации транзакции: при каскадном удалении вершины
+    # её документ не должен создаваться заново
+    transaction.on_commit(lambda: SearchService.index_vertices([vertex_id]))
+
+
+def vertex_saved(sender, instance: models.Vertex, **kwargs) -> None:
+    schedule_reindex(instance.id)
+    invalidate_fuzzy_index(sender, instance)
+
+
+def invalidate_fuzzy_index(sender, instance: models.Vertex, **kwargs) -> None:
+    from at_ontology.apps.ontology.fuzzy import FuzzyLookupService
+
+    FuzzyLookupService.invalidate(instance.ontology_id)
+
+
+def vertex_property_changed(sender, instance: models.VertexPropertyAssignment, **kwargs) -> None:
+    from at_ontology.apps.ontology.alignment import AlignmentService
+
+    schedule_reindex(instance.vertex_id)
+    invalidate_all_features(sender, instance)
+    AlignmentService.touch_on_commit(vertex_id=instance.vertex_id)
+
+
+def invalidate_features(sender, instance: models.Vertex | models.Relationship, **kwargs) -> None:
+    from at_ontology.apps.ontology.matching.features import FeatureTableService
+
+    FeatureTableService.invalidate(instance.ontology_id)
+
+
+def invalidate_all_features(sender, instance, **kwargs) -> None:
+    from at_ontology.apps.ontology.matching.features import FeatureTableService
+
+    # Вершина назначения может быть уже удалена каскадом, поэтому онтология не определяется
+    FeatureTableService.invalidate()
+
+
+def touch_ontology(sender, instance: models.Vertex | models.Relationship, **kwargs) -> None:
+    from at_ontology.apps.ontology.alignment import AlignmentService
+
+    AlignmentService.touch_on_commit(ontology_id=instance.ontology_id)
+
+
+def connect_signals() -> None:
+    post_save.connect(vertex_saved, sender=models.Vertex, dispatch_uid="ontology_search_vertex_saved")
+    post_delete.connect(invalidate_fuzzy_index, sender=models.Vertex, dispatch_uid="ontology_fuzzy_vertex_deleted")
+    for model in (models.Vertex, models.Relationship):
+        post_save.connect(invalidate_features, sender=model, dispatch_uid=f"matching_features_{model.__name__}_saved")
+        post_delete.connect(
+            invalidate_features,
+            sender=model,
+            dispatch_uid=f"matching_features_{model.__name__}_deleted",
+        )
+        post_save.connect(touch_ontology, sender=model, dispatch_uid=f"alignment_{model.__name__}_saved")
+        post_delete.connect(touch_ontology, sender=model, dispatch_uid=f"alignment_{model.__name__}_deleted")
+    post_save.connect(
+        vertex_property_changed,
+        sender=models.VertexPropertyAssignment,
+        dispatch_uid="ontology_search_property_saved",
+    )
+    post_delete.connect(
+        vertex_property_changed,
+        sender=models.VertexPropertyAssignment,
+        dispatch_uid="ontology_search_property_deleted",
+    )
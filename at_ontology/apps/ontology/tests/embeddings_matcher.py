@@ -17,6 +17,8 @@ from dataclasses import dataclass, field
 from collections import defaultdict
 from typing import Callable
 
+import numpy as np
+
 # Импортируем только базовые структуры и утилиты из SF,
 # НЕ импортируем ничего из embeddings_matcher (избегаем цикла)
 from at_ontology.apps.ontology.tests.similarity_flooding import (
@@ -25,13 +27,17 @@ from at_ontology.apps.ontology.tests.similarity_flooding import (
     _Graph,
     _PCGEdge,
     _load_graph,
-    _build_pcg,
-    _flood,
+    _sparse_flood,
     _normalize_dict,
     _filter_one_to_one,
-    _get_parent_label,
-    _token_sim,
 )
+from at_ontology.apps.ontology.matching.ann import cached_index
+from at_ontology.apps.ontology.matching.ann import IVFIndex
+from at_ontology.apps.ontology.matching.embeddings import EmbeddingStore
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.semantic import EmbeddingScorer
 
 type PairKey = tuple[str, str]
 
@@ -89,36 +95,66 @@ def _get_vertex_text(vertex: object) -> str:
 
 def _compute_embeddings(
     vertices: dict[str, object],
-    model,
+    model_name: str,
     batch_size: int = 64,
+    store: EmbeddingStore | None = None,
 ) -> dict[str, object]:
+    """
+    Векторы вершин. С хранилищем модель загружается и вызывается
+    только для текстов, которых в нём ещё нет.
+    """
     ids   = list(vertices.keys())
     texts = [_get_vertex_text(vertices[vid]) for vid in ids]
 
-    print(f'  Кодируем {len(texts)} вершин...')
-    vectors = model.encode(
-        texts,
-        batch_size=batch_size,
-        show_progress_bar=False,
-        normalize_embeddings=True,
-    )
+    def encode(batch: list[str]):
+        return _get_model(model_name).encode(
+            batch,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=True,
+        )
+
+    if store is None:
+        print(f'  Кодируем {len(texts)} вершин...')
+        vectors = encode(texts)
+    else:
+        missing = len({text for text in texts if text not in store})
+        print(f'  Кодируем {missing} из {len(texts)} вершин (остальные из хранилища)...')
+        vectors = store.encode(texts, encode)
     return {vid: vectors[i] for i, vid in enumerate(ids)}
 
 
-def _cosine_sim(v1, v2) -> float:
-    """
-    Косинусная схожесть нормализованных векторов → [0..1].
-    Так как векторы L2-нормализованы, косинус = скалярное произведение.
-    Сдвигаем из [-1,1] в [0,1].
-    """
-    import numpy as np
-    return float((np.dot(v1, v2) + 1.0) / 2.0)
-
-
 # ─────────────────────────────────────────────────────────────────────────────
 # Построение σ⁰ на основе эмбеддингов
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _match_graph(graph: _Graph) -> MatchGraph:
+    """Тот же граф в виде MatchGraph — для матричных оценок."""
+    names = list(graph.vertices)
+    index = {vid: i for i, vid in enumerate(names)}
+    labels: dict[str, int] = {}
+    edges = [e for e in graph.edges if e.source_id in index and e.target_id in index]
+    return MatchGraph(
+        names,
+        list(graph.vertices.values()),
+        [index[e.source_id] for e in edges],
+        [index[e.target_id] for e in edges],
+        [labels.setdefault(e.label, len(labels)) for e in edges],
+        list(labels),
+    )
+
+
+def _embedding_matrix(names: list[str], emb: dict[str, object]) -> tuple[np.ndarray, np.ndarray]:
+    """Векторы в порядке вершин (нулевой вектор, если эмбеддинга нет) и маска наличия."""
+    present = np.array([emb.get(vid) is not None for vid in names], dtype=bool)
+    dim = len(next(iter(emb.values()))) if emb else 0
+    matrix = np.zeros((len(names), dim), dtype=np.float32)
+    for i, vid in enumerate(names):
+        if present[i]:
+            matrix[i] = emb[vid]
+    return matrix, present
+
+
 def _build_sigma0_embeddings(
     graph_a: _Graph,
     graph_b: _Graph,
@@ -126,6 +162,8 @@ def _build_sigma0_embeddings(
     emb_b: dict[str, object],
     parent_weight: float = 0.20,
     token_weight:  float = 0.10,
+    threshold:     float = 0.0,
+    top_k:         int | None = None,
 ) -> dict[PairKey, float]:
     """
     σ⁰ = взвешенная комбинация:
@@ -136,38 +174,79 @@ def _build_sigma0_embeddings(
     Эмбеддинги понимают что «Машина вывода» ≈ «Механизм логического вывода».
     Токенная схожесть помогает с «НФ» ↔ «неформализованных».
     Родительский контекст разделяет одинаковые названия под разными разделами.
-    """
-    emb_weight = 1.0 - parent_weight - token_weight
-    sigma0: dict[PairKey, float] = {}
-
-    for vid_a, v_a in graph_a.vertices.items():
-        vec_a = emb_a.get(vid_a)
-        if vec_a is None:
-            continue
-        label_a  = getattr(v_a, 'label', None) or v_a.name
-        parent_a = _get_parent_label(vid_a, graph_a)
-
-        for vid_b, v_b in graph_b.vertices.items():
-            vec_b = emb_b.get(vid_b)
-            if vec_b is None:
-                continue
-            label_b  = getattr(v_b, 'label', None) or v_b.name
-            parent_b = _get_parent_label(vid_b, graph_b)
-
-            sem_sim = _cosine_sim(vec_a, vec_b)
-            tok_sim = _token_sim(label_a, label_b)
 
-            if parent_a and parent_b:
-                par_sim = _token_sim(parent_a, parent_b)
-            else:
-                par_sim = 0.5  # нет родителя — нейтральный вклад
-
-            score = emb_weight * sem_sim + token_weight * tok_sim + parent_weight * par_sim
-
-            if score > 0:
-                sigma0[(vid_a, vid_b)] = score
+    Считается блоками матриц (EmbeddingScorer): косинусы — произведением E_a · E_bᵀ
+    во float32, без двойного цикла по парам. Сохраняются пары с σ⁰ > 0 и σ⁰ ≥ threshold,
+    не более top_k на вершину A.
+    """
+    features_a = FeatureTable(_match_graph(graph_a))
+    features_b = FeatureTable(_match_graph(graph_b))
+    matrix_a, present_a = _embedding_matrix(features_a.names, emb_a)
+    matrix_b, present_b = _embedding_matrix(features_b.names, emb_b)
+
+    scorer = EmbeddingScorer(
+        token_weight=token_weight,
+        parent_weight=parent_weight,
+        threshold=threshold,
+        top_k=top_k,
+    )
+    candidates = scorer.candidates(features_a, features_b, matrix_a, matrix_b)
+    keep = present_a[candidates.rows] & present_b[candidates.cols]
+    return {
+        (features_a.names[i], features_b.names[j]): float(score)
+        for i, j, score in zip(
+            candidates.rows[keep].tolist(),
+            candidates.cols[keep].tolist(),
+            candidates.scores[keep].tolist(),
+        )
+    }
+
+
+def _build_sigma0_ann(
+    graph_a: _Graph,
+    graph_b: _Graph,
+    emb_a: dict[str, object],
+    emb_b: dict[str, object],
+    candidate_k: int,
+    n_probe: int = 8,
+    index_dir: str | None = None,
+    parent_weight: float = 0.20,
+    token_weight:  float = 0.10,
+) -> dict[PairKey, float]:
+    """
+    σ⁰ только для кандидатов: для каждой вершины A берём candidate_k ближайших
+    по косинусу вершин B из IVF-индекса и считаем ту же формулу, что и
+    _build_sigma0_embeddings, лишь для этих пар.
 
-    return sigma0
+    Индекс строится по эмбеддингам онтологии B; если задан index_dir,
+    он сохраняется там и переиспользуется, пока тексты вершин B не изменятся.
+    """
+    features_a = FeatureTable(_match_graph(graph_a))
+    features_b = FeatureTable(_match_graph(graph_b))
+    matrix_a, present_a = _embedding_matrix(features_a.names, emb_a)
+    matrix_b, present_b = _embedding_matrix(features_b.names, emb_b)
+
+    if index_dir is None:
+        index = IVFIndex.build(matrix_b)
+    else:
+        texts_b = [_get_vertex_text(graph_b.vertices[vid]) for vid in features_b.names]
+        index = cached_index(index_dir, texts_b, matrix_b)
+    neighbours, _ = index.search(matrix_a, candidate_k, n_probe=n_probe)
+
+    rows = np.repeat(np.arange(len(features_a)), neighbours.shape[1])
+    cols = neighbours.ravel()
+    keep = cols >= 0
+    rows, cols = rows[keep], cols[keep]
+    keep = present_a[rows] & present_b[cols]
+    rows, cols = rows[keep], cols[keep]
+
+    scorer = EmbeddingScorer(token_weight=token_weight, parent_weight=parent_weight)
+    scores = scorer.pair_scores(features_a, features_b, matrix_a, matrix_b, rows, cols)
+    return {
+        (features_a.names[i], features_b.names[j]): float(score)
+        for i, j, score in zip(rows.tolist(), cols.tolist(), scores.tolist())
+        if score > 0
+    }
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -196,6 +275,14 @@ class EmbeddingsSimilarityMatcher:
     vertex_filter          : (vertex) -> bool
                              Для реальных онтологий:
                                lambda v: v.name.startswith("Topic_")
+    embedding_store        : EmbeddingStore той же модели — эмбеддинги сохраняются
+                             между запусками, кодируются только новые и изменённые вершины
+    candidate_k            : если задано — σ⁰ и PCG строятся только для candidate_k
+                             ближайших по эмбеддингам вершин B на каждую вершину A
+                             (IVF-индекс); иначе — для всех пар A × B
+    n_probe                : сколько списков IVF-индекса просматривать: больше —
+                             выше полнота кандидатов, но медленнее (при 8 списках
+                             на кластеризованных данных полнота top-10 близка к 1)
     """
 
     def __init__(
@@ -207,6 +294,9 @@ class EmbeddingsSimilarityMatcher:
         sf_iterations: int                           = 20,
         min_score:     float                         = 0.3,
         vertex_filter: Callable[[object], bool] | None = None,
+        embedding_store: EmbeddingStore | None = None,
+        candidate_k:   int | None                    = None,
+        n_probe:       int                           = 8,
     ) -> None:
         self.ontology_a    = ontology_a
         self.ontology_b    = ontology_b
@@ -215,6 +305,9 @@ class EmbeddingsSimilarityMatcher:
         self.sf_iterations = sf_iterations
         self.min_score     = min_score
         self.vertex_filter = vertex_filter
+        self.embedding_store = embedding_store
+        self.candidate_k   = candidate_k
+        self.n_probe       = n_probe
 
     def run(self, top_k: int | None = None) -> list[MatchResult]:
         print('Загружаем граф A...')
@@ -232,27 +325,34 @@ class EmbeddingsSimilarityMatcher:
         graph_a._build_indices()
         graph_b._build_indices()
 
-        model = _get_model(self.model_name)
-
         print('Вычисляем эмбеддинги онтологии A...')
-        emb_a = _compute_embeddings(graph_a.vertices, model)
+        emb_a = _compute_embeddings(graph_a.vertices, self.model_name, store=self.embedding_store)
 
         print('Вычисляем эмбеддинги онтологии B...')
-        emb_b = _compute_embeddings(graph_b.vertices, model)
+        emb_b = _compute_embeddings(graph_b.vertices, self.model_name, store=self.embedding_store)
 
         print('Строим σ⁰ (эмбеддинги + токены + контекст родителя)...')
-        sigma0 = _build_sigma0_embeddings(graph_a, graph_b, emb_a, emb_b)
+        if self.candidate_k is None:
+            sigma0 = _build_sigma0_embeddings(graph_a, graph_b, emb_a, emb_b)
+        else:
+            index_dir = None
+            if self.embedding_store is not None:
+                index_dir = str(self.embedding_store.path / 'ivf')
+            sigma0 = _build_sigma0_ann(
+                graph_a, graph_b, emb_a, emb_b,
+                self.candidate_k, self.n_probe, index_dir,
+            )
         print(f'  {len(sigma0)} пар с σ⁰ > 0')
 
         if self.use_sf:
-            print('Строим PCG...')
-            pcg_edges = _build_pcg(graph_a, graph_b)
-            print(f'  {len(pcg_edges)} рёбер в PCG')
-
-            print('Итерации SF (формула C)...')
-            sigma = _flood(
-                sigma0, pcg_edges, graph_a, graph_b,
-                self.sf_iterations,
+            print('Строим PCG и итерации SF (формула C)...')
+            candidates = None
+            if self.candidate_k is not None:
+                # Пустое множество кандидатов: PCG строится только между парами σ⁰
+                candidates = PairSpace(len(graph_a.vertices), len(graph_b.vertices), [])
+            sigma = _sparse_flood(
+                sigma0, _match_graph(graph_a), _match_graph(graph_b),
+                self.sf_iterations, candidates=candidates,
             )
         else:
             sigma = _normalize_dict(dict(sigma0))
@@ -19,6 +19,18 @@ from dataclasses import dataclass, field
 from collections import defaultdict
 from typing import Callable
 
+from at_ontology.apps.ontology.matching.assignment import assign_pairs
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.blocking import CandidatePairs
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.incremental import IncrementalMatcher
+from at_ontology.apps.ontology.matching.incremental import MatchState
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.matching.scoring import positive_pairs
+
 
 # ─── Типы ────────────────────────────────────────────────────────────────────
 
@@ -236,6 +248,40 @@ def _compute_sigma0(
     return 0.50 * self_sim + 0.30 * par_sim + 0.20 * child_sim
 
 
+def _parallel_sigma0(
+    ontology_a: object, ontology_b: object,
+    filter_a: Callable[[object], bool], filter_b: Callable[[object], bool],
+    workers: int,
+) -> dict[PairKey, float]:
+    """
+    Тот же σ⁰, что и _compute_sigma0, сразу для всех пар: ContextScorer
+    считает его матрицами, а посимвольную схожесть названий — в workers
+    процессах по частям слов близкой длины.
+    """
+    features_a = FeatureTable.from_ontology(ontology_a, filter_a)
+    features_b = FeatureTable.from_ontology(ontology_b, filter_b)
+    scores = ContextScorer(workers=workers).matrix(features_a, features_b)
+    return positive_pairs(scores, features_a, features_b)
+
+
+def _blocked_sigma0(
+    graph_a: MatchGraph, graph_b: MatchGraph,
+    blocked: CandidatePairs, workers: int,
+) -> dict[PairKey, float]:
+    """
+    σ⁰ только для пар-кандидатов блокировщика: ContextScorer считает их
+    подматрицами «вершины A × их кандидаты», без матрицы A × B.
+    """
+    scores = ContextScorer(workers=workers).pair_scores(
+        FeatureTable(graph_a), FeatureTable(graph_b), blocked.rows, blocked.cols,
+    )
+    return {
+        pair: s
+        for pair, s in zip(blocked.names(graph_a, graph_b), scores.tolist())
+        if s > 0
+    }
+
+
 # ─── Граф попарной связности (PCG) ────────────────────────────────────────────
 
 def _build_pcg(graph_a: _Graph, graph_b: _Graph) -> list[_PCGEdge]:
@@ -332,6 +378,81 @@ def _flood(
     return current
 
 
+def _sparse_flood(
+    sigma0: dict[PairKey, float],
+    graph_a: MatchGraph,
+    graph_b: MatchGraph,
+    iterations: int,
+    sf_weight: float,
+    convergence_threshold: float,
+    verbose: bool,
+    candidates: PairSpace | None = None,
+) -> dict[PairKey, float]:
+    """
+    То же, что _flood, но PCG не материализуется в _PCGEdge: рёбра строятся
+    лениво, блоками по меткам, в массивы номеров пар int32 и сразу
+    собираются в разреженную матрицу распространения.
+
+    candidates (результат блокировки) ограничивает PCG парами-кандидатами.
+    """
+    flooding = SimilarityFlooding(iterations, convergence_threshold, formula='weighted', sf_weight=sf_weight)
+    result = flooding.run_dict(graph_a, graph_b, sigma0, candidates)
+    if verbose:
+        print(f'  {result.edges} рёбер в PCG')
+    if not result.edges:
+        if verbose:
+            print('  PCG пуст — используем σ⁰')
+        return dict(sigma0)
+
+    if verbose:
+        for it, delta in enumerate(result.deltas):
+            print(f'  Итерация {it + 1:2d}: Δ={delta:.6f}')
+        if result.converged:
+            print(f'  Сошлось за {result.iterations} итераций')
+        else:
+            print(f'  Достигнут лимит {iterations} итераций')
+    return result.to_dict(graph_a, graph_b)
+
+
+def _incremental_flood(
+    ontology_a: object,
+    ontology_b: object,
+    vertex_filter: Callable[[object], bool],
+    iterations: int,
+    sf_weight: float,
+    workers: int | None,
+    state_path: str,
+    verbose: bool,
+    blocker: CandidateBlocker | None = None,
+) -> tuple[dict[PairKey, float], dict[PairKey, float]]:
+    """
+    σ⁰ и SF от состояния прошлого запуска (matching.incremental): σ⁰
+    пересчитывается только в строках и столбцах изменённых вершин,
+    итерации начинаются с прежней неподвижной точки σ. Новое состояние
+    записывается в state_path. С blocker SF идёт только по парам-кандидатам.
+    Возвращает (σ⁰, σ).
+    """
+    matcher = IncrementalMatcher(
+        ContextScorer(workers=workers or 1),
+        SimilarityFlooding(iterations, 1e-4, formula='weighted', sf_weight=sf_weight),
+    )
+    features_a = FeatureTable.from_ontology(ontology_a, vertex_filter)
+    features_b = FeatureTable.from_ontology(ontology_b, vertex_filter)
+    candidates = None
+    if blocker is not None:
+        candidates = blocker.candidates(features_a.graph, features_b.graph)
+        if verbose:
+            print(f'  {len(candidates)} пар-кандидатов после блокировки')
+    result = matcher.run(features_a, features_b, MatchState.load(state_path), candidates)
+    result.state.save(state_path)
+    if verbose:
+        print(f'  Пересчитано σ⁰: {result.rows} строк, {result.cols} столбцов')
+        print(f'  {result.flood.edges} рёбер в PCG, итераций SF: {result.flood.iterations}')
+        if result.delta is not None:
+            print(f'  Изменение σ с прошлого запуска: Δ={result.delta:.6f}')
+    return result.sigma0(), result.sigma()
+
+
 # ─── Блок фильтра «один к одному» ────────────────────────────────────────────
 
 def _filter_one_to_one(
@@ -339,29 +460,16 @@ def _filter_one_to_one(
     graph_a: _Graph,
     graph_b: _Graph,
     min_score: float,
+    method: str = 'greedy',
 ) -> list[tuple[PairKey, float]]:
     """
-    Жадное паросочетание: каждая вершина используется не более одного раза.
+    Паросочетание: каждая вершина используется не более одного раза.
     Включает блок фильтра σ⁰ ≥ min_score.
-    """
-    sorted_pairs = sorted(sigma.items(), key=lambda x: -x[1])
-    used_a: set[str] = set()
-    used_b: set[str] = set()
-    result: list[tuple[PairKey, float]] = []
-
-    for (vid_a, vid_b), score in sorted_pairs:
-        if score < min_score:
-            break
-        if (vid_a not in graph_a.vertices or
-                vid_b not in graph_b.vertices):
-            continue
-        if vid_a in used_a or vid_b in used_b:
-            continue
-        used_a.add(vid_a)
-        used_b.add(vid_b)
-        result.append(((vid_a, vid_b), score))
 
-    return result
+    'greedy'  — жадно по убыванию σ (массивами, без сортировки всех пар кортежами);
+    'optimal' — с наибольшей суммой σ (венгерский алгоритм на разреженном графе пар).
+    """
+    return assign_pairs(sigma, min_score, method, graph_a.vertices, graph_b.vertices)
 
 
 # ─── Публичный класс ──────────────────────────────────────────────────────────
@@ -382,6 +490,17 @@ class OntologyIntersection:
     sf_weight     : вес структурного распространения (по умолчанию 0.3)
     vertex_filter : фильтр вершин; по умолчанию только Topic_*
     verbose       : выводить прогресс итераций
+    blocker       : CandidateBlocker — σ⁰ и PCG считаются только для
+                    пар-кандидатов вместо всего произведения |A|·|B|
+    workers       : если задано — σ⁰ считается матрично (ContextScorer),
+                    посимвольная схожесть названий — в workers процессах
+    assignment    : 'greedy' — жадный фильтр «один к одному»,
+                    'optimal' — паросочетание с наибольшей суммой σ
+    state_path    : каталог состояния для инкрементального режима: σ⁰
+                    пересчитывается только для изменённых вершин, SF
+                    стартует с прежней σ; состояние обновляется после
+                    каждого запуска (без блокировки файла). С blocker
+                    SF идёт по парам-кандидатам, σ⁰ хранится полностью
     """
 
     def __init__(
@@ -393,6 +512,10 @@ class OntologyIntersection:
         sf_weight: float = 0.3,
         vertex_filter: Callable[[object], bool] | None = None,
         verbose: bool = True,
+        blocker: CandidateBlocker | None = None,
+        workers: int | None = None,
+        assignment: str = 'greedy',
+        state_path: str | None = None,
     ) -> None:
         self.ontology_a    = ontology_a
         self.ontology_b    = ontology_b
@@ -401,6 +524,10 @@ class OntologyIntersection:
         self.sf_weight     = sf_weight
         self.vertex_filter = vertex_filter if vertex_filter is not None else _is_topic
         self.verbose       = verbose
+        self.blocker       = blocker
+        self.workers       = workers
+        self.assignment    = assignment
+        self.state_path    = state_path
 
     def run(self, top_k: int | None = None) -> IntersectionResult:
         vb = self.verbose
@@ -424,29 +551,54 @@ class OntologyIntersection:
         graph_a.build_indices()
         graph_b.build_indices()
 
-        if vb: print('Блок поиска общих вершин: вычисляем σ⁰...')
-        sigma0: dict[PairKey, float] = {}
-        for vid_a, v_a in graph_a.vertices.items():
-            for vid_b, v_b in graph_b.vertices.items():
-                s = _compute_sigma0(v_a, v_b, graph_a, graph_b)
-                if s > 0:
-                    sigma0[(vid_a, vid_b)] = s
-        if vb: print(f'  {len(sigma0)} пар с σ⁰ > 0')
-
-        if vb: print('Строим PCG...')
-        pcg = _build_pcg(graph_a, graph_b)
-        if vb: print(f'  {len(pcg)} рёбер в PCG')
-
-        if vb: print(f'Итерации SF (вес={self.sf_weight})...')
-        sigma = _flood(
-            sigma0, pcg, graph_a, graph_b,
-            self.iterations, self.sf_weight,
-            convergence_threshold=1e-4,
-            verbose=vb,
-        )
+        if self.state_path is not None:
+            if vb: print('Инкрементальный режим: σ⁰ и SF от сохранённого состояния...')
+            sigma0, sigma = _incremental_flood(
+                self.ontology_a, self.ontology_b, self.vertex_filter,
+                self.iterations, self.sf_weight, self.workers,
+                self.state_path, vb, self.blocker,
+            )
+        else:
+            match_a = MatchGraph.from_ontology(self.ontology_a, self.vertex_filter)
+            match_b = MatchGraph.from_ontology(self.ontology_b, self.vertex_filter)
+            candidates = candidate_space = None
+            if self.blocker is not None:
+                blocked = self.blocker.candidates(match_a, match_b)
+                candidates = blocked.names(match_a, match_b)
+                candidate_space = blocked.pair_space()
+                if vb: print(f'  {len(candidates)} пар-кандидатов после блокировки')
+
+            if vb: print('Блок поиска общих вершин: вычисляем σ⁰...')
+            sigma0: dict[PairKey, float] = {}
+            if self.workers is not None and candidates is not None:
+                sigma0 = _blocked_sigma0(match_a, match_b, blocked, self.workers)
+            elif self.workers is not None:
+                sigma0 = _parallel_sigma0(
+                    self.ontology_a, self.ontology_b,
+                    self.vertex_filter, self.vertex_filter,
+                    self.workers,
+                )
+            else:
+                pairs = candidates if candidates is not None else [
+                    (vid_a, vid_b) for vid_a in graph_a.vertices for vid_b in graph_b.vertices
+                ]
+                for vid_a, vid_b in pairs:
+                    s = _compute_sigma0(graph_a.vertices[vid_a], graph_b.vertices[vid_b], graph_a, graph_b)
+                    if s > 0:
+                        sigma0[(vid_a, vid_b)] = s
+            if vb: print(f'  {len(sigma0)} пар с σ⁰ > 0')
+
+            if vb: print(f'Строим PCG и итерации SF (вес={self.sf_weight})...')
+            sigma = _sparse_flood(
+                sigma0, match_a, match_b,
+                self.iterations, self.sf_weight,
+                convergence_threshold=1e-4,
+                verbose=vb,
+                candidates=candidate_space,
+            )
 
         if vb: print('Блок фильтра «один к одному»...')
-        filtered = _filter_one_to_one(sigma, graph_a, graph_b, self.min_score)
+        filtered = _filter_one_to_one(sigma, graph_a, graph_b, self.min_score, self.assignment)
 
         pairs = [
             SimilarPair(
@@ -5,7 +5,8 @@ ontology_union.py
 Компонент объединения прикладных онтологий курсов/дисциплин.
 
 При объединении O_i и O_j:
-  1. Проверяем точные совпадения (по legacy_db_id или одинаковому label).
+  1. Проверяем точные совпадения (по legacy_db_id и другим ключам metadata,
+     одинаковому label или имени) через хэш-индексы.
   2. Для остальных вызываем компонент пересечения (OntologyIntersection).
   3. Подобные вершины сливаем в одну (имя и label берём из O_i).
   4. Уникальные вершины добавляем как есть.
@@ -50,6 +51,7 @@ class MergedEdge:
     source_name: str
     target_name: str
     rel_type: str
+    original: object | None = None  # исходная связь (первая из O_i, затем из O_j)
 
 
 @dataclass
@@ -63,6 +65,8 @@ class UnionResult:
     similar_pairs: int      # подобные пары (из пересечения)
     unique_from_a: int      # уникальные из O_i
     unique_from_b: int      # уникальные из O_j
+    ontology_a: object | None = None  # исходные онтологии (для артефактов при записи в БД)
+    ontology_b: object | None = None
 
     def summary(self) -> str:
         return (
@@ -78,14 +82,68 @@ class UnionResult:
 
 # ─── Вспомогательные функции ─────────────────────────────────────────────────
 
-def _get_legacy_id(vertex: object) -> int | None:
-    """Читаем legacy_db_id из metadata вершины."""
+def _get_metadata(vertex: object, key: str) -> object | None:
+    """Читаем значение key из metadata вершины."""
     meta = getattr(vertex, 'metadata', None)
     if meta is None:
         return None
     if isinstance(meta, dict):
-        return meta.get('legacy_db_id')
-    return getattr(meta, 'legacy_db_id', None)
+        return meta.get(key)
+    return getattr(meta, key, None)
+
+
+def _get_legacy_id(vertex: object) -> int | None:
+    """Читаем legacy_db_id из metadata вершины."""
+    return _get_metadata(vertex, 'legacy_db_id')
+
+
+def _normalize_key(text: str) -> str:
+    """Ключ точного совпадения: без учёта регистра и лишних пробелов."""
+    return ' '.join(text.split()).lower()
+
+
+def _exact_matches(
+    graph_a: _Graph,
+    graph_b: _Graph,
+    metadata_keys: tuple[str, ...] = ('legacy_db_id',),
+    match_names: bool = False,
+) -> dict[str, str]:
+    """
+    Точные совпадения vid_a → vid_b по хэш-индексам вершин O_i за O(|A| + |B|).
+
+    Для вершины O_j ключи проверяются по порядку: значения metadata_keys,
+    нормализованный label, нормализованное имя (если match_names).
+    Как и в прежнем попарном переборе, при повторе значения metadata в O_i
+    берётся последняя вершина, при повторе label — первая, а более поздняя
+    вершина O_j перезаписывает сопоставление той же вершины O_i.
+    """
+    metadata_index: list[dict[object, str]] = [{} for _ in metadata_keys]
+    label_index: dict[str, str] = {}
+    name_index: dict[str, str] = {}
+    for vid, v in graph_a.vertices.items():
+        for index, key in zip(metadata_index, metadata_keys):
+            value = _get_metadata(v, key)
+            if value is not None:
+                index[value] = vid
+        label_index.setdefault(_normalize_key(_get_label(v)), vid)
+        if match_names:
+            name_index.setdefault(_normalize_key(vid), vid)
+
+    exact_a_to_b: dict[str, str] = {}
+    for vid_b, v_b in graph_b.vertices.items():
+        vid_a = None
+        for index, key in zip(metadata_index, metadata_keys):
+            value = _get_metadata(v_b, key)
+            if value is not None and value in index:
+                vid_a = index[value]
+                break
+        if vid_a is None:
+            vid_a = label_index.get(_normalize_key(_get_label(v_b)))
+        if vid_a is None and match_names:
+            vid_a = name_index.get(_normalize_key(vid_b))
+        if vid_a is not None:
+            exact_a_to_b[vid_a] = vid_b
+    return exact_a_to_b
 
 
 def _get_rel_type_str(rel: object) -> str:
@@ -119,6 +177,12 @@ class OntologyUnion:
     intersection_sf_weight : вес SF в пересечении (по умолчанию 0.3)
     vertex_filter     : фильтр вершин; по умолчанию только Topic_*
     verbose           : выводить прогресс
+    workers           : если задано — σ⁰ пересечения считается матрично,
+                        посимвольная схожесть названий — в workers процессах
+    assignment        : паросочетание в пересечении: 'greedy' или 'optimal'
+    exact_metadata_keys : ключи metadata для точных совпадений
+                        (по умолчанию legacy_db_id), проверяются до label
+    exact_names       : считать точным совпадением и одинаковое имя вершины
     """
 
     def __init__(
@@ -129,6 +193,10 @@ class OntologyUnion:
         intersection_sf_weight: float = 0.3,
         vertex_filter: Callable[[object], bool] | None = None,
         verbose: bool = True,
+        workers: int | None = None,
+        assignment: str = 'greedy',
+        exact_metadata_keys: tuple[str, ...] = ('legacy_db_id',),
+        exact_names: bool = False,
     ) -> None:
         self.ontology_a             = ontology_a
         self.ontology_b             = ontology_b
@@ -136,6 +204,10 @@ class OntologyUnion:
         self.intersection_sf_weight = intersection_sf_weight
         self.vertex_filter          = vertex_filter if vertex_filter is not None else _is_topic
         self.verbose                = verbose
+        self.workers                = workers
+        self.assignment             = assignment
+        self.exact_metadata_keys    = exact_metadata_keys
+        self.exact_names            = exact_names
 
     def run(self) -> UnionResult:
         vb = self.verbose
@@ -156,34 +228,20 @@ class OntologyUnion:
         # ── 2. Блок проверки точных совпадений ────────────────────────────────
         if vb: print('Блок проверки точных совпадений...')
 
-        # Сопоставление по legacy_db_id (если есть)
-        legacy_map_a: dict[int, str] = {}
-        for vid, v in graph_a.vertices.items():
-            lid = _get_legacy_id(v)
-            if lid is not None:
-                legacy_map_a[lid] = vid
-
-        exact_a_to_b: dict[str, str] = {}   # vid_a → vid_b (точные совпадения)
-        for vid_b, v_b in graph_b.vertices.items():
-            lid_b = _get_legacy_id(v_b)
-            if lid_b is not None and lid_b in legacy_map_a:
-                vid_a = legacy_map_a[lid_b]
-                exact_a_to_b[vid_a] = vid_b
-                continue
-            # Запасной вариант: точное совпадение label
-            label_b = _get_label(v_b).lower()
-            for vid_a, v_a in graph_a.vertices.items():
-                if _get_label(v_a).lower() == label_b:
-                    exact_a_to_b[vid_a] = vid_b
-                    break
+        exact_a_to_b = _exact_matches(
+            graph_a, graph_b,
+            self.exact_metadata_keys,
+            self.exact_names,
+        )
 
         if vb: print(f'  Найдено точных совпадений: {len(exact_a_to_b)}')
 
         # ── 3. Вызов компонента пересечения для остальных вершин ─────────────
+        exact_b = set(exact_a_to_b.values())
         remaining_a = {k: v for k, v in graph_a.vertices.items()
                        if k not in exact_a_to_b}
         remaining_b = {k: v for k, v in graph_b.vertices.items()
-                       if k not in set(exact_a_to_b.values())}
+                       if k not in exact_b}
 
         similar_a_to_b: dict[str, tuple[str, float]] = {}  # vid_a → (vid_b, score)
         intersection_result: IntersectionResult | None = None
@@ -214,8 +272,8 @@ class OntologyUnion:
             )
             # Для O_j используем отдельный граф с фильтром
             from ontology_intersection import (
-                _compute_sigma0, _build_pcg, _flood, _filter_one_to_one,
-                _normalize, _is_topic
+                _compute_sigma0, _sparse_flood, _filter_one_to_one,
+                _normalize, _is_topic, _parallel_sigma0, MatchGraph
             )
             graph_a_rem = _load_graph(self.ontology_a, filter_remaining_a)
             graph_b_rem = _load_graph(self.ontology_b, filter_remaining_b)
@@ -223,17 +281,25 @@ class OntologyUnion:
             graph_b_rem.build_indices()
 
             sigma0: dict = {}
-            for vid_a, v_a in graph_a_rem.vertices.items():
-                for vid_b, v_b in graph_b_rem.vertices.items():
-                    s = _compute_sigma0(v_a, v_b, graph_a_rem, graph_b_rem)
-                    if s > 0:
-                        sigma0[(vid_a, vid_b)] = s
+            if self.workers is not None:
+                sigma0 = _parallel_sigma0(
+                    self.ontology_a, self.ontology_b,
+                    filter_remaining_a, filter_remaining_b,
+                    self.workers,
+                )
+            else:
+                for vid_a, v_a in graph_a_rem.vertices.items():
+                    for vid_b, v_b in graph_b_rem.vertices.items():
+                        s = _compute_sigma0(v_a, v_b, graph_a_rem, graph_b_rem)
+                        if s > 0:
+                            sigma0[(vid_a, vid_b)] = s
 
             if vb: print(f'  Пар с σ⁰>0: {len(sigma0)}')
 
-            pcg = _build_pcg(graph_a_rem, graph_b_rem)
-            sigma = _flood(
-                sigma0, pcg, graph_a_rem, graph_b_rem,
+            sigma = _sparse_flood(
+                sigma0,
+                MatchGraph.from_ontology(self.ontology_a, filter_remaining_a),
+                MatchGraph.from_ontology(self.ontology_b, filter_remaining_b),
                 iterations=10,
                 sf_weight=self.intersection_sf_weight,
                 convergence_threshold=1e-4,
@@ -242,6 +308,7 @@ class OntologyUnion:
             filtered = _filter_one_to_one(
                 sigma, graph_a_rem, graph_b_rem,
                 self.intersection_min_score,
+                self.assignment,
             )
             for (vid_a, vid_b), score in filtered:
                 similar_a_to_b[vid_a] = (vid_b, score)
@@ -338,7 +405,8 @@ class OntologyUnion:
         merged_edges: list[MergedEdge] = []
         seen_edges: set[tuple[str, str, str]] = set()
 
-        def _add_edge(src_name: str, tgt_name: str, rel_type: str) -> None:
+        def _add_edge(src_name: str, tgt_name: str, rel: object) -> None:
+            rel_type = _get_rel_type_str(rel)
             key = (src_name, tgt_name, rel_type)
             if key not in seen_edges:
                 seen_edges.add(key)
@@ -346,6 +414,7 @@ class OntologyUnion:
                     source_name=src_name,
                     target_name=tgt_name,
                     rel_type=rel_type,
+                    original=rel,
                 ))
 
         # Связи из O_i
@@ -362,7 +431,7 @@ class OntologyUnion:
             src_mapped = name_map_a.get(src.name)
             tgt_mapped = name_map_a.get(tgt.name)
             if src_mapped and tgt_mapped:
-                _add_edge(src_mapped, tgt_mapped, _get_rel_type_str(rel))
+                _add_edge(src_mapped, tgt_mapped, rel)
 
         # Связи из O_j (только если концы не уже покрыты связями из O_i)
         for _rname, rel in self.ontology_b.relationships.items():
@@ -378,7 +447,7 @@ class OntologyUnion:
             src_mapped = name_map_b.get(src.name)
             tgt_mapped = name_map_b.get(tgt.name)
             if src_mapped and tgt_mapped:
-                _add_edge(src_mapped, tgt_mapped, _get_rel_type_str(rel))
+                _add_edge(src_mapped, tgt_mapped, rel)
 
         if vb: print(f'  Связей в результате: {len(merged_edges)}')
 
@@ -391,6 +460,8 @@ class OntologyUnion:
             similar_pairs=len(similar_a_to_b),
             unique_from_a=unique_a,
             unique_from_b=unique_b,
+            ontology_a=self.ontology_a,
+            ontology_b=self.ontology_b,
         )
 
 
@@ -5,6 +5,14 @@ from dataclasses import dataclass, field
 from collections import defaultdict
 from typing import Callable
 
+from at_ontology.apps.ontology.matching.assignment import assign_pairs
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.matching.scoring import positive_pairs
+
 type PairKey = tuple[str, str]
 
 
@@ -344,6 +352,39 @@ def _flood(
     return current
 
 
+def _sparse_flood(
+    sigma0: dict[PairKey, float],
+    graph_a: MatchGraph,
+    graph_b: MatchGraph,
+    iterations: int = 10,
+    convergence_threshold: float = 1e-4,
+    sf_weight: float = 0.3,
+    candidates: PairSpace | None = None,
+) -> dict[PairKey, float]:
+    """
+    То же, что _flood, без _PCGEdge и словаря incoming: PCG строится лениво,
+    блоками по меткам рёбер, в массивы номеров пар int32 и сразу
+    собирается в разреженную матрицу; итерация — одно умножение на вектор.
+
+    candidates — пары, между которыми строится PCG (вместе с парами σ⁰);
+    по умолчанию PCG полный.
+    """
+    flooding = SimilarityFlooding(iterations, convergence_threshold, formula='weighted', sf_weight=sf_weight)
+    result = flooding.run_dict(graph_a, graph_b, sigma0, candidates)
+    print(f'  {result.edges} рёбер в PCG')
+    if not result.edges:
+        print('  PCG пуст — используем σ⁰')
+        return dict(sigma0)
+
+    for iteration, delta in enumerate(result.deltas):
+        print(f'  Итерация {iteration + 1:2d}: Δ={delta:.6f}')
+    if result.converged:
+        print(f'  Сошлось за {result.iterations} итераций')
+    else:
+        print(f'  Достигнут лимит {iterations} итераций')
+    return result.to_dict(graph_a, graph_b)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Шаг 6. Фильтрация «один к одному»
 # ─────────────────────────────────────────────────────────────────────────────
@@ -353,24 +394,13 @@ def _filter_one_to_one(
     graph_a: _Graph,
     graph_b: _Graph,
     min_score: float = 0.05,
+    method: str = 'greedy',
 ) -> list[tuple[PairKey, float]]:
-    sorted_pairs = sorted(sigma.items(), key=lambda x: -x[1])
-    used_a: set[str] = set()
-    used_b: set[str] = set()
-    result: list[tuple[PairKey, float]] = []
-
-    for (vid_a, vid_b), score in sorted_pairs:
-        if score < min_score:
-            break
-        if vid_a not in graph_a.vertices or vid_b not in graph_b.vertices:
-            continue
-        if vid_a in used_a or vid_b in used_b:
-            continue
-        used_a.add(vid_a)
-        used_b.add(vid_b)
-        result.append(((vid_a, vid_b), score))
-
-    return result
+    """
+    Паросочетание «один к одному» по σ ≥ min_score: 'greedy' — жадно по
+    убыванию σ, 'optimal' — с наибольшей суммой σ (matching.assignment).
+    """
+    return assign_pairs(sigma, min_score, method, graph_a.vertices, graph_b.vertices)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -397,6 +427,10 @@ class OntologySimilarityMatcher:
     min_score              : порог отсечения (по умолчанию 0.10)
     sf_weight              : вес структурного распространения (по умолчанию 0.3)
     vertex_filter          : по умолчанию — только Topic_* вершины
+    workers                : если задано — σ⁰ считается матрично (ContextScorer),
+                             посимвольная схожесть названий — в workers процессах
+    assignment             : 'greedy' — жадный фильтр «один к одному»,
+                             'optimal' — паросочетание с наибольшей суммой σ
     """
 
     def __init__(
@@ -407,6 +441,8 @@ class OntologySimilarityMatcher:
         min_score: float = 0.10,
         sf_weight: float = 0.3,
         vertex_filter: Callable[[object], bool] | None = None,
+        workers: int | None = None,
+        assignment: str = 'greedy',
     ) -> None:
         self.ontology_a    = ontology_a
         self.ontology_b    = ontology_b
@@ -414,6 +450,8 @@ class OntologySimilarityMatcher:
         self.min_score     = min_score
         self.sf_weight     = sf_weight
         self.vertex_filter = vertex_filter if vertex_filter is not None else _is_topic
+        self.workers       = workers
+        self.assignment    = assignment
 
     def run(self, top_k: int | None = None) -> list[MatchResult]:
         print('Загружаем граф A...')
@@ -433,25 +471,29 @@ class OntologySimilarityMatcher:
 
         print('Строим σ⁰ (label + родитель + дети)...')
         sigma0: dict[PairKey, float] = {}
-        for vid_a, v_a in graph_a.vertices.items():
-            for vid_b, v_b in graph_b.vertices.items():
-                s = _initial_sigma(v_a, v_b, graph_a, graph_b)
-                if s > 0:
-                    sigma0[(vid_a, vid_b)] = s
+        if self.workers is not None:
+            features_a = FeatureTable.from_ontology(self.ontology_a, self.vertex_filter)
+            features_b = FeatureTable.from_ontology(self.ontology_b, self.vertex_filter)
+            scores = ContextScorer(workers=self.workers).matrix(features_a, features_b)
+            sigma0 = positive_pairs(scores, features_a, features_b)
+        else:
+            for vid_a, v_a in graph_a.vertices.items():
+                for vid_b, v_b in graph_b.vertices.items():
+                    s = _initial_sigma(v_a, v_b, graph_a, graph_b)
+                    if s > 0:
+                        sigma0[(vid_a, vid_b)] = s
         print(f'  {len(sigma0)} пар с σ⁰ > 0')
 
-        print('Строим PCG...')
-        pcg_edges = _build_pcg(graph_a, graph_b)
-        print(f'  {len(pcg_edges)} рёбер в PCG')
-
-        print(f'Итерации SF (вес={self.sf_weight})...')
-        sigma = _flood(
-            sigma0, pcg_edges, graph_a, graph_b,
+        print(f'Строим PCG и итерации SF (вес={self.sf_weight})...')
+        sigma = _sparse_flood(
+            sigma0,
+            MatchGraph.from_ontology(self.ontology_a, self.vertex_filter),
+            MatchGraph.from_ontology(self.ontology_b, self.vertex_filter),
             self.iterations, sf_weight=self.sf_weight,
         )
 
         print('Фильтрация (один к одному)...')
-        filtered = _filter_one_to_one(sigma, graph_a, graph_b, self.min_score)
+        filtered = _filter_one_to_one(sigma, graph_a, graph_b, self.min_score, self.assignment)
 
         results = [
             MatchResult(
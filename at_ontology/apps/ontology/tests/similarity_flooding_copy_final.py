@@ -5,6 +5,11 @@ from dataclasses import dataclass, field
 from collections import defaultdict
 from typing import Callable
 
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Типы
 # ─────────────────────────────────────────────────────────────────────────────
@@ -460,6 +465,36 @@ def _flood(
     return current
 
 
+def _sparse_flood(
+    sigma0: dict[PairKey, float],
+    graph_a: MatchGraph,
+    graph_b: MatchGraph,
+    iterations: int = 20,
+    convergence_threshold: float = 1e-4,
+    candidates: PairSpace | None = None,
+) -> dict[PairKey, float]:
+    """
+    Формула C, как в _flood, но без _PCGEdge и словаря incoming: рёбра PCG
+    строятся лениво, блоками по меткам, в массивы номеров пар int32
+    и сразу собираются в разреженную матрицу распространения.
+
+    candidates (результат блокировки) ограничивает PCG парами-кандидатами.
+    """
+    result = SimilarityFlooding(iterations, convergence_threshold).run_dict(graph_a, graph_b, sigma0, candidates)
+    print(f'  {result.edges} рёбер в PCG')
+    if not result.edges:
+        print('  PCG пуст — итерации не нужны, используем σ⁰')
+        return dict(sigma0)
+
+    for iteration, delta in enumerate(result.deltas):
+        print(f'  Итерация {iteration + 1:2d}: Δ={delta:.6f}')
+    if result.converged:
+        print(f'  Сошлось за {result.iterations} итераций')
+    else:
+        print(f'  Достигнут лимит {iterations} итераций')
+    return result.to_dict(graph_a, graph_b)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Шаг 5. Фильтрация: один к одному
 # ─────────────────────────────────────────────────────────────────────────────
@@ -512,6 +547,8 @@ class OntologySimilarityMatcher:
     vertex_filter          : (vertex) -> bool
                              Для реальных онтологий:
                                lambda v: v.name.startswith("Topic_")
+    blocker                : CandidateBlocker — σ⁰ и PCG считаются только
+                             для пар-кандидатов вместо всего |A|·|B|
     """
 
     def __init__(
@@ -521,12 +558,14 @@ class OntologySimilarityMatcher:
         iterations: int = 20,
         min_score: float = 0.05,
         vertex_filter: Callable[[object], bool] | None = None,
+        blocker: CandidateBlocker | None = None,
     ) -> None:
         self.ontology_a    = ontology_a
         self.ontology_b    = ontology_b
         self.iterations    = iterations
         self.min_score     = min_score
         self.vertex_filter = vertex_filter
+        self.blocker       = blocker
 
     def run(self, top_k: int | None = None) -> list[MatchResult]:
         print('Загружаем граф A...')
@@ -545,21 +584,28 @@ class OntologySimilarityMatcher:
         graph_a._build_indices()
         graph_b._build_indices()
 
+        match_a = MatchGraph.from_ontology(self.ontology_a, self.vertex_filter)
+        match_b = MatchGraph.from_ontology(self.ontology_b, self.vertex_filter)
+        candidates = candidate_space = None
+        if self.blocker is not None:
+            blocked = self.blocker.candidates(match_a, match_b)
+            candidates = blocked.names(match_a, match_b)
+            candidate_space = blocked.pair_space()
+            print(f'  {len(candidates)} пар-кандидатов после блокировки')
+
         print('Строим σ⁰ (токенная схожесть + контекст родителя)...')
         sigma0: dict[PairKey, float] = {}
-        for vid_a, v_a in graph_a.vertices.items():
-            for vid_b, v_b in graph_b.vertices.items():
-                s = _initial_sigma(v_a, v_b, graph_a, graph_b)
-                if s > 0:
-                    sigma0[(vid_a, vid_b)] = s
+        pairs = candidates if candidates is not None else [
+            (vid_a, vid_b) for vid_a in graph_a.vertices for vid_b in graph_b.vertices
+        ]
+        for vid_a, vid_b in pairs:
+            s = _initial_sigma(graph_a.vertices[vid_a], graph_b.vertices[vid_b], graph_a, graph_b)
+            if s > 0:
+                sigma0[(vid_a, vid_b)] = s
         print(f'  {len(sigma0)} пар с σ⁰ > 0')
 
-        print('Строим PCG...')
-        pcg_edges = _build_pcg(graph_a, graph_b)
-        print(f'  {len(pcg_edges)} рёбер в PCG')
-
-        print('Итерации SF (формула C)...')
-        sigma = _flood(sigma0, pcg_edges, graph_a, graph_b, self.iterations)
+        print('Строим PCG и итерации SF (формула C)...')
+        sigma = _sparse_flood(sigma0, match_a, match_b, self.iterations, candidates=candidate_space)
 
         print('Фильтрация (один к одному)...')
         filtered = _filter_one_to_one(sigma, graph_a, graph_b)
@@ -0,0 +1,173 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+from django.db import OperationalError
+from django.db import transaction
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from at_ontology.apps.ontology.alignment import AlignmentException
+from at_ontology.apps.ontology.alignment import AlignmentService
+from at_ontology.apps.ontology.alignment import config_hash
+from at_ontology.apps.ontology.alignment import SAVE_ATTEMPTS
+from at_ontology.apps.ontology.models import Alignment
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology.models import VertexPropertyAssignment
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import VertexType
+from at_ontology.apps.ontology_model.models import VertexTypePropertyDefinition
+
+CONFIG = {"matcher": "OntologyIntersection", "min_score": 0.3, "sf_weight": 0.3}
+
+
+class AlignmentServiceTest(TestCase):
+    def setUp(self):
+        self.model = OntologyModel.objects.create(name="AlignmentModel")
+        self.type = VertexType.objects.create(name="Topic", ontology_model=self.model)
+        self.ontology_a = Ontology.objects.create(name="AlignmentA")
+        self.ontology_b = Ontology.objects.create(name="AlignmentB")
+        # Ревизии растут при фиксации транзакции: отложенные действия выполняются сразу
+        with self.captureOnCommitCallbacks(execute=True):
+            self.graphs_a = Vertex.objects.create(
+                name="graphs", label="Графы", type=self.type, ontology=self.ontology_a
+            )
+            self.trees_a = Vertex.objects.create(
+                name="trees", label="Деревья", type=self.type, ontology=self.ontology_a
+            )
+            self.graphs_b = Vertex.objects.create(name="graph", label="Граф", type=self.type, ontology=self.ontology_b)
+            self.trees_b = Vertex.objects.create(name="tree", label="Дерево", type=self.type, ontology=self.ontology_b)
+        self.results = [
+            SimpleNamespace(vertex_a=self.graphs_a, vertex_b=self.graphs_b, score=0.9, initial_score=0.7),
+            ("trees", "tree", 0.6, 0.5),
+        ]
+
+    def test_config_hash(self):
+        self.assertEqual(config_hash(CONFIG), config_hash(dict(reversed(CONFIG.items()))))
+        self.assertNotEqual(config_hash(CONFIG), config_hash({**CONFIG, "min_score": 0.2}))
+
+    def test_save_and_get(self):
+        self.assertIsNone(AlignmentService.get(self.ontology_a, self.ontology_b, CONFIG))
+        AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.results)
+
+        alignment = AlignmentService.get(self.ontology_a.id, self.ontology_b.id, CONFIG)
+        self.assertEqual(AlignmentService.rows(alignment), [("graphs", "graph", 0.9, 0.7), ("trees", "tree", 0.6, 0.5)])
+        self.assertIsNone(AlignmentService.get(self.ontology_a, self.ontology_b, {**CONFIG, "min_score": 0.2}))
+
+        AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.results[1:])
+        self.assertEqual(
+            AlignmentService.rows(AlignmentService.get(self.ontology_a, self.ontology_b, CONFIG)),
+            [
+                ("trees", "tree", 0.6, 0.5),
+            ],
+        )
+
+    def test_edit_invalidates(self):
+        AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.results)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trees_b.label = "Деревья"
+            self.trees_b.save()
+        self.assertIsNone(AlignmentService.get(self.ontology_a, self.ontology_b, CONFIG))
+        self.assertEqual(list(AlignmentService.pairs_for_vertex(self.graphs_a)), [])
+        self.assertEqual(len(AlignmentService.pairs_for_vertex(self.graphs_a, current=False)), 1)
+
+    def test_revision_bumped_once_per_transaction(self):
+        definition = VertexTypePropertyDefinition.objects.create(name="code", vertex_type=self.type)
+        revision = Ontology.objects.get(id=self.ontology_a.id).revision
+        with self.captureOnCommitCallbacks(execute=True):
+            self.graphs_a.label = "Граф"
+            self.graphs_a.save()
+            VertexPropertyAssignment.objects.create(vertex=self.trees_a, definition=definition, value="ПК-1")
+            self.trees_a.delete()
+        self.ontology_a.refresh_from_db()
+        self.assertEqual(self.ontology_a.revision, revision + 1)
+
+        # Каскадное удаление онтологии — один UPDATE вместо запроса на каждую вершину и свойство
+        with self.captureOnCommitCallbacks(execute=True):
+            VertexPropertyAssignment.objects.create(vertex=self.graphs_b, definition=definition, value="ПК-2")
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.ontology_b.delete()
+        updates = [query for query in queries if "revision" in query["sql"] and query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+
+    def test_get_or_compute(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return self.results
+
+        first = AlignmentService.get_or_compute(self.ontology_a, self.ontology_b, CONFIG, compute)
+        second = AlignmentService.get_or_compute(self.ontology_a, self.ontology_b, CONFIG, compute)
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+
+    def test_pairs_for_vertex(self):
+        AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.results)
+        AlignmentService.save(self.ontology_b, self.ontology_a, CONFIG, [("tree", "graphs", 0.4, 0.1)])
+
+        pairs = AlignmentService.pairs_for_vertex(self.graphs_a)
+        self.assertEqual(
+            [(pair.vertex_a, pair.vertex_b, pair.score) for pair in pairs],
+            [
+                (self.graphs_a, self.graphs_b, 0.9),
+                (self.trees_b, self.graphs_a, 0.4),
+            ],
+        )
+
+    def test_unknown_vertex(self):
+        with self.assertRaises(AlignmentException):
+            AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, [("graphs", "missing", 1.0, 1.0)])
+        self.assertIsNone(AlignmentService.get(self.ontology_a, self.ontology_b, CONFIG))
+
+
+# Повтор записи проверяется вне транзакции теста: вложенную транзакцию повторить нельзя
+class AlignmentSaveRetryTest(TransactionTestCase):
+    ROWS = [("graphs", "graph", 0.9, 0.7)]
+
+    def setUp(self):
+        model = OntologyModel.objects.create(name="RetryModel")
+        vertex_type = VertexType.objects.create(name="Topic", ontology_model=model)
+        self.ontology_a = Ontology.objects.create(name="RetryA")
+        self.ontology_b = Ontology.objects.create(name="RetryB")
+        Vertex.objects.create(name="graphs", label="Графы", type=vertex_type, ontology=self.ontology_a)
+        Vertex.objects.create(name="graph", label="Граф", type=vertex_type, ontology=self.ontology_b)
+
+        self.calls = 0
+        self.locked_calls = 0
+        update_or_create = Alignment.objects.update_or_create
+
+        def locked_update_or_create(*args, **kwargs):
+            self.calls += 1
+            if self.calls <= self.locked_calls:
+                raise OperationalError("database is locked")
+            return update_or_create(*args, **kwargs)
+
+        patches = (
+            mock.patch.object(Alignment.objects, "update_or_create", side_effect=locked_update_or_create),
+            mock.patch("at_ontology.apps.ontology.alignment.time.sleep"),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_retry_when_locked(self):
+        self.locked_calls = 1
+        AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.ROWS)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(
+            AlignmentService.rows(AlignmentService.get(self.ontology_a, self.ontology_b, CONFIG)), self.ROWS
+        )
+
+        self.calls, self.locked_calls = 0, SAVE_ATTEMPTS
+        with self.assertRaises(OperationalError):
+            AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.ROWS)
+        self.assertEqual(self.calls, SAVE_ATTEMPTS)
+
+    def test_no_retry_inside_transaction(self):
+        self.locked_calls = 1
+        with self.assertRaises(OperationalError), transaction.atomic():
+            AlignmentService.save(self.ontology_a, self.ontology_b, CONFIG, self.ROWS)
+        self.assertEqual(self.calls, 1)
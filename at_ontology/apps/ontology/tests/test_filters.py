@@ -0,0 +1,101 @@
+from django.test import TestCase
+
+from at_ontology.apps.ontology.filters import PropertyFilter
+from at_ontology.apps.ontology.filters import PropertyFilterException
+from at_ontology.apps.ontology.filters import relationship_filters_q
+from at_ontology.apps.ontology.filters import vertex_filters_q
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Relationship
+from at_ontology.apps.ontology.models import RelationshipPropertyAssignment
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology.models import VertexPropertyAssignment
+from at_ontology.apps.ontology.search import SearchService
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import RelationshipType
+from at_ontology.apps.ontology_model.models import RelationshipTypePropertyDefinition
+from at_ontology.apps.ontology_model.models import VertexType
+from at_ontology.apps.ontology_model.models import VertexTypePropertyDefinition
+
+
+class PropertyFilterTest(TestCase):
+    def setUp(self):
+        self.ontology = Ontology.objects.create(name="FilterOntology")
+        self.model = OntologyModel.objects.create(name="FilterModel")
+        self.type = VertexType.objects.create(name="CourseElement", ontology_model=self.model)
+        self.relationship_type = RelationshipType.objects.create(name="Hierarchy", ontology_model=self.model)
+        self.questions = VertexTypePropertyDefinition.objects.create(name="questions", vertex_type=self.type)
+        self.code = VertexTypePropertyDefinition.objects.create(name="code", vertex_type=self.type)
+        self.weight = RelationshipTypePropertyDefinition.objects.create(
+            name="weight", relationship_type=self.relationship_type
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.easy = Vertex.objects.create(name="easy", label="Графы", type=self.type, ontology=self.ontology)
+            self.hard = Vertex.objects.create(name="hard", label="Графы", type=self.type, ontology=self.ontology)
+            self.empty = Vertex.objects.create(name="empty", label="Графы", type=self.type, ontology=self.ontology)
+
+            for vertex, difficulties in ((self.easy, [1, 2]), (self.hard, [2, 5])):
+                for difficulty in difficulties:
+                    VertexPropertyAssignment.objects.create(
+                        vertex=vertex,
+                        definition=self.questions,
+                        value={"question": f"Вопрос {vertex.name} {difficulty}", "difficulty": difficulty},
+                    )
+            VertexPropertyAssignment.objects.create(vertex=self.hard, definition=self.code, value="ПК-1")
+
+        self.relationship = Relationship.objects.create(
+            name="easy_hard",
+            type=self.relationship_type,
+            source=self.easy,
+            target=self.hard,
+            ontology=self.ontology,
+        )
+        RelationshipPropertyAssignment.objects.create(relationship=self.relationship, definition=self.weight, value=0.7)
+
+    def filter_vertices(self, *filters):
+        return set(Vertex.objects.filter(vertex_filters_q(filters)))
+
+    def test_numeric_path(self):
+        self.assertEqual(self.filter_vertices(PropertyFilter("questions", "difficulty", "gt", 3)), {self.hard})
+        self.assertEqual(
+            self.filter_vertices(PropertyFilter("questions", "difficulty", "exact", 2)), {self.easy, self.hard}
+        )
+
+    def test_text_path(self):
+        self.assertEqual(
+            self.filter_vertices(PropertyFilter("questions", "question", "icontains", "easy")), {self.easy}
+        )
+
+    def test_scalar_value(self):
+        self.assertEqual(self.filter_vertices(PropertyFilter("code", value="ПК-1")), {self.hard})
+
+    def test_filters_are_conjunctive_and_composable(self):
+        self.assertEqual(
+            self.filter_vertices(
+                PropertyFilter("questions", "difficulty", "lt", 2), PropertyFilter("code", value="ПК-1")
+            ),
+            set(),
+        )
+        q = ~PropertyFilter("questions", "difficulty", "gte", 1).for_vertices()
+        self.assertEqual(set(Vertex.objects.filter(q)), {self.empty})
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            list(Vertex.objects.filter(vertex_filters_q([PropertyFilter("questions", "difficulty", "gt", 3)])))
+
+    def test_relationships(self):
+        q = relationship_filters_q([PropertyFilter("weight", lookup="gte", value=0.5)])
+        self.assertEqual(list(Relationship.objects.filter(q)), [self.relationship])
+
+    def test_parse(self):
+        self.assertEqual(
+            PropertyFilter.parse("questions.difficulty__gt", 3), PropertyFilter("questions", "difficulty", "gt", 3)
+        )
+        self.assertEqual(PropertyFilter.parse("code", "ПК-1"), PropertyFilter("code", "", "exact", "ПК-1"))
+        with self.assertRaises(PropertyFilterException):
+            PropertyFilter("questions", "difficulty", "between", 3)
+
+    def test_search_with_filters(self):
+        page = SearchService.search("графы", filters=[PropertyFilter("questions", "difficulty", "gt", 3)])
+        self.assertEqual([hit.vertex for hit in page.hits], [self.hard])
+        self.assertEqual(page.total, 1)
@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from at_ontology.apps.ontology.fuzzy import FuzzyLookupService
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology.ngram import NGramIndex
+from at_ontology.apps.ontology.ngram import similarity
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import VertexType
+
+
+class NGramIndexTest(TestCase):
+    def test_similarity_matches_pg_trgm(self):
+        # значения из документации pg_trgm: similarity('word', 'two words') = 4 / 11
+        self.assertAlmostEqual(similarity("word", "two words"), 4 / 11)
+        self.assertEqual(similarity("Граф", "граф"), 1.0)
+        self.assertEqual(similarity("", "граф"), 0.0)
+
+    def test_query_returns_top_k(self):
+        index = NGramIndex()
+        for key, text in enumerate(["Теория графов", "Графы", "Деревья", "Теория множеств"]):
+            index.add(key, text)
+
+        result = index.query("теория графа", k=2, threshold=0.1)
+        self.assertEqual([key for key, _ in result], [0, 3])
+        self.assertGreater(result[0][1], result[1][1])
+        self.assertEqual(index.query("xyz"), [])
+
+    def test_key_score_is_max_over_entries(self):
+        index = NGramIndex()
+        index.add("v", "graph_theory")
+        index.add("v", "Теория графов")
+        self.assertEqual(index.query("Теория графов", threshold=0.9), [("v", 1.0)])
+
+
+class FuzzyLookupServiceTest(TestCase):
+    def setUp(self):
+        self.ontology = Ontology.objects.create(name="FuzzyOntology")
+        self.model = OntologyModel.objects.create(name="FuzzyModel")
+        self.type = VertexType.objects.create(name="CourseElement", ontology_model=self.model)
+        self.graphs = Vertex.objects.create(
+            name="graphs", label="Теория графов", type=self.type, ontology=self.ontology
+        )
+        self.trees = Vertex.objects.create(name="trees", label="Деревья", type=self.type, ontology=self.ontology)
+
+    def test_similar_vertices(self):
+        hits = FuzzyLookupService.similar_vertices("теория графа", self.ontology, k=5)
+        self.assertEqual([hit.vertex for hit in hits], [self.graphs])
+        self.assertLess(hits[0].similarity, 1.0)
+
+    def test_index_is_invalidated_on_write(self):
+        self.assertEqual(FuzzyLookupService.similar_vertices("Леса", self.ontology), [])
+
+        self.trees.label = "Леса"
+        self.trees.save()
+        self.assertEqual(
+            [hit.vertex for hit in FuzzyLookupService.similar_vertices("Леса", self.ontology)], [self.trees]
+        )
+
+        self.trees.delete()
+        self.assertEqual(FuzzyLookupService.similar_vertices("Леса", self.ontology), [])
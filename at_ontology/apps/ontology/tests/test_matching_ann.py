@@ -0,0 +1,84 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.ann import cached_index
+from at_ontology.apps.ontology.matching.ann import IVFIndex
+from at_ontology.apps.ontology.matching.ann import normalize_rows
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.semantic import EmbeddingScorer
+
+DIR_PATH = Path(__file__).parent
+
+
+def clustered(rng: np.random.Generator, centers: np.ndarray, n: int, noise: float = 0.3) -> np.ndarray:
+    return normalize_rows(centers[rng.integers(0, len(centers), n)] + noise * rng.normal(size=(n, centers.shape[1])))
+
+
+class IVFIndexTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(40, 32))
+        cls.vectors = clustered(rng, centers, 2000)
+        cls.queries = clustered(rng, centers, 200)
+        cls.index = IVFIndex.build(cls.vectors, seed=0)
+
+    def exact(self, k: int) -> np.ndarray:
+        return np.argsort(-(self.queries @ self.vectors.T), axis=1)[:, :k]
+
+    def test_recall(self):
+        exact = self.exact(10)
+        ids, scores = self.index.search(self.queries, 10, n_probe=8)
+        recall = np.mean([len(set(ids[i]) & set(exact[i])) / 10 for i in range(len(ids))])
+        self.assertGreaterEqual(recall, 0.9)
+        self.assertTrue((np.diff(scores, axis=1) <= 0).all())
+
+    def test_all_lists_is_exact(self):
+        ids, scores = self.index.search(self.queries, 5, n_probe=self.index.n_lists)
+        np.testing.assert_array_equal(ids, self.exact(5))
+        np.testing.assert_allclose(scores, np.sort(self.queries @ self.vectors.T, axis=1)[:, ::-1][:, :5], rtol=1e-5)
+
+    def test_fewer_vectors_than_k(self):
+        index = IVFIndex.build(self.vectors[:3], n_lists=2)
+        ids, _ = index.search(self.queries[:4], 5, n_probe=2)
+        self.assertEqual(ids.shape, (4, 5))
+        np.testing.assert_array_equal(np.sort(ids, axis=1)[:, 2:], [[0, 1, 2]] * 4)
+        self.assertTrue((ids[:, 3:] == -1).all())
+
+    def test_cached_index(self):
+        texts = [f"вершина {i}" for i in range(len(self.vectors))]
+        with tempfile.TemporaryDirectory() as directory:
+            built = cached_index(directory, texts, self.vectors)
+            loaded = cached_index(directory, texts, self.vectors)
+            self.assertIsInstance(loaded.vectors, np.memmap)
+            np.testing.assert_array_equal(
+                built.search(self.queries, 5)[0],
+                loaded.search(self.queries, 5)[0],
+            )
+            cached_index(directory, texts[:-1], self.vectors[:-1])
+            self.assertEqual(len(list(Path(directory).iterdir())), 2)
+
+
+class PairScoresTest(SimpleTestCase):
+    def test_matches_candidates(self):
+        fixtures = DIR_PATH / "fixtures/test_same_vertex"
+        features_a = FeatureTable.from_ontology(Parser().load_ontology(fixtures / "ontology1.yaml"))
+        features_b = FeatureTable.from_ontology(Parser().load_ontology(fixtures / "ontology2.yaml"))
+        rng = np.random.default_rng(0)
+        embeddings_a = normalize_rows(rng.normal(size=(len(features_a), 16)))
+        embeddings_b = normalize_rows(rng.normal(size=(len(features_b), 16)))
+
+        scorer = EmbeddingScorer()
+        dense = np.zeros((len(features_a), len(features_b)))
+        everything = scorer.candidates(features_a, features_b, embeddings_a, embeddings_b)
+        dense[everything.rows, everything.cols] = everything.scores
+
+        rows = rng.integers(0, len(features_a), 500)
+        cols = rng.integers(0, len(features_b), 500)
+        scores = scorer.pair_scores(features_a, features_b, embeddings_a, embeddings_b, rows, cols, block_size=7)
+        np.testing.assert_allclose(scores, dense[rows, cols], rtol=1e-6)
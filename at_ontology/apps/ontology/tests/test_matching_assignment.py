@@ -0,0 +1,72 @@
+import numpy as np
+from django.test import SimpleTestCase
+from scipy.optimize import linear_sum_assignment
+
+from at_ontology.apps.ontology.matching.assignment import assign
+from at_ontology.apps.ontology.matching.assignment import assign_pairs
+from at_ontology.apps.ontology.matching.assignment import AssignmentException
+from at_ontology.apps.ontology.matching.assignment import greedy_assignment
+from at_ontology.apps.ontology.matching.assignment import optimal_assignment
+
+
+def legacy_filter(sigma, min_score):
+    """Прежний ``_filter_one_to_one``: сортировка всех пар кортежами и жадный выбор."""
+    used_a, used_b, result = set(), set(), []
+    for (vid_a, vid_b), score in sorted(sigma.items(), key=lambda x: -x[1]):
+        if score < min_score:
+            break
+        if vid_a in used_a or vid_b in used_b:
+            continue
+        used_a.add(vid_a)
+        used_b.add(vid_b)
+        result.append(((vid_a, vid_b), score))
+    return result
+
+
+class AssignmentTest(SimpleTestCase):
+    def random_pairs(self, seed: int, n_a: int = 60, n_b: int = 40, density: float = 0.3):
+        rng = np.random.default_rng(seed)
+        rows, cols = np.nonzero(rng.random((n_a, n_b)) < density)
+        # Оценки с двумя знаками после запятой, чтобы были равные
+        scores = np.round(rng.random(len(rows)), 2)
+        order = rng.permutation(len(rows))
+        return rows[order], cols[order], scores[order]
+
+    def test_greedy_matches_legacy(self):
+        for seed in range(5):
+            rows, cols, scores = self.random_pairs(seed)
+            sigma = {(f"a{row}", f"b{col}"): score for row, col, score in zip(rows, cols, scores.tolist())}
+            expected = legacy_filter(sigma, 0.3)
+            self.assertEqual(assign_pairs(sigma, 0.3), expected)
+            chosen = greedy_assignment(rows, cols, scores, 0.3, chunk_size=7)
+            self.assertEqual([(f"a{rows[i]}", f"b{cols[i]}") for i in chosen], [pair for pair, _ in expected])
+
+    def test_optimal_is_maximal(self):
+        for seed in range(5):
+            rows, cols, scores = self.random_pairs(seed)
+            chosen = optimal_assignment(rows, cols, scores, 0.2)
+            self.assertEqual(len(set(rows[chosen])), len(chosen))
+            self.assertEqual(len(set(cols[chosen])), len(chosen))
+            self.assertTrue((np.diff(scores[chosen]) <= 0).all())
+
+            dense = np.zeros((rows.max() + 1, cols.max() + 1))
+            kept = scores >= 0.2
+            dense[rows[kept], cols[kept]] = scores[kept]
+            best_rows, best_cols = linear_sum_assignment(dense, maximize=True)
+            self.assertAlmostEqual(scores[chosen].sum(), dense[best_rows, best_cols].sum())
+
+            greedy = greedy_assignment(rows, cols, scores, 0.2)
+            self.assertGreaterEqual(scores[chosen].sum(), scores[greedy].sum() - 1e-9)
+
+    def test_optimal_beats_greedy(self):
+        rows, cols, scores = np.array([0, 0, 1]), np.array([0, 1, 0]), np.array([0.9, 0.8, 0.8])
+        self.assertEqual(greedy_assignment(rows, cols, scores).tolist(), [0])
+        self.assertEqual(sorted(optimal_assignment(rows, cols, scores).tolist()), [1, 2])
+
+    def test_assign_pairs(self):
+        sigma = {("a", "x"): 0.9, ("a", "y"): 0.5, ("b", "x"): 0.95, ("c", "z"): 0.1}
+        self.assertEqual(assign_pairs(sigma, 0.2, vertices_a={"a", "c"}), [(("a", "x"), 0.9)])
+        self.assertEqual(assign_pairs(sigma, 0.2, "optimal"), [(("b", "x"), 0.95), (("a", "y"), 0.5)])
+        self.assertEqual(assign_pairs({}, 0.2), [])
+        with self.assertRaises(AssignmentException):
+            assign(np.array([0]), np.array([0]), np.array([1.0]), method="auction")
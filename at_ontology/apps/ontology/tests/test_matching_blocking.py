@@ -0,0 +1,111 @@
+from pathlib import Path
+from unittest import mock
+
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.graph import topic_vertex_filter
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_final
+from at_ontology.apps.ontology.tests.ontology_intersection import OntologyIntersection
+
+DIR_PATH = Path(__file__).parent
+
+
+class CandidateBlockingTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        cls.ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        cls.graph_a = MatchGraph.from_ontology(cls.ontology_a, topic_vertex_filter)
+        cls.graph_b = MatchGraph.from_ontology(cls.ontology_b, topic_vertex_filter)
+
+        # Эталон — пары с высоким σ⁰ полного перебора (для каждой четвёртой вершины A, чтобы тест был быстрым)
+        legacy_a = similarity_flooding_copy_final._load_graph(cls.ontology_a, topic_vertex_filter)
+        legacy_b = similarity_flooding_copy_final._load_graph(cls.ontology_b, topic_vertex_filter)
+        legacy_a._build_indices()
+        legacy_b._build_indices()
+        cls.reference = [
+            (name_a, name_b)
+            for name_a in list(legacy_a.vertices)[::4]
+            for name_b in legacy_b.vertices
+            if similarity_flooding_copy_final._initial_sigma(
+                legacy_a.vertices[name_a], legacy_b.vertices[name_b], legacy_a, legacy_b
+            )
+            >= 0.5
+        ]
+
+    def test_recall(self):
+        candidates = CandidateBlocker().candidates(self.graph_a, self.graph_b)
+        self.assertGreaterEqual(candidates.recall(self.reference, self.graph_a, self.graph_b), 0.95)
+        self.assertGreaterEqual(candidates.reduction, 0.8)
+
+    def test_threshold_trades_recall_for_size(self):
+        strict = CandidateBlocker(threshold=0.4, top_k=0).candidates(self.graph_a, self.graph_b)
+        loose = CandidateBlocker(threshold=0.1, top_k=0).candidates(self.graph_a, self.graph_b)
+        self.assertLess(len(strict), len(loose))
+        self.assertTrue(set(strict.names(self.graph_a, self.graph_b)) <= set(loose.names(self.graph_a, self.graph_b)))
+        self.assertLessEqual(
+            strict.recall(self.reference, self.graph_a, self.graph_b),
+            loose.recall(self.reference, self.graph_a, self.graph_b),
+        )
+
+    def test_top_k_covers_every_vertex(self):
+        blocker = CandidateBlocker(threshold=1.1, top_k=1)
+        candidates = blocker.candidates(self.graph_a, self.graph_b)
+        scores = blocker.text_scores(self.graph_a, self.graph_b).tocoo()
+        self.assertEqual(set(candidates.rows.tolist()), set(scores.row.tolist()))
+        self.assertEqual(set(candidates.cols.tolist()), set(scores.col.tolist()))
+
+    def test_abbreviation(self):
+        blocker = CandidateBlocker()
+        self.assertIn("^иэс", blocker.token_features("Интеллектуальных экспертных систем"))
+        self.assertIn("^иэс", blocker.token_features("Динамические ИЭС"))
+
+    def test_matcher_with_blocker(self):
+        matcher = similarity_flooding_copy_final.OntologySimilarityMatcher(
+            self.ontology_a,
+            self.ontology_b,
+            vertex_filter=topic_vertex_filter,
+            blocker=CandidateBlocker(),
+        )
+        results = matcher.run()
+        self.assertTrue(results)
+        names_a = {result.vertex_a.name for result in results}
+        self.assertEqual(len(names_a), len(results))
+
+    def test_intersection_workers_with_blocker(self):
+        blocker = CandidateBlocker()
+        expected = OntologyIntersection(self.ontology_a, self.ontology_b, verbose=False, blocker=blocker).run()
+        # С блокировщиком σ⁰ считается только для кандидатов, без матрицы A × B
+        with mock.patch.object(ContextScorer, "matrix", side_effect=AssertionError):
+            result = OntologyIntersection(
+                self.ontology_a, self.ontology_b, verbose=False, blocker=blocker, workers=1
+            ).run()
+        self.assertEqual(
+            [(pair.vertex_a.name, pair.vertex_b.name) for pair in result.pairs],
+            [(pair.vertex_a.name, pair.vertex_b.name) for pair in expected.pairs],
+        )
+        for pair, reference in zip(result.pairs, expected.pairs):
+            self.assertAlmostEqual(pair.initial_score, reference.initial_score, places=6)
+            self.assertAlmostEqual(pair.score, reference.score, places=6)
+
+    def test_candidates_many(self):
+        blocker = CandidateBlocker()
+        expected = blocker.candidates(self.graph_a, self.graph_b)
+        pair = blocker.candidates_many([self.graph_a, self.graph_b])
+        self.assertEqual(list(pair), [(0, 1)])
+        self.assertEqual(pair[0, 1].names(self.graph_a, self.graph_b), expected.names(self.graph_a, self.graph_b))
+
+        # IDF считается по всем графам, но вершины копии графа остаются кандидатами для самих себя
+        candidates = blocker.candidates_many([self.graph_a, self.graph_b, self.graph_a])
+        self.assertEqual(set(candidates), {(0, 1), (0, 2), (1, 2)})
+        self_pairs = candidates[0, 2]
+        self.assertTrue(
+            set(zip(self_pairs.rows.tolist(), self_pairs.cols.tolist()))
+            >= {(i, i) for i in range(len(self.graph_a)) if self.graph_a.vertices[i].label}
+        )
+        self.assertGreaterEqual(candidates[0, 1].recall(self.reference, self.graph_a, self.graph_b), 0.95)
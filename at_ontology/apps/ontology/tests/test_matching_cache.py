@@ -0,0 +1,110 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import override_settings
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.cache import set_similarity_cache
+from at_ontology.apps.ontology.matching.cache import similarity_cache
+from at_ontology.apps.ontology.matching.cache import SimilarityCache
+from at_ontology.apps.ontology.matching.strings import CHAR_SIMILARITY_KIND
+from at_ontology.apps.ontology.matching.strings import char_similarity_matrix
+
+
+class CountingSimilarity(object):
+    """Посимвольная схожесть без кэша, считающая запрошенные пары."""
+
+    def __init__(self):
+        self.pairs = 0
+
+    def __call__(self, words_a: list[str], words_b: list[str]) -> np.ndarray:
+        self.pairs += len(words_a) * len(words_b)
+        with override_settings(ONTOLOGY_SIMILARITY_CACHE_SIZE=0, ONTOLOGY_SIMILARITY_CACHE_PATH=None):
+            set_similarity_cache(None)
+            return char_similarity_matrix(words_a, words_b)
+
+
+class SimilarityCacheTest(SimpleTestCase):
+    WORDS_A = ["Введение", "Основные понятия", "Графы", "", "деревья"]
+    WORDS_B = ["Основные понятия", "Введение в графы", "Деревья", "Графы"]
+
+    def setUp(self):
+        self.addCleanup(set_similarity_cache, None)
+        self.compute = CountingSimilarity()
+        self.expected = self.compute(self.WORDS_A, self.WORDS_B)
+        self.compute.pairs = 0
+
+    def test_matrix(self):
+        cache = SimilarityCache()
+        np.testing.assert_array_equal(cache.matrix("char", self.WORDS_A, self.WORDS_B, self.compute), self.expected)
+        self.assertEqual(self.compute.pairs, len(self.WORDS_A) * len(self.WORDS_B))
+
+        # Порядок пары не важен: обратная матрица целиком берётся из кэша
+        np.testing.assert_array_equal(cache.matrix("char", self.WORDS_B, self.WORDS_A, self.compute), self.expected.T)
+        self.assertEqual(self.compute.pairs, len(self.WORDS_A) * len(self.WORDS_B))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+        # Считаются только строки и столбцы с промахами
+        cache.matrix("char", self.WORDS_A + ["Лес"], self.WORDS_B, self.compute)
+        self.assertEqual(self.compute.pairs, (len(self.WORDS_A) + 1) * len(self.WORDS_B))
+
+        # Другая версия формулы — другие ключи
+        cache.matrix("char:2", self.WORDS_A, self.WORDS_B, self.compute)
+        self.assertEqual(self.compute.pairs, (2 * len(self.WORDS_A) + 1) * len(self.WORDS_B))
+
+    def test_bound(self):
+        cache = SimilarityCache(max_entries=3)
+        cache.matrix("char", self.WORDS_A[-1:], self.WORDS_B[-3:], self.compute)
+        self.assertEqual(len(cache), 3)
+        cache.matrix("char", self.WORDS_A[:1], self.WORDS_B[:3], self.compute)
+        self.assertEqual(len(cache), 3)
+        cache.matrix("char", self.WORDS_A[:1], self.WORDS_B[:3], self.compute)
+        self.assertEqual(cache.stats()["hits"], 3)
+
+        disabled = SimilarityCache(0)
+        np.testing.assert_array_equal(disabled.matrix("char", self.WORDS_A, self.WORDS_B, self.compute), self.expected)
+        self.assertEqual(len(disabled), 0)
+
+    def test_larger_than_cache(self):
+        cache = SimilarityCache(max_entries=len(self.expected.flat) - 1)
+        # Матрица больше кэша считается напрямую одним вызовом, без поиска пар и без вытеснения записей
+        with mock.patch.object(cache, "_lookup", side_effect=AssertionError):
+            for _ in range(2):
+                matrix = cache.matrix("char", self.WORDS_A, self.WORDS_B, self.compute)
+                np.testing.assert_array_equal(matrix, self.expected)
+        self.assertEqual(self.compute.pairs, 2 * len(self.expected.flat))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["bypassed"], 2 * len(self.expected.flat))
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "similarity.sqlite3"
+            first = SimilarityCache(path=path)
+            first.matrix("char", self.WORDS_A, self.WORDS_B, self.compute)
+            first.close()
+            computed = self.compute.pairs
+
+            cache = SimilarityCache(path=path)
+            self.addCleanup(cache.close)
+            matrix = cache.matrix("char", self.WORDS_B, self.WORDS_A, self.compute)
+            np.testing.assert_array_equal(matrix, self.expected.T)
+            self.assertEqual(self.compute.pairs, computed)
+            self.assertEqual(cache.stats()["disk_hits"], len(self.WORDS_A) * len(self.WORDS_B))
+
+            cache.matrix("char", self.WORDS_A, self.WORDS_B, self.compute)
+            self.assertEqual(cache.stats()["hits"], len(self.WORDS_A) * len(self.WORDS_B))
+
+    def test_shared_cache(self):
+        with override_settings(ONTOLOGY_SIMILARITY_CACHE_SIZE=0, ONTOLOGY_SIMILARITY_CACHE_PATH=None):
+            set_similarity_cache(None)
+            self.assertIsNone(similarity_cache())
+
+        cache = SimilarityCache()
+        set_similarity_cache(cache)
+        self.assertIs(similarity_cache(), cache)
+        for _ in range(2):
+            np.testing.assert_array_equal(char_similarity_matrix(self.WORDS_A, self.WORDS_B), self.expected)
+        self.assertEqual((cache.hits, cache.misses), (len(self.expected.flat), len(self.expected.flat)))
+        self.assertEqual({kind for kind, _ in cache._strings}, {CHAR_SIMILARITY_KIND})
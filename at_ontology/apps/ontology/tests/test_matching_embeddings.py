@@ -0,0 +1,66 @@
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.embeddings import EmbeddingStore
+from at_ontology.apps.ontology.matching.embeddings import EmbeddingStoreException
+
+
+class CountingEncoder(object):
+    """Детерминированный «кодировщик»: вектор из длины текста и кодов первых символов."""
+
+    def __init__(self):
+        self.encoded: list[str] = []
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        self.encoded.extend(texts)
+        return np.array([[len(text), *(ord(ch) for ch in text[:3].ljust(3))] for text in texts], dtype=np.float32)
+
+
+class EmbeddingStoreTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_encodes_only_missing_texts(self):
+        encoder = CountingEncoder()
+        store = EmbeddingStore(self.directory.name, "test/model")
+        vectors = store.encode(["графы", "деревья", "графы"], encoder)
+        self.assertEqual(encoder.encoded, ["графы", "деревья"])
+        np.testing.assert_array_equal(vectors[0], vectors[2])
+
+        store.encode(["графы", "сети"], encoder)
+        self.assertEqual(encoder.encoded, ["графы", "деревья", "сети"])
+        self.assertEqual(len(store), 3)
+
+    def test_persistence(self):
+        encoder = CountingEncoder()
+        expected = EmbeddingStore(self.directory.name, "test/model").encode(["графы", "деревья"], encoder)
+
+        store = EmbeddingStore(self.directory.name, "test/model")
+        self.assertIsInstance(store.vectors, np.memmap)
+        np.testing.assert_array_equal(store.get(["деревья", "графы"]), expected[::-1])
+        np.testing.assert_array_equal(store.rows(["деревья", "сети"]), [1, -1])
+        store.encode(["графы", "деревья"], encoder)
+        self.assertEqual(len(encoder.encoded), 2)
+
+    def test_incomplete_write_is_ignored(self):
+        store = EmbeddingStore(self.directory.name, "test/model")
+        store.encode(["графы"], CountingEncoder())
+        with open(store.path / "vectors.f32", "ab") as file:
+            file.write(b"\x00" * 7)
+
+        store = EmbeddingStore(self.directory.name, "test/model")
+        self.assertEqual(len(store), 1)
+        store.encode(["деревья"], CountingEncoder())
+        store = EmbeddingStore(self.directory.name, "test/model")
+        np.testing.assert_array_equal(store.get(["деревья"]), CountingEncoder()(["деревья"]))
+
+    def test_dimension_mismatch(self):
+        store = EmbeddingStore(self.directory.name, "test/model")
+        store.add(["графы"], np.zeros((1, 4)))
+        with self.assertRaises(EmbeddingStoreException):
+            store.add(["деревья"], np.zeros((1, 5)))
+        with self.assertRaises(EmbeddingStoreException):
+            store.get(["деревья"])
@@ -0,0 +1,183 @@
+import random
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.db.models import Q
+from django.test import SimpleTestCase
+from django.test import TestCase
+
+from at_ontology.apps.ontology.matching import scoring
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.features import FeatureTableService
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.matching.scoring import string_similarity_matrix
+from at_ontology.apps.ontology.matching.scoring import StringScorer
+from at_ontology.apps.ontology.matching.scoring import TokenScorer
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Relationship
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology.models import VertexPropertyAssignment
+from at_ontology.apps.ontology.tests import ontology_intersection
+from at_ontology.apps.ontology.tests import similarity_flooding
+from at_ontology.apps.ontology.tests import similarity_flooding_cool_run
+from at_ontology.apps.ontology.tests import similarity_flooding_copy
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_cool_run2
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_final
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import RelationshipType
+from at_ontology.apps.ontology_model.models import VertexType
+from at_ontology.apps.ontology_model.models import VertexTypePropertyDefinition
+
+DIR_PATH = Path(__file__).parent
+
+
+class ScorerEquivalenceTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        cls.ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        cls.features_a = FeatureTable.from_ontology(cls.ontology_a)
+        cls.features_b = FeatureTable.from_ontology(cls.ontology_b)
+
+        rnd = random.Random(0)
+        cls.sample = [(rnd.randrange(len(cls.features_a)), rnd.randrange(len(cls.features_b))) for _ in range(300)]
+
+    def legacy_graphs(self, module):
+        graph_a = module._load_graph(self.ontology_a, lambda vertex: True)
+        graph_b = module._load_graph(self.ontology_b, lambda vertex: True)
+        for graph in (graph_a, graph_b):
+            getattr(graph, "_build_indices", getattr(graph, "build_indices", None))()
+        return graph_a, graph_b
+
+    def assertMatchesLegacy(self, matrix, legacy):
+        for i, j in self.sample:
+            vertex_a = self.features_a.graph.vertices[i]
+            vertex_b = self.features_b.graph.vertices[j]
+            self.assertAlmostEqual(matrix[i, j], legacy(vertex_a, vertex_b), places=12)
+
+    def test_features(self):
+        graph_a, _ = self.legacy_graphs(similarity_flooding)
+        for i, name in enumerate(self.features_a.names):
+            parent_label = similarity_flooding_copy_final._get_parent_label(name, graph_a)
+            self.assertEqual(self.features_a.parent_label(i), parent_label)
+            children = [self.features_a.stripped_labels[child] for child in self.features_a.children_of(i)]
+            self.assertEqual(children, similarity_flooding._get_children_labels(name, graph_a))
+            vertex = self.features_a.graph.vertices[i]
+            self.assertEqual(self.features_a.property_names[i], similarity_flooding_copy._get_property_names(vertex))
+
+    def test_context_scorer(self):
+        matrix = ContextScorer().matrix(self.features_a, self.features_b)
+        for module, legacy in (
+            (similarity_flooding, similarity_flooding._initial_sigma),
+            (ontology_intersection, ontology_intersection._compute_sigma0),
+        ):
+            graph_a, graph_b = self.legacy_graphs(module)
+            self.assertMatchesLegacy(matrix, lambda vertex_a, vertex_b: legacy(vertex_a, vertex_b, graph_a, graph_b))
+
+    def test_scorer_workers(self):
+        np.testing.assert_array_equal(
+            ContextScorer(workers=2).matrix(self.features_a, self.features_b),
+            ContextScorer().matrix(self.features_a, self.features_b),
+        )
+
+    def test_string_scorer(self):
+        matrix = StringScorer().matrix(self.features_a, self.features_b)
+        self.assertMatchesLegacy(matrix, similarity_flooding_copy._initial_sigma)
+
+        matrix = StringScorer(name_weight=0.2, property_weight=0.15).matrix(self.features_a, self.features_b)
+        self.assertMatchesLegacy(matrix, similarity_flooding_cool_run._initial_sigma)
+
+    def test_string_scorer_with_parents(self):
+        module = similarity_flooding_copy_cool_run2
+        graph_a, graph_b = self.legacy_graphs(module)
+        scorer = StringScorer(name_weight=0.2, property_weight=0.15, parent_weight=0.3)
+        self.assertMatchesLegacy(
+            scorer.matrix(self.features_a, self.features_b),
+            lambda vertex_a, vertex_b: module._initial_sigma(vertex_a, vertex_b, graph_a, graph_b),
+        )
+
+    def test_token_scorer(self):
+        module = similarity_flooding_copy_final
+        graph_a, graph_b = self.legacy_graphs(module)
+        self.assertMatchesLegacy(
+            TokenScorer().matrix(self.features_a, self.features_b),
+            lambda vertex_a, vertex_b: module._initial_sigma(vertex_a, vertex_b, graph_a, graph_b),
+        )
+
+    def test_pair_scores(self):
+        rows = np.array([i for i, _ in self.sample], dtype=np.int64)
+        cols = np.array([j for _, j in self.sample], dtype=np.int64)
+        size = len(self.features_a) * len(self.features_b)
+        for scorer in (
+            ContextScorer(),
+            StringScorer(),
+            StringScorer(name_weight=0.2, property_weight=0.15, parent_weight=0.3),
+            TokenScorer(),
+        ):
+            with self.subTest(scorer=type(scorer).__name__):
+                matrix = scorer.matrix(self.features_a, self.features_b)
+                shapes = []
+
+                def similarity(*args, **kwargs):
+                    result = string_similarity_matrix(*args, **kwargs)
+                    shapes.append(result.shape)
+                    return result
+
+                # Матрица A × B не строится: ни сама оценка, ни схожесть строк всех вершин
+                with mock.patch.object(type(scorer), "matrix", side_effect=AssertionError), mock.patch.object(
+                    scoring, "string_similarity_matrix", side_effect=similarity
+                ):
+                    scores = scorer.pair_scores(self.features_a, self.features_b, rows, cols, block_size=8)
+                np.testing.assert_allclose(scores, matrix[rows, cols], rtol=0, atol=1e-12)
+                self.assertTrue(all(n_a * n_b < size for n_a, n_b in shapes))
+
+
+class FeatureTableServiceTest(TestCase):
+    def setUp(self):
+        self.ontology = Ontology.objects.create(name="FeaturesOntology")
+        self.model = OntologyModel.objects.create(name="FeaturesModel")
+        self.type = VertexType.objects.create(name="CourseElement", ontology_model=self.model)
+        self.hierarchy = RelationshipType.objects.create(name="Hierarchy", ontology_model=self.model)
+        self.questions = VertexTypePropertyDefinition.objects.create(name="questions", vertex_type=self.type)
+
+        self.root = Vertex.objects.create(name="Topic_1", label="Теория графов", type=self.type, ontology=self.ontology)
+        self.child = Vertex.objects.create(name="Topic_2", label=" Деревья ", type=self.type, ontology=self.ontology)
+        self.other = Vertex.objects.create(name="Other", type=self.type, ontology=self.ontology)
+        Relationship.objects.create(
+            name="Hierarchy_0",
+            type=self.hierarchy,
+            source=self.root,
+            target=self.child,
+            ontology=self.ontology,
+        )
+        VertexPropertyAssignment.objects.create(vertex=self.child, definition=self.questions, value=[])
+        FeatureTableService.invalidate()
+
+    def test_from_db(self):
+        with self.assertNumQueries(3):
+            table = FeatureTableService.get(self.ontology)
+        self.assertEqual(table.names, ["Other", "Topic_1", "Topic_2"])
+        self.assertEqual(table.labels, ["Other", "Теория графов", " Деревья "])
+        self.assertEqual(table.stripped_labels[2], "Деревья")
+        self.assertEqual(table.parent_label(2), "Теория графов")
+        self.assertEqual(table.children_of(1).tolist(), [2])
+        self.assertEqual(table.property_names, [frozenset(), frozenset(), frozenset({"questions"})])
+
+        topics = FeatureTableService.get(self.ontology, Q(name__startswith="Topic_"))
+        self.assertEqual(topics.names, ["Topic_1", "Topic_2"])
+
+    def test_cache_invalidation(self):
+        table = FeatureTableService.get(self.ontology)
+        with self.assertNumQueries(0):
+            self.assertIs(FeatureTableService.get(self.ontology.id), table)
+
+        self.other.label = "Другое"
+        self.other.save()
+        table = FeatureTableService.get(self.ontology)
+        self.assertEqual(table.labels[0], "Другое")
+
+        VertexPropertyAssignment.objects.create(vertex=self.other, definition=self.questions, value=[])
+        self.assertEqual(FeatureTableService.get(self.ontology).property_names[0], frozenset({"questions"}))
@@ -0,0 +1,129 @@
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.graph import topic_vertex_filter
+from at_ontology.apps.ontology.matching.incremental import IncrementalMatcher
+from at_ontology.apps.ontology.matching.incremental import MatchState
+from at_ontology.apps.ontology.matching.scoring import ContextScorer
+from at_ontology.apps.ontology.tests.ontology_intersection import OntologyIntersection
+
+DIR_PATH = Path(__file__).parent
+
+
+def edited(graph: MatchGraph, renamed: int, edge: tuple[int, int]) -> FeatureTable:
+    """Копия графа: вершина ``renamed`` переименована, добавлены новая вершина-лист и ребро ``edge``."""
+    vertices = [
+        SimpleNamespace(name=name, label=getattr(vertex, "label", None))
+        for name, vertex in zip(graph.names, graph.vertices)
+    ]
+    vertices[renamed].label = "Совсем другое название темы"
+    vertices.append(SimpleNamespace(name="Topic_new", label="Новая тема"))
+    hierarchy = graph.label_index["Hierarchy"]
+    return FeatureTable(
+        MatchGraph(
+            [vertex.name for vertex in vertices],
+            vertices,
+            np.concatenate([graph.edge_source, [edge[0], renamed]]),
+            np.concatenate([graph.edge_target, [edge[1], len(graph)]]),
+            np.concatenate([graph.edge_label, [graph.label_index["Association"], hierarchy]]),
+            graph.labels,
+        )
+    )
+
+
+class IncrementalMatcherTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        cls.ontology_a, cls.ontology_b = ontology_a, ontology_b
+        cls.features_a = FeatureTable.from_ontology(ontology_a, topic_vertex_filter)
+        cls.features_b = FeatureTable.from_ontology(ontology_b, topic_vertex_filter)
+        cls.matcher = IncrementalMatcher()
+        cls.cold = cls.matcher.run(cls.features_a, cls.features_b)
+
+        # Вершина с родителем и детьми, чтобы правка задела соседей по иерархии
+        graph = cls.features_a.graph
+        renamed = next(
+            i for i in range(len(graph)) if cls.features_a.parents[i] >= 0 and cls.features_a.child_counts[i]
+        )
+        cls.edited_a = edited(graph, renamed, (0, len(graph) - 1))
+
+    def test_unchanged(self):
+        result = self.matcher.run(self.features_a, self.features_b, self.cold.state)
+        self.assertEqual((result.rows, result.cols), (0, 0))
+        self.assertEqual(result.flood.iterations, 1)
+        self.assertEqual(result.sigma0(), self.cold.sigma0())
+        self.assertIsNone(self.cold.delta)
+        self.assertLess(result.delta, 1e-3)
+
+    def test_edit(self):
+        full = self.matcher.run(self.edited_a, self.features_b)
+        result = self.matcher.run(self.edited_a, self.features_b, self.cold.state)
+
+        np.testing.assert_array_equal(result.state.scores, ContextScorer().matrix(self.edited_a, self.features_b))
+        self.assertLess(result.rows, len(self.edited_a) // 10)
+        self.assertEqual(result.cols, 0)
+        self.assertLess(result.flood.iterations, full.flood.iterations)
+
+        expected = full.sigma()
+        actual = result.sigma()
+        self.assertEqual(set(actual), set(expected))
+        self.assertLess(max(abs(actual[pair] - expected[pair]) for pair in expected), 1e-3)
+
+        # Δ — сдвиг σ относительно прежней неподвижной точки; вершины A сопоставлены по именам
+        previous = self.cold.sigma()
+        self.assertAlmostEqual(
+            result.delta, sum(abs(actual.get(pair, 0.0) - previous.get(pair, 0.0)) for pair in {*actual, *previous})
+        )
+
+    def test_state_roundtrip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(MatchState.load(directory))
+            self.cold.state.save(directory)
+            state = MatchState.load(directory)
+        self.assertEqual(state.names_a, self.cold.state.names_a)
+        np.testing.assert_array_equal(state.scores, self.cold.state.scores)
+        result = self.matcher.run(self.features_a, self.features_b, state)
+        self.assertEqual((result.rows, result.cols), (0, 0))
+
+    def test_intersection_state_path(self):
+        expected = OntologyIntersection(self.ontology_a, self.ontology_b, verbose=False, workers=1).run()
+        with tempfile.TemporaryDirectory() as directory:
+            intersection = OntologyIntersection(self.ontology_a, self.ontology_b, verbose=False, state_path=directory)
+            for _ in range(2):
+                result = intersection.run()
+                self.assertEqual(
+                    [(pair.vertex_a.name, pair.vertex_b.name) for pair in result.pairs],
+                    [(pair.vertex_a.name, pair.vertex_b.name) for pair in expected.pairs],
+                )
+
+    def test_config_change(self):
+        # Состояние с другими весами σ⁰ не переносится: запуск идёт как холодный
+        matcher = IncrementalMatcher(ContextScorer(label_weight=0.6, parent_weight=0.2))
+        result = matcher.run(self.features_a, self.features_b, self.cold.state)
+        self.assertEqual((result.rows, result.cols), (len(self.features_a), len(self.features_b)))
+        np.testing.assert_array_equal(result.state.scores, matcher.scorer.matrix(self.features_a, self.features_b))
+        self.assertNotEqual(result.state.config_hash, self.cold.state.config_hash)
+
+    def test_intersection_state_path_with_blocker(self):
+        blocker = CandidateBlocker()
+        candidates = blocker.candidates(self.features_a.graph, self.features_b.graph)
+        allowed = set(candidates.names(self.features_a.graph, self.features_b.graph))
+        with tempfile.TemporaryDirectory() as directory:
+            intersection = OntologyIntersection(
+                self.ontology_a, self.ontology_b, verbose=False, blocker=blocker, state_path=directory
+            )
+            result = intersection.run()
+            self.assertTrue(result.pairs)
+            self.assertLessEqual({(pair.vertex_a.name, pair.vertex_b.name) for pair in result.pairs}, allowed)
+            self.assertEqual(MatchState.load(directory).scores.shape, (len(self.features_a), len(self.features_b)))
@@ -0,0 +1,198 @@
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+from unittest import skipIf
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test import TransactionTestCase
+
+from at_ontology.apps.ontology.alignment import AlignmentException
+from at_ontology.apps.ontology.alignment import AlignmentService
+from at_ontology.apps.ontology.matching import strings
+from at_ontology.apps.ontology.matching.jobs import MatchingJobException
+from at_ontology.apps.ontology.matching.jobs import MatchingJobManager
+from at_ontology.apps.ontology.matching.pipeline import MatchingPipeline
+from at_ontology.apps.ontology.matching.pipeline import STAGES
+from at_ontology.apps.ontology.matching.scoring import StringScorer
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Relationship
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import RelationshipType
+from at_ontology.apps.ontology_model.models import VertexType
+
+try:
+    from at_ontology.core.component import ATOntology
+except ImportError:  # at_queue ставится вместе с компонентом
+    ATOntology = None
+
+TOPICS_A = {"Topic_1": "Теория графов", "Topic_2": "Деревья", "Topic_3": "Обход графа", "Topic_4": "Кратчайшие пути"}
+TOPICS_B = {"Topic_1": "Графы", "Topic_2": "Дерево", "Topic_3": "Обходы графов", "Topic_4": "Сортировка"}
+PARAMS = {"vertex_filter": "all"}
+
+
+# Задачи выполняются в пуле потоков: отдельные соединения потоков видят только зафиксированные данные
+class MatchingJobManagerTest(TransactionTestCase):
+    def setUp(self):
+        model = OntologyModel.objects.create(name="JobsModel")
+        vertex_type = VertexType.objects.create(name="Topic", ontology_model=model)
+        hierarchy = RelationshipType.objects.create(name="Hierarchy", ontology_model=model)
+        self.ontology_a = Ontology.objects.create(name="JobsA")
+        self.ontology_b = Ontology.objects.create(name="JobsB")
+        for ontology, topics in ((self.ontology_a, TOPICS_A), (self.ontology_b, TOPICS_B)):
+            vertices = [
+                Vertex.objects.create(name=name, label=label, type=vertex_type, ontology=ontology)
+                for name, label in topics.items()
+            ]
+            for i, child in enumerate(vertices[1:]):
+                Relationship.objects.create(
+                    name=f"Hierarchy_{i}", type=hierarchy, source=vertices[0], target=child, ontology=ontology
+                )
+
+        self.manager = MatchingJobManager(workers=1, processes=False)
+        self.addCleanup(self.manager.shutdown)
+
+    def start(self) -> str:
+        return self.manager.start(self.ontology_a.id, str(self.ontology_b.id), "similarity_flooding_copy", PARAMS)
+
+    def test_job(self):
+        job = self.manager.wait(self.start(), timeout=30)
+        self.assertEqual(job.status, "done", job.error)
+
+        expected = MatchingPipeline.preset("similarity_flooding_copy", **PARAMS).run(self.ontology_a, self.ontology_b)
+        self.assertEqual(job.results, expected.pairs())
+        self.assertEqual(self.manager.results(job.id, offset=1, limit=2), expected.pairs()[1:3])
+        alignment = AlignmentService.get(self.ontology_a, self.ontology_b, job.config)
+        self.assertEqual((alignment.id, AlignmentService.rows(alignment)), (job.alignment, job.results))
+
+        events = job.events
+        self.assertEqual(events[0], {"event": "started"})
+        self.assertEqual([event["stage"] for event in events if event["event"] == "stage"], list(STAGES))
+        iterations = [event for event in events if event["event"] == "iteration"]
+        self.assertEqual([event["iteration"] for event in iterations], list(range(1, len(iterations) + 1)))
+        self.assertEqual(len(iterations), expected.flood.iterations)
+        # Пары отправляются во время паросочетания, до события об окончании этапа
+        stages = [event.get("stage") for event in events]
+        self.assertEqual(events[stages.index("assignment") - 1], {"event": "results", "count": len(job.results)})
+        done = {"event": "done", "alignment": job.alignment, "pairs": len(job.results), "cached": False}
+        self.assertEqual(events[-1], done)
+
+        status = self.manager.status(job.id, events_offset=len(events) - 1)
+        self.assertEqual((status["status"], status["results"], status["events"]), ("done", len(job.results), [done]))
+
+        # Действительное сохранённое сопоставление отдаётся без пересчёта
+        cached = self.manager.wait(self.start(), timeout=30)
+        self.assertEqual(cached.results, job.results)
+        self.assertEqual([event["event"] for event in cached.events], ["started", "results", "done"])
+        self.assertTrue(cached.events[-1]["cached"])
+
+    def test_cancel(self):
+        gate = threading.Event()
+
+        def blocked_get(*args):
+            gate.wait(30)
+            return None
+
+        with mock.patch.object(AlignmentService, "get", side_effect=blocked_get):
+            running = self.start()
+            pending = self.start()
+            # Одна задача за раз: вторая ждёт в очереди пула
+            self.assertEqual(self.manager.status(pending)["status"], "pending")
+            self.assertTrue(self.manager.cancel(pending))
+            self.assertTrue(self.manager.cancel(running))
+            gate.set()
+            for job_id in (running, pending):
+                job = self.manager.wait(job_id, timeout=30)
+                self.assertEqual((job.status, job.results), ("cancelled", []))
+        self.assertEqual(self.manager.status(pending)["events"], [{"event": "cancelled"}])
+        self.assertFalse(self.manager.cancel(running))
+        self.assertIsNone(AlignmentService.get(self.ontology_a, self.ontology_b, job.config))
+
+    def test_cancel_during_sigma0(self):
+        entered, cancelled = threading.Event(), threading.Event()
+        matrix = StringScorer.matrix
+
+        def blocked_matrix(scorer, features_a, features_b, check=None):
+            entered.set()
+            cancelled.wait(30)
+            return matrix(scorer, features_a, features_b, check)
+
+        with mock.patch.object(StringScorer, "matrix", autospec=True, side_effect=blocked_matrix), mock.patch.object(
+            strings, "levenshtein_matrix", wraps=strings.levenshtein_matrix
+        ) as levenshtein:
+            job_id = self.start()
+            self.assertTrue(entered.wait(30))
+            self.assertTrue(self.manager.cancel(job_id))
+            cancelled.set()
+            job = self.manager.wait(job_id, timeout=30)
+        # Отмена прерывает σ⁰ изнутри: ни одного блока расстояний не посчитано
+        self.assertEqual(job.status, "cancelled")
+        levenshtein.assert_not_called()
+        self.assertEqual([event["stage"] for event in job.events if event["event"] == "stage"], list(STAGES[:3]))
+
+    def test_processes(self):
+        with self.assertRaises(MatchingJobException):
+            MatchingJobManager(workers=1).start(self.ontology_a.id, self.ontology_b.id)
+
+        # Тестовая БД SQLite в памяти не видна процессам пула: они получают её копию в файле
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "jobs.sqlite3"
+            connection.ensure_connection()
+            copy = sqlite3.connect(path)
+            connection.connection.backup(copy)
+            copy.close()
+            manager = MatchingJobManager(workers=1)
+            with mock.patch.dict(connection.settings_dict, NAME=str(path)):
+                job_id = manager.start(self.ontology_a.id, self.ontology_b.id, "similarity_flooding_copy", PARAMS)
+            try:
+                job = manager.wait(job_id, timeout=120)
+            finally:
+                manager.shutdown()
+
+        self.assertEqual(job.status, "done", job.error)
+        expected = MatchingPipeline.preset("similarity_flooding_copy", **PARAMS).run(self.ontology_a, self.ontology_b)
+        self.assertEqual(job.results, expected.pairs())
+        self.assertEqual(job.events[-1]["pairs"], len(expected.pairs()))
+
+    def test_errors(self):
+        with self.assertRaises(MatchingJobException):
+            self.manager.start(self.ontology_a.id, self.ontology_b.id, "missing")
+        with self.assertRaises(MatchingJobException):
+            self.manager.start(self.ontology_a.id, self.ontology_b.id, "embeddings_matcher")
+        with self.assertRaises(AlignmentException):
+            self.manager.start(self.ontology_a.id, self.ontology_a.id.hex[::-1], "similarity_flooding")
+        with self.assertRaises(MatchingJobException):
+            self.manager.status("missing")
+
+        with mock.patch.object(MatchingPipeline, "run", side_effect=ValueError("broken")):
+            job = self.manager.wait(self.start(), timeout=30)
+        self.assertEqual((job.status, job.error), ("failed", "ValueError: broken"))
+
+
+@skipIf(ATOntology is None, "at_queue is not installed")
+class ATOntologyMatchingTest(SimpleTestCase):
+    def setUp(self):
+        jobs = mock.patch("at_ontology.core.component.matching_jobs")
+        self.manager = jobs.start().return_value
+        self.addCleanup(jobs.stop)
+        self.component = ATOntology.__new__(ATOntology)
+
+    def test_methods(self):
+        self.manager.start.return_value = "job"
+        self.assertEqual(self.component.start_matching("a", "b", "similarity_flooding_copy", PARAMS), "job")
+        self.manager.start.assert_called_once_with("a", "b", "similarity_flooding_copy", PARAMS)
+
+        self.manager.status.return_value = {"status": "running"}
+        self.assertEqual(self.component.matching_status("job", 2), {"status": "running"})
+        self.manager.status.assert_called_once_with("job", 2)
+
+        self.manager.results.return_value = [("Topic_1", "Topic_1", 0.9, 0.7)]
+        self.assertEqual(self.component.matching_results("job", 1, 10), [["Topic_1", "Topic_1", 0.9, 0.7]])
+        self.manager.results.assert_called_once_with("job", 1, 10)
+
+        self.manager.cancel.return_value = True
+        self.assertTrue(self.component.cancel_matching("job"))
+        self.manager.cancel.assert_called_once_with("job")
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.assignment import assign
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.graph import topic_vertex_filter
+from at_ontology.apps.ontology.matching.nway import consolidate
+from at_ontology.apps.ontology.matching.nway import feature_tables
+from at_ontology.apps.ontology.matching.nway import MultiOntologyMatcher
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+
+DIR_PATH = Path(__file__).parent
+
+
+class MultiOntologyMatcherTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        ontology_c = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        cls.features = feature_tables({"a": ontology_a, "b": ontology_b, "c": ontology_c}, topic_vertex_filter)
+        cls.result = MultiOntologyMatcher().run(cls.features)
+
+    def test_pairwise(self):
+        features_a, features_b = self.features["a"], self.features["b"]
+        candidates = CandidateBlocker().candidates(features_a.graph, features_b.graph)
+        flood = SimilarityFlooding(formula="weighted").run(
+            features_a.graph,
+            features_b.graph,
+            candidates.rows,
+            candidates.cols,
+            candidates.scores,
+            candidates=candidates.pair_space(),
+        )
+        chosen = assign(flood.pairs.rows, flood.pairs.cols, flood.sigma, 0.3)
+        expected = [
+            (features_a.names[row], features_b.names[col])
+            for row, col in zip(flood.pairs.rows[chosen].tolist(), flood.pairs.cols[chosen].tolist())
+        ]
+
+        result = MultiOntologyMatcher().run({"a": features_a, "b": features_b})
+        self.assertEqual([(name_a, name_b) for name_a, name_b, _ in result.pairs("a", "b")], expected)
+        self.assertEqual(
+            [(name_b, name_a) for name_a, name_b, _ in result.pairs("a", "b")],
+            [(name_b, name_a) for name_b, name_a, _ in result.pairs("b", "a")],
+        )
+
+    def test_clusters(self):
+        self.assertEqual(set(self.result.alignments), {(0, 1), (0, 2), (1, 2)})
+        clusters = self.result.cluster_names()
+        self.assertTrue(clusters)
+        for cluster in clusters:
+            keys = [key for key, _ in cluster]
+            self.assertEqual(len(keys), len(set(keys)))
+
+        # Копия онтологии сопоставляется сама с собой, и её вершины попадают в общие кластеры
+        same = [(name_a, name_c) for name_a, name_c, _ in self.result.pairs("a", "c") if name_a == name_c]
+        self.assertGreaterEqual(len(same), len(self.result.pairs("a", "c")) * 0.9)
+        clustered = {vertex for cluster in clusters for vertex in cluster}
+        self.assertTrue(all(("a", name) in clustered and ("c", name) in clustered for name, _ in same))
+
+    def test_workers(self):
+        result = MultiOntologyMatcher(workers=2).run(self.features)
+        self.assertEqual(result.cluster_names(), self.result.cluster_names())
+
+    def test_consolidate(self):
+        owners = np.array([0, 0, 1, 2])
+        rows = np.array([0, 2, 1])
+        cols = np.array([2, 3, 3])
+        clusters = consolidate(owners, rows, cols, np.array([0.9, 0.8, 0.7]))
+        self.assertEqual([cluster.tolist() for cluster in clusters], [[0, 2, 3]])
+        clusters = consolidate(owners, rows, cols, np.array([0.9, 0.8, 0.7]), exclusive=False)
+        self.assertEqual([cluster.tolist() for cluster in clusters], [[0, 1, 2, 3]])
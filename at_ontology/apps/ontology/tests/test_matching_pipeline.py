@@ -0,0 +1,192 @@
+import contextlib
+import io
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching import pipeline as pipeline_module
+from at_ontology.apps.ontology.matching import strings
+from at_ontology.apps.ontology.matching.blocking import CandidateBlocker
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.pipeline import MatchingPipeline
+from at_ontology.apps.ontology.matching.pipeline import PipelineException
+from at_ontology.apps.ontology.matching.pipeline import STAGES
+from at_ontology.apps.ontology.matching.scoring import StringScorer
+from at_ontology.apps.ontology.matching.scoring import TokenScorer
+from at_ontology.apps.ontology.tests import embeddings_matcher
+from at_ontology.apps.ontology.tests import ontology_intersection
+from at_ontology.apps.ontology.tests import similarity_flooding
+from at_ontology.apps.ontology.tests import similarity_flooding_cool_run
+from at_ontology.apps.ontology.tests import similarity_flooding_copy
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_cool_run2
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_final
+
+DIR_PATH = Path(__file__).parent
+
+# Попарные сопоставители из tests/ медленные — сравниваем на первых темах обеих онтологий
+SUBSET_SIZE = 25
+
+
+def legacy_rows(results) -> list[tuple[str, str, float, float]]:
+    return [(result.vertex_a.name, result.vertex_b.name, result.score, result.initial_score) for result in results]
+
+
+class MatchingPipelineTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        cls.ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+
+        subset = set()
+        for ontology in (cls.ontology_a, cls.ontology_b):
+            subset.update(sorted(name for name in ontology.vertices if name.startswith("Topic_"))[:SUBSET_SIZE])
+        cls.subset_filter = staticmethod(lambda vertex: vertex.name in subset)
+        cls.features_a = FeatureTable.from_ontology(cls.ontology_a, cls.subset_filter)
+        cls.features_b = FeatureTable.from_ontology(cls.ontology_b, cls.subset_filter)
+
+    def assertReproduces(self, result, legacy):
+        pairs = result.pairs()
+        self.assertTrue(pairs)
+        self.assertEqual([pair[:2] for pair in pairs], [row[:2] for row in legacy])
+        for pair, row in zip(pairs, legacy):
+            self.assertAlmostEqual(pair[2], row[2], places=9)
+            self.assertAlmostEqual(pair[3], row[3], places=9)
+
+    def legacy(self, module, **kwargs):
+        matcher = module.OntologySimilarityMatcher(
+            self.ontology_a, self.ontology_b, vertex_filter=self.subset_filter, **kwargs
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            return legacy_rows(matcher.run())
+
+    def test_context_presets(self):
+        result = MatchingPipeline.preset("similarity_flooding").run(self.features_a, self.features_b)
+        self.assertReproduces(result, self.legacy(similarity_flooding))
+
+        intersection = ontology_intersection.OntologyIntersection(
+            self.ontology_a, self.ontology_b, verbose=False, vertex_filter=self.subset_filter
+        )
+        result = MatchingPipeline.preset("ontology_intersection").run(self.features_a, self.features_b)
+        self.assertReproduces(result, legacy_rows(intersection.run().pairs))
+
+    def test_string_presets(self):
+        for name, module in (
+            ("similarity_flooding_copy", similarity_flooding_copy),
+            ("similarity_flooding_cool_run", similarity_flooding_cool_run),
+            ("similarity_flooding_copy_cool_run2", similarity_flooding_copy_cool_run2),
+            ("similarity_flooding_copy_final", similarity_flooding_copy_final),
+        ):
+            with self.subTest(preset=name):
+                result = MatchingPipeline.preset(name).run(self.features_a, self.features_b)
+                self.assertReproduces(result, self.legacy(module))
+
+    def test_blocking(self):
+        blocking = {"threshold": 0.2, "top_k": 2}
+        pipeline = MatchingPipeline.preset("similarity_flooding_copy_final", blocking=blocking)
+        # С блокировщиком σ⁰ считается только для кандидатов, без матрицы A × B
+        with mock.patch.object(TokenScorer, "matrix", side_effect=AssertionError):
+            result = pipeline.run(self.features_a, self.features_b)
+        self.assertLess(len(result.candidates), len(self.features_a) * len(self.features_b))
+        self.assertReproduces(result, self.legacy(similarity_flooding_copy_final, blocker=CandidateBlocker(**blocking)))
+
+    def test_embeddings_preset(self):
+        rng = np.random.default_rng(0)
+        embeddings = []
+        for features in (self.features_a, self.features_b):
+            vectors = rng.normal(size=(len(features), 16)).astype(np.float32)
+            embeddings.append(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+        pipeline = MatchingPipeline.preset("embeddings_matcher")
+        result = pipeline.run(self.features_a, self.features_b, embeddings=tuple(embeddings))
+
+        # Сопоставитель кодирует сначала вершины A, затем B; имена вершин онтологий пересекаются
+        by_name = [dict(zip(self.features_a.names, embeddings[0])), dict(zip(self.features_b.names, embeddings[1]))]
+        matcher = embeddings_matcher.EmbeddingsSimilarityMatcher(
+            self.ontology_a, self.ontology_b, vertex_filter=self.subset_filter
+        )
+        with mock.patch.object(embeddings_matcher, "_compute_embeddings", side_effect=by_name):
+            with contextlib.redirect_stdout(io.StringIO()):
+                legacy = legacy_rows(matcher.run())
+        self.assertReproduces(result, legacy)
+
+        with self.assertRaises(PipelineException):
+            pipeline.run(self.features_a, self.features_b)
+
+    def test_weighted_scorers(self):
+        config = {
+            "vertex_filter": "all",
+            "scorers": [{"scorer": "string", "weight": 0.5}, {"scorer": "token", "weight": 0.5}],
+            "flooding": None,
+            "min_score": 0.2,
+        }
+        result = MatchingPipeline.from_config(config).run(self.features_a, self.features_b)
+        self.assertEqual(list(result.timings), list(STAGES))
+
+        pairs = result.flood.pairs
+        expected = 0.5 * StringScorer().matrix(self.features_a, self.features_b)
+        expected += 0.5 * TokenScorer().matrix(self.features_a, self.features_b)
+        np.testing.assert_allclose(result.flood.sigma0, expected[pairs.rows, pairs.cols])
+        np.testing.assert_allclose(result.flood.sigma, result.flood.sigma0 / result.flood.sigma0.max())
+        self.assertTrue(all(pair[2] >= 0.2 for pair in result.pairs()))
+
+        self.assertEqual(list(result.memory), ["sigma0", "propagation", "assignment"])
+        # σ⁰ всех пар небольших онтологий — плотная матрица во float64
+        self.assertEqual(result.memory["sigma0"], len(self.features_a) * len(self.features_b) * 8)
+        self.assertEqual(result.memory["propagation"], result.flood.nbytes)
+        similarity = result.similarity()
+        self.assertEqual(similarity.shape, (len(self.features_a), len(self.features_b)))
+        np.testing.assert_allclose(similarity.get(pairs.rows, pairs.cols), result.flood.sigma, rtol=1e-6)
+
+    def test_streamed_results(self):
+        for assignment in ("greedy", "optimal"):
+            with self.subTest(assignment=assignment):
+                pipeline = MatchingPipeline.preset("similarity_flooding_copy", assignment=assignment)
+                stages, batches = [], []
+
+                def progress(event):
+                    if event["event"] == "stage":
+                        stages.append(event["stage"])
+
+                def results(rows):
+                    # Пары приходят по ходу паросочетания, до конца этапа
+                    self.assertNotIn("assignment", stages)
+                    batches.append(rows)
+
+                with mock.patch.object(pipeline_module, "RESULT_BATCH_SIZE", 2):
+                    result = pipeline.run(self.features_a, self.features_b, progress=progress, results=results)
+                self.assertGreater(len(batches), 1)
+                self.assertTrue(all(len(batch) <= 2 for batch in batches))
+                self.assertEqual([row for batch in batches for row in batch], result.pairs())
+
+    def test_check(self):
+        stages = []
+
+        class Stop(Exception):
+            pass
+
+        def progress(event):
+            stages.append(event.get("stage"))
+
+        def check():
+            if stages[-1:] == ["blocking"]:
+                raise Stop()
+
+        pipeline = MatchingPipeline.preset("similarity_flooding")
+        # Проверка доходит до расчёта расстояний: σ⁰ прерывается до первого блока Левенштейна
+        with mock.patch.object(strings, "levenshtein_matrix", wraps=strings.levenshtein_matrix) as levenshtein:
+            with self.assertRaises(Stop):
+                pipeline.run(self.features_a, self.features_b, progress=progress, check=check)
+        self.assertEqual(stages, ["load", "features", "blocking"])
+        levenshtein.assert_not_called()
+
+    def test_config_errors(self):
+        with self.assertRaises(PipelineException):
+            MatchingPipeline.preset("missing")
+        with self.assertRaises(PipelineException):
+            MatchingPipeline.from_config({"scorers": [{"scorer": "missing"}]})
+        with self.assertRaises(PipelineException):
+            MatchingPipeline.from_config({"scorers": [{"scorer": "token"}], "vertex_filter": "missing"})
@@ -0,0 +1,148 @@
+import contextlib
+import io
+import random
+from pathlib import Path
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.propagation import PairSpace
+from at_ontology.apps.ontology.matching.propagation import pcg_blocks
+from at_ontology.apps.ontology.matching.propagation import pcg_pair_space
+from at_ontology.apps.ontology.matching.propagation import propagation_matrix
+from at_ontology.apps.ontology.matching.propagation import PropagationException
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.tests import ontology_intersection
+from at_ontology.apps.ontology.tests import similarity_flooding
+from at_ontology.apps.ontology.tests import similarity_flooding_copy
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_final
+
+DIR_PATH = Path(__file__).parent
+
+
+class SimilarityFloodingEquivalenceTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        cls.ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        cls.graph_a = MatchGraph.from_ontology(cls.ontology_a)
+        cls.graph_b = MatchGraph.from_ontology(cls.ontology_b)
+
+        rnd = random.Random(42)
+        cls.sigma0 = {
+            (name_a, name_b): rnd.random()
+            for name_a in cls.graph_a.names
+            for name_b in cls.graph_b.names
+            if rnd.random() < 0.05
+        }
+
+    def legacy_flood(self, module, iterations):
+        graph_a = module._load_graph(self.ontology_a)
+        graph_b = module._load_graph(self.ontology_b)
+        pcg = module._build_pcg(graph_a, graph_b)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return module._flood(dict(self.sigma0), pcg, graph_a, graph_b, iterations)
+
+    def assertSigmaEqual(self, legacy, result):
+        legacy = {pair: value for pair, value in legacy.items() if value}
+        self.assertEqual(set(legacy), set(result))
+        for pair, value in legacy.items():
+            self.assertAlmostEqual(value, result[pair], places=9)
+
+    def test_graph(self):
+        legacy = similarity_flooding_copy_final._load_graph(self.ontology_a)
+        self.assertEqual(self.graph_a.names, list(legacy.vertices))
+        self.assertEqual(self.graph_a.edge_count, len(legacy.edges))
+
+    def test_formula_c(self):
+        legacy = self.legacy_flood(similarity_flooding_copy_final, 20)
+        result = SimilarityFlooding(iterations=20).run_dict(self.graph_a, self.graph_b, self.sigma0)
+        self.assertSigmaEqual(legacy, result.to_dict(self.graph_a, self.graph_b))
+        self.assertEqual(result.to_dict(self.graph_a, self.graph_b, initial=True), self.sigma0)
+        self.assertEqual(len(result.deltas), result.iterations)
+
+    def test_formula_weighted(self):
+        legacy = self.legacy_flood(similarity_flooding, 10)
+        result = SimilarityFlooding(iterations=10, formula="weighted").run_dict(self.graph_a, self.graph_b, self.sigma0)
+        self.assertSigmaEqual(legacy, result.to_dict(self.graph_a, self.graph_b))
+
+    def test_formula_basic(self):
+        legacy = similarity_flooding_copy._normalize(self.legacy_flood(similarity_flooding_copy, 10))
+        result = SimilarityFlooding(iterations=10, formula="basic").run_dict(self.graph_a, self.graph_b, self.sigma0)
+        self.assertSigmaEqual(legacy, result.to_dict(self.graph_a, self.graph_b))
+
+    def test_pcg_blocks(self):
+        legacy = similarity_flooding._build_pcg(
+            similarity_flooding._load_graph(self.ontology_a, lambda vertex: True),
+            similarity_flooding._load_graph(self.ontology_b, lambda vertex: True),
+        )
+        pairs = pcg_pair_space(self.graph_a, self.graph_b)
+        names = {(self.graph_a.names[row], self.graph_b.names[col]) for row, col in zip(pairs.rows, pairs.cols)}
+        self.assertEqual(names, {edge.from_pair for edge in legacy} | {edge.to_pair for edge in legacy})
+
+        blocks = list(pcg_blocks(self.graph_a, self.graph_b, pairs, block_edges=7))
+        self.assertEqual(sum(len(block) for block in blocks), len(legacy))
+        dtypes = {(block.from_pairs.dtype.name, block.to_pairs.dtype.name) for block in blocks}
+        self.assertEqual(dtypes, {("int32", "int32")})
+        whole = propagation_matrix(pairs, pcg_blocks(self.graph_a, self.graph_b, pairs))
+        self.assertEqual(abs(whole - propagation_matrix(pairs, blocks)).max(), 0)
+
+        restricted = PairSpace(len(self.graph_a), len(self.graph_b), pairs.keys[::3])
+        whole = propagation_matrix(restricted, pcg_blocks(self.graph_a, self.graph_b, restricted, restrict=True))
+        chunked = pcg_blocks(self.graph_a, self.graph_b, restricted, restrict=True, block_edges=3)
+        self.assertEqual(abs(whole - propagation_matrix(restricted, chunked)).max(), 0)
+
+    def test_intersection_sparse_flood(self):
+        graph_a = ontology_intersection._load_graph(self.ontology_a, lambda vertex: True)
+        graph_b = ontology_intersection._load_graph(self.ontology_b, lambda vertex: True)
+        pcg = ontology_intersection._build_pcg(graph_a, graph_b)
+        legacy = ontology_intersection._flood(dict(self.sigma0), pcg, graph_a, graph_b, 10, 0.3, 1e-4, False)
+        result = ontology_intersection._sparse_flood(self.sigma0, self.graph_a, self.graph_b, 10, 0.3, 1e-4, False)
+        self.assertSigmaEqual(legacy, result)
+
+    def test_candidates_restrict_pair_space(self):
+        full = SimilarityFlooding().run_dict(self.graph_a, self.graph_b, self.sigma0)
+        everything = PairSpace(len(self.graph_a), len(self.graph_b), np.arange(len(self.graph_a) * len(self.graph_b)))
+        result = SimilarityFlooding().run_dict(self.graph_a, self.graph_b, self.sigma0, candidates=everything)
+        self.assertSigmaEqual(full.to_dict(self.graph_a, self.graph_b), result.to_dict(self.graph_a, self.graph_b))
+
+        restricted = PairSpace(len(self.graph_a), len(self.graph_b), full.pairs.keys[::2])
+        result = SimilarityFlooding().run_dict(self.graph_a, self.graph_b, self.sigma0, candidates=restricted)
+        allowed = set(restricted.keys.tolist()) | set(result.pairs.keys[result.sigma0 > 0].tolist())
+        self.assertTrue(set(result.pairs.keys.tolist()) <= allowed)
+
+    def test_empty_pcg(self):
+        graph = MatchGraph.from_ontology(self.ontology_a, lambda vertex: False)
+        result = SimilarityFlooding().run_dict(graph, self.graph_b, {})
+        self.assertEqual(result.to_dict(graph, self.graph_b), {})
+
+    def test_convergence_control(self):
+        flooding = SimilarityFlooding(iterations=100, convergence_threshold=1e-6)
+        plain = flooding.run_dict(self.graph_a, self.graph_b, self.sigma0)
+        self.assertEqual([step.iteration for step in plain.stats], list(range(1, plain.iterations + 1)))
+        self.assertEqual([step.delta for step in plain.stats], plain.deltas)
+        self.assertTrue(all(step.active == len(plain.pairs) for step in plain.stats))
+        self.assertTrue(all(0 < step.residual <= step.delta for step in plain.stats))
+
+        flooding.freeze_threshold = 1e-7
+        frozen = flooding.run_dict(self.graph_a, self.graph_b, self.sigma0)
+        self.assertTrue(frozen.converged)
+        self.assertLess(frozen.stats[-1].active, len(frozen.pairs) // 10)
+        np.testing.assert_allclose(frozen.sigma, plain.sigma, atol=1e-5)
+
+        flooding.freeze_threshold = None
+        flooding.acceleration = "aitken"
+        accelerated = flooding.run_dict(self.graph_a, self.graph_b, self.sigma0)
+        self.assertTrue(accelerated.converged)
+        self.assertLess(accelerated.iterations, plain.iterations)
+        self.assertTrue(any(step.extrapolated for step in accelerated.stats))
+        np.testing.assert_allclose(accelerated.sigma, plain.sigma, atol=1e-5)
+
+    def test_unknown_formula(self):
+        with self.assertRaises(PropagationException):
+            SimilarityFlooding(formula="D")
+        with self.assertRaises(PropagationException):
+            SimilarityFlooding(acceleration="anderson")
@@ -0,0 +1,101 @@
+import random
+from pathlib import Path
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.features import FeatureTable
+from at_ontology.apps.ontology.matching.semantic import EmbeddingScorer
+from at_ontology.apps.ontology.matching.semantic import top_k_columns
+from at_ontology.apps.ontology.tests import embeddings_matcher
+from at_ontology.apps.ontology.tests import similarity_flooding
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_final
+
+DIR_PATH = Path(__file__).parent
+
+
+def legacy_sigma0(v_a, v_b, vec_a, vec_b, graph_a, graph_b):
+    """Формула прежнего попарного ``_build_sigma0_embeddings``."""
+    label_a = getattr(v_a, "label", None) or v_a.name
+    label_b = getattr(v_b, "label", None) or v_b.name
+    parent_a = similarity_flooding._get_parent_label(v_a.name, graph_a)
+    parent_b = similarity_flooding._get_parent_label(v_b.name, graph_b)
+    sem_sim = float((np.dot(vec_a, vec_b) + 1.0) / 2.0)
+    tok_sim = similarity_flooding_copy_final._token_sim(label_a, label_b)
+    if parent_a and parent_b:
+        par_sim = similarity_flooding_copy_final._token_sim(parent_a, parent_b)
+    else:
+        par_sim = 0.5
+    return 0.7 * sem_sim + 0.1 * tok_sim + 0.2 * par_sim
+
+
+class EmbeddingScorerTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        cls.ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        cls.features_a = FeatureTable.from_ontology(cls.ontology_a)
+        cls.features_b = FeatureTable.from_ontology(cls.ontology_b)
+
+        rng = np.random.default_rng(0)
+        cls.embeddings_a = rng.normal(size=(len(cls.features_a), 32)).astype(np.float32)
+        cls.embeddings_b = rng.normal(size=(len(cls.features_b), 32)).astype(np.float32)
+        cls.embeddings_a /= np.linalg.norm(cls.embeddings_a, axis=1, keepdims=True)
+        cls.embeddings_b /= np.linalg.norm(cls.embeddings_b, axis=1, keepdims=True)
+
+    def test_matches_legacy(self):
+        graph_a = similarity_flooding._load_graph(self.ontology_a, lambda vertex: True)
+        graph_b = similarity_flooding._load_graph(self.ontology_b, lambda vertex: True)
+        graph_a._build_indices()
+        graph_b._build_indices()
+        emb_a = dict(zip(self.features_a.names, self.embeddings_a))
+        emb_b = dict(zip(self.features_b.names, self.embeddings_b))
+        sigma0 = embeddings_matcher._build_sigma0_embeddings(graph_a, graph_b, emb_a, emb_b)
+        self.assertEqual(len(sigma0), len(self.features_a) * len(self.features_b))
+
+        rnd = random.Random(0)
+        for _ in range(300):
+            name_a = rnd.choice(self.features_a.names)
+            name_b = rnd.choice(self.features_b.names)
+            expected = legacy_sigma0(
+                graph_a.vertices[name_a],
+                graph_b.vertices[name_b],
+                emb_a[name_a],
+                emb_b[name_b],
+                graph_a,
+                graph_b,
+            )
+            self.assertAlmostEqual(sigma0[(name_a, name_b)], expected, places=6)
+
+    def test_blocks_do_not_change_result(self):
+        whole = EmbeddingScorer().candidates(self.features_a, self.features_b, self.embeddings_a, self.embeddings_b)
+        blocked = EmbeddingScorer(memory_limit=1).candidates(
+            self.features_a, self.features_b, self.embeddings_a, self.embeddings_b
+        )
+        np.testing.assert_array_equal(whole.rows, blocked.rows)
+        np.testing.assert_array_equal(whole.cols, blocked.cols)
+        # Произведение float32 по блокам разной высоты может отличаться в последних разрядах
+        np.testing.assert_allclose(whole.scores, blocked.scores, rtol=1e-6)
+
+    def test_threshold_and_top_k(self):
+        scorer = EmbeddingScorer(threshold=0.55, top_k=3)
+        candidates = scorer.candidates(self.features_a, self.features_b, self.embeddings_a, self.embeddings_b)
+        self.assertTrue((candidates.scores >= 0.55).all())
+        self.assertLessEqual(np.bincount(candidates.rows).max(), 3)
+
+        everything = EmbeddingScorer().candidates(
+            self.features_a, self.features_b, self.embeddings_a, self.embeddings_b
+        )
+        dense = np.zeros((len(self.features_a), len(self.features_b)))
+        dense[everything.rows, everything.cols] = everything.scores
+        for row in np.unique(candidates.rows)[:20]:
+            kept = np.sort(candidates.scores[candidates.rows == row])[::-1]
+            best = np.sort(dense[row])[::-1][: len(kept)]
+            np.testing.assert_allclose(kept, best)
+
+    def test_top_k_columns(self):
+        scores = np.array([[0.1, 0.9, 0.5], [0.3, 0.2, 0.1]])
+        np.testing.assert_array_equal(top_k_columns(scores, 2), [[False, True, True], [True, True, False]])
+        self.assertTrue(top_k_columns(scores, 5).all())
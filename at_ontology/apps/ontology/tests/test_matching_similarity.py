@@ -0,0 +1,94 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.graph import MatchGraph
+from at_ontology.apps.ontology.matching.propagation import normalize
+from at_ontology.apps.ontology.matching.propagation import SimilarityFlooding
+from at_ontology.apps.ontology.matching.similarity import SimilarityMatrix
+from at_ontology.apps.ontology.matching.similarity import SimilarityMatrixException
+
+
+class SimilarityMatrixTest(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.dense = rng.random((30, 40))
+        self.dense[self.dense < 0.8] = 0
+        self.dense[3] = 0
+        self.dense[5] = 0
+        self.dense[5, :4] = 0.9
+
+    def both(self, matrix: np.ndarray) -> list[SimilarityMatrix]:
+        """Плотная и разреженная матрицы с одними и теми же оценками."""
+        return [SimilarityMatrix.from_dense(matrix), SimilarityMatrix.from_dense(matrix, dense_max_pairs=0)]
+
+    def test_storage(self):
+        dense, compressed = self.both(self.dense)
+        self.assertEqual((dense.is_sparse, compressed.is_sparse), (False, True))
+        self.assertEqual(dense.data.dtype, np.float32)
+        self.assertEqual(dense.nnz, compressed.nnz)
+        self.assertEqual(dense.nbytes, self.dense.size * 4)
+        self.assertLess(compressed.nbytes, dense.nbytes)
+
+        rows, cols = np.nonzero(self.dense)
+        for matrix in (dense, compressed):
+            np.testing.assert_array_equal(matrix.to_dense(), self.dense.astype(np.float32))
+            actual = matrix.pairs()
+            np.testing.assert_array_equal(actual[0], rows)
+            np.testing.assert_array_equal(actual[1], cols)
+            expected = self.dense[[5, 3, 0], [1, 7, 0]].astype(np.float32)
+            np.testing.assert_array_equal(matrix.get([5, 3, 0], [1, 7, 0]), expected)
+            self.assertEqual(matrix.transpose().shape, (40, 30))
+            np.testing.assert_array_equal(matrix.transpose().to_dense(), self.dense.T.astype(np.float32))
+
+        # Повторные пары суммируются одинаково в обоих видах
+        for dense_max_pairs in (1 << 20, 0):
+            matrix = SimilarityMatrix.from_pairs(
+                2, 3, [0, 1, 0], [2, 0, 2], [0.25, 0.5, 0.5], dense_max_pairs=dense_max_pairs
+            )
+            self.assertEqual(matrix.to_dict(["a", "b"], ["x", "y", "z"]), {("a", "z"): 0.75, ("b", "x"): 0.5})
+
+        with self.assertRaises(SimilarityMatrixException):
+            SimilarityMatrix(2, 2, np.zeros((2, 3)))
+
+    def test_operations(self):
+        other = self.dense.copy()
+        other[other > 0] *= 0.5
+        expected_delta = np.abs(self.dense.astype(np.float32).astype(np.float64) - other.astype(np.float32)).sum()
+        normalized = normalize(self.dense.ravel()).reshape(self.dense.shape)
+        for matrix in self.both(self.dense):
+            np.testing.assert_allclose(matrix.normalized().to_dense(), normalized, rtol=1e-6)
+            self.assertEqual(matrix.delta(matrix), 0.0)
+            for second in self.both(other):
+                self.assertAlmostEqual(matrix.delta(second), expected_delta, places=4)
+            with self.assertRaises(SimilarityMatrixException):
+                matrix.delta(matrix.transpose())
+
+        empty = SimilarityMatrix.from_dense(np.zeros((2, 2)))
+        self.assertEqual(empty.normalized().nnz, 0)
+
+    def test_top_k(self):
+        expected = []
+        for row in range(len(self.dense)):
+            order = sorted(np.flatnonzero(self.dense[row]).tolist(), key=lambda col: (-self.dense[row, col], col))
+            expected.extend((row, col) for col in order[:3])
+        for matrix in self.both(self.dense):
+            rows, cols, values = matrix.top_k(3)
+            self.assertEqual(list(zip(rows.tolist(), cols.tolist())), expected)
+            np.testing.assert_array_equal(values, matrix.get(rows, cols))
+            # Равные оценки — по номеру B
+            self.assertEqual(cols[rows == 5].tolist(), [0, 1, 2])
+            with self.assertRaises(SimilarityMatrixException):
+                matrix.top_k(0)
+
+    def test_from_flood(self):
+        graph_a = MatchGraph(["a", "b", "c"], [None] * 3, [0, 0], [1, 2], [0, 0], ["child"])
+        graph_b = MatchGraph(["x", "y", "z"], [None] * 3, [0, 0], [1, 2], [0, 0], ["child"])
+        result = SimilarityFlooding().run(graph_a, graph_b, [0, 1, 2], [0, 1, 2], [1.0, 0.5, 0.25])
+        for initial in (False, True):
+            expected = result.to_dict(graph_a, graph_b, initial)
+            for dense_max_pairs in (1 << 20, 0):
+                matrix = SimilarityMatrix.from_flood(result, initial, dense_max_pairs=dense_max_pairs)
+                actual = matrix.to_dict(graph_a.names, graph_b.names)
+                self.assertEqual(set(actual), set(expected))
+                for pair, value in expected.items():
+                    self.assertAlmostEqual(actual[pair], value, places=6)
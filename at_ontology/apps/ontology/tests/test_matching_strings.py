@@ -0,0 +1,69 @@
+import random
+from pathlib import Path
+
+import numpy as np
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+from at_ontology.apps.ontology.matching.strings import abbreviation_score
+from at_ontology.apps.ontology.matching.strings import char_similarity_matrix
+from at_ontology.apps.ontology.matching.strings import label_similarity_matrix
+from at_ontology.apps.ontology.matching.strings import levenshtein_matrix
+from at_ontology.apps.ontology.matching.strings import sharded_levenshtein_matrix
+from at_ontology.apps.ontology.matching.strings import TokenSimilarityKernel
+from at_ontology.apps.ontology.tests import similarity_flooding_copy_final as legacy
+
+DIR_PATH = Path(__file__).parent
+
+
+class StringKernelTest(SimpleTestCase):
+    WORDS = ["", "a", "kitten", "sitting", "интеллект", "интеллектуальных", "иэс", "нф-задач", "G2"]
+
+    def test_levenshtein(self):
+        distances = levenshtein_matrix(self.WORDS, self.WORDS[::-1])
+        for i, word_a in enumerate(self.WORDS):
+            for j, word_b in enumerate(self.WORDS[::-1]):
+                self.assertEqual(distances[i, j], legacy._levenshtein(word_a, word_b))
+
+        similarity = char_similarity_matrix(self.WORDS, self.WORDS)
+        for i, word_a in enumerate(self.WORDS):
+            for j, word_b in enumerate(self.WORDS):
+                self.assertAlmostEqual(similarity[i, j], legacy._char_sim(word_a, word_b))
+
+    def test_abbreviation_score(self):
+        words = ["интеллектуальных", "экспертных", "систем"]
+        for abbreviation in ("иэс", "эс", "нф", "ИЭС", "и"):
+            self.assertEqual(abbreviation_score(abbreviation, words), legacy._abbrev_matches_words(abbreviation, words))
+
+    def test_token_similarity_special_cases(self):
+        labels_a = ["НФ задачи", "ИЭС", "", "в и", "Типовые НФ-задачи для динамических ИЭС", "Topic_1"]
+        labels_b = ["неформализованных задач", "интеллектуальных экспертных систем", "x", "на", "Перечень", "Topic_12"]
+        matrix = TokenSimilarityKernel(labels_a, labels_b).matrix()
+        for i, label_a in enumerate(labels_a):
+            for j, label_b in enumerate(labels_b):
+                self.assertAlmostEqual(matrix[i, j], legacy._token_sim(label_a, label_b), places=12)
+
+
+class StringKernelFixtureTest(SimpleTestCase):
+    def test_matches_legacy_on_fixtures(self):
+        ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        vertices_a = list(ontology_a.vertices.values())
+        vertices_b = list(ontology_b.vertices.values())
+        matrix = label_similarity_matrix(vertices_a, vertices_b)
+
+        rnd = random.Random(0)
+        for _ in range(500):
+            i = rnd.randrange(len(vertices_a))
+            j = rnd.randrange(len(vertices_b))
+            self.assertAlmostEqual(matrix[i, j], legacy._label_sim(vertices_a[i], vertices_b[j]), places=12)
+
+    def test_sharded_levenshtein(self):
+        ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        labels_a = [getattr(vertex, "label", None) or vertex.name for vertex in ontology_a.vertices.values()]
+        labels_b = [getattr(vertex, "label", None) or vertex.name for vertex in ontology_b.vertices.values()]
+        expected = levenshtein_matrix(labels_a[:120], labels_b)
+        np.testing.assert_array_equal(sharded_levenshtein_matrix(labels_a[:120], labels_b), expected)
+        np.testing.assert_array_equal(sharded_levenshtein_matrix(labels_a[:120], labels_b, workers=2), expected)
+        self.assertEqual(sharded_levenshtein_matrix([], labels_b, workers=2).shape, (0, len(labels_b)))
@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import TestCase
+
+from at_ontology.apps.ontology.metadata import index_name
+from at_ontology.apps.ontology.metadata import MetadataIndexException
+from at_ontology.apps.ontology.metadata import MetadataIndexService
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import VertexType
+
+
+class MetadataIndexServiceTest(TestCase):
+    def setUp(self):
+        self.ontology = Ontology.objects.create(name="MetadataOntology")
+        self.other = Ontology.objects.create(name="OtherOntology")
+        self.model = OntologyModel.objects.create(name="MetadataModel")
+        self.type = VertexType.objects.create(name="CourseElement", ontology_model=self.model)
+
+        self.vertices = Vertex.objects.bulk_create(
+            [
+                Vertex(
+                    name=f"topic_{i}",
+                    type=self.type,
+                    ontology=self.ontology,
+                    metadata={"legacy_db_id": i, "parent_id": str(i // 10) if i >= 10 else None},
+                )
+                for i in range(2000)
+            ]
+        )
+        self.foreign = Vertex.objects.create(
+            name="topic_1", type=self.type, ontology=self.other, metadata={"legacy_db_id": 1}
+        )
+
+    def test_indexes_are_created_by_migration(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, "ontology_vertex")
+        self.assertIn(index_name("legacy_db_id"), constraints)
+        self.assertIn(index_name("parent_id"), constraints)
+
+    def test_find_by_metadata(self):
+        ids = list(range(0, 2000, 2)) + [5000]
+        with self.assertNumQueries(1):
+            result = MetadataIndexService.find_by_metadata(self.ontology, "legacy_db_id", ids)
+
+        self.assertEqual(len(result), 1000)
+        self.assertEqual(result["42"], [self.vertices[42]])
+        self.assertNotIn("5000", result)
+
+    def test_values_are_compared_as_text(self):
+        result = MetadataIndexService.find_one_by_metadata(self.ontology, "legacy_db_id", ["7", 8])
+        self.assertEqual(result, {"7": self.vertices[7], "8": self.vertices[8]})
+
+        result = MetadataIndexService.find_by_metadata(self.ontology, "parent_id", [3])
+        self.assertEqual(sorted(vertex.name for vertex in result["3"]), [f"topic_{i}" for i in range(30, 40)])
+
+    def test_without_ontology(self):
+        result = MetadataIndexService.find_by_metadata(None, "legacy_db_id", [1])
+        self.assertEqual({vertex.id for vertex in result["1"]}, {self.vertices[1].id, self.foreign.id})
+
+    def test_invalid_key(self):
+        with self.assertRaises(MetadataIndexException):
+            MetadataIndexService.find_by_metadata(self.ontology, "legacy'; DROP TABLE x; --", [1])
+
+    def test_sync_indexes(self):
+        created, dropped = MetadataIndexService.sync_indexes(["legacy_db_id", "code"])
+        self.assertEqual(created, [index_name("code")])
+        self.assertEqual(dropped, [index_name("parent_id")])
+
+        created, dropped = MetadataIndexService.sync_indexes(["legacy_db_id", "code"])
+        self.assertEqual((created, dropped), ([], []))
+
+    def test_keys_differing_in_case(self):
+        self.assertNotEqual(index_name("code"), index_name("Code"))
+        created, _ = MetadataIndexService.sync_indexes(["code", "Code"])
+        self.assertEqual(sorted(created), sorted([index_name("code"), index_name("Code")]))
+        self.assertLessEqual(len(index_name("k" * 41)), 63)
@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from at_ontology_parser.parsing.parser import Parser
+from django.test import SimpleTestCase
+
+DIR_PATH = Path(__file__).parent
+
+# ontology_union импортирует ontology_intersection как модуль верхнего уровня
+sys.path.insert(0, str(DIR_PATH))
+
+from at_ontology.apps.ontology.tests import ontology_union  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_intersection import _get_label  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_intersection import _Graph  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_intersection import _is_topic  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_intersection import _load_graph  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_union import _exact_matches  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_union import _get_legacy_id  # noqa: E402
+
+
+def nested_exact_matches(graph_a: _Graph, graph_b: _Graph) -> dict[str, str]:
+    """Прежний этап точных совпадений: перебор вершин O_i для каждой вершины O_j."""
+    legacy_map_a = {}
+    for vid, v in graph_a.vertices.items():
+        lid = _get_legacy_id(v)
+        if lid is not None:
+            legacy_map_a[lid] = vid
+
+    exact_a_to_b = {}
+    for vid_b, v_b in graph_b.vertices.items():
+        lid_b = _get_legacy_id(v_b)
+        if lid_b is not None and lid_b in legacy_map_a:
+            exact_a_to_b[legacy_map_a[lid_b]] = vid_b
+            continue
+        label_b = _get_label(v_b).lower()
+        for vid_a, v_a in graph_a.vertices.items():
+            if _get_label(v_a).lower() == label_b:
+                exact_a_to_b[vid_a] = vid_b
+                break
+    return exact_a_to_b
+
+
+def vertex(name: str, label: str | None = None, **metadata) -> SimpleNamespace:
+    return SimpleNamespace(name=name, label=label, metadata=metadata)
+
+
+def graph(*vertices: SimpleNamespace) -> _Graph:
+    return _Graph(vertices={v.name: v for v in vertices})
+
+
+class ExactMatchesTest(SimpleTestCase):
+    def test_fixtures(self):
+        ontology_a = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology1.yaml")
+        ontology_b = Parser().load_ontology(DIR_PATH / "fixtures/test_same_vertex/ontology2.yaml")
+        for graph_a, graph_b in [
+            (_load_graph(ontology_a, _is_topic), _load_graph(ontology_b, _is_topic)),
+            (_load_graph(ontology_a, _is_topic), _load_graph(ontology_a, _is_topic)),
+        ]:
+            expected = nested_exact_matches(graph_a, graph_b)
+            self.assertTrue(expected)
+            self.assertEqual(_exact_matches(graph_a, graph_b), expected)
+
+    def test_keys(self):
+        graph_a = graph(
+            vertex("a1", "Графы", legacy_db_id=1),
+            vertex("a2", "Деревья", code="T"),
+            vertex("a3", "Графы"),
+            vertex("Topic_x", "Сети"),
+        )
+        graph_b = graph(
+            vertex("b1", "Совсем другое", legacy_db_id=1),
+            vertex("b2", "  графы "),
+            vertex("b3", "Лес", code="T"),
+            vertex("topic_X", "Сетевые модели"),
+        )
+        self.assertEqual(_exact_matches(graph_a, graph_b), {"a1": "b2"})
+        self.assertEqual(
+            _exact_matches(graph_a, graph_b, ("legacy_db_id", "code"), match_names=True),
+            {"a1": "b2", "a2": "b3", "Topic_x": "topic_X"},
+        )
+
+    def test_linear_time(self):
+        size = 3000
+        graph_a = graph(*(vertex(f"a{i}", f"Тема {i}") for i in range(size)))
+        graph_b = graph(*(vertex(f"b{i}", f"Тема {i * 2}") for i in range(size)))
+        # Каждая вершина нормализуется один раз, а не для каждой пары вершин A × B
+        with mock.patch.object(ontology_union, "_normalize_key", wraps=ontology_union._normalize_key) as normalize:
+            result = _exact_matches(graph_a, graph_b)
+        self.assertEqual(normalize.call_count, 2 * size)
+        self.assertEqual(len(result), size // 2)
@@ -0,0 +1,116 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import override_settings
+from django.test import TestCase
+
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology.models import VertexPropertyAssignment
+from at_ontology.apps.ontology.models import VertexSearchDocument
+from at_ontology.apps.ontology.search import SearchService
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import VertexType
+from at_ontology.apps.ontology_model.models import VertexTypePropertyDefinition
+
+
+class SearchServiceTest(TestCase):
+    def setUp(self):
+        self.ontology = Ontology.objects.create(name="SearchOntology")
+        self.other = Ontology.objects.create(name="OtherOntology")
+        self.model = OntologyModel.objects.create(name="SearchModel")
+        self.type = VertexType.objects.create(name="CourseElement", ontology_model=self.model)
+        self.questions = VertexTypePropertyDefinition.objects.create(name="questions", vertex_type=self.type)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.graphs = Vertex.objects.create(
+                name="graphs",
+                label="Теория графов",
+                description="Graph theory basics",
+                type=self.type,
+                ontology=self.ontology,
+            )
+            self.trees = Vertex.objects.create(
+                name="trees",
+                label="Деревья",
+                type=self.type,
+                ontology=self.ontology,
+            )
+            self.foreign = Vertex.objects.create(
+                name="graphs",
+                label="Графы",
+                type=self.type,
+                ontology=self.other,
+            )
+            VertexPropertyAssignment.objects.create(
+                vertex=self.trees,
+                definition=self.questions,
+                value={"question": "Сколько рёбер у дерева с n вершинами?", "difficulty": 1},
+            )
+
+    def test_index_is_created_on_save(self):
+        self.assertEqual(VertexSearchDocument.objects.count(), 3)
+        self.assertIn("рёбер", self.trees.search_document.content)
+
+    def test_search_label_and_description(self):
+        page = SearchService.search("graph")
+        self.assertEqual([hit.vertex for hit in page.hits], [self.graphs])
+
+        page = SearchService.search("граф")
+        self.assertEqual({hit.vertex for hit in page.hits}, {self.graphs, self.foreign})
+
+    def test_search_property_value(self):
+        page = SearchService.search("рёбер дерева")
+        self.assertEqual([hit.vertex for hit in page.hits], [self.trees])
+
+    def test_search_restricted_to_ontology(self):
+        page = SearchService.search("граф", ontologies=self.other)
+        self.assertEqual([hit.vertex for hit in page.hits], [self.foreign])
+
+    def test_search_pagination(self):
+        page = SearchService.search("граф", page=1, page_size=1)
+        self.assertEqual(page.total, 2)
+        self.assertEqual(len(page.hits), 1)
+        self.assertTrue(page.has_next)
+
+        second = SearchService.search("граф", page=2, page_size=1)
+        self.assertNotEqual(page.hits[0].vertex, second.hits[0].vertex)
+
+    def test_index_follows_updates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trees.label = "Леса"
+            self.trees.save()
+        self.assertEqual(SearchService.search("деревья").total, 0)
+        self.assertEqual(SearchService.search("леса").total, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trees.delete()
+        self.assertEqual(SearchService.search("рёбер").total, 0)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(SearchService.search('"граф* (').total, 2)
+        self.assertEqual(SearchService.search("   ").total, 0)
+
+    def test_index_existing_vertices(self):
+        # Вершины, созданные до появления индекса: документов у них нет
+        VertexSearchDocument.objects.all().delete()
+        self.assertEqual(SearchService.search("граф").total, 0)
+
+        # Заполнение из миграции 0002 на исторических моделях
+        migration = import_module("at_ontology.apps.ontology.migrations.0002_vertexsearchdocument")
+        state = MigrationLoader(connection).project_state(("ontology", "0002_vertexsearchdocument"))
+        # Миграция не зависит от текущих настроек: свойства для поиска в ней зафиксированы
+        with override_settings(ONTOLOGY_SEARCH_PROPERTIES={}):
+            migration.backfill_search_documents(state.apps, SimpleNamespace(connection=connection))
+        self.assertEqual(VertexSearchDocument.objects.count(), 3)
+        self.assertEqual([hit.vertex for hit in SearchService.search("рёбер").hits], [self.trees])
+
+        VertexSearchDocument.objects.all().delete()
+        call_command("rebuild_search_index", ontology=[str(self.other.id)], stdout=StringIO())
+        self.assertEqual([hit.vertex for hit in SearchService.search("граф").hits], [self.foreign])
+        self.assertEqual(SearchService.rebuild(batch_size=2), 3)
+        self.assertEqual(SearchService.search("граф").total, 2)
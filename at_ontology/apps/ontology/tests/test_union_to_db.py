@@ -0,0 +1,113 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+# ontology_union импортирует ontology_intersection как модуль верхнего уровня
+sys.path.insert(0, str(Path(__file__).parent))
+
+from at_ontology.apps.ontology.models import Ontology  # noqa: E402
+from at_ontology.apps.ontology.service import CreateOntologyException  # noqa: E402
+from at_ontology.apps.ontology.service import OntologyService  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_union import MergedEdge  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_union import MergedVertex  # noqa: E402
+from at_ontology.apps.ontology.tests.ontology_union import UnionResult  # noqa: E402
+from at_ontology.apps.ontology_model.models import OntologyModel  # noqa: E402
+from at_ontology.apps.ontology_model.models import RelationshipType  # noqa: E402
+from at_ontology.apps.ontology_model.models import VertexType  # noqa: E402
+from at_ontology.apps.ontology_model.models import VertexTypePropertyDefinition  # noqa: E402
+
+
+def reference(value: object, alias: str = "") -> SimpleNamespace:
+    """Ссылка парсера на сущность модели, сохранённую в БД."""
+    value = SimpleNamespace(_uuid=value.id) if value is not None else None
+    return SimpleNamespace(alias=alias, value=value, fulfilled=value is not None)
+
+
+class UnionToDbTest(TestCase):
+    def setUp(self):
+        self.model = OntologyModel.objects.create(name="UnionModel")
+        self.type = VertexType.objects.create(name="Topic", ontology_model=self.model)
+        self.hierarchy = RelationshipType.objects.create(name="Hierarchy", ontology_model=self.model)
+        self.code = VertexTypePropertyDefinition.objects.create(name="code", vertex_type=self.type)
+        self.hours = VertexTypePropertyDefinition.objects.create(name="hours", vertex_type=self.type)
+
+    def parser_vertex(self, name: str, label: str, metadata: dict | None = None, **properties) -> SimpleNamespace:
+        definitions = {"code": self.code, "hours": self.hours}
+        vertex = SimpleNamespace(
+            name=name,
+            label=label,
+            description=None,
+            type=reference(self.type, "Topic"),
+            metadata=metadata,
+            artifacts=None,
+        )
+        vertex.properties = [
+            SimpleNamespace(definition=reference(definitions[key], key), value=value, owner=vertex)
+            for key, value in properties.items()
+        ]
+        return vertex
+
+    def parser_relationship(self, name: str) -> SimpleNamespace:
+        # Концы связи берутся из MergedEdge, поэтому source/target не нужны
+        return SimpleNamespace(
+            name=name,
+            label=None,
+            description=None,
+            type=reference(self.hierarchy, "Hierarchy"),
+            metadata=None,
+            properties=None,
+            artifacts=None,
+        )
+
+    def union(self) -> UnionResult:
+        graphs_a = self.parser_vertex("graphs", "Графы", {"legacy_db_id": 1}, code="G1")
+        trees_a = self.parser_vertex("trees", "Деревья")
+        graphs_b = self.parser_vertex("graph", "Граф", {"source": "b", "legacy_db_id": 2}, code="X", hours=10)
+        paths_b = self.parser_vertex("paths", "Пути")
+        rel_a = self.parser_relationship("rel1")
+        rel_b = self.parser_relationship("rel1")
+        return UnionResult(
+            vertices=[
+                MergedVertex("graphs", "Графы", "merged", graphs_a, graphs_b, 0.9),
+                MergedVertex("trees", "Деревья", "a", trees_a, None),
+                MergedVertex("paths_b", "Пути", "b", None, paths_b),
+            ],
+            edges=[
+                MergedEdge("graphs", "trees", "Hierarchy", rel_a),
+                MergedEdge("graphs", "paths_b", "Hierarchy", rel_b),
+            ],
+            ontology_a_name="A",
+            ontology_b_name="B",
+            exact_matches=0,
+            similar_pairs=1,
+            unique_from_a=1,
+            unique_from_b=1,
+            ontology_a=SimpleNamespace(relationships={"rel1": rel_a}),
+            ontology_b=SimpleNamespace(relationships={"rel1": rel_b}),
+        )
+
+    def test_union_to_db(self):
+        ontology = OntologyService.union_to_db(self.union(), "Union")
+
+        self.assertEqual(list(ontology.imports.all()), [self.model])
+        self.assertEqual(sorted(ontology.vertices.values_list("name", flat=True)), ["graphs", "paths_b", "trees"])
+        graphs = ontology.vertices.get(name="graphs")
+        self.assertEqual(graphs.metadata, {"legacy_db_id": 1, "source": "b"})
+        self.assertEqual(
+            sorted(graphs.properties.values_list("definition__name", "value")),
+            [("code", "G1"), ("hours", 10)],
+        )
+        self.assertEqual(
+            sorted(ontology.relationships.values_list("name", "source__name", "target__name")),
+            [("rel1", "graphs", "trees"), ("rel1_2", "graphs", "paths_b")],
+        )
+        self.assertEqual(ontology.search_documents.count(), 3)
+
+    def test_rollback(self):
+        union = self.union()
+        union.vertices[2].original_b.type = reference(None, "Missing")
+        with self.assertRaises(CreateOntologyException):
+            OntologyService.union_to_db(union, "Union")
+        self.assertFalse(Ontology.objects.filter(name="Union").exists())
@@ -7,3 +7,8 @@ class OntologyModelConfig(AppConfig):
     name = "at_ontology.apps.ontology_model"
     label = "ontology_model"
     verbose_name = _("ontology_model")
+
+    def ready(self):
+        from at_ontology.apps.ontology_model.signals import connect_signals
+
+        connect_signals()
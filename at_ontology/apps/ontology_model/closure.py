@@ -0,0 +1,187 @@
+import threading
+from typing import Iterable
+from uuid import UUID
+
+from at_ontology.apps.ontology_model import models
+
+
+class TypeHierarchy(object):
+    """Транзитивное замыкание отношения ``derived_from`` для одного вида типов.
+
+    Множества предков и потомков (включая сам тип) вычисляются один раз при построении,
+    поэтому проверки ``is_a`` и выборки подтипов не обращаются к БД.
+    """
+
+    def __init__(self, parents: dict[UUID, UUID | None]):
+        self.parents = parents
+        self.lineages: dict[UUID, tuple[UUID, ...]] = {type_id: self._lineage(type_id) for type_id in parents}
+        self.ancestors: dict[UUID, frozenset[UUID]] = {
+            type_id: frozenset(lineage) for type_id, lineage in self.lineages.items()
+        }
+
+        descendants: dict[UUID, set[UUID]] = {type_id: set() for type_id in parents}
+        for type_id, lineage in self.lineages.items():
+            for ancestor in lineage:
+                descendants[ancestor].add(type_id)
+        self.descendants: dict[UUID, frozenset[UUID]] = {
+            type_id: frozenset(subtypes) for type_id, subtypes in descendants.items()
+        }
+
+    def _lineage(self, type_id: UUID) -> tuple[UUID, ...]:
+        # Цепочка от типа к корню; цикл в derived_from обрывается на повторе
+        lineage = []
+        seen = set()
+        while type_id is not None and type_id in self.parents and type_id not in seen:
+            seen.add(type_id)
+            lineage.append(type_id)
+            type_id = self.parents[type_id]
+        return tuple(lineage)
+
+    def __contains__(self, type_id: UUID) -> bool:
+        return type_id in self.parents
+
+    def is_a(self, type_id: UUID, super_type_id: UUID) -> bool:
+        return super_type_id in self.ancestors.get(type_id, ())
+
+    def is_a_any(self, type_id: UUID, super_type_ids: Iterable[UUID]) -> bool:
+        ancestors = self.ancestors.get(type_id, frozenset())
+        return not ancestors.isdisjoint(super_type_ids)
+
+    def subtypes(self, type_id: UUID, include_self: bool = True) -> frozenset[UUID]:
+        result = self.descendants.get(type_id, frozenset({type_id}))
+        return result if include_self else result - {type_id}
+
+    def supertypes(self, type_id: UUID, include_self: bool = True) -> tuple[UUID, ...]:
+        lineage = self.lineages.get(type_id, ())
+        return lineage if include_self else lineage[1:]
+
+
+class TypeClosure(object):
+    """Замыкание иерархий типов модели онтологии (с учётом импортированных моделей)."""
+
+    def __init__(self, ontology_model_ids: frozenset[UUID]):
+        self.ontology_model_ids = ontology_model_ids
+
+        vertex_types = models.VertexType.objects.filter(ontology_model_id__in=ontology_model_ids)
+        relationship_types = models.RelationshipType.objects.filter(ontology_model_id__in=ontology_model_ids)
+        data_types = models.DataType.objects.filter(ontology_model_id__in=ontology_model_ids)
+
+        self.vertex_types = TypeHierarchy(dict(vertex_types.values_list("id", "derived_from_id")))
+        self.relationship_types = TypeHierarchy(dict(relationship_types.values_list("id", "derived_from_id")))
+        self.data_types = TypeHierarchy(dict(data_types.values_list("id", "derived_from_id")))
+
+        self.vertex_properties = self._inherit(
+            self.vertex_types,
+            models.VertexTypePropertyDefinition.objects.filter(vertex_type_id__in=self.vertex_types.parents),
+            "vertex_type_id",
+        )
+        self.vertex_artifacts = self._inherit(
+            self.vertex_types,
+            models.VertexTypeArtifactDefinition.objects.filter(vertex_type_id__in=self.vertex_types.parents),
+            "vertex_type_id",
+        )
+        self.relationship_properties = self._inherit(
+            self.relationship_types,
+            models.RelationshipTypePropertyDefinition.objects.filter(
+                relationship_type_id__in=self.relationship_types.parents
+            ),
+            "relationship_type_id",
+        )
+        self.relationship_artifacts = self._inherit(
+            self.relationship_types,
+            models.RelationshipTypeArtifactDefinition.objects.filter(
+                relationship_type_id__in=self.relationship_types.parents
+            ),
+            "relationship_type_id",
+        )
+
+        through_source = models.RelationshipType.valid_source_types.through.objects
+        through_target = models.RelationshipType.valid_target_types.through.objects
+        self.valid_source_types = self._group(
+            through_source.filter(relationshiptype_id__in=self.relationship_types.parents).values_list(
+                "relationshiptype_id", "vertextype_id"
+            )
+        )
+        self.valid_target_types = self._group(
+            through_target.filter(relationshiptype_id__in=self.relationship_types.parents).values_list(
+                "relationshiptype_id", "vertextype_id"
+            )
+        )
+
+    @staticmethod
+    def _group(pairs: Iterable[tuple[UUID, UUID]]) -> dict[UUID, frozenset[UUID]]:
+        result: dict[UUID, set[UUID]] = {}
+        for key, value in pairs:
+            result.setdefault(key, set()).add(value)
+        return {key: frozenset(values) for key, values in result.items()}
+
+    @staticmethod
+    def _inherit(hierarchy: TypeHierarchy, definitions: Iterable, owner_field: str) -> dict[UUID, dict[str, object]]:
+        own: dict[UUID, list] = {}
+        for definition in definitions:
+            own.setdefault(getattr(definition, owner_field), []).append(definition)
+
+        # Определение ближайшего типа в цепочке перекрывает одноимённое определение предка
+        result = {}
+        for type_id, lineage in hierarchy.lineages.items():
+            inherited = {}
+            for ancestor in reversed(lineage):
+                for definition in own.get(ancestor, ()):
+                    inherited[definition.name] = definition
+            result[type_id] = inherited
+        return result
+
+    def relationship_endpoint_allowed(self, relationship_type_id: UUID, vertex_type_id: UUID, target: bool) -> bool:
+        """Допустим ли тип вершины как источник/цель связи с учётом наследования обоих типов.
+
+        Пустой список допустимых типов по всей цепочке типа связи означает отсутствие ограничения.
+        """
+        valid = self.valid_target_types if target else self.valid_source_types
+        allowed = set()
+        for type_id in self.relationship_types.supertypes(relationship_type_id):
+            allowed.update(valid.get(type_id, ()))
+            if allowed:
+                break
+        return not allowed or self.vertex_types.is_a_any(vertex_type_id, allowed)
+
+
+class TypeClosureService(object):
+    _closures: dict[UUID, TypeClosure] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(ontology_model: models.OntologyModel | UUID) -> TypeClosure:
+        model_id = ontology_model.id if isinstance(ontology_model, models.OntologyModel) else ontology_model
+        with TypeClosureService._lock:
+            closure = TypeClosureService._closures.get(model_id)
+            if closure is None:
+                closure = TypeClosure(TypeClosureService.imported_model_ids(model_id))
+                TypeClosureService._closures[model_id] = closure
+            return closure
+
+    @staticmethod
+    def imported_model_ids(model_id: UUID) -> frozenset[UUID]:
+        result = {model_id}
+        frontier = [model_id]
+        Imports = models.OntologyModel.imports.through
+        while frontier:
+            imported = set(
+                Imports.objects.filter(from_ontologymodel_id__in=frontier).values_list("to_ontologymodel_id", flat=True)
+            )
+            frontier = list(imported - result)
+            result.update(frontier)
+        return frozenset(result)
+
+    @staticmethod
+    def invalidate(ontology_model_id: UUID | None = None) -> None:
+        with TypeClosureService._lock:
+            if ontology_model_id is None:
+                TypeClosureService._closures.clear()
+                return
+            stale = [
+                model_id
+                for model_id, closure in TypeClosureService._closures.items()
+                if ontology_model_id in closure.ontology_model_ids
+            ]
+            for model_id in stale:
+                del TypeClosureService._closures[model_id]
@@ -23,6 +23,7 @@ from django.db.transaction import atomic
 from django.utils.translation import gettext_lazy as _
 
 from at_ontology.apps.ontology_model import models
+from at_ontology.apps.ontology_model.closure import TypeClosureService
 
 if TYPE_CHECKING:
     from at_ontology.apps.ontology import models as ontology_models
@@ -669,6 +670,7 @@ class OntologyModelService:
         OntologyModelService.data_types_to_db_bulk(ontology_model.data_types.values(), result)
         OntologyModelService.vertex_types_to_db_bulk(ontology_model.vertex_types.values(), result, default_content_getter)
         OntologyModelService.relationship_types_to_db_bulk(ontology_model.relationship_types.values(), result, default_content_getter)
+        TypeClosureService.invalidate(result.id)
         
         try:
             connection.check_constraints()
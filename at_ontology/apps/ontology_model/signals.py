@@ -0,0 +1,48 @@
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+from at_ontology.apps.ontology_model import models
+from at_ontology.apps.ontology_model.closure import TypeClosureService
+
+
+def type_changed(sender, instance, **kwargs) -> None:
+    TypeClosureService.invalidate(instance.ontology_model_id)
+
+
+def definition_changed(sender, instance, **kwargs) -> None:
+    # Владелец определения может отсутствовать или смениться, поэтому сбрасываются все замыкания
+    TypeClosureService.invalidate()
+
+
+def relations_changed(sender, instance, action: str, **kwargs) -> None:
+    if action.startswith("post_"):
+        TypeClosureService.invalidate()
+
+
+def model_deleted(sender, instance: models.OntologyModel, **kwargs) -> None:
+    TypeClosureService.invalidate(instance.id)
+
+
+def connect_signals() -> None:
+    for model in (models.VertexType, models.RelationshipType, models.DataType):
+        post_save.connect(type_changed, sender=model, dispatch_uid=f"type_closure_{model.__name__}_saved")
+        post_delete.connect(type_changed, sender=model, dispatch_uid=f"type_closure_{model.__name__}_deleted")
+
+    for model in (
+        models.VertexTypePropertyDefinition,
+        models.VertexTypeArtifactDefinition,
+        models.RelationshipTypePropertyDefinition,
+        models.RelationshipTypeArtifactDefinition,
+    ):
+        post_save.connect(definition_changed, sender=model, dispatch_uid=f"type_closure_{model.__name__}_saved")
+        post_delete.connect(definition_changed, sender=model, dispatch_uid=f"type_closure_{model.__name__}_deleted")
+
+    for through in (
+        models.OntologyModel.imports.through,
+        models.RelationshipType.valid_source_types.through,
+        models.RelationshipType.valid_target_types.through,
+    ):
+        m2m_changed.connect(relations_changed, sender=through, dispatch_uid=f"type_closure_{through.__name__}_changed")
+
+    post_delete.connect(model_deleted, sender=models.OntologyModel, dispatch_uid="type_closure_model_deleted")
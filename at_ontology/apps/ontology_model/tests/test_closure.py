@@ -0,0 +1,122 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from at_ontology.apps.ontology.filters import vertex_type_q
+from at_ontology.apps.ontology.models import Ontology
+from at_ontology.apps.ontology.models import Relationship
+from at_ontology.apps.ontology.models import RelationshipPropertyAssignment
+from at_ontology.apps.ontology.models import Vertex
+from at_ontology.apps.ontology.models import VertexPropertyAssignment
+from at_ontology.apps.ontology_model.closure import TypeClosureService
+from at_ontology.apps.ontology_model.models import DataType
+from at_ontology.apps.ontology_model.models import OntologyModel
+from at_ontology.apps.ontology_model.models import RelationshipType
+from at_ontology.apps.ontology_model.models import VertexType
+from at_ontology.apps.ontology_model.models import VertexTypePropertyDefinition
+
+
+class TypeClosureTest(TestCase):
+    def setUp(self):
+        self.base_model = OntologyModel.objects.create(name="BaseModel")
+        self.model = OntologyModel.objects.create(name="CourseModel")
+        self.model.imports.add(self.base_model)
+
+        self.element = VertexType.objects.create(name="Element", ontology_model=self.base_model)
+        self.topic = VertexType.objects.create(name="Topic", ontology_model=self.model, derived_from=self.element)
+        self.subtopic = VertexType.objects.create(name="Subtopic", ontology_model=self.model, derived_from=self.topic)
+        self.competence = VertexType.objects.create(name="Competence", ontology_model=self.model)
+
+        self.string = DataType.objects.create(name="string", ontology_model=self.base_model)
+        self.code = DataType.objects.create(name="code", ontology_model=self.model, derived_from=self.string)
+
+        self.hierarchy = RelationshipType.objects.create(name="Hierarchy", ontology_model=self.model)
+        self.hierarchy.valid_source_types.add(self.topic)
+        self.hierarchy.valid_target_types.add(self.topic)
+        self.strict_hierarchy = RelationshipType.objects.create(
+            name="StrictHierarchy", ontology_model=self.model, derived_from=self.hierarchy
+        )
+
+        self.description = VertexTypePropertyDefinition.objects.create(name="description", vertex_type=self.element)
+        self.topic_description = VertexTypePropertyDefinition.objects.create(name="description", vertex_type=self.topic)
+        self.questions = VertexTypePropertyDefinition.objects.create(name="questions", vertex_type=self.topic)
+
+    def test_hierarchy(self):
+        closure = TypeClosureService.get(self.model)
+        types = closure.vertex_types
+
+        self.assertTrue(types.is_a(self.subtopic.id, self.element.id))
+        self.assertFalse(types.is_a(self.element.id, self.subtopic.id))
+        self.assertFalse(types.is_a(self.competence.id, self.element.id))
+        self.assertEqual(types.subtypes(self.element.id), {self.element.id, self.topic.id, self.subtopic.id})
+        self.assertEqual(types.subtypes(self.topic.id, include_self=False), {self.subtopic.id})
+        self.assertEqual(types.supertypes(self.subtopic.id), (self.subtopic.id, self.topic.id, self.element.id))
+
+        self.assertTrue(closure.data_types.is_a(self.code.id, self.string.id))
+        self.assertTrue(closure.relationship_types.is_a(self.strict_hierarchy.id, self.hierarchy.id))
+
+    def test_lookups_do_not_query(self):
+        closure = TypeClosureService.get(self.model)
+        with self.assertNumQueries(0):
+            self.assertIs(TypeClosureService.get(self.model), closure)
+            closure.vertex_types.is_a(self.subtopic.id, self.element.id)
+            closure.vertex_types.subtypes(self.element.id)
+            closure.vertex_properties[self.subtopic.id]
+
+    def test_inherited_definitions(self):
+        closure = TypeClosureService.get(self.model)
+        self.assertEqual(
+            closure.vertex_properties[self.subtopic.id],
+            {"description": self.topic_description, "questions": self.questions},
+        )
+        self.assertEqual(closure.vertex_properties[self.element.id], {"description": self.description})
+
+    def test_rebuilt_on_change(self):
+        closure = TypeClosureService.get(self.model)
+        self.competence.derived_from = self.element
+        self.competence.save()
+
+        rebuilt = TypeClosureService.get(self.model)
+        self.assertIsNot(rebuilt, closure)
+        self.assertTrue(rebuilt.vertex_types.is_a(self.competence.id, self.element.id))
+
+        VertexTypePropertyDefinition.objects.create(name="code", vertex_type=self.element)
+        self.assertIn("code", TypeClosureService.get(self.model).vertex_properties[self.subtopic.id])
+
+    def test_query_filter_includes_subtypes(self):
+        ontology = Ontology.objects.create(name="ClosureOntology")
+        topic = Vertex.objects.create(name="topic", type=self.topic, ontology=ontology)
+        subtopic = Vertex.objects.create(name="subtopic", type=self.subtopic, ontology=ontology)
+        Vertex.objects.create(name="competence", type=self.competence, ontology=ontology)
+
+        self.assertEqual(set(Vertex.objects.filter(vertex_type_q(self.topic))), {topic, subtopic})
+        self.assertEqual(set(Vertex.objects.filter(vertex_type_q(self.topic, include_subtypes=False))), {topic})
+
+    def test_validators(self):
+        ontology = Ontology.objects.create(name="ClosureOntology")
+        topic = Vertex.objects.create(name="topic", type=self.topic, ontology=ontology)
+        subtopic = Vertex.objects.create(name="subtopic", type=self.subtopic, ontology=ontology)
+        competence = Vertex.objects.create(name="competence", type=self.competence, ontology=ontology)
+
+        Relationship(name="r1", type=self.strict_hierarchy, source=subtopic, target=topic, ontology=ontology).clean()
+        with self.assertRaises(ValidationError):
+            Relationship(name="r2", type=self.hierarchy, source=competence, target=topic, ontology=ontology).clean()
+
+        other = Ontology.objects.create(name="OtherOntology")
+        with self.assertRaises(ValidationError):
+            Relationship(name="r3", type=self.hierarchy, source=topic, target=subtopic, ontology=other).clean()
+
+        VertexPropertyAssignment(vertex=subtopic, definition=self.questions, value=[]).clean()
+        with self.assertRaises(ValidationError):
+            VertexPropertyAssignment(vertex=competence, definition=self.questions, value=[]).clean()
+
+    def test_validators_incomplete(self):
+        # Незаполненные связи — ошибки полей от full_clean, а не исключение из clean
+        for instance, fields in (
+            (Relationship(name="r"), {"type", "source", "target", "ontology"}),
+            (VertexPropertyAssignment(), {"vertex", "definition"}),
+            (RelationshipPropertyAssignment(), {"relationship", "definition"}),
+        ):
+            with self.subTest(model=type(instance).__name__):
+                with self.assertRaises(ValidationError) as context:
+                    instance.full_clean()
+                self.assertLessEqual(fields, set(context.exception.message_dict))
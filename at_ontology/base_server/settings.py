@@ -159,3 +159,29 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Ontology full-text search
+# Property definition name -> JSON paths inside the property value whose strings are indexed
+# ("" indexes the value itself; lists are traversed element-wise)
+
+ONTOLOGY_SEARCH_PROPERTIES = {
+    "questions": ["question"],
+    "code": [""],
+    "description": [""],
+}
+
+# Vertex.metadata keys with expression indexes (apply changes with `manage.py sync_metadata_indexes`)
+
+ONTOLOGY_INDEXED_METADATA_KEYS = ["legacy_db_id", "parent_id"]
+
+# String-similarity cache shared by the matching scorers: pairs kept in memory per process
+# and an optional SQLite file that persists them across processes and runs. Off by default;
+# matrices with more pairs than the size bypass the cache, so size it above the typical label matrix
+
+ONTOLOGY_SIMILARITY_CACHE_SIZE = int(os.getenv("ONTOLOGY_SIMILARITY_CACHE_SIZE", 0))
+ONTOLOGY_SIMILARITY_CACHE_PATH = os.getenv("ONTOLOGY_SIMILARITY_CACHE_PATH") or None
+
+# Matching jobs run by the ATOntology component: number of ontology pairs matched at once,
+# each in its own worker process
+
+ONTOLOGY_MATCHING_WORKERS = int(os.getenv("ONTOLOGY_MATCHING_WORKERS", 2))
@@ -1,5 +1,33 @@
 from at_queue.core.at_component import ATComponent
+from at_queue.utils.decorators import component_method
+
+from at_ontology.apps.ontology.matching.jobs import matching_jobs
 
 
 class ATOntology(ATComponent):
-    pass
+    # ─── Сопоставление онтологий ───
+
+    @component_method
+    def start_matching(
+        self,
+        ontology_a: str,
+        ontology_b: str,
+        preset: str = "similarity_flooding",
+        params: dict = None,
+    ) -> str:
+        """Ставит в очередь сопоставление онтологий из БД; возвращает id задачи."""
+        return matching_jobs().start(ontology_a, ontology_b, preset, params)
+
+    @component_method
+    def matching_status(self, job_id: str, events_offset: int = 0) -> dict:
+        """Состояние задачи и её события начиная с ``events_offset``."""
+        return matching_jobs().status(job_id, events_offset)
+
+    @component_method
+    def matching_results(self, job_id: str, offset: int = 0, limit: int = None) -> list:
+        """Уже найденные пары ``[имя_a, имя_b, σ, σ⁰]`` по убыванию σ."""
+        return [list(row) for row in matching_jobs().results(job_id, offset, limit)]
+
+    @component_method
+    def cancel_matching(self, job_id: str) -> bool:
+        return matching_jobs().cancel(job_id)